@@ -94,5 +94,26 @@ class Config:
         or "sqlite:///" + os.path.join(persistent_dir, "usda_data.db")
     }
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Compiled nutrition labels, keyed by a hash of their Typst source
+    LABEL_CACHE_DIR = os.environ.get("LABEL_CACHE_DIR") or os.path.join(
+        persistent_dir, "label_cache"
+    )
+    LABEL_CACHE_MAX_BYTES = int(
+        os.environ.get("LABEL_CACHE_MAX_BYTES", 256 * 1024 * 1024)
+    )
+    # Typst label compilations: concurrent processes, waiting labels, and the
+    # seconds a request waits before answering 503 with Retry-After
+    LABEL_RENDER_MAX_CONCURRENCY = int(
+        os.environ.get("LABEL_RENDER_MAX_CONCURRENCY", 2)
+    )
+    LABEL_RENDER_MAX_QUEUE = int(os.environ.get("LABEL_RENDER_MAX_QUEUE", 32))
+    LABEL_RENDER_QUEUE_TIMEOUT = float(os.environ.get("LABEL_RENDER_QUEUE_TIMEOUT", 10))
+    LABEL_RENDER_RETRY_AFTER = int(os.environ.get("LABEL_RENDER_RETRY_AFTER", 5))
+    # Background jobs: worker threads (0 runs jobs in the request that starts
+    # them), and where uploads wait for the job that processes them
+    JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 2))
+    JOB_UPLOAD_DIR = os.environ.get("JOB_UPLOAD_DIR") or os.path.join(
+        persistent_dir, "job_uploads"
+    )
     DIET_PRESETS = DIET_PRESETS
     CORE_NUTRIENT_IDS = CORE_NUTRIENT_IDS
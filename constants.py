@@ -28,6 +28,52 @@ CORE_NUTRIENT_IDS = {
     "potassium": 1092,
 }
 
+# Nutrition label lines precomputed per USDA food by the importer, as
+# (food_label_facts column, USDA nutrient names tried in order, label unit).
+LABEL_FACT_NUTRIENTS = [
+    (
+        "energy",
+        [
+            "Energy",
+            "Energy (Atwater General Factors)",
+            "Energy (Atwater Specific Factors)",
+        ],
+        "kcal",
+    ),
+    ("fat", ["Total lipid (fat)", "Lipids"], "g"),
+    ("saturated_fat", ["Fatty acids, total saturated"], "g"),
+    ("trans_fat", ["Fatty acids, total trans"], "g"),
+    ("cholesterol", ["Cholesterol"], "mg"),
+    ("sodium", ["Sodium", "Sodium, Na"], "mg"),
+    ("carbs", ["Carbohydrate, by difference", "Carbohydrates"], "g"),
+    ("fiber", ["Fiber, total dietary", "Total dietary fiber (AOAC 2011.25)"], "g"),
+    ("sugars", ["Sugars, total including NLEA", "Sugars, total", "Total Sugars"], "g"),
+    ("added_sugars", ["Sugars, added"], "g"),
+    ("protein", ["Protein", "Adjusted Protein"], "g"),
+    ("vitamin_d", ["Vitamin D (D2 + D3)"], "mcg"),
+    (
+        "calcium",
+        ["Calcium", "Calcium, Ca", "Calcium, added", "Calcium, intrinsic"],
+        "mg",
+    ),
+    (
+        "iron",
+        [
+            "Iron",
+            "Iron, Fe",
+            "Iron, heme",
+            "Iron, non-heme",
+            "Iron, added",
+            "Iron, intrinsic",
+        ],
+        "mg",
+    ),
+    ("potassium", ["Potassium", "Potassium, K"], "mg"),
+]
+
+# USDA nutrient.csv unit names of the label units
+USDA_UNIT_NAMES = {"kcal": "KCAL", "g": "G", "mg": "MG", "mcg": "UG"}
+
 WATER = "Water"
 BREAKFAST = "Breakfast"
 SNACK_MORNING = "Snack (morning)"
@@ -9,13 +9,22 @@ mkdir -p "$PERSISTENT_DIR"
 USDA_DB_PATH="$PERSISTENT_DIR/usda_data.db"
 USDA_CSV_DIR="$PERSISTENT_DIR/usda_data"
 MEASURE_UNIT_CSV_PATH="$USDA_CSV_DIR/measure_unit.csv"
+# The FoodData Central release to use; set USDA_RELEASE to move to another
+DEFAULT_USDA_RELEASE="2025-04-24"
+USDA_RELEASE="${USDA_RELEASE:-$DEFAULT_USDA_RELEASE}"
+RELEASE_MARKER="$USDA_CSV_DIR/release.txt"
 
 # Step 1: Ensure USDA CSV directory exists and download if files are missing
+# or of another release
 mkdir -p "$USDA_CSV_DIR"
-if [ ! -f "$MEASURE_UNIT_CSV_PATH" ]; then
-    echo "--- USDA CSV files not found. Downloading and extracting... ---"
+if [ -f "$MEASURE_UNIT_CSV_PATH" ] && [ ! -f "$RELEASE_MARKER" ]; then
+    # Downloaded before the release was recorded
+    echo "$DEFAULT_USDA_RELEASE" > "$RELEASE_MARKER"
+fi
+if [ ! -f "$MEASURE_UNIT_CSV_PATH" ] || [ "$(cat "$RELEASE_MARKER")" != "$USDA_RELEASE" ]; then
+    echo "--- USDA CSV files of release $USDA_RELEASE not found. Downloading and extracting... ---"
     
-    URL="https://fdc.nal.usda.gov/fdc-datasets/FoodData_Central_csv_2025-04-24.zip"
+    URL="https://fdc.nal.usda.gov/fdc-datasets/FoodData_Central_csv_${USDA_RELEASE}.zip"
     ZIP_FILE="$USDA_CSV_DIR/usda_data.zip"
     
     echo "--- Downloading USDA dataset... ---"
@@ -32,17 +41,23 @@ if [ ! -f "$MEASURE_UNIT_CSV_PATH" ]; then
     fi
     
     rm "$ZIP_FILE"
+    echo "$USDA_RELEASE" > "$RELEASE_MARKER"
 else
     echo "--- USDA CSV files found. Skipping download. ---"
 fi
 
-# Step 2: Build the USDA database from the CSVs only if it doesn't exist
+# Step 2: Build the USDA database from the CSVs if it doesn't exist or holds
+# another release. The importer builds and validates a new file and swaps it
+# into place, so an existing database keeps being served meanwhile: its
+# rebuild runs in the background and the app picks up the new file.
+IMPORT_ARGS=(--db_file "$USDA_DB_PATH" --usda_data_dir "$USDA_CSV_DIR" --release "$USDA_RELEASE" --skip_if_current)
 if [ ! -f "$USDA_DB_PATH" ]; then
     echo "--- USDA database not found. Building from CSV files... ---"
-    python import_usda_data.py --db_file "$USDA_DB_PATH" # Pass the correct path
+    python import_usda_data.py "${IMPORT_ARGS[@]}"
     echo "--- USDA database build complete. ---"
 else
-    echo "--- USDA database found. Skipping build. ---"
+    echo "--- USDA database found. Rebuilding in the background if it isn't of release $USDA_RELEASE. ---"
+    python import_usda_data.py "${IMPORT_ARGS[@]}" > "$PERSISTENT_DIR/usda_import.log" 2>&1 &
 fi
 
 # Step 3: Always run user database migrations and seeding
@@ -6,6 +6,66 @@ import os
 import sys
 import time
 import re
+import io
+import json
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager, nullcontext
+
+from usda_nutrients import (
+    ENERGY_NUTRIENT_IDS,
+    label_fact_nutrient_ids,
+    referenced_nutrient_ids,
+)
+
+SCHEMA_FILE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "schema_usda.sql"
+)
+# Size of the byte ranges CSV files are split into for parallel parsing, and
+# how many of them each worker may parse ahead of the writer
+CSV_CHUNK_BYTES = 1024 * 1024
+PARSE_AHEAD_PER_WORKER = 2
+# Connection settings of a bulk load; see set_bulk_load_pragmas
+BULK_LOAD_PRAGMAS = (
+    "page_size = 16384",
+    "journal_mode = OFF",
+    "synchronous = OFF",
+    "locking_mode = EXCLUSIVE",
+    "cache_size = -262144",  # 256 MiB
+    "temp.cache_size = -262144",
+)
+# Created after the tables are filled, so the inserts don't maintain them.
+# food_nutrients needs none: its primary key already is a unique index on
+# (fdc_id, nutrient_id).
+POST_LOAD_INDEXES = (
+    # Barcode lookups
+    "CREATE INDEX idx_foods_upc ON foods (upc)",
+)
+# Tables an update compares with the new release, and their key columns.
+# Inserts and updates are applied in this order, deletes in reverse.
+RELEASE_TABLES = (
+    ("nutrients", ("id",)),
+    ("foods", ("fdc_id",)),
+    ("food_nutrients", ("fdc_id", "nutrient_id")),
+    ("food_label_facts", ("fdc_id",)),
+    ("pruned_nutrients", ("id",)),
+)
+# `keep_nutrients` value that keeps the nutrients the app reads
+REFERENCED_NUTRIENTS = "referenced"
+# Rows an update changes per transaction
+UPDATE_BATCH_SIZE = 10000
+# User database tables that hold USDA fdc_ids
+USER_FDC_ID_TABLES = (
+    "daily_logs",
+    "recipe_ingredients",
+    "my_meal_items",
+    "my_foods",
+    "portions",
+)
+
+
+class InvalidDatabaseError(Exception):
+    """Raised when a newly built database fails validation."""
 
 
 def intelligent_capwords(s):
@@ -15,299 +75,916 @@ def intelligent_capwords(s):
     return re.sub(r"[A-Za-z]+('[A-Za-z]+)?", lambda mo: mo.group(0).capitalize(), s)
 
 
-def import_usda_data(db_file=None, keep_newest_upc_only=False):
+def populate_label_facts(cursor):
+    """
+    Fills food_label_facts with one row per food holding its resolved
+    nutrition label values, so labels don't have to match nutrient names.
+    """
+    cursor.execute("SELECT id, name, unit_name FROM nutrients")
+    column_ids = label_fact_nutrient_ids(cursor.fetchall())
+
+    columns = []
+    expressions = []
+    all_ids = set()
+    for column, ids in column_ids.items():
+        columns.append(column)
+        # The first candidate the food has a value for wins
+        cases = [
+            f"MAX(CASE WHEN fn.nutrient_id = {int(nutrient_id)} THEN fn.amount END)"
+            for nutrient_id in ids
+        ]
+        expressions.append(f"COALESCE({', '.join(cases)}, 0)" if cases else "0")
+        all_ids.update(int(nutrient_id) for nutrient_id in ids)
+
+    id_list = ", ".join(str(nutrient_id) for nutrient_id in sorted(all_ids)) or "NULL"
+    cursor.execute(
+        f"INSERT INTO food_label_facts (fdc_id, {', '.join(columns)}) "
+        f"SELECT f.fdc_id, {', '.join(expressions)} FROM foods f "
+        f"LEFT JOIN food_nutrients fn ON fn.fdc_id = f.fdc_id "
+        f"AND fn.nutrient_id IN ({id_list}) "
+        f"GROUP BY f.fdc_id"
+    )
+    return cursor.rowcount
+
+
+@contextmanager
+def timed_phase(name, timings):
+    """Prints how long the phase in the `with` block took, and records it."""
+    print(f"\n{name}...")
+    start = time.perf_counter()
+    yield
+    elapsed = time.perf_counter() - start
+    timings.append((name, elapsed))
+    print(f"-> {name} took {elapsed:.1f}s.")
+
+
+def read_csv_rows(path):
+    """Yields the rows of a USDA CSV file, without its header."""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        next(reader)  # Skip header
+        yield from reader
+
+
+# Row parsers: turn a CSV row into the values staged for it, or None to skip
+# it. They run in the worker processes of a parallel import.
+
+
+def food_nutrient_values(row):
+    amount = float(row[3])
+    if amount > 0:
+        return row[1], row[2], amount
+    return None
+
+
+def food_values(row):
+    return row[0], row[1], intelligent_capwords(row[2]), row[3] or None
+
+
+def branded_food_values(row):
+    return (
+        row[0],
+        row[4] or None,
+        intelligent_capwords(row[5] or None),
+        row[14] or "1900-01-01",
+    )
+
+
+def _record_end(data):
+    """
+    The offset after the last complete CSV record in `data`, which starts
+    at a record: the last newline outside a quoted field. Quotes inside
+    fields are doubled, so a newline is outside one when the number of
+    quotes before it is even. Returns 0 if `data` holds no complete record.
+    """
+    end = data.rfind(b"\n")
+    while end >= 0:
+        if data.count(b'"', 0, end) % 2 == 0:
+            return end + 1
+        end = data.rfind(b"\n", 0, end)
+    return 0
+
+
+def csv_chunks(path, chunk_bytes=None):
+    """
+    Splits the records of a CSV file, after its header, into (start, end)
+    byte ranges of about `chunk_bytes` that begin and end at record
+    boundaries, for workers to parse independently.
+    """
+    chunk_bytes = chunk_bytes or CSV_CHUNK_BYTES
+    chunks = []
+    with open(path, "rb") as f:
+        f.readline()  # Skip header
+        start = f.tell()
+        buffer = b""
+        while True:
+            data = f.read(chunk_bytes)
+            buffer += data
+            # At the end of the file, the last record may lack a newline
+            end = _record_end(buffer) if data else len(buffer)
+            if end:
+                chunks.append((start, start + end))
+                start += end
+                buffer = buffer[end:]
+            if not data:
+                return chunks
+
+
+def parse_csv_chunk(path, start, end, parse_row):
+    """Parses the records in a byte range of a CSV file with `parse_row`."""
+    with open(path, "rb") as f:
+        f.seek(start)
+        text = f.read(end - start).decode("utf-8")
+    values = []
+    for row in csv.reader(io.StringIO(text, newline="")):
+        row_values = parse_row(row)
+        if row_values is not None:
+            values.append(row_values)
+    return values
+
+
+def parse_csv(path, parse_row, pool=None, workers=1):
+    """
+    Yields the values `parse_row` returns for the rows of a CSV file, in
+    file order. With a process pool of `workers` processes, chunks of the
+    file are parsed by the workers. At most PARSE_AHEAD_PER_WORKER chunks
+    per worker are parsed ahead of the caller, which bounds the memory the
+    results take while the caller writes them.
+    """
+    if pool is None:
+        for row in read_csv_rows(path):
+            row_values = parse_row(row)
+            if row_values is not None:
+                yield row_values
+        return
+
+    pending = deque()
+    max_pending = PARSE_AHEAD_PER_WORKER * workers
+    for start, end in csv_chunks(path):
+        pending.append(pool.submit(parse_csv_chunk, path, start, end, parse_row))
+        if len(pending) >= max_pending:
+            yield from pending.popleft().result()
+    while pending:
+        yield from pending.popleft().result()
+
+
+def create_staging_tables(cursor):
+    """
+    Creates the temporary tables the CSV files are streamed into. Their
+    rowids keep the order of the rows in the files. They live in SQLite's
+    temporary file rather than the database, and go with the connection.
+    """
+    cursor.executescript(
+        """
+        CREATE TEMP TABLE food_nutrient_staging (
+            fdc_id INTEGER NOT NULL,
+            nutrient_id INTEGER NOT NULL,
+            amount REAL NOT NULL
+        );
+        CREATE TEMP TABLE food_staging (
+            fdc_id INTEGER NOT NULL,
+            data_type TEXT,
+            description TEXT,
+            food_category_id INTEGER
+        );
+        CREATE TEMP TABLE branded_food_staging (
+            fdc_id INTEGER NOT NULL,
+            gtin_upc TEXT,
+            ingredients TEXT,
+            available_date TEXT
+        );
+        CREATE TEMP TABLE energy_foods (fdc_id INTEGER PRIMARY KEY);
+        CREATE TEMP TABLE branded_foods (
+            fdc_id INTEGER PRIMARY KEY,
+            gtin_upc TEXT,
+            ingredients TEXT
+        );
+        """
+    )
+
+
+def stage_food_nutrients(cursor, rows):
+    """
+    Streams the positive amounts of food_nutrient.csv, as parsed by
+    food_nutrient_values, into the staging table and returns the number of
+    rows staged.
+    """
+    cursor.executemany(
+        "INSERT INTO food_nutrient_staging (fdc_id, nutrient_id, amount) "
+        "VALUES (?, ?, ?)",
+        rows,
+    )
+    return cursor.rowcount
+
+
+def stage_foods(cursor, rows):
+    cursor.executemany(
+        "INSERT INTO food_staging (fdc_id, data_type, description, food_category_id) "
+        "VALUES (?, ?, ?, ?)",
+        rows,
+    )
+    return cursor.rowcount
+
+
+def stage_branded_foods(cursor, rows):
+    cursor.executemany(
+        "INSERT INTO branded_food_staging "
+        "(fdc_id, gtin_upc, ingredients, available_date) VALUES (?, ?, ?, ?)",
+        rows,
+    )
+    return cursor.rowcount
+
+
+def select_energy_foods(cursor):
+    """Collects the foods with a positive energy value."""
+    energy_ids = ", ".join(str(nutrient_id) for nutrient_id in ENERGY_NUTRIENT_IDS)
+    cursor.execute(
+        "INSERT OR IGNORE INTO energy_foods (fdc_id) "
+        f"SELECT fdc_id FROM food_nutrient_staging WHERE nutrient_id IN ({energy_ids})"
+    )
+    cursor.execute("SELECT COUNT(*) FROM energy_foods")
+    return cursor.fetchone()[0]
+
+
+def select_branded_foods(cursor, keep_newest_upc_only):
+    """
+    Picks the UPC and ingredients of each branded food: the last row of a
+    food, or with `keep_newest_upc_only`, only the row with the newest
+    available_date of each UPC keeps the UPC's data (the first such row in
+    the file on a tie). Returns the number of duplicate UPC rows.
+    """
+    if not keep_newest_upc_only:
+        cursor.execute(
+            "INSERT OR REPLACE INTO branded_foods (fdc_id, gtin_upc, ingredients) "
+            "SELECT fdc_id, gtin_upc, ingredients FROM branded_food_staging "
+            "ORDER BY rowid"
+        )
+        return 0
+
+    cursor.execute(
+        "INSERT OR REPLACE INTO branded_foods (fdc_id, gtin_upc, ingredients) "
+        "SELECT fdc_id, gtin_upc, ingredients FROM branded_food_staging "
+        "WHERE gtin_upc IS NULL ORDER BY rowid"
+    )
+    cursor.execute(
+        "INSERT OR REPLACE INTO branded_foods (fdc_id, gtin_upc, ingredients) "
+        "SELECT fdc_id, gtin_upc, ingredients FROM ("
+        "  SELECT fdc_id, gtin_upc, ingredients, ROW_NUMBER() OVER ("
+        "    PARTITION BY gtin_upc ORDER BY available_date DESC, rowid"
+        "  ) AS upc_rank FROM branded_food_staging WHERE gtin_upc IS NOT NULL"
+        ") WHERE upc_rank = 1"
+    )
+    cursor.execute(
+        "SELECT COUNT(*) - COUNT(DISTINCT gtin_upc) FROM branded_food_staging "
+        "WHERE gtin_upc IS NOT NULL"
+    )
+    return cursor.fetchone()[0]
+
+
+def populate_foods(cursor):
+    """
+    Fills foods with the foods that have energy, with their descriptions
+    and, for branded foods, their UPC and ingredients.
+    """
+    cursor.execute(
+        "INSERT INTO foods "
+        "(fdc_id, description, data_type, food_category_id, upc, ingredients) "
+        "SELECT f.fdc_id, f.description, f.data_type, f.food_category_id, "
+        "CASE WHEN f.data_type = 'branded_food' THEN b.gtin_upc END, "
+        "CASE WHEN f.data_type = 'branded_food' THEN b.ingredients END "
+        "FROM food_staging f "
+        "JOIN energy_foods e ON e.fdc_id = f.fdc_id "
+        "LEFT JOIN branded_foods b ON b.fdc_id = f.fdc_id "
+        "ORDER BY f.rowid"
+    )
+    return cursor.rowcount
+
+
+def select_kept_nutrients(cursor, keep_nutrients):
+    """
+    Fills pruned_nutrients with the nutrients not in `keep_nutrients`: an
+    iterable of nutrient ids, or REFERENCED_NUTRIENTS for those the app
+    reads. The energy nutrients are always kept. Returns the number of
+    nutrients pruned.
+    """
+    cursor.execute("SELECT id, name, unit_name FROM nutrients")
+    nutrients = cursor.fetchall()
+    if keep_nutrients == REFERENCED_NUTRIENTS:
+        kept_ids = referenced_nutrient_ids(nutrients)
+    else:
+        kept_ids = {int(nutrient_id) for nutrient_id in keep_nutrients}
+        kept_ids.update(ENERGY_NUTRIENT_IDS)
+    cursor.executemany(
+        "INSERT INTO pruned_nutrients (id) VALUES (?)",
+        ((row[0],) for row in nutrients if row[0] not in kept_ids),
+    )
+    return cursor.rowcount
+
+
+def populate_food_nutrients(cursor):
+    """
+    Fills food_nutrients with the positive amounts of the foods that have
+    energy, except those of pruned_nutrients. The first row of a (food,
+    nutrient) pair in the file wins. Returns (rows inserted, duplicate rows
+    skipped, pruned rows skipped).
+
+    The duplicates are dropped before the insert, which then adds the rows
+    in primary key order: appending to the key's B-tree is much cheaper
+    than inserting in file order and ignoring conflicts.
+    """
+    cursor.execute(
+        "SELECT COUNT(*), "
+        "COALESCE(SUM(nutrient_id IN (SELECT id FROM pruned_nutrients)), 0) "
+        "FROM food_nutrient_staging "
+        "WHERE fdc_id IN (SELECT fdc_id FROM energy_foods)"
+    )
+    processed_count, pruned_count = cursor.fetchone()
+    cursor.execute(
+        "INSERT INTO food_nutrients (fdc_id, nutrient_id, amount) "
+        "SELECT fdc_id, nutrient_id, amount FROM ("
+        "  SELECT fdc_id, nutrient_id, amount, ROW_NUMBER() OVER ("
+        "    PARTITION BY fdc_id, nutrient_id ORDER BY rowid"
+        "  ) AS pair_rank FROM food_nutrient_staging"
+        "  WHERE fdc_id IN (SELECT fdc_id FROM energy_foods)"
+        "  AND nutrient_id NOT IN (SELECT id FROM pruned_nutrients)"
+        ") WHERE pair_rank = 1 ORDER BY fdc_id, nutrient_id"
+    )
+    inserted_count = cursor.rowcount
+    return (
+        inserted_count,
+        processed_count - pruned_count - inserted_count,
+        pruned_count,
+    )
+
+
+def create_indexes(cursor):
+    """Creates the secondary indexes, once the tables are filled."""
+    for statement in POST_LOAD_INDEXES:
+        cursor.execute(statement)
+
+
+def set_bulk_load_pragmas(cursor):
+    """
+    Trades durability for speed while a new database is built: a crash
+    leaves a corrupt file, which a bulk load discards anyway.
+    """
+    for pragma in BULK_LOAD_PRAGMAS:
+        cursor.execute(f"PRAGMA {pragma}")
+
+
+def remove_database(db_file):
+    print(f"Removing existing database: {db_file}")
+    retries = 5
+    delay = 0.5
+    for i in range(retries):
+        try:
+            os.remove(db_file)
+            break
+        except PermissionError:
+            if i < retries - 1:
+                print(f"PermissionError: Could not remove DB. Retrying in {delay}s...")
+                time.sleep(delay)
+            else:
+                raise  # Re-raise if all retries fail
+
+
+def validate_database(db_file, expected_counts):
+    """
+    Checks a newly built database before it replaces the old one: SQLite's
+    integrity_check must pass, its tables must hold `expected_counts`
+    rows, and it must have foods. Raises InvalidDatabaseError otherwise.
+    """
+    conn = sqlite3.connect(db_file)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("PRAGMA integrity_check")
+        problems = [row[0] for row in cursor.fetchall()]
+        if problems != ["ok"]:
+            raise InvalidDatabaseError(
+                f"Integrity check of {db_file} failed: {'; '.join(problems[:5])}"
+            )
+        for table, expected in expected_counts.items():
+            cursor.execute(f"SELECT COUNT(*) FROM {table}")
+            count = cursor.fetchone()[0]
+            if count != expected:
+                raise InvalidDatabaseError(
+                    f"{db_file} has {count} rows in {table} instead of {expected}."
+                )
+            print(f"-> {table}: {count} rows.")
+        if not expected_counts.get("foods"):
+            raise InvalidDatabaseError(f"{db_file} has no foods.")
+    finally:
+        conn.close()
+
+
+def swap_database(new_file, db_file):
+    """
+    Moves `new_file` over `db_file` in one atomic rename, after flushing it
+    to disk, so `db_file` is always either the whole old or the whole new
+    database. Connections open on the old database keep reading it.
+    """
+    with open(new_file, "rb") as f:
+        os.fsync(f.fileno())
+    os.replace(new_file, db_file)
+
+
+def populate_database(
+    conn,
+    usda_data_dir,
+    keep_newest_upc_only,
+    timings,
+    pool=None,
+    workers=1,
+    keep_nutrients=None,
+):
+    """
+    Creates the schema in `conn` and fills it from the CSV files, parsing
+    the large ones on `pool` when one is given. With `keep_nutrients`,
+    only the values of those nutrients are stored; see
+    select_kept_nutrients.
+    """
+    cursor = conn.cursor()
+
+    def parsed(file_name, parse_row):
+        path = os.path.join(usda_data_dir, file_name)
+        return parse_csv(path, parse_row, pool, workers)
+
+    with open(SCHEMA_FILE, "r") as f:
+        cursor.executescript(f.read())
+    print("Schema created successfully.")
+    create_staging_tables(cursor)
+
+    # --- DATA POPULATION ---
+
+    with timed_phase("Populating 'nutrients' table", timings):
+        cursor.executemany(
+            "INSERT INTO nutrients (id, name, unit_name) VALUES (?, ?, ?)",
+            (
+                (row[0], row[1], row[2])
+                for row in read_csv_rows(os.path.join(usda_data_dir, "nutrient.csv"))
+            ),
+        )
+        print(f"-> Imported {cursor.rowcount} nutrients.")
+        if keep_nutrients is not None:
+            count = select_kept_nutrients(cursor, keep_nutrients)
+            print(f"-> Pruning the values of {count} nutrients not kept.")
+
+    with timed_phase("Staging 'food_nutrient.csv'", timings):
+        count = stage_food_nutrients(
+            cursor, parsed("food_nutrient.csv", food_nutrient_values)
+        )
+        print(f"-> Staged {count} positive food nutrient values.")
+
+    with timed_phase("Staging 'food.csv' and 'branded_food.csv'", timings):
+        count = stage_foods(cursor, parsed("food.csv", food_values))
+        print(f"-> Staged {count} foods.")
+        count = stage_branded_foods(
+            cursor, parsed("branded_food.csv", branded_food_values)
+        )
+        print(f"-> Staged {count} branded foods.")
+
+    with timed_phase("Selecting foods with energy values", timings):
+        count = select_energy_foods(cursor)
+        print(f"-> Found {count} foods with energy.")
+        duplicate_upcs = select_branded_foods(cursor, keep_newest_upc_only)
+        if keep_newest_upc_only:
+            print(
+                f"-> Found {duplicate_upcs} duplicate UPCs. Keeping the most recent for each."
+            )
+        else:
+            print("-> Including all branded foods.")
+
+    with timed_phase("Populating 'foods' table", timings):
+        count = populate_foods(cursor)
+        print(f"-> Imported {count} foods.")
+
+    with timed_phase("Populating 'food_nutrients' table", timings):
+        inserted_count, skipped_count, pruned_count = populate_food_nutrients(cursor)
+        print(f"-> Imported {inserted_count} unique food nutrients.")
+        print(f"-> Skipped {skipped_count} duplicate entries.")
+        if pruned_count:
+            share = pruned_count / (inserted_count + pruned_count)
+            print(
+                f"-> Pruned {pruned_count} values of nutrients not kept "
+                f"({share:.0%} of the food nutrient values)."
+            )
+
+    with timed_phase("Populating 'food_label_facts' table", timings):
+        label_facts_count = populate_label_facts(cursor)
+        print(f"-> Computed label facts for {label_facts_count} foods.")
+
+    with timed_phase("Creating indexes and statistics", timings):
+        create_indexes(cursor)
+        cursor.execute("ANALYZE")
+    conn.commit()
+
+
+def import_usda_data(
+    db_file=None,
+    keep_newest_upc_only=False,
+    usda_data_dir=None,
+    bulk_load=True,
+    workers=1,
+    release=None,
+    keep_nutrients=None,
+):
     """
     Creates and populates the SQLite database from USDA CSV files.
-    This script is idempotent: it deletes the old database on every run.
-    This version is optimized to reduce memory usage.
+    This script is idempotent: it replaces the old database on every run.
+
+    Each CSV file is read once and streamed into a temporary staging table.
+    Which foods have energy, the branded foods' UPCs and ingredients, and
+    the foods and food_nutrients rows are then worked out with SQL inside
+    SQLite, so Python's memory use stays the same for any size of release.
+
+    With `bulk_load`, the database is built in a scratch file without
+    journaling or syncs, then written to a new file with VACUUM INTO, which
+    leaves it compact and its tables and indexes in order.
+
+    With more than one of `workers` (0 for one per CPU), food.csv,
+    branded_food.csv and food_nutrient.csv are split into chunks that a
+    pool of processes parses and normalizes, while this process writes the
+    results in file order. The database is the same as a serial import's.
+
+    The new database is checked with `validate_database` and then renamed
+    over `db_file` in one atomic step, so a running application keeps
+    reading the old database until it notices the new one, and a failed
+    import leaves the old database in place.
+
+    With `keep_nutrients`, a list of nutrient ids or REFERENCED_NUTRIENTS
+    for the nutrients the app reads, the values of all other nutrients are
+    left out of food_nutrients, its largest table, and listed in
+    pruned_nutrients.
+
+    The import is recorded in usda_releases as `release`, by default the
+    name of `usda_data_dir`; `update_usda_data` applies later releases.
     """
     if db_file is None:
         db_file = "persistent/usda_data.db"
-    usda_data_dir = "persistent/usda_data"
-    schema_file = "schema_usda.sql"
-    CHUNK_SIZE = 50000
-
-    if os.path.exists(db_file):
-        print(f"Removing existing database: {db_file}")
-        retries = 5
-        delay = 0.5
-        for i in range(retries):
-            try:
-                os.remove(db_file)
-                break
-            except PermissionError:
-                if i < retries - 1:
-                    print(
-                        f"PermissionError: Could not remove DB. Retrying in {delay}s..."
-                    )
-                    time.sleep(delay)
-                else:
-                    raise  # Re-raise if all retries fail
+    if usda_data_dir is None:
+        usda_data_dir = "persistent/usda_data"
+    new_file = f"{db_file}.new"
+    build_file = f"{db_file}.build" if bulk_load else new_file
+    workers = workers or os.cpu_count()
 
+    for path in {new_file, build_file}:
+        if os.path.exists(path):
+            remove_database(path)
+
+    timings = []
+    import_start = time.perf_counter()
     try:
-        with sqlite3.connect(db_file) as conn:
-            print(f"Creating new database: {db_file}")
+        pool_context = ProcessPoolExecutor(workers) if workers > 1 else nullcontext()
+        with sqlite3.connect(build_file) as conn, pool_context as pool:
+            print(f"Creating new database: {build_file}")
+            if bulk_load:
+                set_bulk_load_pragmas(conn.cursor())
+            if pool:
+                print(f"Parsing CSV files with {workers} worker processes.")
+            populate_database(
+                conn,
+                usda_data_dir,
+                keep_newest_upc_only,
+                timings,
+                pool,
+                workers,
+                keep_nutrients,
+            )
             cursor = conn.cursor()
+            changes = {}
+            for table, _ in RELEASE_TABLES:
+                cursor.execute(f"SELECT COUNT(*) FROM {table}")
+                changes[table] = {"inserted": cursor.fetchone()[0]}
+            record_release(
+                cursor, release_name(release, usda_data_dir), "import", changes
+            )
+            conn.commit()
+            if bulk_load:
+                with timed_phase(f"Writing compacted database to {new_file}", timings):
+                    conn.execute("VACUUM INTO ?", (new_file,))
+        conn.close()
+        if bulk_load:
+            os.remove(build_file)
 
-            with open(schema_file, "r") as f:
-                cursor.executescript(f.read())
-            print("Schema created successfully.")
+        with timed_phase("Validating the new database", timings):
+            validate_database(
+                new_file,
+                {table: counts["inserted"] for table, counts in changes.items()},
+            )
+        swap_database(new_file, db_file)
+        print(f"-> Swapped the new database into place at {db_file}.")
+        print(f"-> Database size: {os.path.getsize(db_file) / 1024**2:.1f} MB.")
 
-            print("Creating index for faster inserts...")
+        print("\n--- Import successful. Database is ready. ---")
+
+    except (sqlite3.Error, IOError, csv.Error, InvalidDatabaseError) as e:
+        print(
+            f"\n--- An error occurred during database import: {e} ---", file=sys.stderr
+        )
+        for path in {new_file, build_file}:
+            if os.path.exists(path):
+                os.remove(path)
+        sys.exit(1)
+
+    print("\nTime per phase:")
+    for name, elapsed in timings:
+        print(f"  {name}: {elapsed:.1f}s")
+    print(f"  Total: {time.perf_counter() - import_start:.1f}s")
+
+
+def record_release(cursor, release, mode, changes):
+    """
+    Adds a row to usda_releases. `changes` maps table names to their counts
+    of inserted, updated and deleted rows.
+    """
+    cursor.execute(
+        "INSERT INTO usda_releases (release, mode, changes) VALUES (?, ?, ?)",
+        (release, mode, json.dumps(changes)),
+    )
+
+
+def create_missing_tables(cursor):
+    """
+    Creates the tables of the attached new release, as it defines them,
+    that are missing from a database imported by an older version of this
+    script, e.g. usda_releases or pruned_nutrients.
+    """
+    cursor.execute(
+        "SELECT sql FROM new_release.sqlite_master WHERE type = 'table' "
+        "AND name NOT LIKE 'sqlite_%' "
+        "AND name NOT IN (SELECT name FROM main.sqlite_master)"
+    )
+    for (sql,) in cursor.fetchall():
+        cursor.execute(sql)
+
+
+def current_release(db_file):
+    """
+    The release the database was last imported from or updated to, or None
+    if it doesn't exist or predates usda_releases.
+    """
+    if not os.path.exists(db_file):
+        return None
+    try:
+        conn = sqlite3.connect(f"file:{db_file}?mode=ro", uri=True)
+        try:
+            row = conn.execute(
+                "SELECT release FROM usda_releases ORDER BY id DESC LIMIT 1"
+            ).fetchone()
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return None
+    return row[0] if row else None
+
+
+def release_name(release, usda_data_dir):
+    return release or os.path.basename(os.path.normpath(usda_data_dir))
+
+
+def diff_release_table(cursor, table, keys):
+    """
+    Fills the temp table changes_<table> with the keys of the rows that the
+    release attached as `new_release` inserts, updates or deletes in the
+    main database's `table`, and returns the counts of each.
+    """
+    cursor.execute(f"PRAGMA main.table_info({table})")
+    values = [row[1] for row in cursor.fetchall() if row[1] not in keys]
+    key_list = ", ".join(keys)
+    joined = " AND ".join(f"o.{key} = n.{key}" for key in keys)
+    changed = " OR ".join(f"o.{column} IS NOT n.{column}" for column in values)
+    changes = f"temp.changes_{table}"
+
+    cursor.execute(f"DROP TABLE IF EXISTS {changes}")
+    cursor.execute(f"CREATE TABLE {changes} (change TEXT NOT NULL, {key_list})")
+    cursor.execute(
+        f"INSERT INTO {changes} SELECT 'insert', {key_list} FROM new_release.{table} n "
+        f"WHERE NOT EXISTS (SELECT 1 FROM main.{table} o WHERE {joined})"
+    )
+    inserted = cursor.rowcount
+    updated = 0
+    if values:
+        cursor.execute(
+            f"INSERT INTO {changes} SELECT 'update', "
+            f"{', '.join(f'n.{key}' for key in keys)} "
+            f"FROM new_release.{table} n JOIN main.{table} o ON {joined} "
+            f"WHERE {changed}"
+        )
+        updated = cursor.rowcount
+    cursor.execute(
+        f"INSERT INTO {changes} SELECT 'delete', {key_list} FROM main.{table} o "
+        f"WHERE NOT EXISTS (SELECT 1 FROM new_release.{table} n WHERE {joined})"
+    )
+    return {"inserted": inserted, "updated": updated, "deleted": cursor.rowcount}
+
+
+def apply_release_changes(conn, table, keys, deletes, batch_size):
+    """
+    Applies the upserts, or with `deletes` the deletes, listed in
+    changes_<table> to the main database, committing every `batch_size`
+    changes so readers are never blocked for long.
+    """
+    cursor = conn.cursor()
+    cursor.execute(f"PRAGMA main.table_info({table})")
+    columns = [row[1] for row in cursor.fetchall()]
+    key_list = ", ".join(keys)
+    changes = f"temp.changes_{table}"
+    cursor.execute(f"SELECT COALESCE(MAX(rowid), 0) FROM {changes}")
+    last = cursor.fetchone()[0]
+
+    for start in range(0, last, batch_size):
+        window = (start, start + batch_size)
+        if deletes:
             cursor.execute(
-                "CREATE UNIQUE INDEX IF NOT EXISTS idx_food_nutrients_unique ON food_nutrients (fdc_id, nutrient_id)"
+                f"DELETE FROM main.{table} WHERE ({key_list}) IN ("
+                f"SELECT {key_list} FROM {changes} "
+                f"WHERE change = 'delete' AND rowid > ? AND rowid <= ?)",
+                window,
             )
-            print("Index created.")
-
-            # --- DATA POPULATION ---
-
-            print("\nPopulating 'nutrients' table...")
-            with open(
-                os.path.join(usda_data_dir, "nutrient.csv"), "r", encoding="utf-8"
-            ) as f:
-                reader = csv.reader(f)
-                next(reader)  # Skip header
-                chunk = []
-                count = 0
-                for row in reader:
-                    chunk.append((row[0], row[1], row[2]))
-                    if len(chunk) >= CHUNK_SIZE:
-                        cursor.executemany(
-                            "INSERT INTO nutrients (id, name, unit_name) VALUES (?, ?, ?)",
-                            chunk,
-                        )
-                        count += len(chunk)
-                        chunk = []
-                if chunk:
-                    cursor.executemany(
-                        "INSERT INTO nutrients (id, name, unit_name) VALUES (?, ?, ?)",
-                        chunk,
-                    )
-                    count += len(chunk)
-                print(f"-> Imported {count} nutrients.")
-
-            print("\nPreparing 'foods' data (this may take a while)...")
-            foods_with_energy = set()
-            energy_nutrient_ids = {
-                "1008",
-                "2047",
-            }  # Energy (KCAL) and Energy (Atwater General Factors) (KCAL)
-
-            # First pass: Identify foods with non-zero energy values
-            print("-> Identifying foods with energy values...")
-            with open(
-                os.path.join(usda_data_dir, "food_nutrient.csv"), "r", encoding="utf-8"
-            ) as f:
-                reader = csv.reader(f)
-                next(reader)  # Skip header
-                for row in reader:
-                    fdc_id = row[1]
-                    nutrient_id = row[2]
-                    amount = float(row[3])
-                    if nutrient_id in energy_nutrient_ids and amount > 0:
-                        foods_with_energy.add(fdc_id)
-            print(f"-> Found {len(foods_with_energy)} foods with energy.")
-
-            # --- Load data from specific food type CSVs into dictionaries ---
-            print("-> Processing branded foods data...")
-            branded_foods_data = {}
-            if keep_newest_upc_only:
-                upc_to_best_fdc_info = {}  # Stores gtin_upc -> (fdc_id, ingredients, available_date)
-                duplicate_upcs = 0
-                with open(
-                    os.path.join(usda_data_dir, "branded_food.csv"),
-                    "r",
-                    encoding="utf-8",
-                ) as f:
-                    reader = csv.reader(f)
-                    next(reader)
-                    for row in reader:
-                        fdc_id, gtin_upc, ingredients, available_date = (
-                            row[0],
-                            row[4] or None,
-                            row[5] or None,
-                            row[14] or "1900-01-01",
-                        )
-                        if gtin_upc:
-                            if gtin_upc in upc_to_best_fdc_info:
-                                duplicate_upcs += 1
-                                if available_date > upc_to_best_fdc_info[gtin_upc][2]:
-                                    upc_to_best_fdc_info[gtin_upc] = (
-                                        fdc_id,
-                                        ingredients,
-                                        available_date,
-                                    )
-                            else:
-                                upc_to_best_fdc_info[gtin_upc] = (
-                                    fdc_id,
-                                    ingredients,
-                                    available_date,
-                                )
-                        else:
-                            branded_foods_data[fdc_id] = (gtin_upc, ingredients)
-
-                for gtin_upc, (
-                    fdc_id,
-                    ingredients,
-                    date,
-                ) in upc_to_best_fdc_info.items():
-                    branded_foods_data[fdc_id] = (gtin_upc, ingredients)
-                print(
-                    f"-> Found {duplicate_upcs} duplicate UPCs. Keeping the most recent for each."
-                )
-            else:
-                with open(
-                    os.path.join(usda_data_dir, "branded_food.csv"),
-                    "r",
-                    encoding="utf-8",
-                ) as f:
-                    reader = csv.reader(f)
-                    next(reader)
-                    for row in reader:
-                        fdc_id, gtin_upc, ingredients = (
-                            row[0],
-                            row[4] or None,
-                            row[5] or None,
-                        )
-                        branded_foods_data[fdc_id] = (gtin_upc, ingredients)
-                print("-> Including all branded foods.")
-
-            print("-> Processing sr_legacy_food data...")
-            sr_legacy_foods_data = {}
-            with open(
-                os.path.join(usda_data_dir, "sr_legacy_food.csv"), "r", encoding="utf-8"
-            ) as f:
-                reader = csv.reader(f)
-                next(reader)
-                for row in reader:
-                    fdc_id = row[0]
-                    sr_legacy_foods_data[fdc_id] = ()  # No extra columns for now
-
-            print("-> Processing survey_fndds_food data...")
-            survey_foods_data = {}
-            with open(
-                os.path.join(usda_data_dir, "survey_fndds_food.csv"),
-                "r",
-                encoding="utf-8",
-            ) as f:
-                reader = csv.reader(f)
-                next(reader)
-                for row in reader:
-                    fdc_id = row[0]
-                    survey_foods_data[fdc_id] = ()  # No extra columns for now
-
-            print("\nPopulating 'foods' table...")
-            foods_to_insert_chunk = []
-            count = 0
-            with open(
-                os.path.join(usda_data_dir, "food.csv"), "r", encoding="utf-8"
-            ) as f:
-                reader = csv.reader(f)
-                next(reader)  # Skip header
-                for row in reader:
-                    fdc_id, data_type, description, food_category_id = (
-                        row[0],
-                        row[1],
-                        row[2],
-                        row[3] or None,
-                    )
-
-                    if fdc_id in foods_with_energy:
-                        upc, ingredients = None, None
-
-                        if data_type == "branded_food":
-                            upc, ingredients = branded_foods_data.get(
-                                fdc_id, (None, None)
-                            )
-                        elif data_type == "sr_legacy_food":
-                            # No extra data to pull for sr_legacy_food yet
-                            pass
-                        elif data_type == "survey_fndds_food":
-                            # No extra data to pull for survey_fndds_food yet
-                            pass
-
-                        # Capitalize the description here
-                        formatted_description = intelligent_capwords(description)
-                        # Capitalize ingredients if they exist
-                        formatted_ingredients = (
-                            intelligent_capwords(ingredients) if ingredients else None
-                        )
-
-                        foods_to_insert_chunk.append(
-                            (
-                                fdc_id,
-                                formatted_description,
-                                data_type,
-                                food_category_id,
-                                upc,
-                                formatted_ingredients,
-                            )
-                        )
-
-                        if len(foods_to_insert_chunk) >= CHUNK_SIZE:
-                            cursor.executemany(
-                                "INSERT INTO foods (fdc_id, description, data_type, food_category_id, upc, ingredients) VALUES (?, ?, ?, ?, ?, ?)",
-                                foods_to_insert_chunk,
-                            )
-                            count += len(foods_to_insert_chunk)
-                            foods_to_insert_chunk = []
-
-            if foods_to_insert_chunk:
-                cursor.executemany(
-                    "INSERT INTO foods (fdc_id, description, data_type, food_category_id, upc, ingredients) VALUES (?, ?, ?, ?, ?, ?)",
-                    foods_to_insert_chunk,
-                )
-                count += len(foods_to_insert_chunk)
-            print(f"-> Imported {count} foods.")
-
-            print("\nPopulating 'food_nutrients' table...")
-            to_insert_chunk = []
-            processed_count = 0
-            cursor.execute("SELECT COUNT(*) FROM food_nutrients")
-            initial_count = cursor.fetchone()[0]
-
-            with open(
-                os.path.join(usda_data_dir, "food_nutrient.csv"), "r", encoding="utf-8"
-            ) as f:
-                reader = csv.reader(f)
-                next(reader)
-                for row in reader:
-                    fdc_id = row[1]
-                    nutrient_id = row[2]
-                    amount = float(row[3])
-
-                    if fdc_id in foods_with_energy and amount > 0:
-                        processed_count += 1
-                        to_insert_chunk.append((fdc_id, nutrient_id, amount))
-                        if len(to_insert_chunk) >= CHUNK_SIZE:
-                            cursor.executemany(
-                                "INSERT OR IGNORE INTO food_nutrients (fdc_id, nutrient_id, amount) VALUES (?, ?, ?)",
-                                to_insert_chunk,
-                            )
-                            to_insert_chunk = []
-            if to_insert_chunk:
-                cursor.executemany(
-                    "INSERT OR IGNORE INTO food_nutrients (fdc_id, nutrient_id, amount) VALUES (?, ?, ?)",
-                    to_insert_chunk,
-                )
+        else:
+            cursor.execute(
+                f"INSERT OR REPLACE INTO main.{table} ({', '.join(columns)}) "
+                f"SELECT {', '.join(f'n.{column}' for column in columns)} "
+                f"FROM {changes} c JOIN new_release.{table} n ON "
+                f"{' AND '.join(f'n.{key} = c.{key}' for key in keys)} "
+                f"WHERE c.change != 'delete' AND c.rowid > ? AND c.rowid <= ?",
+                window,
+            )
+        conn.commit()
+
+
+def collect_changed_foods(cursor):
+    """
+    Fills the temp table changed_foods with the fdc_ids of the existing foods
+    that the update deletes ('deleted') or whose description, nutrient
+    values or label facts it changes ('changed').
+    """
+    cursor.execute(
+        "CREATE TEMP TABLE changed_foods (fdc_id INTEGER PRIMARY KEY, change TEXT)"
+    )
+    cursor.execute(
+        "INSERT INTO changed_foods SELECT fdc_id, "
+        "CASE change WHEN 'delete' THEN 'deleted' ELSE 'changed' END "
+        "FROM temp.changes_foods WHERE change != 'insert'"
+    )
+    for table in ("food_nutrients", "food_label_facts"):
+        cursor.execute(
+            f"INSERT OR IGNORE INTO changed_foods SELECT DISTINCT fdc_id, 'changed' "
+            f"FROM temp.changes_{table} "
+            f"WHERE fdc_id IN (SELECT fdc_id FROM main.foods)"
+        )
+
+
+def report_affected_foods(cursor, user_db_file):
+    """
+    Returns {table: {"deleted": fdc_ids, "changed": fdc_ids}} for the user
+    database tables holding fdc_ids of foods in changed_foods, and prints
+    it. The user database is opened read-only.
+    """
+    if not os.path.exists(user_db_file):
+        print(f"-> User database {user_db_file} not found. Skipping the report.")
+        return {}
+    user_conn = sqlite3.connect(f"file:{user_db_file}?mode=ro", uri=True)
+    try:
+        user_cursor = user_conn.cursor()
+        user_cursor.execute(
+            "CREATE TEMP TABLE changed_foods (fdc_id INTEGER PRIMARY KEY, change TEXT)"
+        )
+        cursor.execute("SELECT fdc_id, change FROM temp.changed_foods")
+        user_cursor.executemany("INSERT INTO changed_foods VALUES (?, ?)", cursor)
+        user_cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+        existing_tables = {row[0] for row in user_cursor.fetchall()}
 
-            cursor.execute("SELECT COUNT(*) FROM food_nutrients")
-            final_count = cursor.fetchone()[0]
-            inserted_count = final_count - initial_count
-            skipped_count = processed_count - inserted_count
+        affected = {}
+        for table in USER_FDC_ID_TABLES:
+            if table not in existing_tables:
+                continue
+            user_cursor.execute(
+                f"SELECT DISTINCT c.change, c.fdc_id FROM main.{table} t "
+                f"JOIN changed_foods c ON c.fdc_id = t.fdc_id ORDER BY c.fdc_id"
+            )
+            fdc_ids = {"deleted": [], "changed": []}
+            for change, fdc_id in user_cursor.fetchall():
+                fdc_ids[change].append(fdc_id)
+            if fdc_ids["deleted"] or fdc_ids["changed"]:
+                affected[table] = fdc_ids
+    finally:
+        user_conn.close()
 
-            print(f"-> Imported {inserted_count} unique food nutrients.")
-            print(f"-> Skipped {skipped_count} duplicate entries.")
+    if not affected:
+        print("-> No foods in the user database are affected.")
+    for table, fdc_ids in affected.items():
+        for change, ids in fdc_ids.items():
+            if ids:
+                print(f"-> {table}: {len(ids)} {change} foods: {ids}")
+    return affected
 
-        print("\n--- Import successful. Database is ready. ---")
-        conn.close()
+
+def update_usda_data(
+    db_file=None,
+    keep_newest_upc_only=False,
+    usda_data_dir=None,
+    workers=1,
+    release=None,
+    user_db_file=None,
+    batch_size=None,
+    keep_nutrients=None,
+):
+    """
+    Updates an existing database to a new FoodData Central release in place,
+    instead of rebuilding it, so the application can keep using it.
+
+    The release is built, the same way a bulk import builds it, into a
+    scratch file that is attached to the database. Rows are compared by
+    `fdc_id`, (`fdc_id`, `nutrient_id`) and nutrient `id`, and only the
+    inserted, updated and deleted ones are written, in transactions of
+    `batch_size` rows. The release is recorded in usda_releases. Pass the
+    same `keep_newest_upc_only` and `keep_nutrients` as the database was
+    imported with.
+
+    Returns, and prints, the fdc_ids in the user database's logs, recipes,
+    meals, foods and portions whose USDA food was changed or deleted.
+    """
+    if db_file is None:
+        db_file = "persistent/usda_data.db"
+    if usda_data_dir is None:
+        usda_data_dir = "persistent/usda_data"
+    if user_db_file is None:
+        user_db_file = "persistent/user_data.db"
+    batch_size = batch_size or UPDATE_BATCH_SIZE
+    release = release_name(release, usda_data_dir)
+    release_file = f"{db_file}.release"
+    workers = workers or os.cpu_count()
+
+    if not os.path.exists(db_file):
+        print(
+            f"\n--- Database {db_file} not found. Import it first. ---", file=sys.stderr
+        )
+        sys.exit(1)
+    if os.path.exists(release_file):
+        remove_database(release_file)
+
+    timings = []
+    update_start = time.perf_counter()
+    try:
+        pool_context = ProcessPoolExecutor(workers) if workers > 1 else nullcontext()
+        with sqlite3.connect(release_file) as release_conn, pool_context as pool:
+            print(f"Building release {release} in {release_file}")
+            set_bulk_load_pragmas(release_conn.cursor())
+            populate_database(
+                release_conn,
+                usda_data_dir,
+                keep_newest_upc_only,
+                timings,
+                pool,
+                workers,
+                keep_nutrients,
+            )
+        release_conn.close()
+
+        conn = sqlite3.connect(db_file)
+        try:
+            cursor = conn.cursor()
+            cursor.execute("ATTACH DATABASE ? AS new_release", (release_file,))
+            create_missing_tables(cursor)
+
+            with timed_phase("Comparing the release with the database", timings):
+                changes = {}
+                for table, keys in RELEASE_TABLES:
+                    changes[table] = diff_release_table(cursor, table, keys)
+                    print(f"-> {table}: {changes[table]}")
+                collect_changed_foods(cursor)
+
+            with timed_phase("Applying the changes", timings):
+                for table, keys in RELEASE_TABLES:
+                    apply_release_changes(conn, table, keys, False, batch_size)
+                for table, keys in reversed(RELEASE_TABLES):
+                    apply_release_changes(conn, table, keys, True, batch_size)
+                record_release(cursor, release, "update", changes)
+                cursor.execute("PRAGMA main.optimize")
+                conn.commit()
+
+            with timed_phase("Finding affected foods in the user database", timings):
+                affected = report_affected_foods(cursor, user_db_file)
+            cursor.execute("DETACH DATABASE new_release")
+        finally:
+            conn.close()
+        os.remove(release_file)
+
+        print(f"\n--- Update to release {release} successful. ---")
 
     except (sqlite3.Error, IOError, csv.Error) as e:
         print(
-            f"\n--- An error occurred during database import: {e} ---", file=sys.stderr
+            f"\n--- An error occurred during database update: {e} ---", file=sys.stderr
         )
         sys.exit(1)
 
+    print("\nTime per phase:")
+    for name, elapsed in timings:
+        print(f"  {name}: {elapsed:.1f}s")
+    print(f"  Total: {time.perf_counter() - update_start:.1f}s")
+    return affected
+
 
 if __name__ == "__main__":
     import argparse
@@ -326,9 +1003,84 @@ if __name__ == "__main__":
         action="store_true",
         help="If set, only the newest food entry for a given UPC will be kept.",
     )
+    parser.add_argument(
+        "--usda_data_dir",
+        type=str,
+        default="persistent/usda_data",
+        help="Directory of the USDA FoodData Central CSV files.",
+    )
+    parser.add_argument(
+        "--no_bulk_load",
+        action="store_true",
+        help="Build the database in place with SQLite's default, durable settings.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Processes parsing the CSV files (0 for one per CPU, 1 to parse serially).",
+    )
+
+    parser.add_argument(
+        "--release",
+        type=str,
+        help="Name recorded for the release (defaults to the CSV directory's name).",
+    )
+    parser.add_argument(
+        "--update",
+        action="store_true",
+        help="Apply the release's changes to the existing database instead of rebuilding it.",
+    )
+    parser.add_argument(
+        "--user_db_file",
+        type=str,
+        default="persistent/user_data.db",
+        help="User database checked for foods an update changes or deletes.",
+    )
+    parser.add_argument(
+        "--keep_nutrients",
+        nargs="?",
+        const=REFERENCED_NUTRIENTS,
+        help=(
+            "Only store the values of these nutrients: comma-separated ids, or "
+            "without a value, the nutrients OpenNourish reads. USDA food detail "
+            "pages then only list the kept nutrients."
+        ),
+    )
+    parser.add_argument(
+        "--skip_if_current",
+        action="store_true",
+        help="Do nothing if the database already holds the --release release.",
+    )
 
     args = parser.parse_args()
+    keep_nutrients = args.keep_nutrients
+    if keep_nutrients not in (None, REFERENCED_NUTRIENTS):
+        keep_nutrients = [int(nutrient_id) for nutrient_id in keep_nutrients.split(",")]
 
-    import_usda_data(
-        db_file=args.db_file, keep_newest_upc_only=args.keep_newest_upc_only
-    )
+    if (
+        args.skip_if_current
+        and args.release
+        and current_release(args.db_file) == args.release
+    ):
+        print(f"--- {args.db_file} already holds release {args.release}. ---")
+    elif args.update:
+        update_usda_data(
+            db_file=args.db_file,
+            keep_newest_upc_only=args.keep_newest_upc_only,
+            usda_data_dir=args.usda_data_dir,
+            workers=args.workers,
+            release=args.release,
+            user_db_file=args.user_db_file,
+            keep_nutrients=keep_nutrients,
+        )
+    else:
+        import_usda_data(
+            db_file=args.db_file,
+            keep_newest_upc_only=args.keep_newest_upc_only,
+            usda_data_dir=args.usda_data_dir,
+            bulk_load=not args.no_bulk_load,
+            workers=args.workers,
+            release=args.release,
+            keep_nutrients=keep_nutrients,
+        )
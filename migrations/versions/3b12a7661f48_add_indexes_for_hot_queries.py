@@ -0,0 +1,45 @@
+"""Add indexes for hot queries
+
+Revision ID: 3b12a7661f48
+Revises: 4ff671f5bcdc
+Create Date: 2026-10-19 10:12:40.118214
+
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "3b12a7661f48"
+down_revision = "4ff671f5bcdc"
+branch_labels = None
+depends_on = None
+
+# (table, index name, columns)
+INDEXES = [
+    ("daily_logs", "ix_daily_logs_user_id_log_date", ["user_id", "log_date"]),
+    ("exercise_logs", "ix_exercise_logs_user_id_log_date", ["user_id", "log_date"]),
+    ("check_ins", "ix_check_ins_user_id_checkin_date", ["user_id", "checkin_date"]),
+    ("portions", "ix_portions_my_food_id", ["my_food_id"]),
+    ("portions", "ix_portions_recipe_id", ["recipe_id"]),
+    ("recipe_ingredients", "ix_recipe_ingredients_recipe_id", ["recipe_id"]),
+    ("my_meal_items", "ix_my_meal_items_my_meal_id", ["my_meal_id"]),
+    ("friendships", "ix_friendships_receiver_id_status", ["receiver_id", "status"]),
+    ("fasting_sessions", "ix_fasting_sessions_user_id_status", ["user_id", "status"]),
+    ("user_goals", "ix_user_goals_user_id", ["user_id"]),
+    ("my_foods", "ix_my_foods_user_id", ["user_id"]),
+    ("recipes", "ix_recipes_user_id", ["user_id"]),
+    ("my_meals", "ix_my_meals_user_id", ["user_id"]),
+]
+
+
+def upgrade():
+    for table, name, columns in INDEXES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.create_index(name, columns, unique=False)
+
+
+def downgrade():
+    for table, name, _ in reversed(INDEXES):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_index(name)
@@ -0,0 +1,52 @@
+"""Add background_jobs table
+
+Revision ID: 5d2c81e0a4f7
+Revises: 3b12a7661f48
+Create Date: 2026-10-19 14:02:11.482913
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "5d2c81e0a4f7"
+down_revision = "3b12a7661f48"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "background_jobs",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("kind", sa.String(length=50), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("status", sa.String(length=20), nullable=False),
+        sa.Column("payload", sa.JSON(), nullable=True),
+        sa.Column("result", sa.JSON(), nullable=True),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("progress_done", sa.Integer(), nullable=False),
+        sa.Column("progress_total", sa.Integer(), nullable=True),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("max_attempts", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("started_at", sa.DateTime(), nullable=True),
+        sa.Column("finished_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    with op.batch_alter_table("background_jobs", schema=None) as batch_op:
+        batch_op.create_index("ix_background_jobs_status", ["status"], unique=False)
+        batch_op.create_index(
+            batch_op.f("ix_background_jobs_user_id"), ["user_id"], unique=False
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("background_jobs", schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f("ix_background_jobs_user_id"))
+        batch_op.drop_index("ix_background_jobs_status")
+
+    op.drop_table("background_jobs")
@@ -132,6 +132,7 @@ class Friendship(db.Model):
 
     __table_args__ = (
         db.UniqueConstraint("requester_id", "receiver_id", name="uq_friendship"),
+        db.Index("ix_friendships_receiver_id_status", "receiver_id", "status"),
     )
 
 
@@ -147,11 +148,15 @@ class FastingSession(db.Model):
     )  # e.g., 'active', 'completed'
     user = db.relationship("User", backref=db.backref("fasting_sessions", lazy=True))
 
+    __table_args__ = (
+        db.Index("ix_fasting_sessions_user_id_status", "user_id", "status"),
+    )
+
 
 class UserGoal(db.Model):
     __tablename__ = "user_goals"
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey(USERS_ID), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey(USERS_ID), index=True, nullable=False)
     goal_modifier = db.Column(db.String(50), nullable=True)
     diet_preset = db.Column(db.String(50), nullable=True)
     calories = db.Column(db.Float, default=2000)
@@ -176,14 +181,22 @@ class CheckIn(db.Model):
     body_fat_percentage = db.Column(db.Float)
     waist_cm = db.Column(db.Float)
 
+    __table_args__ = (
+        db.Index("ix_check_ins_user_id_checkin_date", "user_id", "checkin_date"),
+    )
+
 
 class UnifiedPortion(db.Model):
     __tablename__ = "portions"
     id = db.Column(db.Integer, primary_key=True)
 
     # Foreign Keys to link to different parent types
-    my_food_id = db.Column(db.Integer, db.ForeignKey(MY_FOOD_ID), nullable=True)
-    recipe_id = db.Column(db.Integer, db.ForeignKey(RECIPES_ID), nullable=True)
+    my_food_id = db.Column(
+        db.Integer, db.ForeignKey(MY_FOOD_ID), index=True, nullable=True
+    )
+    recipe_id = db.Column(
+        db.Integer, db.ForeignKey(RECIPES_ID), index=True, nullable=True
+    )
     fdc_id = db.Column(
         db.Integer, index=True, nullable=True
     )  # Logical link to usda_data.db
@@ -255,7 +268,7 @@ class FoodCategory(db.Model):
 class MyFood(db.Model):
     __tablename__ = "my_foods"
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey(USERS_ID), nullable=True)
+    user_id = db.Column(db.Integer, db.ForeignKey(USERS_ID), index=True, nullable=True)
     description = db.Column(db.String)
     food_category_id = db.Column(
         db.Integer, db.ForeignKey("food_category.id"), nullable=True
@@ -303,11 +316,15 @@ class DailyLog(db.Model):
     serving_type = db.Column(db.String(50), default="g")
     portion_id_fk = db.Column(db.Integer, db.ForeignKey(PORTIONS_ID), nullable=True)
 
+    __table_args__ = (
+        db.Index("ix_daily_logs_user_id_log_date", "user_id", "log_date"),
+    )
+
 
 class Recipe(db.Model):
     __tablename__ = "recipes"
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey(USERS_ID), nullable=True)
+    user_id = db.Column(db.Integer, db.ForeignKey(USERS_ID), index=True, nullable=True)
     name = db.Column(db.String)
     food_category_id = db.Column(
         db.Integer, db.ForeignKey("food_category.id"), nullable=True
@@ -352,7 +369,9 @@ class Recipe(db.Model):
 class RecipeIngredient(db.Model):
     __tablename__ = "recipe_ingredients"
     id = db.Column(db.Integer, primary_key=True)
-    recipe_id = db.Column(db.Integer, db.ForeignKey(RECIPES_ID), nullable=False)
+    recipe_id = db.Column(
+        db.Integer, db.ForeignKey(RECIPES_ID), index=True, nullable=False
+    )
     fdc_id = db.Column(db.Integer, nullable=True)
     my_food_id = db.Column(db.Integer, db.ForeignKey(MY_FOOD_ID), nullable=True)
     recipe_id_link = db.Column(
@@ -366,7 +385,9 @@ class RecipeIngredient(db.Model):
     @property
     def food(self):
         if self.fdc_id:
-            return db.session.get(Food, self.fdc_id)
+            from opennourish.cache import get_usda_food
+
+            return get_usda_food(self.fdc_id)
         return None
 
     my_food = db.relationship("MyFood", foreign_keys=[my_food_id])
@@ -376,7 +397,7 @@ class RecipeIngredient(db.Model):
 class MyMeal(db.Model):
     __tablename__ = "my_meals"
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey(USERS_ID), nullable=True)
+    user_id = db.Column(db.Integer, db.ForeignKey(USERS_ID), index=True, nullable=True)
     name = db.Column(db.String, nullable=False)
     usage_count = db.Column(db.Integer, default=0, nullable=False)
     items = db.relationship(
@@ -388,7 +409,9 @@ class MyMeal(db.Model):
 class MyMealItem(db.Model):
     __tablename__ = "my_meal_items"
     id = db.Column(db.Integer, primary_key=True)
-    my_meal_id = db.Column(db.Integer, db.ForeignKey("my_meals.id"), nullable=False)
+    my_meal_id = db.Column(
+        db.Integer, db.ForeignKey("my_meals.id"), index=True, nullable=False
+    )
     fdc_id = db.Column(db.Integer, nullable=True)
     my_food_id = db.Column(db.Integer, db.ForeignKey(MY_FOOD_ID), nullable=True)
     recipe_id = db.Column(db.Integer, db.ForeignKey(RECIPES_ID), nullable=True)
@@ -399,7 +422,9 @@ class MyMealItem(db.Model):
     @property
     def food(self):
         if self.fdc_id:
-            return db.session.get(Food, self.fdc_id)
+            from opennourish.cache import get_usda_food
+
+            return get_usda_food(self.fdc_id)
         return None
 
     my_food = db.relationship("MyFood", foreign_keys=[my_food_id], uselist=False)
@@ -427,6 +452,32 @@ class ExerciseLog(db.Model):
 
     activity = db.relationship("ExerciseActivity")
 
+    __table_args__ = (
+        db.Index("ix_exercise_logs_user_id_log_date", "user_id", "log_date"),
+    )
+
+
+class BackgroundJob(db.Model):
+    __tablename__ = "background_jobs"
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey(USERS_ID), index=True, nullable=True)
+    status = db.Column(
+        db.String(20), nullable=False, default="queued"
+    )  # 'queued', 'running', 'succeeded' or 'failed'
+    payload = db.Column(db.JSON, nullable=True)
+    result = db.Column(db.JSON, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    progress_done = db.Column(db.Integer, nullable=False, default=0)
+    progress_total = db.Column(db.Integer, nullable=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=1)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (db.Index("ix_background_jobs_status", "status"),)
+
 
 # --- USDA Data Models (USDA Bind) ---
 
@@ -470,3 +521,32 @@ class FoodNutrient(db.Model):
     nutrient_id = db.Column(db.Integer, db.ForeignKey("nutrients.id"), primary_key=True)
     amount = db.Column(db.Float, nullable=False)
     nutrient = db.relationship("Nutrient", backref="food_nutrients")
+
+
+# A nutrient whose values the importer pruned from food_nutrients.
+class PrunedNutrient(db.Model):
+    __bind_key__ = "usda"
+    __tablename__ = "pruned_nutrients"
+    id = db.Column(db.Integer, db.ForeignKey("nutrients.id"), primary_key=True)
+
+
+# Nutrition label values of a USDA food per 100g, precomputed by the importer.
+class FoodLabelFacts(db.Model):
+    __bind_key__ = "usda"
+    __tablename__ = "food_label_facts"
+    fdc_id = db.Column(db.Integer, db.ForeignKey("foods.fdc_id"), primary_key=True)
+    energy = db.Column(db.Float, nullable=False, default=0)
+    fat = db.Column(db.Float, nullable=False, default=0)
+    saturated_fat = db.Column(db.Float, nullable=False, default=0)
+    trans_fat = db.Column(db.Float, nullable=False, default=0)
+    cholesterol = db.Column(db.Float, nullable=False, default=0)
+    sodium = db.Column(db.Float, nullable=False, default=0)
+    carbs = db.Column(db.Float, nullable=False, default=0)
+    fiber = db.Column(db.Float, nullable=False, default=0)
+    sugars = db.Column(db.Float, nullable=False, default=0)
+    added_sugars = db.Column(db.Float, nullable=False, default=0)
+    protein = db.Column(db.Float, nullable=False, default=0)
+    vitamin_d = db.Column(db.Float, nullable=False, default=0)
+    calcium = db.Column(db.Float, nullable=False, default=0)
+    iron = db.Column(db.Float, nullable=False, default=0)
+    potassium = db.Column(db.Float, nullable=False, default=0)
@@ -1,5 +1,6 @@
 from flask import Flask, current_app
 from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
 import os
 from models import (
     db,
@@ -69,6 +70,27 @@ def create_app(config_class=Config):
     Migrate(app, db)
     login_manager.init_app(app)
 
+    from opennourish.cache import init_cache
+    from opennourish.label_cache import init_label_cache
+    from opennourish.label_renderer import init_label_renderer
+    from opennourish.job_runner import init_job_runner
+
+    init_cache(app)
+    init_label_cache(app)
+    init_label_renderer(app)
+    init_job_runner(app)
+
+    with app.app_context():
+        from opennourish.utils import check_pruned_nutrients
+
+        try:
+            check_pruned_nutrients()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            app.logger.warning(f"Could not check the USDA database's nutrients: {e}")
+        finally:
+            db.session.remove()
+
     # Load email settings from DB after app and db are initialized
     with app.app_context():
         from config import get_setting_from_db
@@ -233,6 +255,10 @@ def create_app(config_class=Config):
 
     app.register_blueprint(undo_bp)
 
+    from opennourish.jobs import jobs_bp
+
+    app.register_blueprint(jobs_bp, url_prefix="/jobs")
+
     @login_manager.user_loader
     def load_user(user_id):
         user = db.session.get(User, int(user_id))
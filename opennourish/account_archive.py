@@ -0,0 +1,400 @@
+"""
+Full-account archives: a zip with one JSON Lines file per table of a user's
+data, for moving an account between OpenNourish instances.
+
+The archive is written while it is being downloaded. Each table is read in
+batches of ARCHIVE_BATCH_SIZE rows by id, each batch with its own query that
+has finished before the batch is sent, so no cursor, and with it no SQLite
+lock, is held while the client reads. The rows are compressed into their zip
+member as they stream, so memory use doesn't grow with the size of the
+account. A restore reads the members in ARCHIVE_TABLES order and bulk
+inserts them in batches, giving every row a new id and mapping the foreign
+keys between the archived rows to the new ids. USDA portions are shared by
+all users, so they are matched with the restoring database's own and only
+created where it has none.
+"""
+
+import io
+import json
+import zipfile
+from collections import namedtuple
+from datetime import date, datetime
+
+from sqlalchemy import func, insert, or_, update
+
+from models import (
+    db,
+    CheckIn,
+    DailyLog,
+    ExerciseLog,
+    FastingSession,
+    FoodCategory,
+    MyFood,
+    MyMeal,
+    MyMealItem,
+    Recipe,
+    RecipeIngredient,
+    UnifiedPortion,
+    User,
+    UserGoal,
+)
+
+ARCHIVE_FORMAT = "opennourish-account"
+ARCHIVE_VERSION = 1
+ARCHIVE_BATCH_SIZE = 1000
+# Compressed bytes collected before a chunk of the download is sent
+ARCHIVE_CHUNK_SIZE = 64 * 1024
+MANIFEST_NAME = "manifest.json"
+PROFILE_NAME = "profile.json"
+
+# User settings carried over to the restoring account; identity, password
+# and role columns stay those of the account restored into.
+PROFILE_COLUMNS = (
+    "age",
+    "gender",
+    "measurement_system",
+    "height_cm",
+    "navbar_preference",
+    "diary_default_view",
+    "theme_preference",
+    "has_completed_onboarding",
+    "meals_per_day",
+    "is_private",
+    "week_start_day",
+    "timezone",
+)
+
+# `rows(user_id)` selects the rows of the table the user's data needs, and
+# `references` maps foreign key columns to the models whose archived ids they
+# hold; a table only references models of tables listed before it. Rows that
+# reference rows outside the archive, such as other users' public recipes,
+# are left out of a restore. Rows of a table with `match` columns are not
+# restored when the database has a row with the same values in them; the
+# references to them are mapped to that row instead.
+ArchiveTable = namedtuple(
+    "ArchiveTable", ["name", "model", "rows", "references", "match"], defaults=[()]
+)
+
+
+def _owned_by(model):
+    return lambda user_id: model.user_id == user_id
+
+
+def _owned_ids(model, user_id):
+    return db.select(model.id).filter(model.user_id == user_id)
+
+
+def _logged_usda_portions(user_id):
+    """The USDA portions the user's recipes, meals and diary logs use."""
+    return UnifiedPortion.fdc_id.is_not(None) & UnifiedPortion.id.in_(
+        db.union(
+            db.select(RecipeIngredient.portion_id_fk).filter(
+                RecipeIngredient.recipe_id.in_(_owned_ids(Recipe, user_id))
+            ),
+            db.select(MyMealItem.portion_id_fk).filter(
+                MyMealItem.my_meal_id.in_(_owned_ids(MyMeal, user_id))
+            ),
+            db.select(DailyLog.portion_id_fk).filter(DailyLog.user_id == user_id),
+        )
+    )
+
+
+ARCHIVE_TABLES = [
+    ArchiveTable("food_categories", FoodCategory, _owned_by(FoodCategory), {}),
+    ArchiveTable(
+        "my_foods", MyFood, _owned_by(MyFood), {"food_category_id": FoodCategory}
+    ),
+    ArchiveTable(
+        "recipes", Recipe, _owned_by(Recipe), {"food_category_id": FoodCategory}
+    ),
+    ArchiveTable(
+        "portions",
+        UnifiedPortion,
+        lambda user_id: or_(
+            UnifiedPortion.my_food_id.in_(_owned_ids(MyFood, user_id)),
+            UnifiedPortion.recipe_id.in_(_owned_ids(Recipe, user_id)),
+        ),
+        {"my_food_id": MyFood, "recipe_id": Recipe},
+    ),
+    ArchiveTable(
+        "usda_portions",
+        UnifiedPortion,
+        _logged_usda_portions,
+        {},
+        match=(
+            "fdc_id",
+            "gram_weight",
+            "amount",
+            "measure_unit_description",
+            "portion_description",
+            "modifier",
+        ),
+    ),
+    ArchiveTable(
+        "recipe_ingredients",
+        RecipeIngredient,
+        lambda user_id: RecipeIngredient.recipe_id.in_(_owned_ids(Recipe, user_id)),
+        {
+            "recipe_id": Recipe,
+            "my_food_id": MyFood,
+            "recipe_id_link": Recipe,
+            "portion_id_fk": UnifiedPortion,
+        },
+    ),
+    ArchiveTable("my_meals", MyMeal, _owned_by(MyMeal), {}),
+    ArchiveTable(
+        "my_meal_items",
+        MyMealItem,
+        lambda user_id: MyMealItem.my_meal_id.in_(_owned_ids(MyMeal, user_id)),
+        {
+            "my_meal_id": MyMeal,
+            "my_food_id": MyFood,
+            "recipe_id": Recipe,
+            "portion_id_fk": UnifiedPortion,
+        },
+    ),
+    ArchiveTable(
+        "daily_logs",
+        DailyLog,
+        _owned_by(DailyLog),
+        {"my_food_id": MyFood, "recipe_id": Recipe, "portion_id_fk": UnifiedPortion},
+    ),
+    ArchiveTable("exercise_logs", ExerciseLog, _owned_by(ExerciseLog), {}),
+    ArchiveTable("check_ins", CheckIn, _owned_by(CheckIn), {}),
+    ArchiveTable("user_goals", UserGoal, _owned_by(UserGoal), {}),
+    ArchiveTable("fasting_sessions", FastingSession, _owned_by(FastingSession), {}),
+]
+
+# Tables that a new account may already have rows in; a restore replaces them
+REPLACED_TABLES = {"user_goals"}
+
+
+# Parsers of the column types that JSON doesn't represent, by type name
+_CONVERTERS = {
+    "Date": date.fromisoformat,
+    "DateTime": datetime.fromisoformat,
+}
+
+
+class ArchiveError(ValueError):
+    """Raised for archives that can't be restored."""
+
+
+class _ZipStream(io.RawIOBase):
+    """An unseekable file collecting what zipfile writes, to be sent on."""
+
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        self.size = 0
+        return data
+
+
+def _json_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _archive_line(row):
+    return (json.dumps(row, default=_json_value) + "\n").encode()
+
+
+def iter_account_archive(user_id):
+    """Yields the bytes of the zip archive of a user's data."""
+    stream = _ZipStream()
+    user = db.session.get(User, user_id)
+    with zipfile.ZipFile(stream, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        manifest = {
+            "format": ARCHIVE_FORMAT,
+            "version": ARCHIVE_VERSION,
+            "exported_on": datetime.now().isoformat(),
+            "tables": [table.name for table in ARCHIVE_TABLES],
+        }
+        archive.writestr(MANIFEST_NAME, json.dumps(manifest, indent=2))
+        profile = {column: getattr(user, column) for column in PROFILE_COLUMNS}
+        archive.writestr(PROFILE_NAME, json.dumps(profile, indent=2))
+
+        for table in ARCHIVE_TABLES:
+            with archive.open(f"{table.name}.jsonl", "w", force_zip64=True) as member:
+                last_id = 0
+                while True:
+                    rows = (
+                        db.session.execute(
+                            db.select(table.model.__table__)
+                            .filter(table.rows(user_id), table.model.id > last_id)
+                            .order_by(table.model.id)
+                            .limit(ARCHIVE_BATCH_SIZE)
+                        )
+                        .mappings()
+                        .all()
+                    )
+                    if not rows:
+                        break
+                    last_id = rows[-1]["id"]
+                    for row in rows:
+                        member.write(_archive_line(dict(row)))
+                    if stream.size >= ARCHIVE_CHUNK_SIZE:
+                        yield stream.drain()
+    yield stream.drain()
+
+
+def _archive_rows(archive, table):
+    """Yields the rows of a table's member as dicts of column values."""
+    member_name = f"{table.name}.jsonl"
+    if member_name not in archive.namelist():
+        return
+    columns = table.model.__table__.columns
+    converters = {
+        column.name: converter
+        for column in columns
+        if (converter := _CONVERTERS.get(type(column.type).__name__))
+    }
+    with archive.open(member_name) as member:
+        for line in io.TextIOWrapper(member, encoding="utf-8"):
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            values = {}
+            for column in columns:
+                if column.name not in row:
+                    continue
+                value = row[column.name]
+                if value is not None and column.name in converters:
+                    value = converters[column.name](value)
+                values[column.name] = value
+            yield values
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _matching_ids(table, batch):
+    """
+    Maps the `match` column values of the rows of a batch to the ids of the
+    database's rows with the same values.
+    """
+    columns = [table.model.__table__.c[name] for name in table.match]
+    existing = db.session.execute(
+        db.select(table.model.id, *columns)
+        .filter(columns[0].in_({row[table.match[0]] for row in batch}))
+        .order_by(table.model.id)
+    )
+    matching_ids = {}
+    for row_id, *values in existing:
+        matching_ids.setdefault(tuple(values), row_id)
+    return matching_ids
+
+
+def account_has_data(user_id):
+    """Whether the user has rows in any archived table but REPLACED_TABLES."""
+    return any(
+        db.session.execute(
+            db.select(table.model.id).filter(table.rows(user_id)).limit(1)
+        ).first()
+        for table in ARCHIVE_TABLES
+        if table.name not in REPLACED_TABLES
+    )
+
+
+def restore_account_archive(file, user_id):
+    """
+    Loads an account archive into the user's account and returns
+    ({table name: rows restored}, {table name: rows left out}), the rows left
+    out being those that reference rows outside the archive. Raises
+    ArchiveError for invalid archives. The session is not committed here.
+    """
+    try:
+        archive = zipfile.ZipFile(file)
+        manifest = json.loads(archive.read(MANIFEST_NAME))
+    except (zipfile.BadZipFile, KeyError, ValueError) as e:
+        raise ArchiveError("The file is not an OpenNourish account archive.") from e
+    if manifest.get("format") != ARCHIVE_FORMAT:
+        raise ArchiveError("The file is not an OpenNourish account archive.")
+    if manifest.get("version", 0) > ARCHIVE_VERSION:
+        raise ArchiveError("The archive was made by a newer version of OpenNourish.")
+
+    profile = {}
+    if PROFILE_NAME in archive.namelist():
+        archived_profile = json.loads(archive.read(PROFILE_NAME))
+        profile = {
+            column: archived_profile[column]
+            for column in PROFILE_COLUMNS
+            if archived_profile.get(column) is not None
+        }
+    # Writing the profile first takes SQLite's write lock, so the ids
+    # allocated below can't be taken by another request before the commit.
+    db.session.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values({"timezone": User.timezone, **profile})
+    )
+
+    # {model: {archived id: restored id}}, shared by the tables of a model
+    id_maps = {table.model: {} for table in ARCHIVE_TABLES}
+    counts = {}
+    left_out = {}
+    with archive:
+        for table in ARCHIVE_TABLES:
+            if table.name in REPLACED_TABLES and f"{table.name}.jsonl" in (
+                archive.namelist()
+            ):
+                db.session.execute(db.delete(table.model).where(table.rows(user_id)))
+            id_map = id_maps[table.model]
+            next_id = (db.session.scalar(db.select(func.max(table.model.id))) or 0) + 1
+            counts[table.name] = 0
+            for batch in _batches(_archive_rows(archive, table), ARCHIVE_BATCH_SIZE):
+                matching_ids = _matching_ids(table, batch) if table.match else {}
+                new_rows = []
+                for row in batch:
+                    if table.match:
+                        key = tuple(row[column] for column in table.match)
+                        if key in matching_ids:
+                            id_map[row["id"]] = matching_ids[key]
+                            counts[table.name] += 1
+                            continue
+                    if any(
+                        row[column] is not None
+                        and row[column] not in id_maps[referenced]
+                        for column, referenced in table.references.items()
+                    ):
+                        left_out[table.name] = left_out.get(table.name, 0) + 1
+                        continue
+                    id_map[row["id"]] = next_id
+                    if table.match:
+                        matching_ids[key] = next_id
+                    row["id"] = next_id
+                    next_id += 1
+                    if "user_id" in row:
+                        row["user_id"] = user_id
+                    for column, referenced in table.references.items():
+                        if row[column] is not None:
+                            row[column] = id_maps[referenced][row[column]]
+                    new_rows.append(row)
+                if new_rows:
+                    db.session.execute(
+                        insert(table.model).execution_options(render_nulls=True),
+                        new_rows,
+                    )
+                counts[table.name] += len(new_rows)
+    return counts, left_out
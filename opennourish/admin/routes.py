@@ -17,6 +17,7 @@ from models import (
     MyMealItem,
 )
 from opennourish.utils import encrypt_value
+from opennourish.job_runner import enqueue_job, job_handler, job_response, job_result
 
 
 USER_NOT_FOUND_MSG = "User not found."
@@ -496,11 +497,10 @@ def cleanup():
     )
 
 
-@admin_bp.route("/cleanup/run", methods=["POST"])
-@login_required
-@admin_required
-def run_cleanup():
-    # Re-run the scan to ensure we are deleting the correct items
+@job_handler("admin_cleanup", max_attempts=3)
+def _run_cleanup_job(job):
+    # Re-run the scan to ensure we are deleting the correct items. Only
+    # unreferenced orphans are deleted, so the job can safely be retried.
     orphaned_foods = MyFood.query.filter(MyFood.user_id.is_(None)).all()
     orphaned_recipes = Recipe.query.filter(Recipe.user_id.is_(None)).all()
     orphaned_meals = MyMeal.query.filter(MyMeal.user_id.is_(None)).all()
@@ -572,8 +572,12 @@ def run_cleanup():
 
     db.session.commit()
 
-    flash(
-        f"Database cleanup complete. Removed {deleted_foods_count} orphaned food items, {deleted_recipes_count} orphaned recipes, and {deleted_meals_count} orphaned meals.",
-        "success",
-    )
-    return redirect(url_for("admin.cleanup"))
+    message = f"Database cleanup complete. Removed {deleted_foods_count} orphaned food items, {deleted_recipes_count} orphaned recipes, and {deleted_meals_count} orphaned meals."
+    return job_result("admin.cleanup", [("success", message)])
+
+
+@admin_bp.route("/cleanup/run", methods=["POST"])
+@login_required
+@admin_required
+def run_cleanup():
+    return job_response(enqueue_job("admin_cleanup", user_id=current_user.id))
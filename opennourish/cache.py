@@ -0,0 +1,386 @@
+import os
+import threading
+import uuid
+from collections import OrderedDict, namedtuple
+from datetime import timedelta
+
+from flask import current_app, g, has_app_context
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from models import (
+    db,
+    CheckIn,
+    DailyLog,
+    ExerciseLog,
+    Food,
+    MyFood,
+    Recipe,
+    RecipeIngredient,
+    UnifiedPortion,
+    UserGoal,
+)
+
+# Writes to these models change the logged days they belong to.
+DAY_VERSIONED_MODELS = (DailyLog, ExerciseLog)
+# Writes to these models can change the nutrition of any logged item.
+FOOD_MODELS = (MyFood, Recipe, RecipeIngredient, UnifiedPortion)
+# Writes to these models change per-user data that is not tied to one day.
+USER_VERSIONED_MODELS = (CheckIn, UserGoal)
+
+# Compact, immutable copy of the USDA Food columns shown by the app.
+UsdaFood = namedtuple(
+    "UsdaFood", ["fdc_id", "description", "food_category_id", "upc", "ingredients"]
+)
+# The USDA database file signature before the first check
+_UNCHECKED = object()
+
+
+class LRUCache:
+    """
+    A small, thread-safe, size-bounded mapping that evicts the least recently
+    used entry once `maxsize` is exceeded.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+class DataVersions:
+    """
+    Version counters for cached per-day data.
+
+    Every (user_id, log_date) has a counter that is bumped whenever a diary or
+    exercise entry of that day is written. Every user has a counter that is
+    bumped with any of their days, check-ins or goals. A global generation is
+    bumped for writes that can affect any day (food/recipe edits, bulk
+    statements). The boot token keeps version strings unique across restarts.
+    """
+
+    def __init__(self):
+        self.boot_token = uuid.uuid4().hex[:8]
+        self._day_versions = {}
+        self._user_versions = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def day_version(self, user_id, log_date):
+        with self._lock:
+            return (
+                f"{self.boot_token}."
+                f"{self._generation}."
+                f"{self._day_versions.get((user_id, log_date), 0)}"
+            )
+
+    def user_version(self, user_id):
+        with self._lock:
+            return (
+                f"{self.boot_token}."
+                f"{self._generation}."
+                f"{self._user_versions.get(user_id, 0)}"
+            )
+
+    def range_version(self, user_ids, start_date, end_date):
+        """A hashable version covering every day of a range for all `user_ids`."""
+        num_days = (end_date - start_date).days + 1
+        with self._lock:
+            return (self.boot_token, self._generation) + tuple(
+                self._day_versions.get((user_id, start_date + timedelta(days=i)), 0)
+                for user_id in user_ids
+                for i in range(num_days)
+            )
+
+    def bump_day(self, user_id, log_date):
+        with self._lock:
+            key = (user_id, log_date)
+            self._day_versions[key] = self._day_versions.get(key, 0) + 1
+            self._user_versions[user_id] = self._user_versions.get(user_id, 0) + 1
+
+    def bump_user(self, user_id):
+        with self._lock:
+            self._user_versions[user_id] = self._user_versions.get(user_id, 0) + 1
+
+    def bump_all(self):
+        with self._lock:
+            self._generation += 1
+
+
+class UsdaDatabaseWatcher:
+    """
+    Notices when the USDA database file changes on disk, e.g. when the
+    importer swaps a rebuilt database into place or applies an update, by
+    its inode, size and modification time. Each change starts a new USDA
+    database generation.
+
+    On a new generation the `usda` bind's connection pool is disposed, so
+    later requests open the new file while requests already running finish
+    on their connections to the old one, and the cached USDA food records
+    and data versions are invalidated.
+    """
+
+    def __init__(self):
+        self.generation = 0
+        self._signature = _UNCHECKED
+        self._lock = threading.Lock()
+
+    def _file_signature(self):
+        database = db.engines["usda"].url.database
+        if not database or database == ":memory:":
+            return None
+        try:
+            stat = os.stat(database)
+        except OSError:
+            return None
+        return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+    def check(self):
+        """Returns the current generation, starting a new one if the file changed."""
+        signature = self._file_signature()
+        with self._lock:
+            if signature == self._signature:
+                return self.generation
+            first_check = self._signature is _UNCHECKED
+            self._signature = signature
+            if first_check:
+                return self.generation
+            self.generation += 1
+            generation = self.generation
+
+        db.engines["usda"].dispose()
+        current_app.extensions["usda_food_cache"].bump_generation()
+        current_app.extensions["data_versions"].bump_all()
+        current_app.logger.info(
+            f"The USDA database changed on disk; now using generation {generation}."
+        )
+        return generation
+
+
+class UsdaFoodCache:
+    """
+    Read-through cache of `UsdaFood` records keyed by fdc_id.
+
+    USDA foods only change when the USDA database is re-imported, so records
+    are kept until the cache's generation changes. It is bumped by in-app
+    writes to `Food` and by the `UsdaDatabaseWatcher` when the database file
+    changes on disk. Records read by a request that started on an older
+    USDA database generation are not stored. Unknown fdc_ids are not cached.
+    """
+
+    def __init__(self, maxsize=10000):
+        self._records = LRUCache(maxsize)
+        self._generation = 0
+        self._stamp = None
+        self._lock = threading.Lock()
+
+    def bump_generation(self):
+        with self._lock:
+            self._generation += 1
+
+    def _current_stamp(self):
+        database_generation = check_usda_database()
+        with self._lock:
+            stamp = (self._generation, database_generation)
+            if stamp != self._stamp:
+                self._stamp = stamp
+                self._records.clear()
+            return stamp
+
+    def get_many(self, fdc_ids):
+        """
+        Returns a dict of fdc_id -> UsdaFood for the given ids that exist.
+        Ids may be given as strings, as they arrive from forms.
+        """
+        stamp = self._current_stamp()
+        found = {}
+        missing = set()
+        for fdc_id in fdc_ids:
+            try:
+                fdc_id = int(fdc_id)
+            except (TypeError, ValueError):
+                continue
+            record = self._records.get(fdc_id)
+            if record is None:
+                missing.add(fdc_id)
+            else:
+                found[fdc_id] = record
+        if not missing:
+            return found
+
+        rows = db.session.execute(
+            select(
+                Food.fdc_id,
+                Food.description,
+                Food.food_category_id,
+                Food.upc,
+                Food.ingredients,
+            ).where(Food.fdc_id.in_(missing))
+        ).all()
+        loaded = {row.fdc_id: UsdaFood(*row) for row in rows}
+        with self._lock:
+            # Don't store records read while the USDA data was changing.
+            still_current = (
+                stamp == self._stamp
+                and stamp[0] == self._generation
+                and g.get("usda_generation", stamp[1]) == stamp[1]
+            )
+        if still_current:
+            for fdc_id, record in loaded.items():
+                self._records.set(fdc_id, record)
+        found.update(loaded)
+        return found
+
+    def clear(self):
+        self._records.clear()
+
+    def __len__(self):
+        return len(self._records)
+
+
+def init_cache(app):
+    """Registers the per-app data versions and caches on `app.extensions`."""
+    app.extensions["data_versions"] = DataVersions()
+    app.extensions["remaining_calories_cache"] = LRUCache(
+        app.config.get("REMAINING_CALORIES_CACHE_SIZE", 1024)
+    )
+    app.extensions["scoreboard_cache"] = LRUCache(
+        app.config.get("SCOREBOARD_CACHE_SIZE", 256)
+    )
+    app.extensions["view_model_cache"] = LRUCache(
+        app.config.get("VIEW_MODEL_CACHE_SIZE", 512)
+    )
+    app.extensions["usda_food_cache"] = UsdaFoodCache(
+        app.config.get("USDA_FOOD_CACHE_SIZE", 10000)
+    )
+    watcher = app.extensions["usda_database_watcher"] = UsdaDatabaseWatcher()
+
+    # Each request keeps the generation it started on, see UsdaFoodCache.
+    @app.before_request
+    def _check_usda_database():
+        g.usda_generation = watcher.check()
+
+
+def get_data_versions():
+    return current_app.extensions["data_versions"]
+
+
+def get_cache(name):
+    return current_app.extensions[name]
+
+
+def get_usda_food(fdc_id):
+    """Returns the cached `UsdaFood` record for `fdc_id`, or None."""
+    foods = get_usda_foods([fdc_id])
+    return next(iter(foods.values()), None)
+
+
+def get_usda_foods(fdc_ids):
+    """
+    Returns a dict of fdc_id -> `UsdaFood` for the given ids, loading all
+    uncached ids with a single query.
+    """
+    return current_app.extensions["usda_food_cache"].get_many(fdc_ids)
+
+
+def check_usda_database():
+    """
+    Returns the USDA database generation, starting a new one if the file
+    changed on disk since the last check.
+    """
+    if has_app_context() and "usda_database_watcher" in current_app.extensions:
+        return current_app.extensions["usda_database_watcher"].check()
+    return 0
+
+
+def bump_usda_generation():
+    """Invalidates cached USDA food records, e.g. after a USDA re-import."""
+    if has_app_context() and "usda_food_cache" in current_app.extensions:
+        current_app.extensions["usda_food_cache"].bump_generation()
+
+
+def _changed_days(obj):
+    """Yields the (user_id, log_date) pairs an entry belonged to before and after a flush."""
+    state = inspect(obj)
+    user_ids = set(state.attrs.user_id.history.sum()) or {obj.user_id}
+    log_dates = set(state.attrs.log_date.history.sum()) or {obj.log_date}
+    for user_id in user_ids:
+        for log_date in log_dates:
+            yield user_id, log_date
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_versions_after_flush(session, flush_context):
+    if not has_app_context() or "data_versions" not in current_app.extensions:
+        return
+    versions = get_data_versions()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, DAY_VERSIONED_MODELS):
+            for user_id, log_date in _changed_days(obj):
+                versions.bump_day(user_id, log_date)
+        elif isinstance(obj, USER_VERSIONED_MODELS):
+            for user_id in set(inspect(obj).attrs.user_id.history.sum()) or {
+                obj.user_id
+            }:
+                versions.bump_user(user_id)
+        elif isinstance(obj, FOOD_MODELS):
+            versions.bump_all()
+        elif isinstance(obj, Food):
+            bump_usda_generation()
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _bump_versions_on_bulk_statements(orm_execute_state):
+    if not (
+        orm_execute_state.is_insert
+        or orm_execute_state.is_update
+        or orm_execute_state.is_delete
+    ):
+        return
+    if not has_app_context() or "data_versions" not in current_app.extensions:
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and issubclass(mapper.class_, Food):
+        bump_usda_generation()
+        return
+    if mapper is None or not issubclass(
+        mapper.class_, DAY_VERSIONED_MODELS + FOOD_MODELS + USER_VERSIONED_MODELS
+    ):
+        return
+    versions = get_data_versions()
+    rows = orm_execute_state.parameters
+    if isinstance(rows, dict):
+        rows = [rows]
+    if (
+        orm_execute_state.is_insert
+        and issubclass(mapper.class_, DAY_VERSIONED_MODELS)
+        and rows
+        and all("user_id" in row and "log_date" in row for row in rows)
+    ):
+        # Bulk inserts of entries only touch the days they are logged on.
+        for user_id, log_date in {(row["user_id"], row["log_date"]) for row in rows}:
+            versions.bump_day(user_id, log_date)
+    else:
+        versions.bump_all()
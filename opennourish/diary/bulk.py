@@ -0,0 +1,486 @@
+from datetime import date, timedelta
+
+from sqlalchemy import insert, or_
+from sqlalchemy.orm import selectinload
+
+from models import (
+    db,
+    DailyLog,
+    Food,
+    Friendship,
+    MyFood,
+    MyMeal,
+    Recipe,
+    UnifiedPortion,
+    User,
+)
+
+MAX_BULK_DIARY_DAYS = 31
+MAX_BULK_DIARY_ENTRIES = 2000
+BULK_FOOD_TYPES = ("usda", "my_food", "recipe", "my_meal")
+
+
+class BulkDiaryError(ValueError):
+    """Raised when a bulk diary payload fails validation; nothing is written."""
+
+    def __init__(self, errors):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+
+def log_row(user_id, log_date, meal_name, source, multiplier=1.0):
+    """
+    Builds a DailyLog insert row for `user_id` from any object that carries
+    the usual food references (a DailyLog, MyMealItem, ...).
+    """
+    return {
+        "user_id": user_id,
+        "log_date": log_date,
+        "meal_name": meal_name,
+        "fdc_id": source.fdc_id,
+        "my_food_id": source.my_food_id,
+        "recipe_id": source.recipe_id,
+        "amount_grams": source.amount_grams * multiplier,
+        "serving_type": source.serving_type,
+        "portion_id_fk": source.portion_id_fk,
+    }
+
+
+def insert_daily_logs(rows):
+    """Inserts many DailyLog rows with a single executemany statement."""
+    if rows:
+        # render_nulls keeps every row in the same parameter set, so the rows
+        # go out as one executemany rather than one batch per null pattern.
+        db.session.execute(insert(DailyLog).execution_options(render_nulls=True), rows)
+    return len(rows)
+
+
+def _parse_date(value, field, errors, prefix):
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        errors.append(f"{prefix}: '{field}' must be a date in YYYY-MM-DD format.")
+        return None
+
+
+def _parse_dates(entry, errors, prefix):
+    """Returns the dates an entry applies to: `log_date` or a `start`/`end` range."""
+    if "log_date" in entry:
+        log_date = _parse_date(entry["log_date"], "log_date", errors, prefix)
+        return [log_date] if log_date else []
+
+    start_date = _parse_date(entry.get("start"), "start", errors, prefix)
+    if start_date is None:
+        return []
+    end_date = start_date
+    if entry.get("end") is not None:
+        end_date = _parse_date(entry["end"], "end", errors, prefix)
+        if end_date is None:
+            return []
+    if end_date < start_date:
+        errors.append(f"{prefix}: 'end' must not be before 'start'.")
+        return []
+    num_days = (end_date - start_date).days + 1
+    if num_days > MAX_BULK_DIARY_DAYS:
+        errors.append(f"{prefix}: a range cannot exceed {MAX_BULK_DIARY_DAYS} days.")
+        return []
+    return [start_date + timedelta(days=offset) for offset in range(num_days)]
+
+
+def _parse_number(value, field, errors, prefix, default=1.0):
+    if value is None:
+        return default
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        number = None
+    if number is None or number <= 0:
+        errors.append(f"{prefix}: '{field}' must be a positive number.")
+        return None
+    return number
+
+
+def _portion_belongs_to(portion, food_type, food_id):
+    if food_type == "usda":
+        return portion.fdc_id == food_id
+    if food_type == "my_food":
+        return portion.my_food_id == food_id
+    return portion.recipe_id == food_id
+
+
+def _friend_ids(user):
+    """The ids of the user's accepted friends, in one query."""
+    return {
+        friendship.requester_id
+        if friendship.receiver_id == user.id
+        else friendship.receiver_id
+        for friendship in Friendship.query.filter(
+            Friendship.status == "accepted",
+            or_(Friendship.requester_id == user.id, Friendship.receiver_id == user.id),
+        )
+    }
+
+
+def _can_log(food_type, item, user, friend_ids):
+    """
+    My Foods can only be logged by their owner; recipes also when they are
+    public or a friend's, as in the diary's search.
+    """
+    if item.user_id == user.id:
+        return True
+    if food_type == "recipe":
+        return item.is_public or item.user_id in friend_ids
+    return False
+
+
+def _owner_available(item, user, owner_ids):
+    """Items of deleted users can no longer be logged by anyone else."""
+    return item.user_id == user.id or item.user_id in owner_ids
+
+
+def _load_by_id(model, ids, *options):
+    if not ids:
+        return {}
+    query = model.query.filter(model.id.in_(ids))
+    if options:
+        query = query.options(*options)
+    return {obj.id: obj for obj in query}
+
+
+def apply_bulk_diary_payload(user, payload):
+    """
+    Validates and applies a bulk diary payload for `user` in one transaction.
+
+    The payload may contain three lists:
+
+    - ``add``: ``{food_type, food_id, amount, portion_id, meal_name}`` plus
+      either ``log_date`` or a ``start``/``end`` range. ``amount`` is a number
+      of portions, or grams when no portion is given. For ``my_meal`` it
+      multiplies the saved meal.
+    - ``copy``: ``{start, end, target_start}`` with optional ``meal_name``,
+      ``target_meal_name``, ``friend_username`` and ``multiplier``. Every day
+      of the source range is copied to the same offset from ``target_start``.
+    - ``move``: ``{ids, log_date}`` with an optional ``meal_name``.
+
+    All references are validated with one query per table before anything is
+    written. Raises BulkDiaryError listing every problem found, otherwise
+    commits and returns the number of entries added, copied and moved.
+    """
+    if not isinstance(payload, dict):
+        raise BulkDiaryError(["The request body must be a JSON object."])
+    operations = {}
+    errors = []
+    for key in ("add", "copy", "move"):
+        entries = payload.get(key, [])
+        if not isinstance(entries, list) or not all(
+            isinstance(entry, dict) for entry in entries
+        ):
+            errors.append(f"'{key}' must be a list of objects.")
+            entries = []
+        operations[key] = entries
+    if not any(operations.values()) and not errors:
+        errors.append("Nothing to do: provide 'add', 'copy' or 'move' entries.")
+    if errors:
+        raise BulkDiaryError(errors)
+
+    # Parse everything and collect the ids that need to be looked up
+    adds = []
+    ids = {food_type: set() for food_type in BULK_FOOD_TYPES}
+    portion_ids = set()
+    for index, entry in enumerate(operations["add"]):
+        prefix = f"add[{index}]"
+        food_type = entry.get("food_type")
+        if food_type not in BULK_FOOD_TYPES:
+            errors.append(
+                f"{prefix}: 'food_type' must be one of {', '.join(BULK_FOOD_TYPES)}."
+            )
+            continue
+        try:
+            food_id = int(entry.get("food_id"))
+        except (TypeError, ValueError):
+            errors.append(f"{prefix}: 'food_id' must be an integer.")
+            continue
+        portion_id = entry.get("portion_id")
+        if portion_id is not None:
+            try:
+                portion_id = int(portion_id)
+            except (TypeError, ValueError):
+                errors.append(f"{prefix}: 'portion_id' must be an integer.")
+                continue
+        meal_name = entry.get("meal_name")
+        if not meal_name:
+            errors.append(f"{prefix}: 'meal_name' is required.")
+        amount = _parse_number(entry.get("amount"), "amount", errors, prefix)
+        dates = _parse_dates(entry, errors, prefix)
+        if not meal_name or amount is None or not dates:
+            continue
+        ids[food_type].add(food_id)
+        if portion_id is not None and food_type != "my_meal":
+            portion_ids.add(portion_id)
+        adds.append((prefix, food_type, food_id, portion_id, meal_name, amount, dates))
+
+    copies = []
+    friend_usernames = set()
+    for index, entry in enumerate(operations["copy"]):
+        prefix = f"copy[{index}]"
+        source_dates = _parse_dates(entry, errors, prefix)
+        target_start = _parse_date(
+            entry.get("target_start"), "target_start", errors, prefix
+        )
+        multiplier = _parse_number(
+            entry.get("multiplier"), "multiplier", errors, prefix
+        )
+        if not source_dates or target_start is None or multiplier is None:
+            continue
+        friend_username = entry.get("friend_username")
+        if friend_username:
+            friend_usernames.add(friend_username)
+        copies.append(
+            (
+                prefix,
+                friend_username,
+                source_dates,
+                entry.get("meal_name"),
+                target_start,
+                entry.get("target_meal_name"),
+                multiplier,
+            )
+        )
+
+    moves = []
+    move_ids = set()
+    for index, entry in enumerate(operations["move"]):
+        prefix = f"move[{index}]"
+        log_ids = entry.get("ids")
+        if (
+            not isinstance(log_ids, list)
+            or not log_ids
+            or not all(isinstance(log_id, int) for log_id in log_ids)
+        ):
+            errors.append(f"{prefix}: 'ids' must be a non-empty list of integers.")
+            continue
+        log_date = _parse_date(entry.get("log_date"), "log_date", errors, prefix)
+        if log_date is None:
+            continue
+        move_ids.update(log_ids)
+        moves.append((prefix, log_ids, log_date, entry.get("meal_name")))
+
+    if errors:
+        raise BulkDiaryError(errors)
+
+    # One query per referenced table
+    foods = (
+        {
+            food.fdc_id: food
+            for food in Food.query.filter(Food.fdc_id.in_(ids["usda"])).all()
+        }
+        if ids["usda"]
+        else {}
+    )
+    my_foods = _load_by_id(MyFood, ids["my_food"])
+    recipes = _load_by_id(Recipe, ids["recipe"])
+    my_meals = _load_by_id(MyMeal, ids["my_meal"], selectinload(MyMeal.items))
+    portions = _load_by_id(UnifiedPortion, portion_ids)
+    owner_ids = {
+        item.user_id
+        for item in list(my_foods.values()) + list(recipes.values())
+        if item.user_id is not None and item.user_id != user.id
+    }
+    if owner_ids:
+        owner_ids = {
+            user_id
+            for (user_id,) in db.session.query(User.id).filter(User.id.in_(owner_ids))
+        }
+
+    friends = {}
+    if friend_usernames:
+        friends = {
+            friend.username: friend
+            for friend in User.query.filter(User.username.in_(friend_usernames))
+        }
+        friend_ids = set()
+        if friends:
+            friend_ids = {
+                friendship.requester_id
+                if friendship.receiver_id == user.id
+                else friendship.receiver_id
+                for friendship in Friendship.query.filter(
+                    Friendship.status == "accepted",
+                    or_(
+                        (Friendship.requester_id == user.id)
+                        & Friendship.receiver_id.in_(
+                            [friend.id for friend in friends.values()]
+                        ),
+                        (Friendship.receiver_id == user.id)
+                        & Friendship.requester_id.in_(
+                            [friend.id for friend in friends.values()]
+                        ),
+                    ),
+                )
+            }
+        friends = {
+            username: friend
+            for username, friend in friends.items()
+            if friend.id in friend_ids
+        }
+
+    logs_to_move = {}
+    if move_ids:
+        logs_to_move = {
+            log.id: log
+            for log in DailyLog.query.filter(
+                DailyLog.id.in_(move_ids), DailyLog.user_id == user.id
+            )
+        }
+
+    # Validate references and build the rows to insert
+    rows = []
+    friend_ids = set()
+    if any(
+        recipe.user_id != user.id and not recipe.is_public
+        for recipe in recipes.values()
+    ):
+        friend_ids = _friend_ids(user)
+    meal_usage = {}
+    for prefix, food_type, food_id, portion_id, meal_name, amount, dates in adds:
+        if food_type == "my_meal":
+            my_meal = my_meals.get(food_id)
+            if not my_meal or my_meal.user_id != user.id:
+                errors.append(f"{prefix}: My Meal {food_id} not found.")
+                continue
+            for log_date in dates:
+                rows.extend(
+                    log_row(user.id, log_date, meal_name, item, amount)
+                    for item in my_meal.items
+                )
+            meal_usage[my_meal] = meal_usage.get(my_meal, 0) + len(dates)
+            continue
+
+        if food_type == "usda":
+            food_item = foods.get(food_id)
+        elif food_type == "my_food":
+            food_item = my_foods.get(food_id)
+        else:
+            food_item = recipes.get(food_id)
+        # Items the user may not log are reported like missing ones
+        if not food_item or (
+            food_type != "usda" and not _can_log(food_type, food_item, user, friend_ids)
+        ):
+            errors.append(f"{prefix}: {food_type} {food_id} not found.")
+            continue
+        if food_type != "usda" and not _owner_available(food_item, user, owner_ids):
+            errors.append(
+                f"{prefix}: {food_type} {food_id} belongs to a deleted user "
+                "and cannot be added."
+            )
+            continue
+
+        if portion_id is None:
+            amount_grams, serving_type = amount, "g"
+        else:
+            portion = portions.get(portion_id)
+            if not portion or not _portion_belongs_to(portion, food_type, food_id):
+                errors.append(
+                    f"{prefix}: portion {portion_id} does not belong to this food."
+                )
+                continue
+            amount_grams = amount * portion.gram_weight
+            serving_type = portion.full_description_str
+        for log_date in dates:
+            rows.append(
+                {
+                    "user_id": user.id,
+                    "log_date": log_date,
+                    "meal_name": meal_name,
+                    "fdc_id": food_id if food_type == "usda" else None,
+                    "my_food_id": food_id if food_type == "my_food" else None,
+                    "recipe_id": food_id if food_type == "recipe" else None,
+                    "amount_grams": amount_grams,
+                    "serving_type": serving_type,
+                    "portion_id_fk": portion_id,
+                }
+            )
+    num_added = len(rows)
+
+    # Copies: one query per source user covering every requested day
+    copy_sources = {}
+    for prefix, friend_username, source_dates, *_ in copies:
+        source_user_id = user.id
+        if friend_username:
+            friend = friends.get(friend_username)
+            if not friend:
+                errors.append(
+                    f"{prefix}: you are not friends with '{friend_username}'."
+                )
+                continue
+            source_user_id = friend.id
+        copy_sources.setdefault(source_user_id, set()).update(source_dates)
+
+    source_logs = {}
+    for source_user_id, source_dates in copy_sources.items():
+        for log in (
+            DailyLog.query.filter(
+                DailyLog.user_id == source_user_id,
+                DailyLog.log_date.in_(source_dates),
+            )
+            .order_by(DailyLog.id)
+            .all()
+        ):
+            source_logs.setdefault((source_user_id, log.log_date), []).append(log)
+
+    for (
+        prefix,
+        friend_username,
+        source_dates,
+        source_meal,
+        target_start,
+        target_meal,
+        multiplier,
+    ) in copies:
+        if friend_username and friend_username not in friends:
+            continue
+        source_user_id = friends[friend_username].id if friend_username else user.id
+        offset = target_start - source_dates[0]
+        for source_date in source_dates:
+            for log in source_logs.get((source_user_id, source_date), []):
+                if source_meal and log.meal_name != source_meal:
+                    continue
+                rows.append(
+                    log_row(
+                        user.id,
+                        source_date + offset,
+                        target_meal or log.meal_name,
+                        log,
+                        multiplier,
+                    )
+                )
+    num_copied = len(rows) - num_added
+
+    num_moved = 0
+    for prefix, log_ids, log_date, meal_name in moves:
+        missing = [log_id for log_id in log_ids if log_id not in logs_to_move]
+        if missing:
+            errors.append(
+                f"{prefix}: diary entries {', '.join(map(str, missing))} not found."
+            )
+            continue
+        for log_id in log_ids:
+            log = logs_to_move[log_id]
+            log.log_date = log_date
+            if meal_name:
+                log.meal_name = meal_name
+        num_moved += len(log_ids)
+
+    if len(rows) > MAX_BULK_DIARY_ENTRIES:
+        errors.append(
+            f"A single request cannot create more than {MAX_BULK_DIARY_ENTRIES} entries."
+        )
+    if errors:
+        db.session.rollback()
+        raise BulkDiaryError(errors)
+
+    for my_meal, times_used in meal_usage.items():
+        my_meal.usage_count += times_used
+    insert_daily_logs(rows)
+    db.session.commit()
+    return {"added": num_added, "copied": num_copied, "moved": num_moved}
@@ -12,7 +12,6 @@ from . import diary_bp
 from models import (
     db,
     DailyLog,
-    Food,
     MyFood,
     MyMeal,
     MyMealItem,
@@ -26,13 +25,21 @@ from models import (
     FastingSession,
 )
 from datetime import date, timedelta, datetime
-from opennourish.time_utils import get_user_today
+from opennourish.time_utils import get_user_today, get_start_of_week
 from opennourish.utils import (
     calculate_nutrition_for_items,
     get_available_portions,
     get_standard_meal_names_for_user,
     prepare_undo_and_delete,
 )
+from opennourish.cache import get_cache, get_data_versions, get_usda_foods
+from opennourish.loaders import (
+    load_item_references,
+    resolve_food_item,
+    get_display_description,
+)
+from opennourish.view_models import get_diary_view_model, get_meal_names_to_render
+from .bulk import BulkDiaryError, apply_bulk_diary_payload, insert_daily_logs, log_row
 from .forms import MealForm
 from sqlalchemy.orm import joinedload, selectinload
 from constants import ALL_MEAL_TYPES
@@ -48,6 +55,7 @@ DIARY_ROUTE = "diary.diary"
 EDIT_MEAL_ROUTE = "diary.edit_meal"
 MY_MEALS_ROUTE = "diary.my_meals"
 DASHBOARD_ROUTE = "dashboard.dashboard"
+MAX_DIARY_RANGE_DAYS = 31
 
 
 @diary_bp.route("/diary/")
@@ -72,113 +80,7 @@ def diary(log_date_str=None):
         # Create a temporary default goal if none exists
         user_goal = UserGoal(calories=2000, protein=150, carbs=250, fat=60)
 
-    daily_logs = DailyLog.query.filter_by(
-        user_id=current_user.id, log_date=log_date
-    ).all()
-
-    exercise_logs = ExerciseLog.query.filter_by(
-        user_id=current_user.id, log_date=log_date
-    ).all()
-    calories_burned = sum(log.calories_burned for log in exercise_logs)
-
-    meals = {
-        "Breakfast": [],
-        "Snack (morning)": [],
-        "Lunch": [],
-        "Snack (afternoon)": [],
-        "Dinner": [],
-        "Snack (evening)": [],
-        "Unspecified": [],
-        "Water": [],
-    }
-
-    meal_totals = {
-        meal_name: {"calories": 0, "protein": 0, "carbs": 0, "fat": 0, "fiber": 0}
-        for meal_name in meals
-    }
-
-    totals = calculate_nutrition_for_items(daily_logs)
-
-    for log in daily_logs:
-        food_item = None
-        description_to_display = "Unknown Food"
-        display_amount = log.amount_grams
-        selected_portion = None
-        nutrition = calculate_nutrition_for_items([log])
-        available_portions = []
-        food_type = None
-        food_id = None
-        total_gram_weight = log.amount_grams
-
-        if log.fdc_id:
-            food_item = db.session.get(Food, log.fdc_id)
-            food_type = "usda"
-            food_id = log.fdc_id
-        elif log.my_food_id:
-            food_item = db.session.get(MyFood, log.my_food_id)
-            food_type = "my_food"
-            food_id = log.my_food_id
-        elif log.recipe_id:
-            food_item = db.session.get(Recipe, log.recipe_id)
-            food_type = "recipe"
-            food_id = log.recipe_id
-
-        if food_item:
-            available_portions = get_available_portions(food_item)
-            gram_portion = next(
-                (p for p in available_portions if p.gram_weight == 1.0), None
-            )
-            selected_portion = gram_portion
-
-            if log.portion_id_fk:
-                portion = db.session.get(UnifiedPortion, log.portion_id_fk)
-                if portion and portion.gram_weight > 0:
-                    display_amount = log.amount_grams / portion.gram_weight
-                    selected_portion = portion
-
-            nutrition = calculate_nutrition_for_items([log])
-            description_to_display = (
-                food_item.description
-                if hasattr(food_item, "description")
-                else food_item.name
-            )
-
-            if hasattr(food_item, "user_id"):
-                if food_item.user_id is None:
-                    description_to_display += " (deleted)"
-                elif food_item.user_id != current_user.id:
-                    owner = db.session.get(User, food_item.user_id)
-                    if owner:
-                        description_to_display += f" (from {owner.username})"
-                    else:
-                        description_to_display += " (deleted)"
-
-        meal_key = log.meal_name or "Unspecified"
-        if meal_key not in meals:
-            meals[meal_key] = []
-
-        meal_totals[meal_key]["calories"] += nutrition["calories"]
-        meal_totals[meal_key]["protein"] += nutrition["protein"]
-        meal_totals[meal_key]["carbs"] += nutrition["carbs"]
-        meal_totals[meal_key]["fat"] += nutrition["fat"]
-        meal_totals[meal_key]["fiber"] += nutrition["fiber"]
-
-        meals[meal_key].append(
-            {
-                "log_id": log.id,
-                "description": description_to_display,
-                "amount": display_amount,
-                "nutrition": nutrition,
-                "portions": available_portions,
-                "selected_portion": selected_portion,
-                "total_gram_weight": total_gram_weight,
-                "owner_id": food_item.user_id
-                if hasattr(food_item, "user_id")
-                else None,
-                "food_type": food_type,
-                "food_id": food_id,
-            }
-        )
+    view_model = get_diary_view_model(current_user, log_date)
 
     prev_date = log_date - timedelta(days=1)
     next_date = log_date + timedelta(days=1)
@@ -190,19 +92,13 @@ def diary(log_date_str=None):
     if is_fasting:
         base_meals_to_show = ["Water"]
 
-    # Collect all meal names that actually have items logged for the day
-    logged_meal_names = {meal_name for meal_name, items in meals.items() if items}
-
     # Combine base meals with any other meals that have logged items
-    meal_names_to_render = sorted(
-        list(set(base_meals_to_show) | logged_meal_names), key=ALL_MEAL_TYPES.index
-    )
+    meal_names_to_render = get_meal_names_to_render(base_meals_to_show, view_model)
 
     # --- Water Quick-Add Setup ---
     # Ensure a "Water" food item exists for the user to log against, with all standard portions.
-    water_food = MyFood.query.filter_by(
-        user_id=current_user.id, description="Water"
-    ).first()
+    # The view model loads it with the day's foods.
+    water_food = view_model.water_food
 
     # Define standard water portions and their gram weights
     standard_water_portions = {
@@ -263,26 +159,205 @@ def diary(log_date_str=None):
         if portions_to_add:
             db.session.add_all(portions_to_add)
             db.session.commit()
-
-    # Calculate total water intake in grams
-    water_total_grams = sum(
-        log.amount_grams for log in daily_logs if log.meal_name == "Water"
-    )
+            water_food = db.session.get(MyFood, water_food.id)
 
     return render_template(
         "diary/diary.html",
         date=log_date,
-        meals=meals,
-        totals=totals,
+        meals=view_model.meals,
+        totals=view_model.totals,
         prev_date=prev_date,
         next_date=next_date,
         goals=user_goal,
-        calories_burned=calories_burned,
+        calories_burned=view_model.calories_burned,
         meal_names_to_render=meal_names_to_render,
         is_fasting=is_fasting,
-        water_total_grams=water_total_grams,
+        water_total_grams=view_model.water_total_grams,
         water_food=water_food,
-        meal_totals=meal_totals,
+        meal_totals=view_model.meal_totals,
+    )
+
+
+def _parse_diary_range_args(user):
+    """
+    Reads the `start` and `end` query parameters for the range views. A missing
+    bound spans seven days from the other one; with neither, the user's current
+    week is used. Raises ValueError for invalid ranges.
+    """
+    start_str = request.args.get("start")
+    end_str = request.args.get("end")
+
+    if start_str:
+        start_date = date.fromisoformat(start_str)
+        end_date = (
+            date.fromisoformat(end_str) if end_str else start_date + timedelta(days=6)
+        )
+    elif end_str:
+        end_date = date.fromisoformat(end_str)
+        start_date = end_date - timedelta(days=6)
+    else:
+        start_date = get_start_of_week(
+            get_user_today(user.timezone), user.week_start_day
+        )
+        end_date = start_date + timedelta(days=6)
+
+    if end_date < start_date:
+        raise ValueError("End date must not be before start date.")
+    if (end_date - start_date).days + 1 > MAX_DIARY_RANGE_DAYS:
+        raise ValueError(f"Date range cannot exceed {MAX_DIARY_RANGE_DAYS} days.")
+    return start_date, end_date
+
+
+def _build_diary_range(user, start_date, end_date):
+    """
+    Builds the diary contents for every day in [start_date, end_date].
+    All DailyLog and ExerciseLog rows of the range are fetched with one query
+    each, and nutrition is calculated against one batch of referenced foods.
+    Returns a list of per-day dicts grouped by meal.
+    """
+    daily_logs = (
+        DailyLog.query.filter(
+            DailyLog.user_id == user.id,
+            DailyLog.log_date >= start_date,
+            DailyLog.log_date <= end_date,
+        )
+        .order_by(DailyLog.log_date.asc(), DailyLog.id.asc())
+        .all()
+    )
+    exercise_logs = (
+        ExerciseLog.query.options(joinedload(ExerciseLog.activity))
+        .filter(
+            ExerciseLog.user_id == user.id,
+            ExerciseLog.log_date >= start_date,
+            ExerciseLog.log_date <= end_date,
+        )
+        .order_by(ExerciseLog.log_date.asc(), ExerciseLog.id.asc())
+        .all()
+    )
+
+    refs = load_item_references(daily_logs)
+
+    days = {}
+    current_date = start_date
+    while current_date <= end_date:
+        days[current_date] = {
+            "date": current_date.isoformat(),
+            "meals": {},
+            "totals": calculate_nutrition_for_items([]),
+            "calories_burned": 0,
+            "exercises": [],
+        }
+        current_date += timedelta(days=1)
+
+    for log in daily_logs:
+        day = days[log.log_date]
+        nutrition = calculate_nutrition_for_items([log], nutrients_map=refs.nutrients)
+        food_item, food_type, food_id = resolve_food_item(log, refs)
+
+        display_amount = log.amount_grams
+        serving_type = "g"
+        portion = refs.portions.get(log.portion_id_fk)
+        if portion and portion.gram_weight > 0:
+            display_amount = log.amount_grams / portion.gram_weight
+            serving_type = portion.full_description_str.strip()
+
+        meal_key = log.meal_name or "Unspecified"
+        meal = day["meals"].setdefault(
+            meal_key, {"items": [], "totals": calculate_nutrition_for_items([])}
+        )
+        meal["items"].append(
+            {
+                "log_id": log.id,
+                "description": get_display_description(food_item, refs, user.id)
+                if food_item
+                else "Unknown Food",
+                "food_type": food_type,
+                "food_id": food_id,
+                "amount": display_amount,
+                "serving_type": serving_type,
+                "amount_grams": log.amount_grams,
+                "nutrition": nutrition,
+            }
+        )
+        for key, value in nutrition.items():
+            meal["totals"][key] += value
+            day["totals"][key] += value
+
+    for log in exercise_logs:
+        day = days[log.log_date]
+        day["calories_burned"] += log.calories_burned
+        day["exercises"].append(
+            {
+                "description": log.activity.name
+                if log.activity
+                else log.manual_description,
+                "duration_minutes": log.duration_minutes,
+                "calories_burned": log.calories_burned,
+            }
+        )
+
+    for day in days.values():
+        day["meals"] = dict(
+            sorted(
+                day["meals"].items(),
+                key=lambda meal: ALL_MEAL_TYPES.index(meal[0])
+                if meal[0] in ALL_MEAL_TYPES
+                else len(ALL_MEAL_TYPES),
+            )
+        )
+
+    return list(days.values())
+
+
+@diary_bp.route("/diary/range")
+@login_required
+def diary_range():
+    try:
+        start_date, end_date = _parse_diary_range_args(current_user)
+    except ValueError as e:
+        flash(str(e), "danger")
+        return redirect(url_for(DIARY_ROUTE))
+
+    user_goal = UserGoal.query.filter_by(user_id=current_user.id).first()
+    if not user_goal:
+        user_goal = UserGoal(calories=2000, protein=150, carbs=250, fat=60)
+
+    days = _build_diary_range(current_user, start_date, end_date)
+    range_totals = calculate_nutrition_for_items([])
+    for day in days:
+        for key, value in day["totals"].items():
+            range_totals[key] += value
+
+    num_days = len(days)
+    return render_template(
+        "diary/range.html",
+        days=days,
+        start_date=start_date,
+        end_date=end_date,
+        prev_start=start_date - timedelta(days=num_days),
+        prev_end=start_date - timedelta(days=1),
+        next_start=end_date + timedelta(days=1),
+        next_end=end_date + timedelta(days=num_days),
+        goals=user_goal,
+        range_totals=range_totals,
+        calories_burned=sum(day["calories_burned"] for day in days),
+    )
+
+
+@diary_bp.route("/api/diary/range")
+@login_required
+def get_diary_range():
+    try:
+        start_date, end_date = _parse_diary_range_args(current_user)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return jsonify(
+        {
+            "start": start_date.isoformat(),
+            "end": end_date.isoformat(),
+            "days": _build_diary_range(current_user, start_date, end_date),
+        }
     )
 
 
@@ -489,12 +564,7 @@ def new_meal():
 def edit_meal(meal_id):
     meal = (
         db.session.query(MyMeal)
-        .options(
-            selectinload(MyMeal.items)
-            .selectinload(MyMealItem.my_food)
-            .selectinload(MyFood.portions),
-            selectinload(MyMeal.items).selectinload(MyMealItem.recipe),
-        )
+        .options(selectinload(MyMeal.items))
         .filter_by(id=meal_id)
         .first()
     )
@@ -510,10 +580,11 @@ def edit_meal(meal_id):
         flash("Meal name updated.", "success")
         return redirect(url_for(EDIT_MEAL_ROUTE, meal_id=meal.id))
 
+    refs = load_item_references(meal.items)
+
     for item in meal.items:
-        item.available_portions = get_available_portions(
-            item.food or item.my_food or item.recipe
-        )
+        food_item, _, _ = resolve_food_item(item, refs)
+        item.available_portions = get_available_portions(food_item)
 
         # Determine display_amount and selected_portion_id based on saved portion
         item.display_amount = item.amount_grams  # Default to grams for display
@@ -521,7 +592,7 @@ def edit_meal(meal_id):
         item.display_serving_type = "g"  # Default display type
 
         if item.portion_id_fk:
-            selected_portion = db.session.get(UnifiedPortion, item.portion_id_fk)
+            selected_portion = refs.portions.get(item.portion_id_fk)
             if selected_portion:
                 if selected_portion.gram_weight > 0:
                     item.display_amount = (
@@ -548,11 +619,13 @@ def edit_meal(meal_id):
             amount_grams=item.amount_grams,
         )
         item.nutrition_summary = calculate_nutrition_for_items(
-            [temp_item_for_nutrition]
+            [temp_item_for_nutrition], nutrients_map=refs.nutrients
         )
 
     # Calculate total nutrition for the meal
-    meal.totals = calculate_nutrition_for_items(meal.items)
+    meal.totals = calculate_nutrition_for_items(
+        meal.items, nutrients_map=refs.nutrients
+    )
 
     return render_template("diary/edit_meal.html", meal=meal, form=form)
 
@@ -746,17 +819,14 @@ def my_meals():
         if item.fdc_id
     }
 
-    # Fetch all relevant USDA Food objects in one query
-    usda_foods_map = {}
-    if all_usda_food_ids:
-        usda_foods = Food.query.filter(Food.fdc_id.in_(all_usda_food_ids)).all()
-        usda_foods_map = {food.fdc_id: food for food in usda_foods}
+    # Fetch all relevant USDA food records, uncached ones in one query
+    usda_foods_map = get_usda_foods(all_usda_food_ids)
 
     # Process each meal to calculate display values and nutrition
     for meal in meals_pagination.items:
         for item in meal.items:
             if item.fdc_id:
-                # Attach the pre-loaded USDA food object to the meal item
+                # Attach the pre-loaded USDA food record to the meal item
                 item.usda_food = usda_foods_map.get(item.fdc_id)
 
             # Determine display_amount and display_serving_type based on saved portion
@@ -867,25 +937,29 @@ def copy_meal_from_friend():
         )
 
     # Copy each log entry to the current user
-    for friend_log in friend_logs:
-        new_log = DailyLog(
-            user_id=current_user.id,
-            log_date=friend_log.log_date,
-            meal_name=friend_log.meal_name,
-            fdc_id=friend_log.fdc_id,
-            my_food_id=friend_log.my_food_id,
-            recipe_id=friend_log.recipe_id,
-            amount_grams=friend_log.amount_grams,
-            serving_type=friend_log.serving_type,
-            portion_id_fk=friend_log.portion_id_fk,
-        )
-        db.session.add(new_log)
-
+    insert_daily_logs(
+        [
+            log_row(
+                current_user.id, friend_log.log_date, friend_log.meal_name, friend_log
+            )
+            for friend_log in friend_logs
+        ]
+    )
     db.session.commit()
     flash(f"Successfully copied {meal_name} from {friend_username}'s diary.", "success")
     return redirect(url_for(DIARY_ROUTE, log_date_str=log_date_str))
 
 
+@diary_bp.route("/api/diary/bulk", methods=["POST"])
+@login_required
+def bulk_diary():
+    try:
+        result = apply_bulk_diary_payload(current_user, request.get_json(silent=True))
+    except BulkDiaryError as e:
+        return jsonify({"errors": e.errors}), 400
+    return jsonify(result)
+
+
 @diary_bp.route("/api/get-remaining-calories/<string:log_date_str>")
 @login_required
 def get_remaining_calories(log_date_str):
@@ -898,20 +972,31 @@ def get_remaining_calories(log_date_str):
     if not user_goal or not user_goal.calories:
         return jsonify({"error": "Calorie goal not set"}), 404
 
-    daily_logs = DailyLog.query.filter_by(
-        user_id=current_user.id, log_date=log_date
-    ).all()
+    # Consumed and burned calories only change when the day's entries (or the
+    # foods they reference) change, so they are cached per day version.
+    day_version = get_data_versions().day_version(current_user.id, log_date)
+    cache = get_cache("remaining_calories_cache")
+    cache_key = (current_user.id, log_date, day_version)
+    day_totals = cache.get(cache_key)
+    if day_totals is None:
+        daily_logs = DailyLog.query.filter_by(
+            user_id=current_user.id, log_date=log_date
+        ).all()
 
-    exercise_logs = ExerciseLog.query.filter_by(
-        user_id=current_user.id, log_date=log_date
-    ).all()
+        exercise_logs = ExerciseLog.query.filter_by(
+            user_id=current_user.id, log_date=log_date
+        ).all()
 
-    calories_consumed = calculate_nutrition_for_items(daily_logs)["calories"]
-    calories_burned = sum(log.calories_burned for log in exercise_logs)
+        day_totals = (
+            calculate_nutrition_for_items(daily_logs)["calories"],
+            sum(log.calories_burned for log in exercise_logs),
+        )
+        cache.set(cache_key, day_totals)
 
+    calories_consumed, calories_burned = day_totals
     remaining_calories = user_goal.calories + calories_burned - calories_consumed
 
-    return jsonify(
+    response = jsonify(
         {
             "remaining_calories": remaining_calories,
             "goal_calories": user_goal.calories,
@@ -919,3 +1004,7 @@ def get_remaining_calories(log_date_str):
             "calories_burned": calories_burned,
         }
     )
+    response.set_etag(f"{day_version}.{user_goal.calories}")
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
@@ -0,0 +1,97 @@
+"""
+Streaming downloads for the My Foods and recipe exports.
+
+Exports are written item by item while the rows are read in batches of
+EXPORT_BATCH_SIZE, so memory use and the time to the first byte don't grow
+with the size of a collection. A YAML list is written as one block sequence
+per item, which concatenate to the same document `yaml.dump` produces for
+the whole list. The JSON Lines format has one JSON object per line.
+"""
+
+import json
+from datetime import datetime
+
+import yaml
+from flask import Response, stream_with_context
+
+from models import db
+
+# libyaml's loader parses several times faster, when PyYAML was built with it
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+EXPORT_BATCH_SIZE = 500
+EXPORT_FORMATS = {
+    "yaml": "application/x-yaml",
+    "jsonl": "application/x-ndjson",
+}
+
+
+def iter_in_batches(statement, id_column, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Yields the objects selected by `statement`, which is ordered by
+    `id_column`. Each batch of ids is read with its own query, after the last
+    id of the previous batch, and its objects are loaded with one query, so
+    `selectinload` options also run once per batch. Both queries are read to
+    the end before the batch is yielded, so no cursor, and with it no SQLite
+    lock, is held while a streamed download waits for the client.
+    """
+    last_id = None
+    while True:
+        ids_statement = statement.with_only_columns(id_column).limit(batch_size)
+        if last_id is not None:
+            ids_statement = ids_statement.where(id_column > last_id)
+        ids = db.session.scalars(ids_statement).all()
+        if not ids:
+            return
+        last_id = ids[-1]
+        yield from db.session.scalars(statement.where(id_column.in_(ids))).all()
+
+
+def dump_yaml(data):
+    return yaml.dump(data, default_flow_style=False, sort_keys=False, indent=2)
+
+
+def yaml_list(items, key=None):
+    """
+    Yields `items` as a YAML block sequence, as the value of the top-level
+    mapping `key` when one is given.
+    """
+    empty = True
+    for item in items:
+        if empty and key:
+            yield f"{key}:\n"
+        empty = False
+        yield dump_yaml([item])
+    if empty:
+        yield dump_yaml({key: []} if key else [])
+
+
+def load_yaml(stream):
+    return yaml.load(stream, Loader=YAML_LOADER)
+
+
+def read_upload_text(file):
+    """
+    Reads an uploaded file, e.g. one a background job saved, as UTF-8 text.
+    Raises UnicodeDecodeError for other encodings.
+    """
+    return file.read().decode("utf-8-sig")
+
+
+def json_line(data):
+    return json.dumps(data) + "\n"
+
+
+def load_json_lines(stream):
+    """Parses JSON Lines from a string or a binary file into a list."""
+    lines = stream.splitlines() if isinstance(stream, str) else stream
+    return [json.loads(line) for line in lines if line.strip()]
+
+
+def streamed_export(chunks, filename_prefix, export_format):
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename = f"{filename_prefix}_{timestamp}.{export_format}"
+    return Response(
+        stream_with_context(chunks),
+        mimetype=EXPORT_FORMATS[export_format],
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
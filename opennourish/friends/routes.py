@@ -3,11 +3,56 @@ from flask_login import current_user, login_required
 from models import db, User, Friendship, DailyLog, ExerciseLog
 from . import friends_bp
 from datetime import datetime, timedelta
+from opennourish.cache import get_cache, get_data_versions
 from opennourish.utils import prepare_undo_and_delete
+from sqlalchemy import func, or_
+from sqlalchemy.orm import joinedload
 
 FRIENDS_PAGE_ROUTE = "friends.friends_page"
 
 
+def _weekly_activity_counts(user_ids, start_of_week, end_of_week):
+    """
+    Returns {user_id: (diary_logs, exercise_logs)} for the week, using one
+    grouped query per table. Results are cached until one of the users logs
+    something on a day of that week.
+    """
+    user_ids = tuple(sorted(user_ids))
+    version = get_data_versions().range_version(user_ids, start_of_week, end_of_week)
+    cache = get_cache("scoreboard_cache")
+    cache_key = (user_ids, start_of_week, version)
+    counts = cache.get(cache_key)
+    if counts is not None:
+        return counts
+
+    diary_counts = dict(
+        db.session.query(DailyLog.user_id, func.count(DailyLog.id))
+        .filter(
+            DailyLog.user_id.in_(user_ids),
+            DailyLog.log_date >= start_of_week,
+            DailyLog.log_date <= end_of_week,
+        )
+        .group_by(DailyLog.user_id)
+        .all()
+    )
+    exercise_counts = dict(
+        db.session.query(ExerciseLog.user_id, func.count(ExerciseLog.id))
+        .filter(
+            ExerciseLog.user_id.in_(user_ids),
+            ExerciseLog.log_date >= start_of_week,
+            ExerciseLog.log_date <= end_of_week,
+        )
+        .group_by(ExerciseLog.user_id)
+        .all()
+    )
+    counts = {
+        user_id: (diary_counts.get(user_id, 0), exercise_counts.get(user_id, 0))
+        for user_id in user_ids
+    }
+    cache.set(cache_key, counts)
+    return counts
+
+
 @friends_bp.route("/", methods=["GET"])
 @login_required
 def friends_page():
@@ -16,23 +61,41 @@ def friends_page():
     start_of_week = today - timedelta(days=today.weekday())
     end_of_week = start_of_week + timedelta(days=6)
 
-    # Get all accepted friends, including the current user for the scoreboard
-    all_users_for_scoreboard = [current_user] + list(current_user.friends)
+    # Load every friendship of the current user, with both users, at once
+    friendships = (
+        Friendship.query.options(
+            joinedload(Friendship.requester), joinedload(Friendship.receiver)
+        )
+        .filter(
+            or_(
+                Friendship.requester_id == current_user.id,
+                Friendship.receiver_id == current_user.id,
+            )
+        )
+        .order_by(Friendship.id)
+        .all()
+    )
+    friends = []
+    pending_sent = []
+    pending_received = []
+    for friendship in friendships:
+        is_requester = friendship.requester_id == current_user.id
+        if friendship.status == "accepted":
+            friends.append(
+                friendship.receiver if is_requester else friendship.requester
+            )
+        elif friendship.status == "pending":
+            (pending_sent if is_requester else pending_received).append(friendship)
+
+    # Include the current user in the scoreboard
+    all_users_for_scoreboard = [current_user] + friends
+    activity_counts = _weekly_activity_counts(
+        [user.id for user in all_users_for_scoreboard], start_of_week, end_of_week
+    )
 
     scoreboard_data = []
     for user in all_users_for_scoreboard:
-        diary_logs_count = DailyLog.query.filter(
-            DailyLog.user_id == user.id,
-            DailyLog.log_date >= start_of_week,
-            DailyLog.log_date <= end_of_week,
-        ).count()
-
-        exercise_logs_count = ExerciseLog.query.filter(
-            ExerciseLog.user_id == user.id,
-            ExerciseLog.log_date >= start_of_week,
-            ExerciseLog.log_date <= end_of_week,
-        ).count()
-
+        diary_logs_count, exercise_logs_count = activity_counts[user.id]
         scoreboard_data.append(
             {
                 "username": user.username,
@@ -48,9 +111,9 @@ def friends_page():
 
     return render_template(
         "friends/friends.html",
-        friends=current_user.friends,
-        pending_sent=current_user.pending_requests_sent,
-        pending_received=current_user.pending_requests_received,
+        friends=friends,
+        pending_sent=pending_sent,
+        pending_received=pending_received,
         scoreboard=scoreboard_data,
         start_of_week=start_of_week,
         end_of_week=end_of_week,
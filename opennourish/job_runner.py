@@ -0,0 +1,284 @@
+"""
+Background jobs for operations that can outlast a request: imports, account
+restores and deletions, and admin maintenance.
+
+A job is a row in the `background_jobs` table, so queued and interrupted jobs
+survive a restart. Routes create one with `enqueue_job` and answer with
+`job_response`, which sends the user to the job's status page while it runs.
+The jobs run on a pool of JOB_WORKERS threads, each in its own app context.
+With JOB_WORKERS = 0, the default under testing, a job runs in the request
+that enqueues it, so its outcome is known when `enqueue_job` returns.
+
+Handlers are registered per job kind with `@job_handler`. A handler gets a
+`JobContext` and returns the outcome from `job_result`: the messages to show
+and the page to continue to. A handler that raises is retried until it has
+run `max_attempts` times; handlers must therefore be safe to run again.
+
+Uploads are not stored in the table: `save_job_upload` saves them to a file
+whose path goes in the payload. The runner deletes the file, if the handler
+hasn't, and clears the payload when the job has finished or failed.
+"""
+
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from types import SimpleNamespace
+
+from flask import current_app, flash, redirect, url_for
+from sqlalchemy import func, update
+from sqlalchemy.exc import SQLAlchemyError
+
+from models import db, BackgroundJob
+
+JOB_HANDLERS = {}
+
+
+def job_handler(kind, max_attempts=1):
+    """Registers the decorated function as the handler of a job kind."""
+
+    def register(func):
+        JOB_HANDLERS[kind] = SimpleNamespace(run=func, max_attempts=max_attempts)
+        return func
+
+    return register
+
+
+def job_result(endpoint, messages=(), **values):
+    """
+    The outcome of a job: (flash category, message) pairs, and the endpoint
+    and URL values of the page the user continues to.
+    """
+    return {
+        "endpoint": endpoint,
+        "values": values,
+        "messages": [list(message) for message in messages],
+    }
+
+
+class JobContext:
+    """What a handler sees of its job."""
+
+    def __init__(self, job):
+        self.id = job.id
+        self.user_id = job.user_id
+        self.payload = job.payload or {}
+
+    def progress(self, done, total=None):
+        """Records the job's progress. Commits the session."""
+        db.session.execute(
+            update(BackgroundJob)
+            .where(BackgroundJob.id == self.id)
+            .values(progress_done=done, progress_total=total)
+        )
+        db.session.commit()
+
+
+class JobRunner:
+    def __init__(self, app, max_workers=2):
+        self.app = app
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """
+        Starts the worker pool, once, and queues the jobs a previous process
+        left unfinished. Does nothing when jobs run inline.
+        """
+        if not self.max_workers:
+            return
+        with self._lock:
+            if self._executor is not None:
+                return
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="job-worker"
+            )
+        for job_id in self._recover():
+            self._executor.submit(self._run_in_app_context, job_id)
+
+    def submit(self, job_id):
+        """
+        Runs a job on the pool, returning its future, or runs it to the end
+        in the current thread when jobs run inline.
+        """
+        if not self.max_workers:
+            while self._run(job_id):
+                pass
+            return None
+        self.start()
+        return self._executor.submit(self._run_in_app_context, job_id)
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    def _run_in_app_context(self, job_id):
+        with self.app.app_context():
+            while self._run(job_id):
+                pass
+
+    def _run(self, job_id):
+        """Runs a queued job once. Returns True if it should be retried."""
+        # Claiming the job in one statement keeps two workers from running it
+        claimed = db.session.execute(
+            update(BackgroundJob)
+            .where(BackgroundJob.id == job_id, BackgroundJob.status == "queued")
+            .values(
+                status="running",
+                attempts=BackgroundJob.attempts + 1,
+                started_at=datetime.utcnow(),
+            )
+        ).rowcount
+        db.session.commit()
+        if not claimed:
+            return False
+        job = db.session.get(BackgroundJob, job_id)
+        payload = job.payload
+        handler = JOB_HANDLERS.get(job.kind)
+        try:
+            if handler is None:
+                raise LookupError(f"No handler for jobs of kind '{job.kind}'")
+            result = handler.run(JobContext(job))
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.exception(f"Job {job_id} ({job.kind}) failed")
+            job = db.session.get(BackgroundJob, job_id)
+            retry = job.attempts < job.max_attempts
+            job.status = "queued" if retry else "failed"
+            job.error = str(e)
+            if not retry:
+                job.finished_at = datetime.utcnow()
+                remove_job_upload(payload)
+                job.payload = None
+            db.session.commit()
+            return retry
+
+        remove_job_upload(payload)
+
+        db.session.execute(
+            update(BackgroundJob)
+            .where(BackgroundJob.id == job_id)
+            .values(
+                status="succeeded",
+                payload=None,
+                result=result,
+                error=None,
+                progress_done=func.coalesce(
+                    BackgroundJob.progress_total, BackgroundJob.progress_done
+                ),
+                finished_at=datetime.utcnow(),
+            )
+        )
+        db.session.commit()
+        return False
+
+    def _recover(self):
+        """
+        Requeues the jobs that were running when the last process stopped, or
+        fails them if they are out of attempts, and returns the ids of all
+        queued jobs.
+        """
+        with self.app.app_context():
+            try:
+                interrupted = BackgroundJob.query.filter_by(status="running").all()
+                for job in interrupted:
+                    if job.attempts < job.max_attempts:
+                        job.status = "queued"
+                    else:
+                        job.status = "failed"
+                        job.error = "Interrupted by a restart"
+                        job.finished_at = datetime.utcnow()
+                        remove_job_upload(job.payload)
+                        job.payload = None
+                db.session.commit()
+                return db.session.scalars(
+                    db.select(BackgroundJob.id)
+                    .filter_by(status="queued")
+                    .order_by(BackgroundJob.id)
+                ).all()
+            except SQLAlchemyError as e:
+                # E.g. before the migration that adds the table has run
+                db.session.rollback()
+                current_app.logger.warning(f"Could not recover background jobs: {e}")
+                return []
+
+
+def init_job_runner(app):
+    runner = JobRunner(
+        app, max_workers=app.config.get("JOB_WORKERS", 0 if app.testing else 2)
+    )
+    app.extensions["job_runner"] = runner
+
+    # The pool starts with the first request rather than here, so CLI
+    # commands like `flask db upgrade` neither start workers nor run jobs.
+    @app.before_request
+    def _start_job_runner():
+        runner.start()
+
+
+def get_job_runner():
+    return current_app.extensions["job_runner"]
+
+
+def enqueue_job(kind, payload=None, user_id=None):
+    """
+    Creates a job and hands it to the runner. Commits the session. Returns
+    the job, which has already run when jobs run inline.
+    """
+    job = BackgroundJob(
+        kind=kind,
+        user_id=user_id,
+        payload=payload,
+        max_attempts=JOB_HANDLERS[kind].max_attempts,
+    )
+    db.session.add(job)
+    db.session.flush()
+    job_id = job.id
+    db.session.commit()
+    get_job_runner().submit(job_id)
+    db.session.refresh(job)
+    return job
+
+
+def save_job_upload(file, suffix=""):
+    """
+    Saves an uploaded file, or text as UTF-8, to JOB_UPLOAD_DIR for a job to
+    read, and returns its path for the job's payload. The job's handler
+    deletes the file when done with it.
+    """
+    upload_dir = current_app.config.get("JOB_UPLOAD_DIR") or os.path.join(
+        current_app.instance_path, "job_uploads"
+    )
+    os.makedirs(upload_dir, exist_ok=True)
+    path = os.path.join(upload_dir, f"{uuid.uuid4().hex}{suffix}")
+    if isinstance(file, str):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(file)
+    else:
+        file.save(path)
+    return path
+
+
+def remove_job_upload(payload):
+    """Deletes the upload a job's payload refers to, if it is still there."""
+    path = (payload or {}).get("path")
+    if path and os.path.exists(path):
+        os.remove(path)
+
+
+def job_response(job):
+    """
+    Responds with a job's outcome if it has finished, flashing its messages
+    and redirecting to its result page, or else with its status page.
+    """
+    if job.status == "succeeded":
+        for category, message in job.result.get("messages", []):
+            flash(message, category)
+        return redirect(url_for(job.result["endpoint"], **job.result.get("values", {})))
+    if job.status == "queued" and job.attempts == 0:
+        flash("The job has been started.", "info")
+    return redirect(url_for("jobs.job_status", job_id=job.id))
@@ -0,0 +1,44 @@
+from flask import abort, jsonify, render_template
+from flask_login import current_user, login_required
+
+from models import db, BackgroundJob
+from opennourish.job_runner import job_response
+from . import jobs_bp
+
+
+def _get_job_or_404(job_id):
+    job = db.session.get(BackgroundJob, job_id)
+    if job is None or not (job.user_id == current_user.id or current_user.is_admin):
+        abort(404)
+    return job
+
+
+@jobs_bp.route("/<int:job_id>")
+@login_required
+def job_status(job_id):
+    job = _get_job_or_404(job_id)
+    # A finished job continues to its result page, with its messages
+    if job.status == "succeeded":
+        return job_response(job)
+    return render_template("jobs/job_status.html", title="Job Status", job=job)
+
+
+@jobs_bp.route("/<int:job_id>/status")
+@login_required
+def job_status_json(job_id):
+    job = _get_job_or_404(job_id)
+    return jsonify(
+        {
+            "id": job.id,
+            "kind": job.kind,
+            "status": job.status,
+            "progress_done": job.progress_done,
+            "progress_total": job.progress_total,
+            "attempts": job.attempts,
+            "max_attempts": job.max_attempts,
+            "error": job.error,
+            "created_at": job.created_at.isoformat(),
+            "started_at": job.started_at and job.started_at.isoformat(),
+            "finished_at": job.finished_at and job.finished_at.isoformat(),
+        }
+    )
@@ -0,0 +1,106 @@
+"""
+Content-addressed on-disk cache of compiled nutrition labels.
+
+Labels are stored under LABEL_CACHE_DIR as `<key>.<format>`, where the key
+is a hash of the Typst source and the compile options. Identical label
+content therefore maps to the same file no matter which food it belongs to,
+and any change to the content yields a new key, so entries never go stale.
+The directory is kept under LABEL_CACHE_MAX_BYTES by evicting the least
+recently used files; hits refresh a file's modification time.
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+
+from flask import current_app
+
+from config import persistent_dir
+
+
+def label_cache_key(typst_content, output_format, pages=None):
+    digest = hashlib.sha256()
+    digest.update(f"{output_format}\0{pages or ''}\0".encode())
+    digest.update(typst_content.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class LabelCache:
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _path(self, key, output_format):
+        return os.path.join(self.directory, f"{key}.{output_format}")
+
+    def open(self, key, output_format):
+        """Returns an open binary file for a cached label, or None on a miss."""
+        path = self._path(key, output_format)
+        try:
+            label_file = open(path, "rb")
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return label_file
+
+    def put(self, key, output_format, data):
+        """
+        Stores a freshly compiled label. It is written next to its final name
+        and renamed, so readers never see a partially written label.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as tmp_file:
+                tmp_file.write(data)
+            os.replace(tmp_path, self._path(key, output_format))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.evict()
+
+    def evict(self):
+        """Deletes the least recently used labels until under `max_bytes`."""
+        with self._lock:
+            try:
+                entries = [
+                    entry
+                    for entry in os.scandir(self.directory)
+                    if entry.is_file() and not entry.name.endswith(".tmp")
+                ]
+            except FileNotFoundError:
+                return
+            stats = []
+            for entry in entries:
+                try:
+                    stats.append((entry.stat(), entry.path))
+                except FileNotFoundError:
+                    continue
+            total = sum(stat.st_size for stat, _ in stats)
+            for stat, path in sorted(stats, key=lambda s: s[0].st_mtime_ns):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= stat.st_size
+                except OSError:
+                    # e.g. still open on Windows; try again on the next put
+                    continue
+
+
+def init_label_cache(app):
+    app.extensions["label_cache"] = LabelCache(
+        app.config.get("LABEL_CACHE_DIR")
+        or os.path.join(persistent_dir, "label_cache"),
+        app.config.get("LABEL_CACHE_MAX_BYTES", 256 * 1024 * 1024),
+    )
+
+
+def get_label_cache():
+    return current_app.extensions["label_cache"]
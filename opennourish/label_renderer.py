@@ -0,0 +1,85 @@
+"""
+Bounded pool for Typst label compilations.
+
+At most LABEL_RENDER_MAX_CONCURRENCY `typst` processes run at once, and at
+most LABEL_RENDER_MAX_QUEUE further labels wait for a free worker. Requests
+for a label that is already queued or compiling wait for that compilation
+instead of starting another one. When the queue is full, or a label isn't
+ready within LABEL_RENDER_QUEUE_TIMEOUT seconds, `LabelRendererBusy` is
+raised so the caller can answer 503 with a Retry-After header. A compilation
+that outlives its waiters still finishes and fills the label cache, so the
+retry is usually a cache hit.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from flask import current_app
+
+
+class LabelRendererBusy(Exception):
+    def __init__(self, retry_after):
+        super().__init__("Label rendering is busy, please retry shortly.")
+        self.retry_after = retry_after
+
+
+class LabelRenderer:
+    def __init__(
+        self, max_concurrency=2, max_queue=32, queue_timeout=10, retry_after=5
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self._executor = None
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        # Created on first use, so apps that never render labels start no threads
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_concurrency, thread_name_prefix="label-render"
+            )
+        return self._executor
+
+    def render(self, key, compile_label):
+        """
+        Returns the result of `compile_label()`, running it on the pool unless
+        a compilation for `key` is already queued or running.
+        """
+        submitted = False
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is None:
+                if len(self._in_flight) >= self.max_concurrency + self.max_queue:
+                    raise LabelRendererBusy(self.retry_after)
+                future = self._get_executor().submit(compile_label)
+                self._in_flight[key] = future
+                submitted = True
+        if submitted:
+            # Outside the lock: the callback runs at once if already done
+            future.add_done_callback(lambda _: self._forget(key, future))
+        try:
+            return future.result(timeout=self.queue_timeout)
+        except FutureTimeoutError:
+            raise LabelRendererBusy(self.retry_after) from None
+
+    def _forget(self, key, future):
+        with self._lock:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+
+
+def init_label_renderer(app):
+    app.extensions["label_renderer"] = LabelRenderer(
+        max_concurrency=app.config.get("LABEL_RENDER_MAX_CONCURRENCY", 2),
+        max_queue=app.config.get("LABEL_RENDER_MAX_QUEUE", 32),
+        queue_timeout=app.config.get("LABEL_RENDER_QUEUE_TIMEOUT", 10),
+        retry_after=app.config.get("LABEL_RENDER_RETRY_AFTER", 5),
+    )
+
+
+def get_label_renderer():
+    return current_app.extensions["label_renderer"]
@@ -0,0 +1,150 @@
+"""
+In-process SVG rendering of FDA-style nutrition labels.
+
+Used for the inline label previews, which are drawn straight from the label
+`data` dictionary that typst_utils also hands to the nutrition-label-nam
+Typst package, so both show the same amounts. Typst remains the renderer
+for the printable PDF labels.
+"""
+
+from xml.sax.saxutils import escape
+
+# FDA reference daily values used for the % Daily Value column
+DAILY_VALUES = {
+    "total_fat": 78,
+    "saturated_fat": 20,
+    "cholesterol": 300,
+    "sodium": 2300,
+    "carbohydrate": 275,
+    "fiber": 28,
+    "added_sugars": 50,
+    "vitamin_d": 20,
+    "calcium": 1300,
+    "iron": 18,
+    "potassium": 4700,
+}
+
+# (data key, name on the label, indentation level)
+NUTRIENT_ROWS = [
+    ("total_fat", "Total Fat", 0),
+    ("saturated_fat", "Saturated Fat", 1),
+    ("trans_fat", "Trans Fat", 1),
+    ("cholesterol", "Cholesterol", 0),
+    ("sodium", "Sodium", 0),
+    ("carbohydrate", "Total Carbohydrate", 0),
+    ("fiber", "Dietary Fiber", 1),
+    ("sugars", "Total Sugars", 1),
+    ("added_sugars", "Added Sugars", 2),
+    ("protein", "Protein", 0),
+]
+
+WIDTH = 260
+MARGIN = 6
+INDENT = 12
+FONT_FAMILY = "Liberation Sans, Helvetica, Arial, sans-serif"
+FOOTNOTE = [
+    "* The % Daily Value (DV) tells you how much a nutrient in",
+    "a serving of food contributes to a daily diet. 2,000",
+    "calories a day is used for general nutrition advice.",
+]
+
+
+def _percent_daily_value(key, value):
+    daily_value = DAILY_VALUES.get(key)
+    if not daily_value:
+        return ""
+    return f"{round(float(value) / daily_value * 100)}%"
+
+
+class _LabelCanvas:
+    def __init__(self):
+        self.elements = []
+        self.y = MARGIN
+
+    def text(self, x, content, size, bold=False, anchor="start"):
+        weight = ' font-weight="bold"' if bold else ""
+        self.elements.append(
+            f'<text x="{x}" y="{self.y}" font-size="{size}"{weight} '
+            f'text-anchor="{anchor}">{content}</text>'
+        )
+
+    def line(self, text_size, left="", right="", bold=False):
+        self.y += text_size + 2
+        if left:
+            self.text(MARGIN, left, text_size, bold=bold)
+        if right:
+            self.text(WIDTH - MARGIN, right, text_size, bold=bold, anchor="end")
+        self.y += 3
+
+    def rule(self, thickness=1):
+        self.elements.append(
+            f'<rect x="{MARGIN}" y="{self.y}" width="{WIDTH - 2 * MARGIN}" '
+            f'height="{thickness}"/>'
+        )
+        self.y += thickness
+
+    def nutrient(self, name, amount, daily_value, level):
+        self.y += 12
+        self.elements.append(
+            f'<text x="{MARGIN + level * INDENT}" y="{self.y}" font-size="10">'
+            f"{name} {amount}</text>"
+        )
+        if daily_value:
+            self.text(WIDTH - MARGIN, daily_value, 10, bold=True, anchor="end")
+        self.y += 4
+        self.rule()
+
+    def svg(self):
+        height = self.y + MARGIN
+        return (
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{WIDTH}" '
+            f'height="{height}" viewBox="0 0 {WIDTH} {height}" '
+            f'font-family="{FONT_FAMILY}">'
+            f'<rect width="{WIDTH}" height="{height}" fill="white"/>'
+            f"{''.join(self.elements)}</svg>"
+        )
+
+
+def render_label_svg(data):
+    """
+    Returns an FDA-style nutrition facts label for a label `data` dictionary
+    (see typst_utils._label_data) as an SVG document string.
+    """
+    canvas = _LabelCanvas()
+    canvas.line(24, "Nutrition Facts", bold=True)
+    canvas.rule()
+    canvas.line(10, f"{escape(str(data['servings']))} servings per container")
+    canvas.line(11, "Serving size", escape(data["serving_size"]), bold=True)
+    canvas.rule(8)
+    canvas.line(9, "Amount per serving", bold=True)
+    canvas.y -= 4
+    canvas.line(20, "Calories", escape(data["calories"]), bold=True)
+    canvas.rule(4)
+    canvas.line(9, right="% Daily Value*", bold=True)
+    canvas.rule()
+
+    for key, name, level in NUTRIENT_ROWS:
+        nutrient = data[key]
+        amount = f"{nutrient['value']}{nutrient['unit']}"
+        if key == "added_sugars":
+            name, amount = f"Includes {amount}", "Added Sugars"
+        elif level == 0:
+            name = f'<tspan font-weight="bold">{name}</tspan>'
+        canvas.nutrient(
+            name, amount, _percent_daily_value(key, nutrient["value"]), level
+        )
+    canvas.y -= 1
+    canvas.rule(8)
+
+    for micronutrient in data["micronutrients"]:
+        amount = f"{micronutrient['value']}{micronutrient['unit']}"
+        canvas.nutrient(
+            escape(micronutrient["name"]),
+            amount,
+            _percent_daily_value(micronutrient["key"], micronutrient["value"]),
+            0,
+        )
+    canvas.rule(3)
+    for footnote_line in FOOTNOTE:
+        canvas.line(8, footnote_line)
+    return canvas.svg()
@@ -0,0 +1,203 @@
+from collections import defaultdict
+from types import SimpleNamespace
+
+from sqlalchemy import or_
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm.attributes import set_committed_value
+
+from models import (
+    MyFood,
+    Recipe,
+    UnifiedPortion,
+    User,
+)
+from opennourish.cache import get_usda_foods
+from opennourish.utils import get_usda_nutrients_map
+
+
+def load_item_references(items, also_my_foods=None):
+    """
+    Batch-loads everything referenced by a list of DailyLog-like rows (DailyLog,
+    MyMealItem, RecipeIngredient): USDA foods, My Foods, recipes, portions, the
+    owners of foreign foods and the USDA nutrient values. `also_my_foods` is an
+    optional condition selecting further My Foods to load with the referenced
+    ones, such as the user's Water food for the diary's quick-add.
+
+    Each entity type is fetched with a single query, and the loaded objects stay
+    in the session's identity map, so later `db.session.get()` calls and
+    `get_available_portions()` are served without further queries. USDA foods
+    come from the process-wide USDA food cache as read-only records carrying
+    their `portions`.
+    """
+    fdc_ids = {item.fdc_id for item in items if item.fdc_id}
+    my_food_ids = {
+        item.my_food_id
+        for item in items
+        if getattr(item, "my_food_id", None) and not item.fdc_id
+    }
+    recipe_ids = {
+        _referenced_recipe_id(item)
+        for item in items
+        if _referenced_recipe_id(item)
+        and not item.fdc_id
+        and not getattr(item, "my_food_id", None)
+    }
+
+    foods = {
+        fdc_id: SimpleNamespace(**record._asdict(), portions=[])
+        for fdc_id, record in get_usda_foods(fdc_ids).items()
+    }
+
+    my_foods = {}
+    if my_food_ids or also_my_foods is not None:
+        condition = MyFood.id.in_(my_food_ids)
+        if also_my_foods is not None:
+            condition = or_(condition, also_my_foods)
+        my_foods = {
+            my_food.id: my_food for my_food in MyFood.query.filter(condition).all()
+        }
+
+    recipes = {}
+    if recipe_ids:
+        # Joined rather than selectin-loaded, to save a query
+        recipes = {
+            recipe.id: recipe
+            for recipe in Recipe.query.options(joinedload(Recipe.ingredients))
+            .filter(Recipe.id.in_(recipe_ids))
+            .all()
+        }
+
+    portions = _load_portions(foods, my_foods, recipes)
+    # Logged portions normally belong to the logged food; pick up any strays.
+    missing_portion_ids = {
+        item.portion_id_fk
+        for item in items
+        if getattr(item, "portion_id_fk", None) and item.portion_id_fk not in portions
+    }
+    if missing_portion_ids:
+        for portion in UnifiedPortion.query.filter(
+            UnifiedPortion.id.in_(missing_portion_ids)
+        ).all():
+            portions[portion.id] = portion
+
+    owner_ids = {
+        food_item.user_id
+        for food_item in list(my_foods.values()) + list(recipes.values())
+        if food_item.user_id is not None
+    }
+    owners = {}
+    if owner_ids:
+        owners = {
+            user.id: user for user in User.query.filter(User.id.in_(owner_ids)).all()
+        }
+
+    # Prefetch nutrients for the logged USDA foods and for the USDA ingredients
+    # of logged recipes, which are needed when their nutrition is calculated.
+    nutrient_fdc_ids = set(fdc_ids)
+    for recipe in recipes.values():
+        nutrient_fdc_ids.update(ing.fdc_id for ing in recipe.ingredients if ing.fdc_id)
+    nutrients = get_usda_nutrients_map(nutrient_fdc_ids)
+
+    return SimpleNamespace(
+        foods=foods,
+        my_foods=my_foods,
+        recipes=recipes,
+        portions=portions,
+        owners=owners,
+        nutrients=nutrients,
+    )
+
+
+def _referenced_recipe_id(item):
+    # RecipeIngredient.recipe_id is the parent recipe; nested recipes are
+    # linked through recipe_id_link instead.
+    if hasattr(item, "recipe_id_link"):
+        return item.recipe_id_link
+    return getattr(item, "recipe_id", None)
+
+
+def _load_portions(foods, my_foods, recipes):
+    """
+    Loads the portions of all given foods in one query and populates each
+    parent's `portions` collection, so accessing it does not lazy-load.
+    Returns a dict of all loaded portions keyed by id.
+    """
+    conditions = []
+    if foods:
+        conditions.append(UnifiedPortion.fdc_id.in_(foods.keys()))
+    if my_foods:
+        conditions.append(UnifiedPortion.my_food_id.in_(my_foods.keys()))
+    if recipes:
+        conditions.append(UnifiedPortion.recipe_id.in_(recipes.keys()))
+    if not conditions:
+        return {}
+
+    portions = (
+        UnifiedPortion.query.filter(or_(*conditions))
+        .order_by(UnifiedPortion.id.asc())
+        .all()
+    )
+
+    by_fdc_id = defaultdict(list)
+    by_my_food_id = defaultdict(list)
+    by_recipe_id = defaultdict(list)
+    for portion in portions:
+        if portion.fdc_id in foods:
+            by_fdc_id[portion.fdc_id].append(portion)
+        if portion.my_food_id in my_foods:
+            by_my_food_id[portion.my_food_id].append(portion)
+        if portion.recipe_id in recipes:
+            by_recipe_id[portion.recipe_id].append(portion)
+
+    # Mirror the order_by of the corresponding relationships in models.py
+    for fdc_id, food in foods.items():
+        food_portions = sorted(
+            by_fdc_id[fdc_id],
+            key=lambda p: (p.seq_num is None, p.seq_num or 0, p.gram_weight),
+        )
+        food.portions = food_portions
+    for my_food_id, my_food in my_foods.items():
+        my_food_portions = sorted(
+            by_my_food_id[my_food_id],
+            key=lambda p: (p.seq_num is None, p.seq_num or 0),
+        )
+        set_committed_value(my_food, "portions", my_food_portions)
+    for recipe_id, recipe in recipes.items():
+        set_committed_value(recipe, "portions", by_recipe_id[recipe_id])
+
+    return {portion.id: portion for portion in portions}
+
+
+def resolve_food_item(item, refs):
+    """
+    Returns a (food_item, food_type, food_id) tuple for a DailyLog-like row,
+    looked up in references loaded by `load_item_references`.
+    """
+    if item.fdc_id:
+        return refs.foods.get(item.fdc_id), "usda", item.fdc_id
+    if getattr(item, "my_food_id", None):
+        return refs.my_foods.get(item.my_food_id), "my_food", item.my_food_id
+    recipe_id = _referenced_recipe_id(item)
+    if recipe_id:
+        return refs.recipes.get(recipe_id), "recipe", recipe_id
+    return None, None, None
+
+
+def get_display_description(food_item, refs, viewer_id):
+    """
+    Returns the description of a food item as shown in the diary, marking
+    deleted items and items owned by another user.
+    """
+    description = (
+        food_item.description if hasattr(food_item, "description") else food_item.name
+    )
+    if hasattr(food_item, "user_id"):
+        if food_item.user_id is None:
+            description += " (deleted)"
+        elif food_item.user_id != viewer_id:
+            owner = refs.owners.get(food_item.user_id)
+            if owner:
+                description += f" (from {owner.username})"
+            else:
+                description += " (deleted)"
+    return description
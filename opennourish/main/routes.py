@@ -14,6 +14,7 @@ from models import db, Food
 import os
 from opennourish.utils import (
     ensure_portion_sequence,
+    has_pruned_nutrients,
 )
 from opennourish.typst_utils import (
     generate_nutrition_label_pdf,
@@ -59,6 +60,7 @@ def food_detail(fdc_id):
         food=food,
         search_term=q,
         portions=portions,
+        nutrients_pruned=has_pruned_nutrients(),
         timestamp=datetime.now(timezone.utc).timestamp(),
     )
 
@@ -6,10 +6,11 @@ from flask import (
     flash,
     Blueprint,
     current_app,
-    Response,
 )
 from datetime import datetime, timezone
 from flask_login import login_required, current_user
+import json
+import os
 import yaml
 from models import (
     db,
@@ -20,16 +21,35 @@ from models import (
     FoodCategory,
 )
 from opennourish.my_foods.forms import MyFoodForm, PortionForm, CategoryForm
-from sqlalchemy import func
+from sqlalchemy import func, insert
 from sqlalchemy.orm import joinedload, selectinload
 from opennourish.utils import (
     ensure_portion_sequence,
     get_nutrients_for_display,
     convert_display_nutrients_to_100g,
     prepare_undo_and_delete,
+    resolve_food_categories,
+)
+from opennourish.export_utils import (
+    EXPORT_FORMATS,
+    iter_in_batches,
+    json_line,
+    load_json_lines,
+    load_yaml,
+    read_upload_text,
+    streamed_export,
+    yaml_list,
+)
+from opennourish.job_runner import (
+    enqueue_job,
+    job_handler,
+    job_response,
+    job_result,
+    save_job_upload,
 )
 from opennourish.typst_utils import (
     generate_myfood_label_pdf,
+    generate_myfood_labels_pdf,
 )
 
 my_foods_bp = Blueprint("my_foods", __name__)
@@ -39,6 +59,7 @@ MY_FOODS_LIST_ROUTE = "my_foods.my_foods"
 IMPORT_FOODS_ROUTE = "my_foods.import_foods"
 MANAGE_CATEGORIES_ROUTE = "my_foods.manage_categories"
 PORTIONS_TABLE_FRAGMENT = "#portions-table"
+MAX_LABELS_PER_SHEET = 500
 
 
 def _get_or_create_food_category(category_name, user_id, food_description):
@@ -66,179 +87,288 @@ def _get_or_create_food_category(category_name, user_id, food_description):
     return new_category.id
 
 
-def _process_yaml_import(yaml_stream):
-    try:
-        food_data = yaml.safe_load(yaml_stream)
-        if not food_data:
-            flash("No food items found in the YAML content.", "info")
-            return redirect(url_for(IMPORT_FOODS_ROUTE))
-        if not isinstance(food_data, list):
-            flash("YAML file must contain a list of food items.", "danger")
-            return redirect(url_for(IMPORT_FOODS_ROUTE))
-
-        existing_descriptions = {
-            f.description.lower()
-            for f in MyFood.query.filter_by(user_id=current_user.id).all()
-        }
-        processed_in_file = set()
-        skipped_items = []
-        success_count = 0
-
-        for item in food_data:
-            description = item.get("description")
-            if not description:
-                skipped_items.append(("Unnamed Item", "Missing description"))
-                continue
-
-            if description.lower() in processed_in_file:
-                skipped_items.append((description, "Duplicate in file"))
-                continue
-
-            if description.lower() in existing_descriptions:
-                skipped_items.append((description, "Already exists"))
-                continue
-
-            processed_in_file.add(description.lower())
-
-            # Determine gram_weight for calculation from the correct source
-            gram_weight = None
-            is_new_format = "portions" in item and item["portions"]
-            is_legacy_format = "serving" in item
-
-            if is_new_format:
-                gram_weight = item["portions"][0].get("gram_weight")
-            elif is_legacy_format:
-                gram_weight = item["serving"].get("gram_weight")
-
-            nutrition_facts = item.get("nutrition_facts", {})
-            calories = nutrition_facts.get("calories")
-
-            if gram_weight is None or gram_weight < 0 or calories is None:
-                skipped_items.append((description, "Invalid data (serving/calories)"))
-                continue
-
-            # If gram_weight is 0 or not provided, calculate it from macros
-            if not gram_weight or gram_weight <= 0:
-                protein = nutrition_facts.get("protein_grams", 0) or 0
-                carbs = nutrition_facts.get("carbohydrates_grams", 0) or 0
-                fat = nutrition_facts.get("fat_grams", 0) or 0
-                calculated_gram_weight = protein + carbs + fat
-
-                # BUG FIX: Update the original item dict with the calculated weight
-                if calculated_gram_weight > 0:
-                    gram_weight = calculated_gram_weight
-                    if is_new_format:
-                        item["portions"][0]["gram_weight"] = gram_weight
-                    elif is_legacy_format:
-                        item["serving"]["gram_weight"] = gram_weight
-
-            if calories > 0 and gram_weight <= 0:
-                skipped_items.append(
-                    (description, "Foods with calories must have a gram weight > 0")
-                )
-                continue
-
-            category_id = _get_or_create_food_category(
-                item.get("category"), current_user.id, description
+# YAML nutrition_facts keys (per serving) and the MyFood columns (per 100g)
+IMPORT_NUTRITION_FIELDS = {
+    "calories": "calories_per_100g",
+    "protein_grams": "protein_per_100g",
+    "carbohydrates_grams": "carbs_per_100g",
+    "fat_grams": "fat_per_100g",
+    "saturated_fat_grams": "saturated_fat_per_100g",
+    "trans_fat_grams": "trans_fat_per_100g",
+    "cholesterol_milligrams": "cholesterol_mg_per_100g",
+    "sodium_milligrams": "sodium_mg_per_100g",
+    "fiber_grams": "fiber_per_100g",
+    "total_sugars_grams": "sugars_per_100g",
+    "added_sugars_grams": "added_sugars_per_100g",
+    "vitamin_d_micrograms": "vitamin_d_mcg_per_100g",
+    "calcium_milligrams": "calcium_mg_per_100g",
+    "iron_milligrams": "iron_mg_per_100g",
+    "potassium_milligrams": "potassium_mg_per_100g",
+}
+IMPORT_BATCH_SIZE = 1000
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _validate_import_item(item, seen_descriptions):
+    """
+    Returns (food row, portion rows) for a valid import item, or raises
+    ValueError with the reason the item is skipped. Rows are keyed by
+    column, without ids.
+    """
+    description = item.get("description")
+    if not description or not isinstance(description, str):
+        raise ValueError("Missing description")
+    if description.lower() in seen_descriptions:
+        raise ValueError(seen_descriptions[description.lower()])
+
+    # Determine gram_weight for calculation from the correct source
+    gram_weight = None
+    is_new_format = "portions" in item and item["portions"]
+    is_legacy_format = "serving" in item
+
+    if is_new_format:
+        gram_weight = item["portions"][0].get("gram_weight")
+    elif is_legacy_format:
+        gram_weight = item["serving"].get("gram_weight")
+
+    nutrition_facts = item.get("nutrition_facts") or {}
+    calories = nutrition_facts.get("calories")
+
+    if not _is_number(gram_weight) or gram_weight < 0 or not _is_number(calories):
+        raise ValueError("Invalid data (serving/calories)")
+    # Blank amounts count as 0
+    nutrition_facts = {
+        key: nutrition_facts.get(key) or 0 for key in IMPORT_NUTRITION_FIELDS
+    }
+    if not all(_is_number(value) for value in nutrition_facts.values()):
+        raise ValueError("Invalid data (nutrition facts)")
+
+    # If gram_weight is 0, calculate it from macros
+    if gram_weight == 0:
+        gram_weight = sum(
+            nutrition_facts[key]
+            for key in ("protein_grams", "carbohydrates_grams", "fat_grams")
+        )
+        gram_weight = max(gram_weight, 0)
+
+    if calories > 0 and gram_weight <= 0:
+        raise ValueError("Foods with calories must have a gram weight > 0")
+
+    factor = 100.0 / gram_weight if gram_weight > 0 else 1.0
+    food_row = {
+        "description": description,
+        "ingredients": item.get("ingredients", ""),
+        "upc": item.get("upc") or None,
+        "fdc_id": item.get("fdc_id") or None,
+        "is_placeholder": False,
+    }
+    for key, column in IMPORT_NUTRITION_FIELDS.items():
+        food_row[column] = nutrition_facts[key] * factor
+
+    # Create Portions based on format
+    portion_rows = []
+    if is_new_format:
+        # New format: all portions from the list, the first with the
+        # (possibly calculated) serving weight
+        for i, p_data in enumerate(item["portions"]):
+            portion_rows.append(
+                {
+                    "amount": p_data.get("amount", 1),
+                    "measure_unit_description": p_data.get(
+                        "measure_unit_description", ""
+                    ),
+                    "gram_weight": gram_weight
+                    if i == 0
+                    else p_data.get("gram_weight", 0),
+                    "portion_description": p_data.get("portion_description", ""),
+                    "modifier": p_data.get("modifier", ""),
+                    "seq_num": i + 1,
+                }
             )
-
-            factor = 100.0 / gram_weight if gram_weight > 0 else 1.0
-
-            my_food = MyFood(
-                user_id=current_user.id,
-                description=description,
-                ingredients=item.get("ingredients", ""),
-                food_category_id=category_id,
-                upc=item.get("upc") or None,
-                fdc_id=item.get("fdc_id") or None,
-                calories_per_100g=nutrition_facts.get("calories", 0) * factor,
-                protein_per_100g=nutrition_facts.get("protein_grams", 0) * factor,
-                carbs_per_100g=nutrition_facts.get("carbohydrates_grams", 0) * factor,
-                fat_per_100g=nutrition_facts.get("fat_grams", 0) * factor,
-                saturated_fat_per_100g=nutrition_facts.get("saturated_fat_grams", 0)
-                * factor,
-                trans_fat_per_100g=nutrition_facts.get("trans_fat_grams", 0) * factor,
-                cholesterol_mg_per_100g=nutrition_facts.get("cholesterol_milligrams", 0)
-                * factor,
-                sodium_mg_per_100g=nutrition_facts.get("sodium_milligrams", 0) * factor,
-                fiber_per_100g=nutrition_facts.get("fiber_grams", 0) * factor,
-                sugars_per_100g=nutrition_facts.get("total_sugars_grams", 0) * factor,
-                added_sugars_per_100g=nutrition_facts.get("added_sugars_grams", 0)
-                * factor,
-                vitamin_d_mcg_per_100g=nutrition_facts.get("vitamin_d_micrograms", 0)
-                * factor,
-                calcium_mg_per_100g=nutrition_facts.get("calcium_milligrams", 0)
-                * factor,
-                iron_mg_per_100g=nutrition_facts.get("iron_milligrams", 0) * factor,
-                potassium_mg_per_100g=nutrition_facts.get("potassium_milligrams", 0)
-                * factor,
+    else:
+        # Legacy format: the serving block + a 1g portion
+        serving = item.get("serving", {})
+        portion_rows.append(
+            {
+                "amount": serving.get("amount", 1),
+                "measure_unit_description": serving.get("unit", ""),
+                "gram_weight": gram_weight,
+                "portion_description": None,
+                "modifier": None,
+                "seq_num": 1,
+            }
+        )
+        if gram_weight > 0:
+            portion_rows.append(
+                {
+                    "amount": 1.0,
+                    "measure_unit_description": "g",
+                    "gram_weight": 1.0,
+                    "portion_description": None,
+                    "modifier": None,
+                    "seq_num": 2,
+                }
             )
-            db.session.add(my_food)
-            db.session.flush()
-
-            # Create Portions based on format
-            if is_new_format:
-                # New format: create all portions from the list
-                for i, p_data in enumerate(item["portions"]):
-                    portion = UnifiedPortion(
-                        my_food_id=my_food.id,
-                        amount=p_data.get("amount", 1),
-                        measure_unit_description=p_data.get(
-                            "measure_unit_description", ""
-                        ),
-                        gram_weight=p_data.get("gram_weight", 0),
-                        portion_description=p_data.get("portion_description", ""),
-                        modifier=p_data.get("modifier", ""),
-                        seq_num=i + 1,  # Assign sequence number
-                    )
-                    db.session.add(portion)
-            elif is_legacy_format:
-                # Legacy format: create from serving block + 1g portion
-                serving = item.get("serving", {})
-                user_portion = UnifiedPortion(
-                    my_food_id=my_food.id,
-                    amount=serving.get("amount", 1),
-                    measure_unit_description=serving.get("unit", ""),
-                    gram_weight=gram_weight,  # Use the corrected gram_weight
-                    seq_num=1,
-                )
-                db.session.add(user_portion)
+    return food_row, portion_rows
+
 
-                if gram_weight > 0:
-                    gram_portion = UnifiedPortion(
-                        my_food_id=my_food.id,
-                        amount=1.0,
-                        measure_unit_description="g",
-                        gram_weight=1.0,
-                        seq_num=2,
-                    )
-                    db.session.add(gram_portion)
+def _import_my_foods(food_data, user_id, progress=None):
+    """
+    Imports a list of My Foods import items for a user and returns
+    (number of foods added, [(name, reason skipped)]).
 
-            success_count += 1
+    All items are validated first. The valid ones are then written with bulk
+    inserts, IMPORT_BATCH_SIZE foods with their portions per transaction;
+    `progress(done, total)` is called after each batch.
+    """
+    existing_descriptions = db.session.scalars(
+        db.select(func.lower(MyFood.description)).filter_by(user_id=user_id)
+    )
+    seen_descriptions = {
+        description: "Already exists"
+        for description in existing_descriptions
+        if description is not None
+    }
+    skipped_items = []
+    valid_items = []
+    for item in food_data:
+        if not isinstance(item, dict):
+            skipped_items.append(("Unnamed Item", "Invalid entry"))
+            continue
+        try:
+            food_row, portion_rows = _validate_import_item(item, seen_descriptions)
+        except ValueError as e:
+            skipped_items.append((item.get("description") or "Unnamed Item", str(e)))
+            continue
+        except (AttributeError, TypeError):
+            skipped_items.append(
+                (item.get("description") or "Unnamed Item", "Invalid data")
+            )
+            continue
+        seen_descriptions[food_row["description"].lower()] = "Duplicate in file"
+        valid_items.append((item.get("category"), food_row, portion_rows))
+
+    # A food is never put in a category named like itself
+    valid_items = [
+        (
+            category
+            if isinstance(category, str)
+            and category.strip()
+            and category.lower() != food_row["description"].lower()
+            else None,
+            food_row,
+            portion_rows,
+        )
+        for category, food_row, portion_rows in valid_items
+    ]
+    category_ids = resolve_food_categories(
+        [category for category, _, _ in valid_items if category], user_id
+    )
+    db.session.commit()
 
+    total = len(valid_items)
+    for start in range(0, total, IMPORT_BATCH_SIZE):
+        batch = valid_items[start : start + IMPORT_BATCH_SIZE]
+        food_rows = []
+        for category, food_row, _ in batch:
+            food_row["user_id"] = user_id
+            food_row["food_category_id"] = (
+                category_ids.get(category.strip().lower()) if category else None
+            )
+            food_rows.append(food_row)
+        # Descriptions are unique within an import, so the returned rows can
+        # be matched up by description; asking for them in parameter order
+        # would make SQLite insert one row per statement.
+        food_ids = dict(
+            db.session.execute(
+                insert(MyFood).returning(MyFood.description, MyFood.id), food_rows
+            ).all()
+        )
+        portion_rows = [
+            dict(portion_row, my_food_id=food_ids[food_row["description"]])
+            for _, food_row, rows in batch
+            for portion_row in rows
+        ]
+        if portion_rows:
+            db.session.execute(insert(UnifiedPortion), portion_rows)
         db.session.commit()
+        done = start + len(batch)
+        current_app.logger.info(f"My Foods import: {done}/{total} foods added")
+        if progress:
+            progress(done, total)
 
-        # Flash summary message
-        summary_message = (
-            f"Import complete. Successfully added {success_count} new foods."
+    return total, skipped_items
+
+
+@job_handler("my_foods_import")
+def _run_my_foods_import(job):
+    """Imports the My Foods YAML or JSON Lines upload of a job's payload."""
+    path = job.payload["path"]
+    try:
+        with open(path, "rb") as file:
+            text = read_upload_text(file)
+    except UnicodeDecodeError:
+        return job_result(
+            IMPORT_FOODS_ROUTE, [("danger", "The file must be UTF-8 encoded text.")]
         )
-        if skipped_items:
-            skipped_count = len(skipped_items)
-            summary_message += f" {skipped_count} items were skipped."
-            flash(summary_message, "warning")
-            # Optional: flash details about skipped items if needed
-            skipped_details = ", ".join(
-                [f"{name} ({reason})" for name, reason in skipped_items]
-            )
-            flash(f"Skipped items: {skipped_details}", "info")
+    finally:
+        os.remove(path)
+    try:
+        if job.payload.get("json_lines"):
+            food_data = load_json_lines(text)
         else:
-            flash(summary_message, "success")
+            food_data = load_yaml(text)
+    except yaml.YAMLError as e:
+        return job_result(
+            IMPORT_FOODS_ROUTE, [("danger", f"Error parsing YAML file: {e}")]
+        )
+    except json.JSONDecodeError as e:
+        return job_result(
+            IMPORT_FOODS_ROUTE, [("danger", f"Error parsing JSON Lines file: {e}")]
+        )
+    if not food_data:
+        return job_result(
+            IMPORT_FOODS_ROUTE, [("info", "No food items found in the YAML content.")]
+        )
+    if not isinstance(food_data, list):
+        return job_result(
+            IMPORT_FOODS_ROUTE,
+            [("danger", "YAML file must contain a list of food items.")],
+        )
 
-        return redirect(url_for("my_foods.my_foods"))
+    success_count, skipped_items = _import_my_foods(
+        food_data, job.user_id, progress=job.progress
+    )
 
-    except yaml.YAMLError as e:
-        flash(f"Error parsing YAML file: {e}", "danger")
-        return redirect(url_for(IMPORT_FOODS_ROUTE))
+    # Summary message
+    summary_message = f"Import complete. Successfully added {success_count} new foods."
+    if skipped_items:
+        skipped_count = len(skipped_items)
+        summary_message += f" {skipped_count} items were skipped."
+        skipped_details = ", ".join(
+            [f"{name} ({reason})" for name, reason in skipped_items]
+        )
+        messages = [
+            ("warning", summary_message),
+            ("info", f"Skipped items: {skipped_details}"),
+        ]
+    else:
+        messages = [("success", summary_message)]
+    return job_result(MY_FOODS_LIST_ROUTE, messages)
+
+
+def _start_my_foods_import(source, json_lines=False):
+    """Starts a job importing `source`, an uploaded file or text."""
+    path = save_job_upload(source, ".jsonl" if json_lines else ".yaml")
+    job = enqueue_job(
+        "my_foods_import",
+        {"path": path, "json_lines": json_lines},
+        user_id=current_user.id,
+    )
+    return job_response(job)
 
 
 @my_foods_bp.route("/import", methods=["GET", "POST"])
@@ -250,15 +380,18 @@ def import_foods():
             if file and (
                 file.filename.endswith(".yaml") or file.filename.endswith(".yml")
             ):
-                return _process_yaml_import(file)
+                return _start_my_foods_import(file)
+            elif file and file.filename.endswith(".jsonl"):
+                return _start_my_foods_import(file, json_lines=True)
             else:
                 flash(
-                    "Invalid file type. Please upload a .yaml or .yml file.", "danger"
+                    "Invalid file type. Please upload a .yaml, .yml or .jsonl file.",
+                    "danger",
                 )
                 return redirect(request.url)
         elif "yaml_text" in request.form and request.form["yaml_text"].strip() != "":
             yaml_text = request.form["yaml_text"]
-            return _process_yaml_import(yaml_text)
+            return _start_my_foods_import(yaml_text)
         else:
             flash("No file selected or text provided.", "danger")
             return redirect(request.url)
@@ -784,6 +917,36 @@ def generate_pdf_details(food_id):
     return generate_myfood_label_pdf(food_id, label_only=False)
 
 
+@my_foods_bp.route("/labels", methods=["GET", "POST"])
+@login_required
+def generate_pdf_labels():
+    """
+    Prints the labels of the selected foods (`food_ids`), of one category
+    (`category_id`) or, without either, of all the user's foods as one PDF.
+    `layout=details` prints the detail sheet of each food instead.
+    """
+    query = MyFood.query.filter_by(user_id=current_user.id, is_placeholder=False)
+    food_ids = request.values.getlist("food_ids", type=int)
+    category_id = request.values.get("category_id", type=int)
+    if food_ids:
+        query = query.filter(MyFood.id.in_(food_ids))
+    elif category_id:
+        query = query.filter_by(food_category_id=category_id)
+    my_foods = query.order_by(MyFood.description).limit(MAX_LABELS_PER_SHEET + 1).all()
+
+    if not my_foods:
+        flash("No foods found to print labels for.", "warning")
+        return redirect(url_for(MY_FOODS_LIST_ROUTE))
+    if len(my_foods) > MAX_LABELS_PER_SHEET:
+        flash(
+            f"You can print at most {MAX_LABELS_PER_SHEET} labels at once.", "warning"
+        )
+        return redirect(url_for(MY_FOODS_LIST_ROUTE))
+
+    label_only = request.values.get("layout", "label") != "details"
+    return generate_myfood_labels_pdf(my_foods, label_only=label_only)
+
+
 @my_foods_bp.route("/portion/<int:portion_id>/move_up", methods=["POST"])
 @login_required
 def move_my_food_portion_up(portion_id):
@@ -938,133 +1101,126 @@ def delete_category(category_id):
     return redirect(url_for(MANAGE_CATEGORIES_ROUTE))
 
 
-def _export_my_foods_to_yaml():
-    """Export user's custom foods to YAML format, including all portions and data."""
-    my_foods = (
-        MyFood.query.options(selectinload(MyFood.portions))
-        .filter_by(user_id=current_user.id)
-        .all()
+def _my_food_export_data(food):
+    """Returns a food as an item of the My Foods export, with all its portions."""
+    # Export all portions, sorted by sequence number
+    portions_data = []
+    sorted_portions = sorted(
+        food.portions,
+        key=lambda p: p.seq_num if p.seq_num is not None else float("inf"),
     )
-
-    export_data = []
-
-    for food in my_foods:
-        # Export all portions, sorted by sequence number
-        portions_data = []
-        sorted_portions = sorted(
-            food.portions,
-            key=lambda p: p.seq_num if p.seq_num is not None else float("inf"),
-        )
-        for p in sorted_portions:
-            portions_data.append(
-                {
-                    "amount": p.amount,
-                    "measure_unit_description": p.measure_unit_description or "",
-                    "gram_weight": p.gram_weight,
-                    "portion_description": p.portion_description or "",
-                    "modifier": p.modifier or "",
-                }
-            )
-
-        # Get the first portion to use for nutrition facts scaling
-        first_portion = sorted_portions[0] if sorted_portions else None
-
-        nutrition_facts = {}
-        if first_portion and first_portion.gram_weight > 0:
-            scaling_factor = first_portion.gram_weight / 100.0
-            # Calculate per-serving nutrition
-            nutrition_facts = {
-                "calories": round((food.calories_per_100g or 0) * scaling_factor),
-                "protein_grams": round(
-                    (food.protein_per_100g or 0) * scaling_factor, 2
-                ),
-                "carbohydrates_grams": round(
-                    (food.carbs_per_100g or 0) * scaling_factor, 2
-                ),
-                "fat_grams": round((food.fat_per_100g or 0) * scaling_factor, 2),
-                "saturated_fat_grams": round(
-                    (food.saturated_fat_per_100g or 0) * scaling_factor, 2
-                ),
-                "trans_fat_grams": round(
-                    (food.trans_fat_per_100g or 0) * scaling_factor, 2
-                ),
-                "cholesterol_milligrams": round(
-                    (food.cholesterol_mg_per_100g or 0) * scaling_factor, 2
-                ),
-                "sodium_milligrams": round(
-                    (food.sodium_mg_per_100g or 0) * scaling_factor, 2
-                ),
-                "fiber_grams": round((food.fiber_per_100g or 0) * scaling_factor, 2),
-                "total_sugars_grams": round(
-                    (food.sugars_per_100g or 0) * scaling_factor, 2
-                ),
-                "added_sugars_grams": round(
-                    (food.added_sugars_per_100g or 0) * scaling_factor, 2
-                ),
-                "vitamin_d_micrograms": round(
-                    (food.vitamin_d_mcg_per_100g or 0) * scaling_factor, 2
-                ),
-                "calcium_milligrams": round(
-                    (food.calcium_mg_per_100g or 0) * scaling_factor, 2
-                ),
-                "iron_milligrams": round(
-                    (food.iron_mg_per_100g or 0) * scaling_factor, 2
-                ),
-                "potassium_milligrams": round(
-                    (food.potassium_mg_per_100g or 0) * scaling_factor, 2
-                ),
-            }
-        else:  # Fallback for no portions or zero gram weight
-            nutrition_facts = {
-                "calories": 0,
-                "protein_grams": 0,
-                "carbohydrates_grams": 0,
-                "fat_grams": 0,
-                "saturated_fat_grams": 0,
-                "trans_fat_grams": 0,
-                "cholesterol_milligrams": 0,
-                "sodium_milligrams": 0,
-                "fiber_grams": 0,
-                "total_sugars_grams": 0,
-                "added_sugars_grams": 0,
-                "vitamin_d_micrograms": 0,
-                "calcium_milligrams": 0,
-                "iron_milligrams": 0,
-                "potassium_milligrams": 0,
+    for p in sorted_portions:
+        portions_data.append(
+            {
+                "amount": p.amount,
+                "measure_unit_description": p.measure_unit_description or "",
+                "gram_weight": p.gram_weight,
+                "portion_description": p.portion_description or "",
+                "modifier": p.modifier or "",
             }
+        )
 
-        category = food.food_category.description if food.food_category else ""
-
-        food_item = {
-            "description": food.description,
-            "upc": food.upc or "",
-            "fdc_id": food.fdc_id or None,
-            "ingredients": food.ingredients or "",
-            "category": category,
-            "portions": portions_data,
-            "nutrition_facts": nutrition_facts,
+    # Get the first portion to use for nutrition facts scaling
+    first_portion = sorted_portions[0] if sorted_portions else None
+
+    nutrition_facts = {}
+    if first_portion and first_portion.gram_weight > 0:
+        scaling_factor = first_portion.gram_weight / 100.0
+        # Calculate per-serving nutrition
+        nutrition_facts = {
+            "calories": round((food.calories_per_100g or 0) * scaling_factor),
+            "protein_grams": round((food.protein_per_100g or 0) * scaling_factor, 2),
+            "carbohydrates_grams": round(
+                (food.carbs_per_100g or 0) * scaling_factor, 2
+            ),
+            "fat_grams": round((food.fat_per_100g or 0) * scaling_factor, 2),
+            "saturated_fat_grams": round(
+                (food.saturated_fat_per_100g or 0) * scaling_factor, 2
+            ),
+            "trans_fat_grams": round(
+                (food.trans_fat_per_100g or 0) * scaling_factor, 2
+            ),
+            "cholesterol_milligrams": round(
+                (food.cholesterol_mg_per_100g or 0) * scaling_factor, 2
+            ),
+            "sodium_milligrams": round(
+                (food.sodium_mg_per_100g or 0) * scaling_factor, 2
+            ),
+            "fiber_grams": round((food.fiber_per_100g or 0) * scaling_factor, 2),
+            "total_sugars_grams": round(
+                (food.sugars_per_100g or 0) * scaling_factor, 2
+            ),
+            "added_sugars_grams": round(
+                (food.added_sugars_per_100g or 0) * scaling_factor, 2
+            ),
+            "vitamin_d_micrograms": round(
+                (food.vitamin_d_mcg_per_100g or 0) * scaling_factor, 2
+            ),
+            "calcium_milligrams": round(
+                (food.calcium_mg_per_100g or 0) * scaling_factor, 2
+            ),
+            "iron_milligrams": round((food.iron_mg_per_100g or 0) * scaling_factor, 2),
+            "potassium_milligrams": round(
+                (food.potassium_mg_per_100g or 0) * scaling_factor, 2
+            ),
+        }
+    else:  # Fallback for no portions or zero gram weight
+        nutrition_facts = {
+            "calories": 0,
+            "protein_grams": 0,
+            "carbohydrates_grams": 0,
+            "fat_grams": 0,
+            "saturated_fat_grams": 0,
+            "trans_fat_grams": 0,
+            "cholesterol_milligrams": 0,
+            "sodium_milligrams": 0,
+            "fiber_grams": 0,
+            "total_sugars_grams": 0,
+            "added_sugars_grams": 0,
+            "vitamin_d_micrograms": 0,
+            "calcium_milligrams": 0,
+            "iron_milligrams": 0,
+            "potassium_milligrams": 0,
         }
 
-        export_data.append(food_item)
+    category = food.food_category.description if food.food_category else ""
 
-    # Generate YAML content
-    yaml_content = yaml.dump(
-        export_data, default_flow_style=False, sort_keys=False, indent=2
-    )
+    food_item = {
+        "description": food.description,
+        "upc": food.upc or "",
+        "fdc_id": food.fdc_id or None,
+        "ingredients": food.ingredients or "",
+        "category": category,
+        "portions": portions_data,
+        "nutrition_facts": nutrition_facts,
+    }
 
-    # Create response with proper headers for download
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"my_foods_export_{timestamp}.yaml"
+    return food_item
 
-    return Response(
-        yaml_content,
-        mimetype="application/x-yaml",
-        headers={"Content-Disposition": f"attachment; filename={filename}"},
+
+def _export_my_foods(export_format):
+    """Streams the user's custom foods as a YAML list or as JSON Lines."""
+    my_foods = iter_in_batches(
+        db.select(MyFood)
+        .options(selectinload(MyFood.portions), selectinload(MyFood.food_category))
+        .filter_by(user_id=current_user.id)
+        .order_by(MyFood.id),
+        MyFood.id,
     )
+    items = (_my_food_export_data(food) for food in my_foods)
+    if export_format == "jsonl":
+        chunks = (json_line(item) for item in items)
+    else:
+        chunks = yaml_list(items)
+    return streamed_export(chunks, "my_foods_export", export_format)
 
 
 @my_foods_bp.route("/export", methods=["GET"])
 @login_required
 def export_my_foods():
-    """Export user's custom foods to YAML file."""
-    return _export_my_foods_to_yaml()
+    """Export user's custom foods to a YAML (default) or JSON Lines file."""
+    export_format = request.args.get("format", "yaml")
+    if export_format not in EXPORT_FORMATS:
+        flash("Unsupported export format.", "danger")
+        return redirect(url_for(MY_FOODS_LIST_ROUTE))
+    return _export_my_foods(export_format)
@@ -6,11 +6,13 @@ from flask import (
     url_for,
     flash,
     current_app,
-    Response,
 )
 from datetime import datetime, timezone
+import json
+import os
 import yaml
 from flask_login import login_required, current_user
+from constants import CORE_NUTRIENT_IDS
 from models import (
     db,
     Recipe,
@@ -25,9 +27,11 @@ from models import (
 from opennourish.recipes.forms import RecipeForm
 from opennourish.diary.forms import AddToLogForm
 from opennourish.my_foods.forms import PortionForm
-from sqlalchemy import func
-from sqlalchemy.orm import joinedload, selectinload, subqueryload
+from sqlalchemy import false, func, insert, or_, update
+from sqlalchemy.orm import joinedload, selectinload
 from opennourish.utils import (
+    get_usda_nutrients_map,
+    resolve_food_categories,
     calculate_nutrition_for_items,
     calculate_recipe_nutrition_per_100g,
     ensure_portion_sequence,
@@ -35,8 +39,28 @@ from opennourish.utils import (
     update_recipe_nutrition,
     prepare_undo_and_delete,
 )
+from opennourish.cache import get_usda_foods
+from opennourish.export_utils import (
+    EXPORT_BATCH_SIZE,
+    EXPORT_FORMATS,
+    dump_yaml,
+    json_line,
+    load_json_lines,
+    load_yaml,
+    read_upload_text,
+    streamed_export,
+    yaml_list,
+)
+from opennourish.job_runner import (
+    enqueue_job,
+    job_handler,
+    job_response,
+    job_result,
+    save_job_upload,
+)
 from opennourish.typst_utils import (
     generate_recipe_label_pdf,
+    generate_recipe_labels_pdf,
     generate_recipe_label_svg,
 )
 
@@ -48,39 +72,424 @@ RECIPES_LIST_ROUTE = "recipes.recipes"
 EDIT_RECIPE_ROUTE = "recipes.edit_recipe"
 PORTION_TABLE_FRAGMENT = "#portions-table"
 IMPORT_RECIPES_ROUTE = "recipes.import_recipes"
+MAX_LABELS_PER_SHEET = 500
+
+
+# Per-100g nutrition columns of recipes and My Foods, keyed like the totals
+# of calculate_nutrition_for_items
+NUTRITION_COLUMNS = {
+    "calories": "calories_per_100g",
+    "protein": "protein_per_100g",
+    "carbs": "carbs_per_100g",
+    "fat": "fat_per_100g",
+    "saturated_fat": "saturated_fat_per_100g",
+    "trans_fat": "trans_fat_per_100g",
+    "cholesterol": "cholesterol_mg_per_100g",
+    "sodium": "sodium_mg_per_100g",
+    "fiber": "fiber_per_100g",
+    "sugars": "sugars_per_100g",
+    "vitamin_d": "vitamin_d_mcg_per_100g",
+    "calcium": "calcium_mg_per_100g",
+    "iron": "iron_mg_per_100g",
+    "potassium": "potassium_mg_per_100g",
+}
+PORTION_MATCH_FIELDS = (
+    "amount",
+    "measure_unit_description",
+    "portion_description",
+    "modifier",
+    "gram_weight",
+)
 
 
-def _get_or_create_food_category(category_name, user_id, food_description):
-    if not category_name or category_name.lower() == food_description.lower():
+def _bundle_category(category_name, description):
+    """The category name of a bundle item, None if it just repeats the name."""
+    if not category_name or category_name.lower() == description.lower():
         return None
-    category_name = category_name.strip()
-    # Try to find user-specific category first
-    category = FoodCategory.query.filter(
-        func.lower(FoodCategory.description) == func.lower(category_name),
-        FoodCategory.user_id == user_id,
-    ).first()
-    if category:
-        return category
-    # Try to find global category
-    category = FoodCategory.query.filter(
-        func.lower(FoodCategory.description) == func.lower(category_name),
-        FoodCategory.user_id.is_(None),
-    ).first()
-    if category:
-        return category
-    # Create new user-specific category
-    new_category = FoodCategory(description=category_name, user_id=user_id)
-    db.session.add(new_category)
-    db.session.flush()
-    return new_category
-
-
-def _process_recipe_yaml_import(yaml_stream):
+    return category_name.strip()
+
+
+def _recipe_import_levels(recipes_by_name):
+    """
+    Sorts the new recipes of a bundle, {lowercase name: recipe data}, into
+    topological levels: lists of names whose bundle recipe ingredients are
+    all in earlier levels. Recipes on a dependency cycle form the last level.
+    """
+    dependencies = {}
+    for name, recipe_data in recipes_by_name.items():
+        dependencies[name] = {
+            str(ing_data.get("identifier")).lower()
+            for ing_data in recipe_data.get("ingredients", [])
+            if ing_data.get("type") == "recipe"
+        } & recipes_by_name.keys() - {name}
+
+    levels = []
+    placed = set()
+    while dependencies:
+        level = [name for name, uses in dependencies.items() if uses <= placed]
+        if not level:
+            current_app.logger.warning(
+                f"Circular recipe dependency among imported recipes: {sorted(dependencies)}"
+            )
+            level = list(dependencies)
+        levels.append(level)
+        placed.update(level)
+        for name in level:
+            del dependencies[name]
+    return levels
+
+
+def _per_100g_nutrition(ingredients, final_weight_grams, nutrition_of):
+    """
+    Returns the per-100g column values of a recipe from its ingredient rows,
+    scaled like update_recipe_nutrition. `nutrition_of(ingredient)` returns
+    the per-100g {nutrient: amount} of an ingredient's food.
+    """
+    totals = dict.fromkeys(NUTRITION_COLUMNS, 0)
+    for ingredient in ingredients:
+        grams = ingredient["amount_grams"] or 0
+        for key, value in nutrition_of(ingredient).items():
+            totals[key] += value * grams / 100.0
+    total_grams = (
+        final_weight_grams
+        if final_weight_grams and final_weight_grams > 0
+        else sum(ing["amount_grams"] or 0 for ing in ingredients)
+    )
+    scaling_factor = 100.0 / total_grams if total_grams > 0 else 0
+    return {key: totals[key] * scaling_factor for key in NUTRITION_COLUMNS}
+
+
+def _bulk_insert(model):
+    """
+    An ORM bulk insert that writes None values as NULL. By default the rows
+    are grouped by the keys that aren't None, so rows mixing optional columns
+    would be inserted in many small batches.
+    """
+    return insert(model).execution_options(render_nulls=True)
+
+
+def _import_recipe_bundle(dependent_foods, recipes_to_import, user_id):
+    """
+    Imports the `dependent_my_foods` and `recipes` of a recipe bundle for a
+    user and returns (number of recipes added, number of foods added).
+
+    Foods and recipes whose names the user already has are skipped, as are
+    the ingredients of skipped recipes. References are resolved against name
+    maps loaded once, the foods, recipes, portions and ingredients are each
+    written with one bulk insert, and the nutrition of every new recipe is
+    then computed once, level by level up the dependency graph, from the
+    per-100g values of its ingredients. The session is not committed here.
+    """
+    my_food_ids = {
+        description.lower(): food_id
+        for description, food_id in db.session.execute(
+            db.select(MyFood.description, MyFood.id).filter_by(user_id=user_id)
+        )
+        if description is not None
+    }
+    recipe_ids = {
+        name.lower(): recipe_id
+        for name, recipe_id in db.session.execute(
+            db.select(Recipe.name, Recipe.id).filter_by(user_id=user_id)
+        )
+        if name is not None
+    }
+
+    new_foods = {}
+    for food_item in dependent_foods:
+        description = food_item.get("description")
+        if not description or description.lower() in my_food_ids:
+            continue
+        if description.lower() not in new_foods:
+            new_foods[description.lower()] = food_item
+    new_recipes = {}
+    for recipe_data in recipes_to_import:
+        name = recipe_data.get("name")
+        if not name or name.lower() in recipe_ids:
+            continue
+        if name.lower() not in new_recipes:
+            new_recipes[name.lower()] = recipe_data
+
+    category_ids = resolve_food_categories(
+        [
+            category
+            for items, name_key in ((new_foods, "description"), (new_recipes, "name"))
+            for item in items.values()
+            if (category := _bundle_category(item.get("category"), item[name_key]))
+        ],
+        user_id,
+    )
+
+    def category_id(item, name_key):
+        category = _bundle_category(item.get("category"), item[name_key])
+        return category_ids[category.lower()] if category else None
+
+    # --- Foods and recipes ---
+    food_rows = []
+    for food_item in new_foods.values():
+        nutrition_facts = food_item.get("nutrition_facts", {})
+        first_portion = food_item["portions"][0] if "portions" in food_item else {}
+        gram_weight = first_portion.get("gram_weight", 0)
+        factor = 100.0 / gram_weight if gram_weight > 0 else 0
+        food_rows.append(
+            {
+                "user_id": user_id,
+                "description": food_item["description"],
+                "food_category_id": category_id(food_item, "description"),
+                "ingredients": food_item.get("ingredients"),
+                "upc": food_item.get("upc"),
+                "is_placeholder": food_item.get("is_placeholder", False),
+                "calories_per_100g": nutrition_facts.get("calories", 0) * factor,
+                "protein_per_100g": nutrition_facts.get("protein_grams", 0) * factor,
+                "carbs_per_100g": nutrition_facts.get("carbohydrates_grams", 0)
+                * factor,
+                "fat_per_100g": nutrition_facts.get("fat_grams", 0) * factor,
+            }
+        )
+    if food_rows:
+        # Names are unique within the import, so rows are matched by name
+        for description, food_id in db.session.execute(
+            _bulk_insert(MyFood).returning(MyFood.description, MyFood.id), food_rows
+        ):
+            my_food_ids[description.lower()] = food_id
+
+    recipe_rows = [
+        {
+            "user_id": user_id,
+            "name": recipe_data["name"],
+            "servings": recipe_data.get("servings", 1),
+            "instructions": recipe_data.get("instructions"),
+            "final_weight_grams": recipe_data.get("final_weight_grams"),
+            "is_public": False,  # Always import as private
+            "food_category_id": category_id(recipe_data, "name"),
+        }
+        for recipe_data in new_recipes.values()
+    ]
+    if recipe_rows:
+        for name, recipe_id in db.session.execute(
+            _bulk_insert(Recipe).returning(Recipe.name, Recipe.id), recipe_rows
+        ):
+            recipe_ids[name.lower()] = recipe_id
+
+    portion_rows = [
+        {
+            "my_food_id": my_food_ids[key],
+            "recipe_id": None,
+            "amount": p_data.get("amount", 1),
+            "measure_unit_description": p_data.get("measure_unit_description"),
+            "gram_weight": p_data.get("gram_weight"),
+        }
+        for key, food_item in new_foods.items()
+        for p_data in food_item.get("portions", [])
+    ] + [
+        {
+            "my_food_id": None,
+            "recipe_id": recipe_ids[key],
+            "amount": p_data.get("amount"),
+            "measure_unit_description": p_data.get("measure_unit_description"),
+            "gram_weight": p_data.get("gram_weight"),
+        }
+        for key, recipe_data in new_recipes.items()
+        for p_data in recipe_data.get("portions", [])
+    ]
+    if portion_rows:
+        db.session.execute(_bulk_insert(UnifiedPortion), portion_rows)
+
+    # --- Ingredients ---
+    # Rows left behind for a reused recipe id aren't inserted twice
+    existing_ingredients = set(
+        db.session.execute(
+            db.select(
+                RecipeIngredient.recipe_id,
+                RecipeIngredient.fdc_id,
+                RecipeIngredient.my_food_id,
+                RecipeIngredient.recipe_id_link,
+                RecipeIngredient.amount_grams,
+            ).filter(
+                RecipeIngredient.recipe_id.in_(recipe_ids[key] for key in new_recipes)
+            )
+        ).tuples()
+    )
+    ingredients_by_recipe = {}
+    ingredient_portions = []
+    for key, recipe_data in new_recipes.items():
+        ingredients = ingredients_by_recipe[key] = {}
+        for ing_data in recipe_data.get("ingredients", []):
+            ing_type = ing_data.get("type")
+            identifier = ing_data.get("identifier")
+            ingredient = {
+                "recipe_id": recipe_ids[key],
+                "fdc_id": None,
+                "my_food_id": None,
+                "recipe_id_link": None,
+                "amount_grams": ing_data.get("amount_grams"),
+            }
+            owner = {"fdc_id": None, "my_food_id": None, "recipe_id": None}
+            if ing_type == "usda":
+                ingredient["fdc_id"] = owner["fdc_id"] = identifier
+            elif ing_type == "my_food":
+                food_id = my_food_ids.get(str(identifier).lower())
+                ingredient["my_food_id"] = owner["my_food_id"] = food_id
+            elif ing_type == "recipe":
+                linked_id = recipe_ids.get(str(identifier).lower())
+                ingredient["recipe_id_link"] = owner["recipe_id"] = linked_id
+
+            # Identical ingredients of a recipe are only added once
+            ingredient_key = tuple(ingredient.values())
+            if ingredient_key in ingredients:
+                continue
+            ingredients[ingredient_key] = ingredient
+            portion_data = ing_data.get("portion")
+            if portion_data:
+                portion = owner | {
+                    field: portion_data.get(field) for field in PORTION_MATCH_FIELDS
+                }
+                ingredient_portions.append((ingredient, tuple(portion.values())))
+
+    # Ingredient portions reuse an identical portion of the food if there is
+    # one, so the existing portions of the referenced foods are read at once
+    portion_ids = {}
+    if ingredient_portions:
+        owners = {"fdc_id": set(), "my_food_id": set(), "recipe_id": set()}
+        for _, portion_key in ingredient_portions:
+            for column, owner_id in zip(owners, portion_key):
+                if owner_id is not None:
+                    owners[column].add(owner_id)
+        match_columns = [
+            getattr(UnifiedPortion, column)
+            for column in (*owners, *PORTION_MATCH_FIELDS)
+        ]
+        existing_portions = db.session.execute(
+            db.select(UnifiedPortion.id, *match_columns)
+            .filter(
+                or_(
+                    *(
+                        getattr(UnifiedPortion, column).in_(ids)
+                        for column, ids in owners.items()
+                        if ids
+                    ),
+                    false(),
+                )
+            )
+            .order_by(UnifiedPortion.id.desc())
+        )
+        for portion_id, *portion_key in existing_portions:
+            portion_ids[tuple(portion_key)] = portion_id
+
+        missing = {
+            portion_key: dict(zip((*owners, *PORTION_MATCH_FIELDS), portion_key))
+            for _, portion_key in ingredient_portions
+            if portion_key not in portion_ids
+        }
+        if missing:
+            for portion_id, *portion_key in db.session.execute(
+                _bulk_insert(UnifiedPortion).returning(
+                    UnifiedPortion.id, *match_columns
+                ),
+                list(missing.values()),
+            ):
+                portion_ids[tuple(portion_key)] = portion_id
+
+    for ingredient, portion_key in ingredient_portions:
+        ingredient["portion_id_fk"] = portion_ids[portion_key]
+    ingredient_rows = [
+        {"portion_id_fk": None} | ingredient
+        for ingredients in ingredients_by_recipe.values()
+        for ingredient_key, ingredient in ingredients.items()
+        if ingredient_key not in existing_ingredients
+    ]
+    if ingredient_rows:
+        db.session.execute(_bulk_insert(RecipeIngredient), ingredient_rows)
+
+    # --- Nutrition, bottom-up ---
+    all_ingredients = [
+        ingredient
+        for ingredients in ingredients_by_recipe.values()
+        for ingredient in ingredients.values()
+    ]
+    usda_nutrients = get_usda_nutrients_map(
+        {row["fdc_id"] for row in all_ingredients if row["fdc_id"]}
+    )
+    columns = [getattr(MyFood, column) for column in NUTRITION_COLUMNS.values()]
+    food_nutrition = {
+        food_id: {key: value or 0 for key, value in zip(NUTRITION_COLUMNS, values)}
+        for food_id, *values in db.session.execute(
+            db.select(MyFood.id, *columns).filter(
+                MyFood.id.in_({row["my_food_id"] for row in all_ingredients})
+            )
+        )
+    }
+    recipe_columns = [getattr(Recipe, column) for column in NUTRITION_COLUMNS.values()]
+    new_recipe_ids = {recipe_ids[key] for key in new_recipes}
+    recipe_nutrition = {
+        recipe_id: {key: value or 0 for key, value in zip(NUTRITION_COLUMNS, values)}
+        for recipe_id, *values in db.session.execute(
+            db.select(Recipe.id, *recipe_columns).filter(
+                Recipe.id.in_(
+                    {row["recipe_id_link"] for row in all_ingredients} - new_recipe_ids
+                )
+            )
+        )
+    }
+
+    def nutrition_of(ingredient):
+        if ingredient["fdc_id"]:
+            nutrients = usda_nutrients.get(ingredient["fdc_id"], {})
+            return {
+                key: nutrients[nutrient_id]
+                for key, nutrient_id in CORE_NUTRIENT_IDS.items()
+                if nutrient_id in nutrients
+            }
+        if ingredient["my_food_id"]:
+            return food_nutrition.get(ingredient["my_food_id"], {})
+        if ingredient["recipe_id_link"]:
+            # On a dependency cycle, recipes not computed yet count as empty
+            return recipe_nutrition.get(ingredient["recipe_id_link"], {})
+        return {}
+
+    nutrition_rows = []
+    for level in _recipe_import_levels(new_recipes):
+        for key in level:
+            nutrition = _per_100g_nutrition(
+                ingredients_by_recipe[key].values(),
+                new_recipes[key].get("final_weight_grams"),
+                nutrition_of,
+            )
+            recipe_nutrition[recipe_ids[key]] = nutrition
+            nutrition_rows.append(
+                {"id": recipe_ids[key]}
+                | {NUTRITION_COLUMNS[k]: value for k, value in nutrition.items()}
+            )
+    if nutrition_rows:
+        db.session.execute(update(Recipe), nutrition_rows)
+
+    return len(new_recipes), len(new_foods)
+
+
+@job_handler("recipe_import")
+def _run_recipe_import(job):
+    """Imports the recipe YAML or JSON Lines upload of a job's payload."""
+    path = job.payload["path"]
+    try:
+        with open(path, "rb") as file:
+            text = read_upload_text(file)
+    except UnicodeDecodeError:
+        return job_result(
+            IMPORT_RECIPES_ROUTE, [("danger", "The file must be UTF-8 encoded text.")]
+        )
+    finally:
+        os.remove(path)
+    user_id = job.user_id
+    messages = []
     try:
-        data = yaml.safe_load(yaml_stream)
+        if job.payload.get("json_lines"):
+            data = _load_recipe_json_lines(text)
+        else:
+            data = load_yaml(text)
         if not data:
-            flash("No data found in the YAML content.", "info")
-            return redirect(url_for(IMPORT_RECIPES_ROUTE))
+            return job_result(
+                IMPORT_RECIPES_ROUTE, [("info", "No data found in the YAML content.")]
+            )
 
         # Mode detection
         is_simple_import = "ingredients" in data and isinstance(
@@ -92,11 +501,13 @@ def _process_recipe_yaml_import(yaml_stream):
             # --- Simple Import Workflow ---
             name = data.get("name")
             if not name:
-                flash("Simple import requires a 'name' for the recipe.", "danger")
-                return redirect(url_for(IMPORT_RECIPES_ROUTE))
+                return job_result(
+                    IMPORT_RECIPES_ROUTE,
+                    [("danger", "Simple import requires a 'name' for the recipe.")],
+                )
 
             new_recipe = Recipe(
-                user_id=current_user.id,
+                user_id=user_id,
                 name=name,
                 servings=data.get("servings", 1),
                 instructions=data.get("instructions", ""),
@@ -108,19 +519,21 @@ def _process_recipe_yaml_import(yaml_stream):
             for ingredient_data in data["ingredients"]:
                 # Ensure ingredient_data is a dictionary
                 if not isinstance(ingredient_data, dict):
-                    flash(
-                        f"Skipping invalid ingredient entry: {ingredient_data}",
-                        "warning",
+                    messages.append(
+                        (
+                            "warning",
+                            f"Skipping invalid ingredient entry: {ingredient_data}",
+                        )
                     )
                     continue
 
                 ingredient_name = ingredient_data.get("name")
                 if not ingredient_name:
-                    flash("Skipping ingredient with no name.", "warning")
+                    messages.append(("warning", "Skipping ingredient with no name."))
                     continue
 
                 placeholder_food = MyFood(
-                    user_id=current_user.id,
+                    user_id=user_id,
                     description=ingredient_name,
                     is_placeholder=True,
                 )
@@ -149,11 +562,13 @@ def _process_recipe_yaml_import(yaml_stream):
                 db.session.add(ingredient)
 
             db.session.commit()
-            flash(
-                "Recipe imported! Please match the ingredients to real foods.",
-                "success",
+            messages.append(
+                (
+                    "success",
+                    "Recipe imported! Please match the ingredients to real foods.",
+                )
             )
-            return redirect(url_for(EDIT_RECIPE_ROUTE, recipe_id=new_recipe.id))
+            return job_result(EDIT_RECIPE_ROUTE, messages, recipe_id=new_recipe.id)
 
         elif is_complex_import:
             # --- Complex Import Workflow ---
@@ -163,231 +578,59 @@ def _process_recipe_yaml_import(yaml_stream):
             if not isinstance(dependent_foods, list) or not isinstance(
                 recipes_to_import, list
             ):
-                flash(
-                    "Complex import must contain 'dependent_my_foods' and 'recipes' as lists.",
-                    "danger",
-                )
-                return redirect(url_for(IMPORT_RECIPES_ROUTE))
-
-            # ... (rest of the complex import logic remains the same)
-            # --- Pass 1: Process Dependent MyFoods ---
-            existing_food_descriptions = {
-                f.description.lower()
-                for f in MyFood.query.filter_by(user_id=current_user.id).all()
-            }
-            my_foods_map = {f.lower(): f for f in existing_food_descriptions}
-            new_foods_count = 0
-
-            for food_item in dependent_foods:
-                description = food_item.get("description")
-                if not description or description.lower() in existing_food_descriptions:
-                    continue  # Skip if no description or already exists
-
-                # Create new MyFood
-                category = _get_or_create_food_category(
-                    food_item.get("category"), current_user.id, description
-                )
-                nutrition_facts = food_item.get("nutrition_facts", {})
-                first_portion = (
-                    food_item["portions"][0] if "portions" in food_item else {}
-                )
-                gram_weight = first_portion.get("gram_weight", 0)
-                factor = 100.0 / gram_weight if gram_weight > 0 else 0
-
-                new_food = MyFood(
-                    user_id=current_user.id,
-                    description=description,
-                    food_category=category,
-                    ingredients=food_item.get("ingredients"),
-                    upc=food_item.get("upc"),
-                    is_placeholder=food_item.get("is_placeholder", False),
-                    calories_per_100g=nutrition_facts.get("calories", 0) * factor,
-                    protein_per_100g=nutrition_facts.get("protein_grams", 0) * factor,
-                    carbs_per_100g=nutrition_facts.get("carbohydrates_grams", 0)
-                    * factor,
-                    fat_per_100g=nutrition_facts.get("fat_grams", 0) * factor,
-                )
-                db.session.add(new_food)
-                db.session.flush()
-
-                for p_data in food_item.get("portions", []):
-                    portion = UnifiedPortion(
-                        my_food_id=new_food.id,
-                        amount=p_data.get("amount", 1),
-                        measure_unit_description=p_data.get("measure_unit_description"),
-                        gram_weight=p_data.get("gram_weight"),
-                    )
-                    db.session.add(portion)
-
-                existing_food_descriptions.add(description.lower())
-                my_foods_map[description.lower()] = new_food
-                new_foods_count += 1
-
-            # --- Pass 2: Process Recipes ---
-            existing_recipe_names = {
-                r.name.lower()
-                for r in Recipe.query.filter_by(user_id=current_user.id).all()
-            }
-            recipes_map = {}
-            new_recipes_count = 0
-
-            for recipe_data in recipes_to_import:
-                name = recipe_data.get("name")
-                if not name or name.lower() in existing_recipe_names:
-                    continue
-
-                category = _get_or_create_food_category(
-                    recipe_data.get("category"), current_user.id, name
-                )
-
-                new_recipe = Recipe(
-                    user_id=current_user.id,
-                    name=name,
-                    servings=recipe_data.get("servings", 1),
-                    instructions=recipe_data.get("instructions"),
-                    final_weight_grams=recipe_data.get("final_weight_grams"),
-                    is_public=False,  # Always import as private
-                    food_category=category,
-                )
-                db.session.add(new_recipe)
-                db.session.flush()
-
-                for portion_data in recipe_data.get("portions", []):
-                    portion = UnifiedPortion(
-                        recipe_id=new_recipe.id,
-                        amount=portion_data.get("amount"),
-                        measure_unit_description=portion_data.get(
-                            "measure_unit_description"
-                        ),
-                        gram_weight=portion_data.get("gram_weight"),
-                    )
-                    db.session.add(portion)
-
-                recipes_map[name.lower()] = new_recipe
-                existing_recipe_names.add(name.lower())
-                new_recipes_count += 1
-
-                # --- Pass 3: Link Ingredients ---
-            for recipe_data in recipes_to_import:
-                recipe_name = recipe_data.get("name")
-                if not recipe_name or recipe_name.lower() not in recipes_map:
-                    continue
-
-                recipe_obj = recipes_map[recipe_name.lower()]
-                for ing_data in recipe_data.get("ingredients", []):
-                    ing_type = ing_data.get("type")
-                    identifier = ing_data.get("identifier")
-                    amount_grams = ing_data.get("amount_grams")
-                    portion_data = ing_data.get("portion")
-
-                    # Initialize ingredient data
-                    ingredient_data = {
-                        "recipe_id": recipe_obj.id,
-                        "amount_grams": amount_grams,
-                    }
-
-                    # This will hold the query filter for finding the portion
-                    portion_filter = {}
-                    # This will hold the attributes for creating a new portion
-                    new_portion_attrs = {}
-
-                    if ing_type == "usda":
-                        ingredient_data["fdc_id"] = identifier
-                        portion_filter["fdc_id"] = identifier
-                        new_portion_attrs["fdc_id"] = identifier
-                    elif ing_type == "my_food":
-                        food_obj = MyFood.query.filter(
-                            func.lower(MyFood.description) == identifier.lower(),
-                            MyFood.user_id == current_user.id,
-                        ).first()
-                        if food_obj:
-                            ingredient_data["my_food_id"] = food_obj.id
-                            portion_filter["my_food_id"] = food_obj.id
-                            new_portion_attrs["my_food_id"] = food_obj.id
-                    elif ing_type == "recipe":
-                        food_obj = Recipe.query.filter(
-                            func.lower(Recipe.name) == identifier.lower(),
-                            Recipe.user_id == current_user.id,
-                        ).first()
-                        if food_obj:
-                            ingredient_data["recipe_id_link"] = food_obj.id
-                            portion_filter["recipe_id"] = food_obj.id
-                            new_portion_attrs["recipe_id"] = food_obj.id
-
-                    # If we have portion data from the YAML, find or create the portion
-                    if portion_data:
-                        # Add portion details to the filter
-                        portion_filter["amount"] = portion_data.get("amount")
-                        portion_filter["measure_unit_description"] = portion_data.get(
-                            "measure_unit_description"
-                        )
-                        portion_filter["portion_description"] = portion_data.get(
-                            "portion_description"
+                return job_result(
+                    IMPORT_RECIPES_ROUTE,
+                    [
+                        (
+                            "danger",
+                            "Complex import must contain 'dependent_my_foods' and 'recipes' as lists.",
                         )
-                        portion_filter["modifier"] = portion_data.get("modifier")
-                        portion_filter["gram_weight"] = portion_data.get("gram_weight")
-
-                        # Try to find an existing portion that matches exactly
-                        existing_portion = UnifiedPortion.query.filter_by(
-                            **portion_filter
-                        ).first()
-
-                        if existing_portion:
-                            ingredient_data["portion_id_fk"] = existing_portion.id
-                        else:
-                            # Create a new portion
-                            new_portion_attrs.update(
-                                {
-                                    "amount": portion_data.get("amount"),
-                                    "measure_unit_description": portion_data.get(
-                                        "measure_unit_description"
-                                    ),
-                                    "portion_description": portion_data.get(
-                                        "portion_description"
-                                    ),
-                                    "modifier": portion_data.get("modifier"),
-                                    "gram_weight": portion_data.get("gram_weight"),
-                                }
-                            )
-                            new_portion = UnifiedPortion(**new_portion_attrs)
-                            db.session.add(new_portion)
-                            db.session.flush()
-                            ingredient_data["portion_id_fk"] = new_portion.id
-
-                    # Check if an identical ingredient already exists to avoid duplicates
-                    # This check is crucial for re-imports.
-                    query_params = ingredient_data.copy()
-                    # The FK for the portion might be different on re-import, so we don't check it.
-                    query_params.pop("portion_id_fk", None)
-                    existing_ingredient = RecipeIngredient.query.filter_by(
-                        **query_params
-                    ).first()
-                    if existing_ingredient:
-                        continue
-
-                    ingredient = RecipeIngredient(**ingredient_data)
-                    db.session.add(ingredient)
-
-                update_recipe_nutrition(recipe_obj)
+                    ],
+                )
 
+            new_recipes_count, new_foods_count = _import_recipe_bundle(
+                dependent_foods, recipes_to_import, user_id
+            )
             db.session.commit()
-            flash(
-                f"Import successful! Added {new_recipes_count} new recipes and {new_foods_count} new foods.",
-                "success",
+            messages.append(
+                (
+                    "success",
+                    f"Import successful! Added {new_recipes_count} new recipes and {new_foods_count} new foods.",
+                )
             )
-            return redirect(url_for(RECIPES_LIST_ROUTE))
+            return job_result(RECIPES_LIST_ROUTE, messages)
         else:
-            flash("Invalid YAML format. Could not determine import type.", "danger")
-            return redirect(url_for(IMPORT_RECIPES_ROUTE))
+            return job_result(
+                IMPORT_RECIPES_ROUTE,
+                [("danger", "Invalid YAML format. Could not determine import type.")],
+            )
 
     except yaml.YAMLError as e:
-        flash(f"Error parsing YAML file: {e}", "danger")
-        return redirect(url_for(IMPORT_RECIPES_ROUTE))
+        return job_result(
+            IMPORT_RECIPES_ROUTE, [("danger", f"Error parsing YAML file: {e}")]
+        )
+    except json.JSONDecodeError as e:
+        return job_result(
+            IMPORT_RECIPES_ROUTE, [("danger", f"Error parsing JSON Lines file: {e}")]
+        )
     except Exception as e:
         db.session.rollback()
-        flash(f"An unexpected error occurred during import: {e}", "danger")
         current_app.logger.error(f"Recipe import failed: {e}")
-        return redirect(url_for(IMPORT_RECIPES_ROUTE))
+        return job_result(
+            IMPORT_RECIPES_ROUTE,
+            [("danger", f"An unexpected error occurred during import: {e}")],
+        )
+
+
+def _start_recipe_import(source, json_lines=False):
+    """Starts a job importing `source`, an uploaded file or text."""
+    path = save_job_upload(source, ".jsonl" if json_lines else ".yaml")
+    job = enqueue_job(
+        "recipe_import",
+        {"path": path, "json_lines": json_lines},
+        user_id=current_user.id,
+    )
+    return job_response(job)
 
 
 @recipes_bp.route("/import", methods=["GET", "POST"])
@@ -399,11 +642,16 @@ def import_recipes():
             if file and (
                 file.filename.endswith(".yaml") or file.filename.endswith(".yml")
             ):
-                return _process_recipe_yaml_import(file.stream)
+                return _start_recipe_import(file)
+            elif file and file.filename.endswith(".jsonl"):
+                return _start_recipe_import(file, json_lines=True)
             else:
-                flash("Invalid file type. Please upload a .yaml file.", "danger")
+                flash(
+                    "Invalid file type. Please upload a .yaml or .jsonl file.",
+                    "danger",
+                )
         elif "yaml_text" in request.form and request.form["yaml_text"].strip():
-            return _process_recipe_yaml_import(request.form["yaml_text"])
+            return _start_recipe_import(request.form["yaml_text"])
         else:
             flash("No file or text provided.", "info")
         return redirect(url_for(IMPORT_RECIPES_ROUTE))
@@ -411,145 +659,222 @@ def import_recipes():
     return render_template("recipes/import_recipes.html")
 
 
-@recipes_bp.route("/export", methods=["GET"])
-@login_required
-def export_recipes():
-    user_recipes = (
-        Recipe.query.options(
-            subqueryload(Recipe.ingredients).subqueryload(RecipeIngredient.my_food),
-            subqueryload(Recipe.ingredients).subqueryload(
-                RecipeIngredient.linked_recipe
-            ),
-            subqueryload(Recipe.portions),
-            subqueryload(Recipe.food_category),
-        )
-        .filter_by(user_id=current_user.id)
-        .all()
-    )
-
-    dependent_my_foods = {}
-    recipes_to_export_data = []
+def _recipe_export_data(recipe, dependent_my_food_ids, portions, usda_foods, user_id):
+    """
+    Returns a recipe as an item of the recipe export, adding the ids of the
+    MyFoods of user `user_id` its ingredients use to `dependent_my_food_ids`.
+    `portions` and `usda_foods` map the ingredients' portion ids and fdc_ids
+    to their rows.
+    """
+    ingredients_data = []
+    for ing in recipe.ingredients:
+        ing_info = {
+            "amount_grams": ing.amount_grams,
+        }
+        portion = portions.get(ing.portion_id_fk)
+        if portion:
+            ing_info["portion"] = {
+                "amount": portion.amount,
+                "measure_unit_description": portion.measure_unit_description,
+                "portion_description": portion.portion_description,
+                "modifier": portion.modifier,
+                "gram_weight": portion.gram_weight,
+            }
 
-    # Use a set to keep track of recipes to include, ensuring no duplicates
-    recipes_to_process = set(user_recipes)
-    processed_recipe_ids = set()
+        if ing.fdc_id:
+            ing_info["type"] = "usda"
+            ing_info["identifier"] = ing.fdc_id
+            if ing.fdc_id in usda_foods:
+                # For readers of the file; the import goes by the fdc_id
+                ing_info["description"] = usda_foods[ing.fdc_id].description
+        elif ing.my_food_id:
+            ing_info["type"] = "my_food"
+            ing_info["identifier"] = ing.my_food.description
+            # Other users' MyFoods are not exported
+            if ing.my_food.user_id == user_id:
+                dependent_my_food_ids.add(ing.my_food_id)
+        elif ing.recipe_id_link:
+            ing_info["type"] = "recipe"
+            ing_info["identifier"] = ing.linked_recipe.name
+
+        ingredients_data.append(ing_info)
+
+    portions_data = [
+        {
+            "amount": p.amount,
+            "measure_unit_description": p.measure_unit_description,
+            "gram_weight": p.gram_weight,
+        }
+        for p in recipe.portions
+    ]
 
-    while recipes_to_process:
-        recipe = recipes_to_process.pop()
-        if recipe.id in processed_recipe_ids:
-            continue
-        processed_recipe_ids.add(recipe.id)
+    return {
+        "name": recipe.name,
+        "servings": recipe.servings,
+        "instructions": recipe.instructions,
+        "final_weight_grams": recipe.final_weight_grams,
+        "category": recipe.food_category.description if recipe.food_category else "",
+        "is_public": recipe.is_public,
+        "portions": portions_data,
+        "ingredients": ingredients_data,
+    }
 
-        ingredients_data = []
-        for ing in recipe.ingredients:
-            ing_info = {
-                "amount_grams": ing.amount_grams,
-            }
-            portion = db.session.get(UnifiedPortion, ing.portion_id_fk)
-            if portion:
-                ing_info["portion"] = {
-                    "amount": portion.amount,
-                    "measure_unit_description": portion.measure_unit_description,
-                    "portion_description": portion.portion_description,
-                    "modifier": portion.modifier,
-                    "gram_weight": portion.gram_weight,
-                }
 
-            if ing.fdc_id:
-                ing_info["type"] = "usda"
-                ing_info["identifier"] = ing.fdc_id
-            elif ing.my_food_id:
-                ing_info["type"] = "my_food"
-                ing_info["identifier"] = ing.my_food.description
-                if ing.my_food.id not in dependent_my_foods:
-                    dependent_my_foods[ing.my_food.id] = ing.my_food
-            elif ing.recipe_id_link:
-                ing_info["type"] = "recipe"
-                ing_info["identifier"] = ing.linked_recipe.name
-                # If the linked recipe is also a user recipe, ensure it's processed
-                if (
-                    ing.linked_recipe.user_id == current_user.id
-                    and ing.linked_recipe.id not in processed_recipe_ids
-                ):
-                    recipes_to_process.add(ing.linked_recipe)
-
-            ingredients_data.append(ing_info)
-
-        portions_data = [
-            {
-                "amount": p.amount,
-                "measure_unit_description": p.measure_unit_description,
-                "gram_weight": p.gram_weight,
-            }
-            for p in recipe.portions
-        ]
-
-        recipe_data = {
-            "name": recipe.name,
-            "servings": recipe.servings,
-            "instructions": recipe.instructions,
-            "final_weight_grams": recipe.final_weight_grams,
-            "category": recipe.food_category.description
-            if recipe.food_category
-            else "",
-            "is_public": recipe.is_public,
-            "portions": portions_data,
-            "ingredients": ingredients_data,
+def _dependent_my_food_export_data(food):
+    food_portions_data = [
+        {
+            "amount": p.amount,
+            "measure_unit_description": p.measure_unit_description or "",
+            "gram_weight": p.gram_weight,
+        }
+        for p in food.portions
+    ]
+    first_portion = food.portions[0] if food.portions else None
+    nutrition_facts = {}
+    if first_portion and first_portion.gram_weight > 0:
+        scaling_factor = first_portion.gram_weight / 100.0
+        nutrition_facts = {
+            "calories": (food.calories_per_100g or 0) * scaling_factor,
+            "protein_grams": (food.protein_per_100g or 0) * scaling_factor,
+            "carbohydrates_grams": (food.carbs_per_100g or 0) * scaling_factor,
+            "fat_grams": (food.fat_per_100g or 0) * scaling_factor,
         }
-        recipes_to_export_data.append(recipe_data)
-
-    # Format dependent MyFoods for export
-    my_foods_export_data = []
-    for food in dependent_my_foods.values():
-        food_portions_data = [
-            {
-                "amount": p.amount,
-                "measure_unit_description": p.measure_unit_description or "",
-                "gram_weight": p.gram_weight,
-            }
-            for p in food.portions
-        ]
-        first_portion = food.portions[0] if food.portions else None
-        nutrition_facts = {}
-        if first_portion and first_portion.gram_weight > 0:
-            scaling_factor = first_portion.gram_weight / 100.0
-            nutrition_facts = {
-                "calories": (food.calories_per_100g or 0) * scaling_factor,
-                "protein_grams": (food.protein_per_100g or 0) * scaling_factor,
-                "carbohydrates_grams": (food.carbs_per_100g or 0) * scaling_factor,
-                "fat_grams": (food.fat_per_100g or 0) * scaling_factor,
-            }
 
-        food_data_to_export = {
-            "description": food.description,
-            "category": food.food_category.description if food.food_category else "",
-            "ingredients": food.ingredients or "",
-            "upc": food.upc or "",
-            "portions": food_portions_data,
-            "nutrition_facts": nutrition_facts,
+    food_data_to_export = {
+        "description": food.description,
+        "category": food.food_category.description if food.food_category else "",
+        "ingredients": food.ingredients or "",
+        "upc": food.upc or "",
+        "portions": food_portions_data,
+        "nutrition_facts": nutrition_facts,
+    }
+    if food.is_placeholder:
+        food_data_to_export["is_placeholder"] = True
+    return food_data_to_export
+
+
+def _exported_recipe_ids(user_id):
+    """
+    Selects the ids of the user's recipes and of every recipe they use,
+    directly or nested, that is theirs or public, so that the export contains
+    what its recipe ingredients refer to without other users' private recipes.
+    """
+    closure = (
+        db.select(Recipe.id.label("id"))
+        .filter_by(user_id=user_id)
+        .cte("exported_recipes", recursive=True)
+    )
+    closure = closure.union(
+        db.select(Recipe.id)
+        .join(RecipeIngredient, RecipeIngredient.recipe_id_link == Recipe.id)
+        .join(closure, RecipeIngredient.recipe_id == closure.c.id)
+        .filter((Recipe.user_id == user_id) | Recipe.is_public)
+    )
+    return db.select(closure.c.id)
+
+
+def _iter_recipes_for_export(user_id):
+    """
+    Yields (recipe, portions, usda_foods) for the exported recipes in id
+    order. The recipes are loaded EXPORT_BATCH_SIZE at a time, each batch with
+    its ingredients' portions and USDA foods, so the number of queries grows
+    with the number of batches and not with the number of recipes.
+    """
+    recipe_ids = db.session.scalars(_exported_recipe_ids(user_id).order_by("id")).all()
+    for start in range(0, len(recipe_ids), EXPORT_BATCH_SIZE):
+        recipes = db.session.scalars(
+            db.select(Recipe)
+            .options(
+                selectinload(Recipe.ingredients).selectinload(RecipeIngredient.my_food),
+                selectinload(Recipe.ingredients).selectinload(
+                    RecipeIngredient.linked_recipe
+                ),
+                selectinload(Recipe.portions),
+                selectinload(Recipe.food_category),
+            )
+            .filter(Recipe.id.in_(recipe_ids[start : start + EXPORT_BATCH_SIZE]))
+            .order_by(Recipe.id)
+        ).all()
+        ingredients = [ing for recipe in recipes for ing in recipe.ingredients]
+        portion_ids = {ing.portion_id_fk for ing in ingredients if ing.portion_id_fk}
+        portions = {
+            portion.id: portion
+            for portion in db.session.scalars(
+                db.select(UnifiedPortion).filter(UnifiedPortion.id.in_(portion_ids))
+            )
         }
-        if food.is_placeholder:
-            food_data_to_export["is_placeholder"] = True
-        my_foods_export_data.append(food_data_to_export)
+        usda_foods = get_usda_foods({ing.fdc_id for ing in ingredients if ing.fdc_id})
+        for recipe in recipes:
+            yield recipe, portions, usda_foods
+
+
+def _stream_recipe_export(export_format):
+    """
+    Yields the user's recipes and the recipes they use, then the MyFoods they
+    depend on, as one YAML document or as JSON Lines. The importer doesn't
+    depend on the order of the two sections, so the dependencies can be
+    collected while streaming.
+    """
+    dependent_my_food_ids = set()
+    recipe_items = (
+        _recipe_export_data(
+            recipe, dependent_my_food_ids, portions, usda_foods, current_user.id
+        )
+        for recipe, portions, usda_foods in _iter_recipes_for_export(current_user.id)
+    )
 
-    # Final YAML structure
-    export_payload = {
+    def dependent_my_food_items():
+        # Runs once all recipes have been written
+        food_ids = sorted(dependent_my_food_ids)
+        for start in range(0, len(food_ids), EXPORT_BATCH_SIZE):
+            foods = (
+                MyFood.query.options(
+                    selectinload(MyFood.portions), selectinload(MyFood.food_category)
+                )
+                .filter(MyFood.id.in_(food_ids[start : start + EXPORT_BATCH_SIZE]))
+                .order_by(MyFood.id)
+            )
+            for food in foods:
+                yield _dependent_my_food_export_data(food)
+
+    header = {
         "format_version": 1.0,
         "exported_on": datetime.now(timezone.utc).isoformat(),
-        "dependent_my_foods": my_foods_export_data,
-        "recipes": recipes_to_export_data,
     }
+    if export_format == "jsonl":
+        yield json_line(header)
+        for item in recipe_items:
+            yield json_line({"recipe": item})
+        for item in dependent_my_food_items():
+            yield json_line({"dependent_my_food": item})
+    else:
+        yield dump_yaml(header)
+        yield from yaml_list(recipe_items, "recipes")
+        yield from yaml_list(dependent_my_food_items(), "dependent_my_foods")
+
+
+def _load_recipe_json_lines(stream):
+    """Reassembles a JSON Lines recipe export into the YAML export's structure."""
+    data = {"dependent_my_foods": [], "recipes": []}
+    for record in load_json_lines(stream):
+        if "recipe" in record:
+            data["recipes"].append(record["recipe"])
+        elif "dependent_my_food" in record:
+            data["dependent_my_foods"].append(record["dependent_my_food"])
+        else:
+            data.update(record)
+    return data
 
-    yaml_content = yaml.dump(
-        export_payload, default_flow_style=False, sort_keys=False, indent=2
-    )
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"recipes_export_{timestamp}.yaml"
 
-    return Response(
-        yaml_content,
-        mimetype="application/x-yaml",
-        headers={"Content-Disposition": f"attachment; filename={filename}"},
+@recipes_bp.route("/export", methods=["GET"])
+@login_required
+def export_recipes():
+    export_format = request.args.get("format", "yaml")
+    if export_format not in EXPORT_FORMATS:
+        flash("Unsupported export format.", "danger")
+        return redirect(url_for(RECIPES_LIST_ROUTE))
+    return streamed_export(
+        _stream_recipe_export(export_format), "recipes_export", export_format
     )
 
 
@@ -1087,11 +1412,9 @@ def view_recipe(recipe_id):
     # Ensure portions have sequence numbers before passing to the template
     ensure_portion_sequence([recipe])
 
-    usda_food_ids = {ing.fdc_id for ing in recipe.ingredients if ing.fdc_id}
-    usda_foods_map = {}
-    if usda_food_ids:
-        usda_foods = Food.query.filter(Food.fdc_id.in_(usda_food_ids)).all()
-        usda_foods_map = {food.fdc_id: food for food in usda_foods}
+    usda_foods_map = get_usda_foods(
+        {ing.fdc_id for ing in recipe.ingredients if ing.fdc_id}
+    )
 
     for ingredient in recipe.ingredients:
         if ingredient.fdc_id:
@@ -1290,6 +1613,41 @@ def generate_label_pdf(recipe_id):
     return generate_recipe_label_pdf(recipe_id, label_only=True)
 
 
+@recipes_bp.route("/labels", methods=["GET", "POST"])
+@login_required
+def generate_labels_pdf():
+    """
+    Prints the labels of the selected recipes (`recipe_ids`), of one category
+    (`category_id`) or, without either, of all the user's recipes as one PDF.
+    `layout=details` prints the detail sheet of each recipe instead.
+    """
+    query = Recipe.query.filter_by(user_id=current_user.id)
+    recipe_ids = request.values.getlist("recipe_ids", type=int)
+    category_id = request.values.get("category_id", type=int)
+    if recipe_ids:
+        query = query.filter(Recipe.id.in_(recipe_ids))
+    elif category_id:
+        query = query.filter_by(food_category_id=category_id)
+    recipes = (
+        query.options(selectinload(Recipe.ingredients))
+        .order_by(Recipe.name)
+        .limit(MAX_LABELS_PER_SHEET + 1)
+        .all()
+    )
+
+    if not recipes:
+        flash("No recipes found to print labels for.", "warning")
+        return redirect(url_for(RECIPES_LIST_ROUTE))
+    if len(recipes) > MAX_LABELS_PER_SHEET:
+        flash(
+            f"You can print at most {MAX_LABELS_PER_SHEET} labels at once.", "warning"
+        )
+        return redirect(url_for(RECIPES_LIST_ROUTE))
+
+    label_only = request.values.get("layout", "label") != "details"
+    return generate_recipe_labels_pdf(recipes, label_only=label_only)
+
+
 @recipes_bp.route("/<int:recipe_id>/nutrition-label.svg")
 @login_required
 def nutrition_label_svg(recipe_id):
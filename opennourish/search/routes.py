@@ -26,6 +26,8 @@ from flask_login import login_required, current_user
 from datetime import date
 from opennourish.time_utils import get_user_today
 from opennourish.utils import ensure_portion_sequence, update_recipe_nutrition
+from opennourish.cache import get_usda_food
+from opennourish.diary.bulk import insert_daily_logs, log_row
 from sqlalchemy import or_, func, and_
 from sqlalchemy.orm import joinedload
 import math
@@ -598,19 +600,12 @@ def add_item():
                 else get_user_today(current_user.timezone)
             )
             my_meal.usage_count += 1
-            for item in my_meal.items:
-                daily_log = DailyLog(
-                    user_id=current_user.id,
-                    log_date=log_date,
-                    meal_name=meal_name,
-                    fdc_id=item.fdc_id,
-                    my_food_id=item.my_food_id,
-                    recipe_id=item.recipe_id,
-                    amount_grams=item.amount_grams * amount,
-                    serving_type=item.serving_type,
-                    portion_id_fk=item.portion_id_fk,
-                )
-                db.session.add(daily_log)
+            insert_daily_logs(
+                [
+                    log_row(current_user.id, log_date, meal_name, item, amount)
+                    for item in my_meal.items
+                ]
+            )
             db.session.commit()
             flash(f'"{my_meal.name}" (expanded) added to your diary.', "success")
             if return_url:
@@ -700,20 +695,12 @@ def add_item():
             return redirect(url_for(DIARY_ROUTE_NAME, log_date_str=log_date_str))
 
         target_log_date = date.fromisoformat(target_log_date_str)
-        for log in source_logs:
-            new_log = DailyLog(
-                user_id=current_user.id,
-                log_date=target_log_date,
-                meal_name=target_meal_name,
-                fdc_id=log.fdc_id,
-                my_food_id=log.my_food_id,
-                recipe_id=log.recipe_id,
-                amount_grams=log.amount_grams * amount,
-                serving_type=log.serving_type,
-                portion_id_fk=log.portion_id_fk,
-            )
-            db.session.add(new_log)
-
+        insert_daily_logs(
+            [
+                log_row(current_user.id, target_log_date, target_meal_name, log, amount)
+                for log in source_logs
+            ]
+        )
         db.session.commit()
         flash(
             f"Successfully copied items from {source_meal_name} to {target_meal_name}.",
@@ -816,7 +803,7 @@ def add_item():
             log_date = date.fromisoformat(log_date_str)
 
             if food_type == "usda":
-                food = db.session.get(Food, food_id)
+                food = get_usda_food(food_id)
                 if food:
                     daily_log = DailyLog(
                         user_id=current_user.id,
@@ -903,7 +890,7 @@ def add_item():
                 )
 
             if food_type == "usda":
-                food = db.session.get(Food, food_id)
+                food = get_usda_food(food_id)
                 if food:
                     # Calculate the next seq_num for the ingredient
                     max_seq_num = (
@@ -1137,7 +1124,7 @@ def add_item():
                 )
 
             if food_type == "usda":
-                food = db.session.get(Food, food_id)
+                food = get_usda_food(food_id)
                 if food:
                     meal_item = MyMealItem(
                         my_meal_id=target_my_meal.id,
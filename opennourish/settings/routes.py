@@ -1,4 +1,8 @@
+import os
+from datetime import datetime
+
 from flask import (
+    Response,
     render_template,
     flash,
     redirect,
@@ -6,6 +10,7 @@ from flask import (
     request,
     current_app,
     jsonify,
+    stream_with_context,
 )
 from flask_login import current_user, login_required, logout_user
 from models import (
@@ -19,11 +24,28 @@ from models import (
     ExerciseLog,
     Friendship,
     MyMeal,
+    BackgroundJob,
 )
 from .forms import SettingsForm, ChangePasswordForm, DeleteAccountConfirmForm
 from opennourish.utils import ft_in_to_cm, cm_to_ft_in
+from opennourish.account_archive import (
+    ArchiveError,
+    account_has_data,
+    iter_account_archive,
+    restore_account_archive,
+)
+from opennourish.job_runner import (
+    enqueue_job,
+    job_handler,
+    job_response,
+    job_result,
+    remove_job_upload,
+    save_job_upload,
+)
 from . import settings_bp
 
+SETTINGS_ROUTE = "settings.settings"
+
 
 @settings_bp.route("/set-timezone", methods=["POST"])
 @login_required
@@ -83,14 +105,14 @@ def settings():
 
         db.session.commit()
         flash("Your settings have been updated.", "success")
-        return redirect(url_for("settings.settings"))
+        return redirect(url_for(SETTINGS_ROUTE))
 
     if password_form.validate_on_submit() and "submit_password" in request.form:
         user = db.session.get(User, current_user.id)
         user.set_password(password_form.password.data)
         db.session.commit()
         flash("Your password has been changed.", "success")
-        return redirect(url_for("settings.settings"))
+        return redirect(url_for(SETTINGS_ROUTE))
 
     # Pre-populate form fields for GET request
     if request.method == "GET":
@@ -125,6 +147,86 @@ def restart_onboarding():
     return redirect(url_for("onboarding.step1"))
 
 
+@settings_bp.route("/export")
+@login_required
+def export_account():
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename = f"opennourish_{current_user.username}_{timestamp}.zip"
+    return Response(
+        stream_with_context(iter_account_archive(current_user.id)),
+        mimetype="application/zip",
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
+
+
+@settings_bp.route("/restore", methods=["POST"])
+@login_required
+def restore_account():
+    file = request.files.get("file")
+    if not file or not file.filename.endswith(".zip"):
+        flash("Please choose a .zip account archive to restore.", "danger")
+        return redirect(url_for(SETTINGS_ROUTE))
+    if account_has_data(current_user.id):
+        flash(
+            "An archive can only be restored into an account without foods, recipes, meals or logs.",
+            "danger",
+        )
+        return redirect(url_for(SETTINGS_ROUTE))
+
+    job = enqueue_job(
+        "account_restore",
+        {"path": save_job_upload(file, ".zip")},
+        user_id=current_user.id,
+    )
+    return job_response(job)
+
+
+@job_handler("account_restore")
+def _run_account_restore(job):
+    path = job.payload["path"]
+    try:
+        if account_has_data(job.user_id):
+            return job_result(
+                SETTINGS_ROUTE,
+                [
+                    (
+                        "danger",
+                        "An archive can only be restored into an account without foods, recipes, meals or logs.",
+                    )
+                ],
+            )
+        with open(path, "rb") as file:
+            counts, left_out = restore_account_archive(file, job.user_id)
+        db.session.commit()
+    except ArchiveError as e:
+        db.session.rollback()
+        return job_result(SETTINGS_ROUTE, [("danger", str(e))])
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error restoring account archive: {e}")
+        return job_result(
+            SETTINGS_ROUTE,
+            [("danger", "An error occurred while restoring the archive.")],
+        )
+    finally:
+        os.remove(path)
+    messages = [
+        (
+            "success",
+            f"Your account has been restored with {sum(counts.values())} records.",
+        )
+    ]
+    if left_out:
+        messages.append(
+            (
+                "warning",
+                "Entries that use other users' recipes or foods were left out: "
+                f"{sum(left_out.values())}.",
+            )
+        )
+    return job_result(SETTINGS_ROUTE, messages)
+
+
 @settings_bp.route("/delete_confirm")
 @login_required
 def delete_confirm():
@@ -134,6 +236,44 @@ def delete_confirm():
     )
 
 
+@job_handler("account_deletion", max_attempts=3)
+def _run_account_deletion(job):
+    user = db.session.get(User, job.payload["user_id"])
+    if user is None:
+        return job_result("main.index")
+
+    # Anonymize MyFood and Recipe records
+    MyFood.query.filter_by(user_id=user.id).update({"user_id": None})
+    Recipe.query.filter_by(user_id=user.id).update({"user_id": None})
+
+    # Delete direct personal data
+    UserGoal.query.filter_by(user_id=user.id).delete()
+    CheckIn.query.filter_by(user_id=user.id).delete()
+    DailyLog.query.filter_by(user_id=user.id).delete()
+    ExerciseLog.query.filter_by(user_id=user.id).delete()
+    for job in BackgroundJob.query.filter_by(user_id=user.id):
+        remove_job_upload(job.payload)
+    BackgroundJob.query.filter_by(user_id=user.id).delete()
+
+    # Fetch and delete MyMeal records to trigger cascade deletion of MyMealItems
+    my_meals_to_delete = MyMeal.query.filter_by(user_id=user.id).all()
+    for meal in my_meals_to_delete:
+        db.session.delete(meal)
+
+    # Delete social connections
+    Friendship.query.filter(
+        (Friendship.requester_id == user.id) | (Friendship.receiver_id == user.id)
+    ).delete()
+
+    # Delete the user
+    db.session.delete(user)
+
+    db.session.commit()
+    return job_result(
+        "main.index", [("success", "Your account has been permanently deleted.")]
+    )
+
+
 @settings_bp.route("/delete", methods=["POST"])
 @login_required
 def delete_account():
@@ -141,43 +281,23 @@ def delete_account():
     if form.validate_on_submit():
         user = db.session.get(User, current_user.id)
         if user.check_password(form.password.data):
-            try:
-                # Anonymize MyFood and Recipe records
-                MyFood.query.filter_by(user_id=user.id).update({"user_id": None})
-                Recipe.query.filter_by(user_id=user.id).update({"user_id": None})
-
-                # Delete direct personal data
-                UserGoal.query.filter_by(user_id=user.id).delete()
-                CheckIn.query.filter_by(user_id=user.id).delete()
-                DailyLog.query.filter_by(user_id=user.id).delete()
-                ExerciseLog.query.filter_by(user_id=user.id).delete()
-
-                # Fetch and delete MyMeal records to trigger cascade deletion of MyMealItems
-                my_meals_to_delete = MyMeal.query.filter_by(user_id=user.id).all()
-                for meal in my_meals_to_delete:
-                    db.session.delete(meal)
-
-                # Delete social connections
-                Friendship.query.filter(
-                    (Friendship.requester_id == user.id)
-                    | (Friendship.receiver_id == user.id)
-                ).delete()
-
-                # Delete the user
-                db.session.delete(user)
-
-                db.session.commit()
-                logout_user()
-                flash("Your account has been permanently deleted.", "success")
-                return redirect(url_for("main.index"))
-            except Exception as e:
-                db.session.rollback()
-                current_app.logger.error(f"Error deleting user account: {e}")
+            # The job isn't owned by the user, as it outlives the account
+            job = enqueue_job("account_deletion", {"user_id": user.id})
+            if job.status == "failed":
+                current_app.logger.error(f"Error deleting user account: {job.error}")
                 flash(
                     "An error occurred during account deletion. Please try again.",
                     "danger",
                 )
                 return redirect(url_for("settings.delete_confirm"))
+            logout_user()
+            if job.status == "succeeded":
+                return job_response(job)
+            flash(
+                "Your account is being deleted. This can take a few minutes.",
+                "info",
+            )
+            return redirect(url_for("main.index"))
         else:
             flash("Incorrect password.", "danger")
     return render_template(
@@ -1,3 +1,4 @@
+import io
 import os
 import subprocess
 import tempfile
@@ -7,18 +8,25 @@ from flask import (
     current_app,
 )
 from datetime import datetime
+from sqlalchemy import inspect
+
+from constants import LABEL_FACT_NUTRIENTS
+from usda_nutrients import label_fact_nutrient_ids
 from models import (
     db,
-    Food,
+    FoodLabelFacts,
     MyFood,
+    Nutrient,
     Recipe,
     UnifiedPortion,
 )
-from opennourish.utils import (
-    get_available_portions,
-)
+from opennourish.cache import get_usda_food, get_usda_foods
+from opennourish.label_cache import get_label_cache, label_cache_key
+from opennourish.label_renderer import LabelRendererBusy, get_label_renderer
+from opennourish.label_svg import render_label_svg
+from opennourish.utils import get_usda_nutrients_map
 
-NO_CACHE_HEADERS = "no-cache, no-store, must-revalidate"
+LABEL_CACHE_HEADERS = "private, no-cache"
 TYPST_NOT_FOUND_ERROR = "Typst executable not found. Please ensure Typst is installed and in your system's PATH."
 TYPST_NOT_FOUND_SHORT_ERROR = "Typst executable not found."
 TIMESTAMP_FORMAT = "%Y%m%dT%H%M%S"
@@ -32,151 +40,306 @@ SUGARS_ADDED = "Sugars, added"
 VITAMIN_D = "Vitamin D"
 
 
+# Lines of a nutrition label, with their food_label_facts column, unit, number
+# format and key in the label data dictionary.
+LABEL_FIELDS = {
+    "Energy": {"column": "energy", "unit": "kcal", "format": ".0f"},
+    TOTAL_LIPID_FAT: {
+        "column": "fat",
+        "unit": "g",
+        "format": ".1f",
+        "data": "total_fat",
+    },
+    FATTY_ACIDS_TOTAL_SATURATED: {
+        "column": "saturated_fat",
+        "unit": "g",
+        "format": ".1f",
+        "data": "saturated_fat",
+    },
+    FATTY_ACIDS_TOTAL_TRANS: {
+        "column": "trans_fat",
+        "unit": "g",
+        "format": ".1f",
+        "data": "trans_fat",
+    },
+    "Cholesterol": {
+        "column": "cholesterol",
+        "unit": "mg",
+        "format": ".0f",
+        "data": "cholesterol",
+    },
+    "Sodium": {"column": "sodium", "unit": "mg", "format": ".0f", "data": "sodium"},
+    CARBOHYDRATE_BY_DIFFERENCE: {
+        "column": "carbs",
+        "unit": "g",
+        "format": ".1f",
+        "data": "carbohydrate",
+    },
+    FIBER_TOTAL_DIETARY: {
+        "column": "fiber",
+        "unit": "g",
+        "format": ".1f",
+        "data": "fiber",
+    },
+    SUGARS_TOTAL_INCLUDING_NLEA: {
+        "column": "sugars",
+        "unit": "g",
+        "format": ".1f",
+        "data": "sugars",
+    },
+    SUGARS_ADDED: {
+        "column": "added_sugars",
+        "unit": "g",
+        "format": ".1f",
+        "data": "added_sugars",
+    },
+    "Protein": {"column": "protein", "unit": "g", "format": ".1f", "data": "protein"},
+    VITAMIN_D: {
+        "column": "vitamin_d",
+        "unit": "mcg",
+        "format": ".0f",
+        "key": "vitamin_d",
+    },
+    "Calcium": {"column": "calcium", "unit": "mg", "format": ".0f", "key": "calcium"},
+    "Iron": {"column": "iron", "unit": "mg", "format": ".1f", "key": "iron"},
+    "Potassium": {
+        "column": "potassium",
+        "unit": "mg",
+        "format": ".0f",
+        "key": "potassium",
+    },
+}
+
+
+def get_label_facts_map(fdc_ids):
+    """
+    Returns {fdc_id: {label facts column: value per 100g}} for the given USDA
+    foods, read from the food_label_facts rows precomputed by the importer.
+    Foods without a row (e.g. a database imported before label facts existed)
+    are resolved from their nutrients with the same fallback names.
+    """
+    fdc_ids = set(fdc_ids)
+    facts_map = {}
+    if not fdc_ids:
+        return facts_map
+
+    columns = [column for column, _, _ in LABEL_FACT_NUTRIENTS]
+    if inspect(db.engines["usda"]).has_table(FoodLabelFacts.__tablename__):
+        for facts in FoodLabelFacts.query.filter(FoodLabelFacts.fdc_id.in_(fdc_ids)):
+            facts_map[facts.fdc_id] = {
+                column: getattr(facts, column) or 0.0 for column in columns
+            }
+
+    missing_fdc_ids = fdc_ids - facts_map.keys()
+    if missing_fdc_ids:
+        label_names = {name for _, names, _ in LABEL_FACT_NUTRIENTS for name in names}
+        column_ids = label_fact_nutrient_ids(
+            db.session.query(Nutrient.id, Nutrient.name, Nutrient.unit_name)
+            .filter(Nutrient.name.in_(label_names))
+            .all()
+        )
+        nutrients_map = get_usda_nutrients_map(missing_fdc_ids)
+        for fdc_id in missing_fdc_ids:
+            amounts = nutrients_map[fdc_id]
+            facts_map[fdc_id] = {
+                column: next((amounts[nid] for nid in ids if nid in amounts), 0.0)
+                for column, ids in column_ids.items()
+            }
+    return facts_map
+
+
 def _get_nutrition_label_data(fdc_id):
-    food = db.session.get(Food, fdc_id)
+    food = get_usda_food(fdc_id)
     if not food:
         return None, None, None
 
-    # Map common nutrition label fields to USDA nutrient names and their units
-    nutrient_info = {
-        "Energy": {
-            "names": [
-                "Energy",
-                "Energy (Atwater General Factors)",
-                "Energy (Atwater Specific Factors)",
-            ],
-            "unit": "kcal",
-            "format": ".0f",
-        },
-        TOTAL_LIPID_FAT: {
-            "names": [TOTAL_LIPID_FAT, "Lipids"],
-            "unit": "g",
-            "format": ".1f",
-        },
-        FATTY_ACIDS_TOTAL_SATURATED: {
-            "names": [FATTY_ACIDS_TOTAL_SATURATED],
-            "unit": "g",
-            "format": ".1f",
-        },
-        FATTY_ACIDS_TOTAL_TRANS: {
-            "names": [FATTY_ACIDS_TOTAL_TRANS],
-            "unit": "g",
-            "format": ".1f",
-        },
-        "Cholesterol": {"names": ["Cholesterol"], "unit": "mg", "format": ".0f"},
-        "Sodium": {"names": ["Sodium", "Sodium, Na"], "unit": "mg", "format": ".0f"},
-        CARBOHYDRATE_BY_DIFFERENCE: {
-            "names": [CARBOHYDRATE_BY_DIFFERENCE, "Carbohydrates"],
-            "unit": "g",
-            "format": ".1f",
-        },
-        FIBER_TOTAL_DIETARY: {
-            "names": [FIBER_TOTAL_DIETARY, "Total dietary fiber (AOAC 2011.25)"],
-            "unit": "g",
-            "format": ".1f",
-        },
-        SUGARS_TOTAL_INCLUDING_NLEA: {
-            "names": [SUGARS_TOTAL_INCLUDING_NLEA, "Sugars, total", "Total Sugars"],
-            "unit": "g",
-            "format": ".1f",
-        },
-        SUGARS_ADDED: {"names": [SUGARS_ADDED], "unit": "g", "format": ".1f"},
-        "Protein": {
-            "names": ["Protein", "Adjusted Protein"],
-            "unit": "g",
-            "format": ".1f",
-        },
-        VITAMIN_D: {
-            "names": ["Vitamin D (D2 + D3)"],
-            "unit": "mcg",
-            "format": ".0f",
-            "key": "vitamin_d",
-        },
-        "Calcium": {
-            "names": ["Calcium", "Calcium, Ca", "Calcium, added", "Calcium, intrinsic"],
-            "unit": "mg",
-            "format": ".0f",
-            "key": "calcium",
-        },
-        "Iron": {
-            "names": [
-                "Iron",
-                "Iron, Fe",
-                "Iron, heme",
-                "Iron, non-heme",
-                "Iron, added",
-                "Iron, intrinsic",
-            ],
-            "unit": "mg",
-            "format": ".1f",
-            "key": "iron",
-        },
-        "Potassium": {
-            "names": ["Potassium", "Potassium, K"],
-            "unit": "mg",
-            "format": ".0f",
-            "key": "potassium",
-        },
+    facts = get_label_facts_map([food.fdc_id])[food.fdc_id]
+    nutrients_for_label = {
+        label_field: facts[info["column"]] for label_field, info in LABEL_FIELDS.items()
     }
+    return food, LABEL_FIELDS, nutrients_for_label
 
-    # Extract nutrient values
-    nutrients_for_label = {}
-    for label_field, info in nutrient_info.items():
-        found_value = None  # Initialize to None to distinguish from 0.0
-        for usda_name in info["names"]:
-            # Iterate through the eager-loaded food.nutrients
-            for fn in food.nutrients:
-                if fn.nutrient.name == usda_name:
-                    found_value = fn.amount
-                    break  # Break as soon as a match is found
-            # If a value was found for the current usda_name, stop searching other names for this label_field
-            if found_value is not None:
-                break
-        nutrients_for_label[label_field] = (
-            found_value if found_value is not None else 0.0
-        )  # Assign 0.0 if not found
-    return food, nutrient_info, nutrients_for_label
-
-
-# this is for USDA foods
-def _generate_typst_content(
-    food, nutrient_info, nutrients_for_label, include_extra_info=False
-):
-    def _sanitize_for_typst(text):
-        """Sanitizes text to be safely included in Typst markup by escaping the '*' character."""
-        if not isinstance(text, str):
-            return text
-        return text.replace("*", r"\*")
 
-    # 1. Determine the default portion and scaling factor
-    default_portion = (
-        UnifiedPortion.query.filter(UnifiedPortion.fdc_id == food.fdc_id)
+def _default_portion(**owner):
+    """Returns the first ordered portion of a USDA food, MyFood or recipe."""
+    return (
+        UnifiedPortion.query.filter_by(**owner)
         .filter(UnifiedPortion.seq_num.isnot(None))
         .order_by(UnifiedPortion.seq_num)
         .first()
     )
 
+
+def _scale_to_serving(nutrients_for_label, default_portion):
+    """
+    Returns (serving size, nutrients per serving) for per-100g nutrients. The
+    default portion is the serving; without one, 100g is.
+    """
     if default_portion and default_portion.gram_weight > 0:
         if default_portion.measure_unit_description == "g":
-            serving_size_str = _sanitize_for_typst(
-                default_portion.full_description_str_1
-            )
+            serving_size = default_portion.full_description_str_1
         else:
-            serving_size_str = _sanitize_for_typst(
+            serving_size = (
                 default_portion.full_description_str_1
                 + f" ({round(default_portion.gram_weight)}g)"
             )
-
         scaling_factor = default_portion.gram_weight / 100.0
     else:
-        # Fallback to 100g if no default portion is found
-        serving_size_str = "100g"
+        serving_size = "100g"
         scaling_factor = 1.0
 
-    # 2. Scale the nutrient values
     scaled_nutrients = {
         key: (value or 0) * scaling_factor for key, value in nutrients_for_label.items()
     }
+    return serving_size, scaled_nutrients
+
+
+def _label_data(servings, serving_size, scaled_nutrients):
+    """
+    Returns the `data` dictionary of the nutrition-label-nam Typst package,
+    with the amounts formatted as they are printed. The SVG previews of
+    label_svg are drawn from the same dictionary.
+    """
+    data = {
+        "servings": str(servings),
+        "serving_size": serving_size,
+        "calories": f"{scaled_nutrients['Energy']:{LABEL_FIELDS['Energy']['format']}}",
+        "micronutrients": [],
+    }
+    for label_field, info in LABEL_FIELDS.items():
+        value = f"{scaled_nutrients[label_field]:{info['format']}}"
+        if "data" in info:
+            data[info["data"]] = {"value": value, "unit": info["unit"]}
+        elif "key" in info:
+            data["micronutrients"].append(
+                {
+                    "name": label_field,
+                    "key": info["key"],
+                    "value": value,
+                    "unit": info["unit"],
+                }
+            )
+    return data
+
+
+def _typst_string(text):
+    return str(text).replace("\\", r"\\").replace('"', r"\"").replace("*", r"\*")
+
+
+def _typst_label_data(data):
+    """Returns the Typst imports and the `data` declaration of a label."""
+    lines = [
+        '#import "@preview/nutrition-label-nam:0.2.0": nutrition-label-nam',
+        '#import "@preview/codetastic:0.2.2": ean13',
+        "#let data = (",
+        f'  servings: "{_typst_string(data["servings"])}",',
+        f'  serving_size: "{_typst_string(data["serving_size"])}",',
+        f'  calories: "{data["calories"]}",',
+    ]
+    for info in LABEL_FIELDS.values():
+        if "data" in info:
+            nutrient = data[info["data"]]
+            lines.append(
+                f'  {info["data"]}: (value: {nutrient["value"]}, '
+                f'unit: "{nutrient["unit"]}"),'
+            )
+    lines.append("  micronutrients: (")
+    for nutrient in data["micronutrients"]:
+        lines.append(
+            f'    (name: "{nutrient["name"]}", key: "{nutrient["key"]}", '
+            f'value: {nutrient["value"]}, unit: "{nutrient["unit"]}"),'
+        )
+    lines += ["  ),", ")"]
+    return "\n" + "\n".join(lines) + "\n"
+
+
+def _compile_typst(typst_content, output_format, pages=None):
+    """
+    Returns (label file, etag) for `typst_content` compiled to `output_format`.
+    Typst only runs when the label cache has no entry for this exact source,
+    and then on the bounded label renderer pool. Compile errors propagate as
+    CalledProcessError/FileNotFoundError; a saturated pool raises
+    LabelRendererBusy.
+    """
+    cache = get_label_cache()
+    key = label_cache_key(typst_content, output_format, pages)
+    label_file = cache.open(key, output_format)
+    if label_file is not None:
+        return label_file, key
+
+    data = get_label_renderer().render(
+        key,
+        lambda: _run_typst(cache, key, typst_content, output_format, pages),
+    )
+    return io.BytesIO(data), key
+
+
+def _run_typst(cache, key, typst_content, output_format, pages):
+    # Runs on a label renderer worker thread, outside the app context
+    with tempfile.TemporaryDirectory() as tmpdir:
+        typ_file_path = os.path.join(tmpdir, "label.typ")
+        output_file_path = os.path.join(tmpdir, f"label.{output_format}")
+
+        with open(typ_file_path, "w", encoding="utf-8") as f:
+            f.write(typst_content)
+
+        command = ["typst", "compile", "--format", output_format]
+        if pages:
+            command += ["--pages", str(pages)]
+        command += [
+            os.path.basename(typ_file_path),
+            os.path.basename(output_file_path),
+        ]
+        subprocess.run(command, capture_output=True, text=True, check=True, cwd=tmpdir)
+
+        with open(output_file_path, "rb") as f:
+            data = f.read()
+    cache.put(key, output_format, data)
+    return data
+
+
+def _busy_response(error):
+    return str(error), 503, {"Retry-After": str(error.retry_after)}
+
+
+def _send_label_svg(svg, download_name):
+    # Previews are drawn on every request; the ETag still spares the transfer
+    return _send_label(
+        io.BytesIO(svg.encode("utf-8")),
+        label_cache_key(svg, "svg"),
+        download_name,
+        "image/svg+xml",
+    )
+
+
+def _send_label(label_file, etag, download_name, mimetype):
+    response = send_file(
+        label_file,
+        as_attachment=False,
+        download_name=download_name,
+        mimetype=mimetype,
+        etag=etag,
+        conditional=True,
+    )
+    # Browsers revalidate every time, but keep their copy while the ETag matches
+    response.headers["Cache-Control"] = LABEL_CACHE_HEADERS
+    return response
+
+
+# this is for USDA foods
+def _generate_typst_content(
+    food, nutrient_info, nutrients_for_label, include_extra_info=False
+):
+    def _sanitize_for_typst(text):
+        """Sanitizes text to be safely included in Typst markup by escaping the '*' character."""
+        if not isinstance(text, str):
+            return text
+        return text.replace("*", r"\*")
+
+    # 1. Scale the nutrients to the default portion
+    serving_size_str, scaled_nutrients = _scale_to_serving(
+        nutrients_for_label, _default_portion(fdc_id=food.fdc_id)
+    )
 
     ingredients_str = food.ingredients if food.ingredients else "N/A"
     ingredients_str = _sanitize_for_typst(ingredients_str)
@@ -206,31 +369,9 @@ def _generate_typst_content(
         # Pad or truncate to 12 digits if it's some other length
         upc_str = food.upc.ljust(12, "0")[:12]
 
-    typst_content_data = f"""
-#import "@preview/nutrition-label-nam:0.2.0": nutrition-label-nam
-#import "@preview/codetastic:0.2.2": ean13
-#let data = (
-  servings: "1",
-  serving_size: "{serving_size_str}",
-  calories: "{scaled_nutrients['Energy']:{nutrient_info['Energy']['format']}}",
-  total_fat: (value: {scaled_nutrients['Total lipid (fat)']:{nutrient_info['Total lipid (fat)']['format']}}, unit: "{nutrient_info['Total lipid (fat)']['unit']}"),
-  saturated_fat: (value: {scaled_nutrients['Fatty acids, total saturated']:{nutrient_info['Fatty acids, total saturated']['format']}}, unit: "{nutrient_info['Fatty acids, total saturated'] ['unit']}"),
-  trans_fat: (value: {scaled_nutrients['Fatty acids, total trans']:{nutrient_info['Fatty acids, total trans']['format']}}, unit: "{nutrient_info['Fatty acids, total trans']['unit']}"),
-  cholesterol: (value: {scaled_nutrients['Cholesterol']:{nutrient_info['Cholesterol']['format']}}, unit: "{nutrient_info['Cholesterol']['unit']}"),
-  sodium: (value: {scaled_nutrients['Sodium']:{nutrient_info['Sodium']['format']}}, unit: "{nutrient_info['Sodium']['unit']}"),
-  carbohydrate: (value: {scaled_nutrients['Carbohydrate, by difference']:{nutrient_info['Carbohydrate, by difference']['format']}}, unit: "{nutrient_info['Carbohydrate, by difference']['unit']}"),
-  fiber: (value: {scaled_nutrients['Fiber, total dietary']:{nutrient_info['Fiber, total dietary']['format']}}, unit: "{nutrient_info['Fiber, total dietary']['unit']}"),
-  sugars: (value: {scaled_nutrients['Sugars, total including NLEA']:{nutrient_info['Sugars, total including NLEA']['format']}}, unit: "{nutrient_info['Sugars, total including NLEA']['unit']}"),
-  added_sugars: (value: {scaled_nutrients['Sugars, added']:{nutrient_info['Sugars, added']['format']}}, unit: "{nutrient_info['Sugars, added']['unit']}"),
-  protein: (value: {scaled_nutrients['Protein']:{nutrient_info['Protein']['format']}}, unit: "{nutrient_info['Protein']['unit']}"),
-  micronutrients: (
-    (name: "Vitamin D", key: "vitamin_d", value: {scaled_nutrients['Vitamin D']:{nutrient_info['Vitamin D']['format']}}, unit: "mcg"),
-    (name: "Calcium", key: "calcium", value: {scaled_nutrients['Calcium']:{nutrient_info['Calcium']['format']}}, unit: "mg"),
-    (name: "Iron", key: "iron", value: {scaled_nutrients['Iron']:{nutrient_info['Iron']['format']}}, unit: "mg"),
-    (name: "Potassium", key: "potassium", value: {scaled_nutrients['Potassium']:{nutrient_info['Potassium']['format']}}, unit: "mg"),
-  ),
-)
-"""
+    typst_content_data = _typst_label_data(
+        _label_data("1", serving_size_str, scaled_nutrients)
+    )
 
     if include_extra_info:
         typst_content_data = (
@@ -295,106 +436,41 @@ def generate_nutrition_label_pdf(fdc_id):
         food, nutrient_info, nutrients_for_label, include_extra_info=True
     )
     current_app.logger.debug(f"typst_content: {typst_content}")
-    with tempfile.TemporaryDirectory() as tmpdir:
-        typ_file_path = os.path.join(tmpdir, f"nutrition_label_{fdc_id}.typ")
-        pdf_file_path = os.path.join(tmpdir, f"nutrition_label_{fdc_id}.pdf")
-
-        with open(typ_file_path, "w", encoding="utf-8") as f:
-            f.write(typst_content)
-
-        try:
-            # Run Typst command
-            subprocess.run(
-                [
-                    "typst",
-                    "compile",
-                    os.path.basename(typ_file_path),
-                    os.path.basename(pdf_file_path),
-                ],
-                capture_output=True,
-                text=True,
-                check=True,
-                cwd=tmpdir,
-            )
+    try:
+        label_file, etag = _compile_typst(typst_content, "pdf")
+    except LabelRendererBusy as e:
+        return _busy_response(e)
+    except subprocess.CalledProcessError as e:
+        print(f"Typst compilation failed: {e}")
+        print(f"Stdout: {e.stdout}")
+        print(f"Stderr: {e.stderr}")
+        return f"Error generating PDF: {e.stderr}", 500
+    except FileNotFoundError:
+        return (
+            TYPST_NOT_FOUND_ERROR,
+            500,
+        )
 
-            timestamp = datetime.now().strftime(TIMESTAMP_FORMAT)
-            response = send_file(
-                pdf_file_path,
-                as_attachment=False,
-                download_name=f"nutrition_label_{fdc_id}_{timestamp}.pdf",
-                mimetype="application/pdf",
-            )
-            # Add headers to prevent caching
-            response.headers["Cache-Control"] = NO_CACHE_HEADERS
-            response.headers["Pragma"] = "no-cache"
-            response.headers["Expires"] = "0"
-            return response
-
-        except subprocess.CalledProcessError as e:
-            print(f"Typst compilation failed: {e}")
-            print(f"Stdout: {e.stdout}")
-            print(f"Stderr: {e.stderr}")
-            return f"Error generating PDF: {e.stderr}", 500
-        except FileNotFoundError:
-            return (
-                TYPST_NOT_FOUND_ERROR,
-                500,
-            )
+    timestamp = datetime.now().strftime(TIMESTAMP_FORMAT)
+    return _send_label(
+        label_file,
+        etag,
+        f"nutrition_label_{fdc_id}_{timestamp}.pdf",
+        "application/pdf",
+    )
 
 
 def generate_nutrition_label_svg(fdc_id):
-    food, nutrient_info, nutrients_for_label = _get_nutrition_label_data(fdc_id)
+    """Renders the label preview of a USDA food in-process, without Typst."""
+    food, _, nutrients_for_label = _get_nutrition_label_data(fdc_id)
     if not food:
         return "Food not found", 404
 
-    typst_content = _generate_typst_content(food, nutrient_info, nutrients_for_label)
-
-    with tempfile.TemporaryDirectory() as tmpdir:
-        typ_file_path = os.path.join(tmpdir, f"nutrition_label_{fdc_id}.typ")
-        svg_file_path = os.path.join(tmpdir, f"nutrition_label_{fdc_id}.svg")
-
-        with open(typ_file_path, "w", encoding="utf-8") as f:
-            f.write(typst_content)
-
-        try:
-            # Run Typst command
-            subprocess.run(
-                [
-                    "typst",
-                    "compile",
-                    "--format",
-                    "svg",
-                    os.path.basename(typ_file_path),
-                    os.path.basename(svg_file_path),
-                ],
-                capture_output=True,
-                text=True,
-                check=True,
-                cwd=tmpdir,
-            )
-
-            response = send_file(
-                svg_file_path,
-                as_attachment=False,
-                download_name=f"nutrition_label_{fdc_id}.svg",
-                mimetype="image/svg+xml",
-            )
-            # Add headers to prevent caching
-            response.headers["Cache-Control"] = NO_CACHE_HEADERS
-            response.headers["Pragma"] = "no-cache"
-            response.headers["Expires"] = "0"
-            return response
-
-        except subprocess.CalledProcessError as e:
-            print(f"Typst compilation failed: {e}")
-            print(f"Stdout: {e.stdout}")
-            print(f"Stderr: {e.stderr}")
-            return f"Error generating PDF: {e.stderr}", 500
-        except FileNotFoundError:
-            return (
-                TYPST_NOT_FOUND_ERROR,
-                500,
-            )
+    serving_size, scaled_nutrients = _scale_to_serving(
+        nutrients_for_label, _default_portion(fdc_id=food.fdc_id)
+    )
+    svg = render_label_svg(_label_data("1", serving_size, scaled_nutrients))
+    return _send_label_svg(svg, f"nutrition_label_{fdc_id}.svg")
 
 
 def _get_nutrition_label_data_myfood(my_food_id):
@@ -404,7 +480,10 @@ def _get_nutrition_label_data_myfood(my_food_id):
     my_food = db.session.get(MyFood, my_food_id)
     if not my_food:
         return None, None
+    return my_food, _myfood_nutrients_for_label(my_food)
 
+
+def _myfood_nutrients_for_label(my_food):
     # The Typst template expects specific keys. We map the MyFood attributes to these keys.
     # All values are per 100g.
     nutrients_for_label = {
@@ -424,7 +503,7 @@ def _get_nutrition_label_data_myfood(my_food_id):
         "Iron": my_food.iron_mg_per_100g or 0,
         "Potassium": my_food.potassium_mg_per_100g or 0,
     }
-    return my_food, nutrients_for_label
+    return nutrients_for_label
 
 
 def _generate_typst_content_myfood(my_food, nutrients_for_label, label_only=False):
@@ -434,36 +513,11 @@ def _generate_typst_content_myfood(my_food, nutrients_for_label, label_only=Fals
             return text
         return text.replace("\\", r"\\").replace('"', r"\"").replace("*", r"\*")
 
-    # 1. Determine the default portion and scaling factor
-    default_portion = (
-        UnifiedPortion.query.filter(UnifiedPortion.my_food_id == my_food.id)
-        .filter(UnifiedPortion.seq_num.isnot(None))
-        .order_by(UnifiedPortion.seq_num)
-        .first()
+    # 1. Scale the nutrients to the default portion
+    serving_size_str, scaled_nutrients = _scale_to_serving(
+        nutrients_for_label, _default_portion(my_food_id=my_food.id)
     )
 
-    if default_portion and default_portion.gram_weight > 0:
-        if default_portion.measure_unit_description == "g":
-            serving_size_str = _sanitize_for_typst(
-                default_portion.full_description_str_1
-            )
-        else:
-            serving_size_str = _sanitize_for_typst(
-                default_portion.full_description_str_1
-                + f" ({round(default_portion.gram_weight)}g)"
-            )
-
-        scaling_factor = default_portion.gram_weight / 100.0
-    else:
-        # Fallback to 100g if no default portion is found
-        serving_size_str = "100g"
-        scaling_factor = 1.0
-
-    # 2. Scale the nutrient values
-    scaled_nutrients = {
-        key: (value or 0) * scaling_factor for key, value in nutrients_for_label.items()
-    }
-
     # Sanitize all user-provided strings
     sanitized_food_name = _sanitize_for_typst(my_food.description)
 
@@ -509,31 +563,9 @@ def _generate_typst_content_myfood(my_food, nutrients_for_label, label_only=Fals
     else:
         portions_str = "N/A"
 
-    typst_content_data = f"""
-#import "@preview/nutrition-label-nam:0.2.0": nutrition-label-nam
-#import "@preview/codetastic:0.2.2": ean13
-#let data = (
-  servings: "1",
-  serving_size: "{serving_size_str}",
-  calories: "{scaled_nutrients['Energy']:.0f}",
-  total_fat: (value: {scaled_nutrients['Total lipid (fat)']:.1f}, unit: "g"),
-  saturated_fat: (value: {scaled_nutrients['Fatty acids, total saturated']:.1f}, unit: "g"),
-  trans_fat: (value: {scaled_nutrients['Fatty acids, total trans']:.1f}, unit: "g"),
-  cholesterol: (value: {scaled_nutrients['Cholesterol']:.0f}, unit: "mg"),
-  sodium: (value: {scaled_nutrients['Sodium']:.0f}, unit: "mg"),
-  carbohydrate: (value: {scaled_nutrients['Carbohydrate, by difference']:.1f}, unit: "g"),
-  fiber: (value: {scaled_nutrients['Fiber, total dietary']:.1f}, unit: "g"),
-  sugars: (value: {scaled_nutrients['Sugars, total including NLEA']:.1f}, unit: "g"),
-  added_sugars: (value: {scaled_nutrients['Sugars, added']:.1f}, unit: "g"),
-  protein: (value: {scaled_nutrients['Protein']:.1f}, unit: "g"),
-  micronutrients: (
-    (name: "Vitamin D", key: "vitamin_d", value: {scaled_nutrients['Vitamin D']:.0f}, unit: "mcg"),
-    (name: "Calcium", key: "calcium", value: {scaled_nutrients['Calcium']:.0f}, unit: "mg"),
-    (name: "Iron", key: "iron", value: {scaled_nutrients['Iron']:.1f}, unit: "mg"),
-    (name: "Potassium", key: "potassium", value: {scaled_nutrients['Potassium']:.0f}, unit: "mg"),
-  ),
-)
-"""
+    typst_content_data = _typst_label_data(
+        _label_data("1", serving_size_str, scaled_nutrients)
+    )
 
     if label_only:
         typst_content = (
@@ -613,63 +645,29 @@ def generate_myfood_label_pdf(my_food_id, label_only=False):
         my_food, nutrients_for_label, label_only=label_only
     )
     current_app.logger.debug(f"typst_content: {typst_content}")
-    with tempfile.TemporaryDirectory() as tmpdir:
-        file_suffix = "label_only" if label_only else "details"
-        typ_file_path = os.path.join(
-            tmpdir, f"myfood_label_{my_food.id}_{file_suffix}.typ"
+    try:
+        label_file, etag = _compile_typst(typst_content, "pdf", pages=1)
+    except LabelRendererBusy as e:
+        return _busy_response(e)
+    except subprocess.CalledProcessError as e:
+        current_app.logger.error(
+            f"Typst compilation failed for my_food_id {my_food_id}: {e.stderr}"
         )
-        pdf_file_path = os.path.join(
-            tmpdir, f"myfood_label_{my_food.id}_{file_suffix}.pdf"
+        return f"Error generating PDF: {e.stderr}", 500
+    except FileNotFoundError:
+        current_app.logger.error(TYPST_NOT_FOUND_SHORT_ERROR)
+        return (
+            TYPST_NOT_FOUND_ERROR,
+            500,
         )
 
-        with open(typ_file_path, "w", encoding="utf-8") as f:
-            f.write(typst_content)
-
-        try:
-            # Run Typst command
-            subprocess.run(
-                [
-                    "typst",
-                    "compile",
-                    os.path.basename(typ_file_path),
-                    "--pages",
-                    "1",
-                    os.path.basename(pdf_file_path),
-                ],
-                capture_output=True,
-                text=True,
-                check=True,
-                cwd=tmpdir,
-            )
-
-            timestamp = datetime.now().strftime(TIMESTAMP_FORMAT)
-            safe_description = (
-                re.sub(r"[^\\w\\s-]", "", my_food.description).strip().replace(" ", "_")
-            )
-            download_name = f"{safe_description}_{file_suffix}_{timestamp}.pdf"
-            response = send_file(
-                pdf_file_path,
-                as_attachment=False,
-                download_name=download_name,
-                mimetype="application/pdf",
-            )
-            # Add headers to prevent caching
-            response.headers["Cache-Control"] = NO_CACHE_HEADERS
-            response.headers["Pragma"] = "no-cache"
-            response.headers["Expires"] = "0"
-            return response
-
-        except subprocess.CalledProcessError as e:
-            current_app.logger.error(
-                f"Typst compilation failed for my_food_id {my_food_id}: {e.stderr}"
-            )
-            return f"Error generating PDF: {e.stderr}", 500
-        except FileNotFoundError:
-            current_app.logger.error(TYPST_NOT_FOUND_SHORT_ERROR)
-            return (
-                TYPST_NOT_FOUND_ERROR,
-                500,
-            )
+    file_suffix = "label_only" if label_only else "details"
+    timestamp = datetime.now().strftime(TIMESTAMP_FORMAT)
+    safe_description = (
+        re.sub(r"[^\\w\\s-]", "", my_food.description).strip().replace(" ", "_")
+    )
+    download_name = f"{safe_description}_{file_suffix}_{timestamp}.pdf"
+    return _send_label(label_file, etag, download_name, "application/pdf")
 
 
 def _generate_typst_content_recipe(
@@ -681,67 +679,24 @@ def _generate_typst_content_recipe(
             return text
         return text.replace("\\", r"\\").replace('"', r"\"").replace("*", r"\*")
 
-    # 0. Determine how many servings the recipe has
-    servings_str = _sanitize_for_typst(recipe.servings)
-
-    # 1. Determine the default portion and scaling factor
-    default_portion = (
-        UnifiedPortion.query.filter(UnifiedPortion.recipe_id == recipe.id)
-        .filter(UnifiedPortion.seq_num.isnot(None))
-        .order_by(UnifiedPortion.seq_num)
-        .first()
+    # 1. Scale the nutrients to the default portion
+    serving_size_str, scaled_nutrients = _scale_to_serving(
+        nutrients_for_label, _default_portion(recipe_id=recipe.id)
     )
 
-    if default_portion and default_portion.gram_weight > 0:
-        if default_portion.measure_unit_description == "g":
-            serving_size_str = _sanitize_for_typst(
-                default_portion.full_description_str_1
-            )
-        else:
-            serving_size_str = _sanitize_for_typst(
-                default_portion.full_description_str_1
-                + f" ({round(default_portion.gram_weight)}g)"
-            )
-
-        scaling_factor = default_portion.gram_weight / 100.0
-    else:
-        # Fallback to 100g if no default portion is found
-        serving_size_str = "100g"
-        scaling_factor = 1.0
-
-    # 2. Scale the nutrient values
-    scaled_nutrients = {
-        key: (value or 0) * scaling_factor for key, value in nutrients_for_label.items()
-    }
-
     # Sanitize all user-provided strings
     sanitized_recipe_name = _sanitize_for_typst(recipe.name)
 
     # Create a string of ingredients for the recipe
-    # Manually fetch USDA food data
-    from opennourish.utils import calculate_nutrition_for_items
-
-    usda_food_ids = [ing.fdc_id for ing in recipe.ingredients if ing.fdc_id]
-    if usda_food_ids:
-        usda_foods = Food.query.filter(Food.fdc_id.in_(usda_food_ids)).all()
-        usda_foods_map = {food.fdc_id: food for food in usda_foods}
+    usda_foods_map = get_usda_foods(
+        {ing.fdc_id for ing in recipe.ingredients if ing.fdc_id}
+    )
     ingredients_str = ""
     if recipe.ingredients:
         for ing in recipe.ingredients:
-            if ing.fdc_id:
-                ing.usda_food = usda_foods_map.get(ing.fdc_id)
-
-            # Calculate nutrition for each individual ingredient
-            ingredient_nutrition = calculate_nutrition_for_items([ing])
-            ing.calories = ingredient_nutrition["calories"]
-            ing.protein = ingredient_nutrition["protein"]
-            ing.carbs = ingredient_nutrition["carbs"]
-            ing.fat = ingredient_nutrition["fat"]
-
-            # Calculate quantity and portion description
             food_object = None
-            if hasattr(ing, "usda_food") and ing.usda_food:
-                food_object = ing.usda_food
+            if ing.fdc_id and ing.fdc_id in usda_foods_map:
+                food_object = usda_foods_map[ing.fdc_id]
                 ing.description = food_object.description
             elif ing.my_food:
                 food_object = ing.my_food
@@ -758,8 +713,6 @@ def _generate_typst_content_recipe(
                 selected_portion = db.session.get(UnifiedPortion, ing.portion_id_fk)
 
             if food_object:
-                available_portions = get_available_portions(food_object)
-                available_portions.sort(key=lambda p: p.gram_weight, reverse=True)
                 if selected_portion and selected_portion.gram_weight > 0:
                     ing.quantity = ing.amount_grams / selected_portion.gram_weight
                     ing.portion_description = selected_portion.full_description_str
@@ -824,31 +777,9 @@ def _generate_typst_content_recipe(
     else:
         portions_str = "N/A"
 
-    typst_content_data = f"""
-#import "@preview/nutrition-label-nam:0.2.0": nutrition-label-nam
-#import "@preview/codetastic:0.2.2": ean13
-#let data = (
-  servings: "{servings_str}",
-  serving_size: "{serving_size_str}",
-  calories: "{scaled_nutrients['Energy']:.0f}",
-  total_fat: (value: {scaled_nutrients['Total lipid (fat)']:.1f}, unit: "g"),
-  saturated_fat: (value: {scaled_nutrients['Fatty acids, total saturated']:.1f}, unit: "g"),
-  trans_fat: (value: {scaled_nutrients['Fatty acids, total trans']:.1f}, unit: "g"),
-  cholesterol: (value: {scaled_nutrients['Cholesterol']:.0f}, unit: "mg"),
-  sodium: (value: {scaled_nutrients['Sodium']:.0f}, unit: "mg"),
-  carbohydrate: (value: {scaled_nutrients['Carbohydrate, by difference']:.1f}, unit: "g"),
-  fiber: (value: {scaled_nutrients['Fiber, total dietary']:.1f}, unit: "g"),
-  sugars: (value: {scaled_nutrients['Sugars, total including NLEA']:.1f}, unit: "g"),
-  added_sugars: (value: {scaled_nutrients['Sugars, added']:.1f}, unit: "g"),
-  protein: (value: {scaled_nutrients['Protein']:.1f}, unit: "g"),
-  micronutrients: (
-    (name: "Vitamin D", key: "vitamin_d", value: {scaled_nutrients['Vitamin D']:.0f}, unit: "mcg"),
-    (name: "Calcium", key: "calcium", value: {scaled_nutrients['Calcium']:.0f}, unit: "mg"),
-    (name: "Iron", key: "iron", value: {scaled_nutrients['Iron']:.1f}, unit: "mg"),
-    (name: "Potassium", key: "potassium", value: {scaled_nutrients['Potassium']:.0f}, unit: "mg"),
-  ),
-)
-"""
+    typst_content_data = _typst_label_data(
+        _label_data(recipe.servings, serving_size_str, scaled_nutrients)
+    )
 
     if svg_only:
         typst_content = (
@@ -942,7 +873,10 @@ def _get_nutrition_label_data_recipe(recipe_id):
     recipe = db.session.get(Recipe, recipe_id)
     if not recipe:
         return None, None
+    return recipe, _recipe_nutrients_for_label(recipe)
 
+
+def _recipe_nutrients_for_label(recipe):
     # The Typst template expects specific keys. We map the Recipe attributes to these keys.
     # All values are per 100g.
     nutrients_for_label = {
@@ -962,7 +896,7 @@ def _get_nutrition_label_data_recipe(recipe_id):
         "Iron": recipe.iron_mg_per_100g or 0,
         "Potassium": recipe.potassium_mg_per_100g or 0,
     }
-    return recipe, nutrients_for_label
+    return nutrients_for_label
 
 
 def generate_recipe_label_pdf(recipe_id, label_only=False):
@@ -978,118 +912,99 @@ def generate_recipe_label_pdf(recipe_id, label_only=False):
         recipe, nutrients_for_label, label_only=label_only
     )
     current_app.logger.debug(f"typst_content: {typst_content}")
-    with tempfile.TemporaryDirectory() as tmpdir:
-        file_suffix = "label_only" if label_only else "details"
-        typ_file_path = os.path.join(
-            tmpdir, f"recipe_label_{recipe.id}_{file_suffix}.typ"
+    try:
+        label_file, etag = _compile_typst(typst_content, "pdf", pages=1)
+    except LabelRendererBusy as e:
+        return _busy_response(e)
+    except subprocess.CalledProcessError as e:
+        current_app.logger.error(
+            f"Typst compilation failed for recipe_id {recipe_id}: {e.stderr}"
         )
-        pdf_file_path = os.path.join(
-            tmpdir, f"recipe_label_{recipe.id}_{file_suffix}.pdf"
+        return f"Error generating PDF: {e.stderr}", 500
+    except FileNotFoundError:
+        current_app.logger.error(TYPST_NOT_FOUND_SHORT_ERROR)
+        return (
+            TYPST_NOT_FOUND_ERROR,
+            500,
         )
 
-        with open(typ_file_path, "w", encoding="utf-8") as f:
-            f.write(typst_content)
-
-        try:
-            # Run Typst command
-            subprocess.run(
-                [
-                    "typst",
-                    "compile",
-                    os.path.basename(typ_file_path),
-                    "--pages",
-                    "1",
-                    os.path.basename(pdf_file_path),
-                ],
-                capture_output=True,
-                text=True,
-                check=True,
-                cwd=tmpdir,
-            )
-
-            timestamp = datetime.now().strftime(TIMESTAMP_FORMAT)
-            safe_recipe_name = (
-                re.sub(r"[^\w\s-]", "", recipe.name).strip().replace(" ", "_")
-            )
-            download_name = f"{safe_recipe_name}_{file_suffix}_{timestamp}.pdf"
-            response = send_file(
-                pdf_file_path,
-                as_attachment=False,
-                download_name=download_name,
-                mimetype="application/pdf",
-            )
-            # Add headers to prevent caching
-            response.headers["Cache-Control"] = NO_CACHE_HEADERS
-            response.headers["Pragma"] = "no-cache"
-            response.headers["Expires"] = "0"
-            return response
-
-        except subprocess.CalledProcessError as e:
-            current_app.logger.error(
-                f"Typst compilation failed for recipe_id {recipe_id}: {e.stderr}"
-            )
-            return f"Error generating PDF: {e.stderr}", 500
-        except FileNotFoundError:
-            current_app.logger.error(TYPST_NOT_FOUND_SHORT_ERROR)
-            return (
-                TYPST_NOT_FOUND_ERROR,
-                500,
-            )
+    file_suffix = "label_only" if label_only else "details"
+    timestamp = datetime.now().strftime(TIMESTAMP_FORMAT)
+    safe_recipe_name = re.sub(r"[^\w\s-]", "", recipe.name).strip().replace(" ", "_")
+    download_name = f"{safe_recipe_name}_{file_suffix}_{timestamp}.pdf"
+    return _send_label(label_file, etag, download_name, "application/pdf")
 
 
 def generate_recipe_label_svg(recipe_id):
+    """Renders the label preview of a recipe in-process, without Typst."""
     recipe, nutrients_for_label = _get_nutrition_label_data_recipe(recipe_id)
     if not recipe:
         return "Recipe not found", 404
 
-    typst_content = _generate_typst_content_recipe(
-        recipe, nutrients_for_label, svg_only=True
+    serving_size, scaled_nutrients = _scale_to_serving(
+        nutrients_for_label, _default_portion(recipe_id=recipe.id)
     )
+    svg = render_label_svg(_label_data(recipe.servings, serving_size, scaled_nutrients))
+    return _send_label_svg(svg, f"recipe_label_{recipe_id}.svg")
 
-    with tempfile.TemporaryDirectory() as tmpdir:
-        typ_file_path = os.path.join(tmpdir, f"recipe_label_{recipe_id}.typ")
-        svg_file_path = os.path.join(tmpdir, f"recipe_label_{recipe_id}.svg")
 
-        with open(typ_file_path, "w", encoding="utf-8") as f:
-            f.write(typst_content)
+def _combine_typst_documents(documents):
+    """
+    Joins standalone label documents into one. Each is wrapped in a content
+    block, so its page setup and set rules stay scoped to its own pages.
+    """
+    return "\n#pagebreak(weak: true)\n".join(
+        f"#[\n{document}\n]" for document in documents
+    )
 
-        try:
-            # Run Typst command
-            subprocess.run(
-                [
-                    "typst",
-                    "compile",
-                    "--format",
-                    "svg",
-                    os.path.basename(typ_file_path),
-                    os.path.basename(svg_file_path),
-                ],
-                capture_output=True,
-                text=True,
-                check=True,
-                cwd=tmpdir,
-            )
 
-            response = send_file(
-                svg_file_path,
-                as_attachment=False,
-                download_name=f"recipe_label_{recipe_id}.svg",
-                mimetype="image/svg+xml",
-            )
-            # Add headers to prevent caching
-            response.headers["Cache-Control"] = NO_CACHE_HEADERS
-            response.headers["Pragma"] = "no-cache"
-            response.headers["Expires"] = "0"
-            return response
-
-        except subprocess.CalledProcessError as e:
-            current_app.logger.error(
-                f"Typst compilation failed for recipe_id {recipe_id}: {e.stderr}"
-            )
-            return f"Error generating SVG: {e.stderr}", 500
-        except FileNotFoundError:
-            current_app.logger.error(TYPST_NOT_FOUND_SHORT_ERROR)
-            return (
-                TYPST_NOT_FOUND_ERROR,
-                500,
-            )
+def _generate_label_sheet_pdf(documents, download_prefix):
+    typst_content = _combine_typst_documents(documents)
+    try:
+        label_file, etag = _compile_typst(typst_content, "pdf")
+    except LabelRendererBusy as e:
+        return _busy_response(e)
+    except subprocess.CalledProcessError as e:
+        current_app.logger.error(
+            f"Typst compilation failed for label sheet: {e.stderr}"
+        )
+        return f"Error generating PDF: {e.stderr}", 500
+    except FileNotFoundError:
+        current_app.logger.error(TYPST_NOT_FOUND_SHORT_ERROR)
+        return (
+            TYPST_NOT_FOUND_ERROR,
+            500,
+        )
+
+    timestamp = datetime.now().strftime(TIMESTAMP_FORMAT)
+    return _send_label(
+        label_file, etag, f"{download_prefix}_{timestamp}.pdf", "application/pdf"
+    )
+
+
+def generate_myfood_labels_pdf(my_foods, label_only=True):
+    """
+    Generates one PDF with the labels of several MyFood items, one item per
+    page, with a single Typst compilation.
+    """
+    documents = [
+        _generate_typst_content_myfood(
+            my_food, _myfood_nutrients_for_label(my_food), label_only=label_only
+        )
+        for my_food in my_foods
+    ]
+    return _generate_label_sheet_pdf(documents, "my_food_labels")
+
+
+def generate_recipe_labels_pdf(recipes, label_only=True):
+    """
+    Generates one PDF with the labels of several recipes, one recipe per page,
+    with a single Typst compilation.
+    """
+    documents = [
+        _generate_typst_content_recipe(
+            recipe, _recipe_nutrients_for_label(recipe), label_only=label_only
+        )
+        for recipe in recipes
+    ]
+    return _generate_label_sheet_pdf(documents, "recipe_labels")
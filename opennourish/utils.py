@@ -1,4 +1,5 @@
 import asyncio
+import os
 from constants import DIET_PRESETS, CORE_NUTRIENT_IDS, MEAL_CONFIG, DEFAULT_MEAL_NAMES
 from flask import (
     current_app,
@@ -14,6 +15,7 @@ from flask_mailing import Message
 from opennourish import mail
 from datetime import datetime, timedelta
 from opennourish.time_utils import get_user_today
+from usda_nutrients import referenced_nutrient_ids
 from models import (
     db,
     UserGoal,
@@ -22,7 +24,11 @@ from models import (
     ExerciseLog,
     MyFood,
     FoodNutrient,
+    FoodCategory,
+    Nutrient,
+    PrunedNutrient,
 )
+from sqlalchemy import func, insert
 from sqlalchemy.inspection import inspect
 from datetime import date
 from decimal import Decimal
@@ -429,10 +435,126 @@ def get_allow_registration_status():
     return True
 
 
-def calculate_nutrition_for_items(items, processed_recipes=None):
+def resolve_food_categories(category_names, user_id):
+    """
+    Returns {lowercase name: category id} for the given category names,
+    matching the user's and then the global categories case-insensitively
+    and creating the missing ones as user categories in one insert.
+    """
+    wanted = {}
+    for name in category_names:
+        # The first spelling of a new category is the one created
+        wanted.setdefault(name.strip().lower(), name.strip())
+    if not wanted:
+        return {}
+    category_ids = {}
+    existing = db.session.execute(
+        db.select(FoodCategory.id, FoodCategory.description, FoodCategory.user_id)
+        .filter(func.lower(FoodCategory.description).in_(wanted))
+        .filter((FoodCategory.user_id == user_id) | FoodCategory.user_id.is_(None))
+        # User categories win over global ones of the same name
+        .order_by(FoodCategory.user_id.is_(None))
+    )
+    for category_id, description, _ in existing:
+        category_ids.setdefault(description.lower(), category_id)
+
+    missing = [name for key, name in wanted.items() if key not in category_ids]
+    if missing:
+        new_categories = db.session.execute(
+            insert(FoodCategory).returning(FoodCategory.id, FoodCategory.description),
+            [{"description": name, "user_id": user_id} for name in missing],
+        )
+        for category_id, description in new_categories:
+            category_ids[description.lower()] = category_id
+    return category_ids
+
+
+def get_usda_nutrients_map(fdc_ids, nutrients_map=None):
+    """
+    Returns a dict of {fdc_id: {nutrient_id: amount}} for the given USDA foods.
+    If an existing `nutrients_map` is passed, only the missing fdc_ids are
+    fetched and merged into it.
+    """
+    if nutrients_map is None:
+        nutrients_map = {}
+
+    missing_fdc_ids = {fdc_id for fdc_id in fdc_ids if fdc_id not in nutrients_map}
+    if missing_fdc_ids:
+        for fdc_id in missing_fdc_ids:
+            nutrients_map[fdc_id] = {}
+        # Fetch all relevant FoodNutrient objects in one query
+        food_nutrients = (
+            db.session.query(FoodNutrient)
+            .filter(FoodNutrient.fdc_id.in_(missing_fdc_ids))
+            .all()
+        )
+        for fn in food_nutrients:
+            nutrients_map[fn.fdc_id][fn.nutrient_id] = fn.amount
+
+    return nutrients_map
+
+
+def _usda_has_pruned_nutrients_table():
+    engine = db.engines["usda"]
+    database = engine.url.database
+    # Connecting to a missing SQLite file would create an empty one
+    if database and database != ":memory:" and not os.path.exists(database):
+        return False
+    return inspect(engine).has_table(PrunedNutrient.__tablename__)
+
+
+def has_pruned_nutrients():
+    """
+    Whether the importer's --keep_nutrients allow-list pruned the values of
+    any nutrients from the USDA database, so USDA foods don't list them.
+    """
+    if not _usda_has_pruned_nutrients_table():
+        return False
+    return db.session.query(PrunedNutrient.id).first() is not None
+
+
+def check_pruned_nutrients():
+    """
+    Warns about the nutrients the app reads whose values were pruned from
+    the USDA database by the importer's --keep_nutrients allow-list, and
+    returns them as (id, name) rows. Run at startup.
+    """
+    if not _usda_has_pruned_nutrients_table():
+        return []
+
+    pruned_count = db.session.query(PrunedNutrient).count()
+    if pruned_count:
+        current_app.logger.info(
+            f"The USDA database holds no values of {pruned_count} nutrients "
+            f"the importer pruned; USDA food detail pages only list the "
+            f"nutrients it kept."
+        )
+
+    referenced_ids = referenced_nutrient_ids(
+        db.session.query(Nutrient.id, Nutrient.name, Nutrient.unit_name).all()
+    )
+    pruned = (
+        db.session.query(Nutrient.id, Nutrient.name)
+        .join(PrunedNutrient, PrunedNutrient.id == Nutrient.id)
+        .filter(Nutrient.id.in_(referenced_ids))
+        .order_by(Nutrient.id)
+        .all()
+    )
+    for nutrient_id, name in pruned:
+        current_app.logger.warning(
+            f"The USDA database has no values of nutrient {nutrient_id} "
+            f"({name}), which OpenNourish uses: the importer pruned them. "
+            f"Re-import the database with this nutrient kept."
+        )
+    return pruned
+
+
+def calculate_nutrition_for_items(items, processed_recipes=None, nutrients_map=None):
     """
     Calculates total nutrition for a list of items (DailyLog or RecipeIngredient).
     `processed_recipes` is a set used to prevent infinite recursion for nested recipes.
+    `nutrients_map` is an optional, shared {fdc_id: {nutrient_id: amount}} cache,
+    e.g. from `get_usda_nutrients_map`; missing foods are fetched into it.
     """
     if processed_recipes is None:
         processed_recipes = set()
@@ -463,19 +585,7 @@ def calculate_nutrition_for_items(items, processed_recipes=None):
         if item.fdc_id:
             usda_fdc_ids.add(item.fdc_id)
 
-    nutrients_map = {}
-    if usda_fdc_ids:
-        # Fetch all relevant FoodNutrient objects in one query
-        # Use .all() to execute the query and fetch results
-        food_nutrients = (
-            db.session.query(FoodNutrient)
-            .filter(FoodNutrient.fdc_id.in_(usda_fdc_ids))
-            .all()
-        )
-        for fn in food_nutrients:
-            if fn.fdc_id not in nutrients_map:
-                nutrients_map[fn.fdc_id] = {}
-            nutrients_map[fn.fdc_id][fn.nutrient_id] = fn.amount
+    nutrients_map = get_usda_nutrients_map(usda_fdc_ids, nutrients_map)
 
     for item in items:
         # Initialize scaling_factor for the current item
@@ -530,7 +640,7 @@ def calculate_nutrition_for_items(items, processed_recipes=None):
 
                 processed_recipes.add(nested_recipe.id)
                 nested_nutrition = calculate_nutrition_for_items(
-                    nested_recipe.ingredients, processed_recipes
+                    nested_recipe.ingredients, processed_recipes, nutrients_map
                 )
                 processed_recipes.remove(nested_recipe.id)
 
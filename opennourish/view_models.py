@@ -0,0 +1,340 @@
+"""
+Shared view-models for the dashboard and diary pages.
+
+The owner's pages and a friend's read-only view of them render the same
+numbers, so they are built once here and cached by the viewed user's data
+version. Cached values hold plain snapshots rather than ORM instances, so
+they can safely outlive the session that loaded them.
+"""
+
+from datetime import timedelta
+from types import SimpleNamespace
+
+from constants import ALL_MEAL_TYPES
+from models import CheckIn, DailyLog, ExerciseLog, MyFood, UserGoal
+from opennourish.cache import get_cache, get_data_versions
+from opennourish.loaders import (
+    get_display_description,
+    load_item_references,
+    resolve_food_item,
+)
+from opennourish.time_utils import get_start_of_week
+from opennourish.utils import (
+    calculate_intake_vs_goal_deviation,
+    calculate_nutrient_density,
+    calculate_nutrition_for_items,
+    get_available_portions,
+    get_meal_based_nutrition,
+)
+
+# Number of days of check-ins shown for each dashboard time range
+CHECK_IN_RANGE_DAYS = {
+    "1_month": 30,
+    "3_month": 90,
+    "6_month": 180,
+    "1_year": 365,
+}
+
+# FDA standard DVs based on a 2,000 calorie diet
+FDA_STANDARD_DVS = {
+    "saturated_fat": 20,  # g
+    "cholesterol": 300,  # mg
+    "sodium": 2300,  # mg
+    "fiber": 28,  # g
+    "sugars": 90,  # g - Using NHS reference, as FDA has no DV for total sugars
+    "added_sugars": 50,  # g
+    "vitamin_d": 20,  # mcg
+    "calcium": 1300,  # mg
+    "iron": 18,  # mg
+    "potassium": 4700,  # mg
+}
+
+DIARY_MEAL_NAMES = [
+    "Breakfast",
+    "Snack (morning)",
+    "Lunch",
+    "Snack (afternoon)",
+    "Dinner",
+    "Snack (evening)",
+    "Unspecified",
+    "Water",
+]
+
+
+def _snapshot(obj):
+    """Copies the column values of a model instance into a SimpleNamespace."""
+    if obj is None:
+        return None
+    return SimpleNamespace(
+        **{column.key: getattr(obj, column.key) for column in obj.__table__.columns}
+    )
+
+
+def _portion_snapshot(portion):
+    snapshot = _snapshot(portion)
+    snapshot.full_description_str = portion.full_description_str
+    return snapshot
+
+
+def _cached(key, builder):
+    cache = get_cache("view_model_cache")
+    view_model = cache.get(key)
+    if view_model is None:
+        view_model = builder()
+        cache.set(key, view_model)
+    return view_model
+
+
+def _get_user_goal(user):
+    """The user's goal, or a temporary default goal if none exists."""
+    user_goal = UserGoal.query.filter_by(user_id=user.id).first()
+    if not user_goal:
+        user_goal = UserGoal(calories=2000, protein=150, carbs=250, fat=60)
+    return user_goal
+
+
+def get_diary_view_model(user, log_date):
+    """
+    Returns the meals, per-meal totals, day totals, calories burned and water
+    intake of `user`'s diary for `log_date`, and a snapshot of the user's
+    Water food for the quick-add, or None if they don't have one yet.
+    """
+    version = get_data_versions().day_version(user.id, log_date)
+    return _cached(
+        ("diary", user.id, log_date, version),
+        lambda: _build_diary_view_model(user, log_date),
+    )
+
+
+def _build_diary_view_model(user, log_date):
+    daily_logs = DailyLog.query.filter_by(user_id=user.id, log_date=log_date).all()
+    exercise_logs = ExerciseLog.query.filter_by(
+        user_id=user.id, log_date=log_date
+    ).all()
+
+    meals = {meal_name: [] for meal_name in DIARY_MEAL_NAMES}
+    meal_totals = {
+        meal_name: {"calories": 0, "protein": 0, "carbs": 0, "fat": 0, "fiber": 0}
+        for meal_name in meals
+    }
+
+    # The Water food comes with the logged My Foods and their portions
+    refs = load_item_references(
+        daily_logs,
+        also_my_foods=(MyFood.user_id == user.id) & (MyFood.description == "Water"),
+    )
+    totals = calculate_nutrition_for_items(daily_logs, nutrients_map=refs.nutrients)
+    water_food = min(
+        (
+            food
+            for food in refs.my_foods.values()
+            if food.user_id == user.id and food.description == "Water"
+        ),
+        key=lambda food: food.id,
+        default=None,
+    )
+
+    for log in daily_logs:
+        description_to_display = "Unknown Food"
+        display_amount = log.amount_grams
+        selected_portion = None
+        nutrition = calculate_nutrition_for_items([log], nutrients_map=refs.nutrients)
+        available_portions = []
+
+        food_item, food_type, food_id = resolve_food_item(log, refs)
+
+        if food_item:
+            available_portions = [
+                _portion_snapshot(portion)
+                for portion in get_available_portions(food_item)
+            ]
+            selected_portion = next(
+                (p for p in available_portions if p.gram_weight == 1.0), None
+            )
+
+            if log.portion_id_fk:
+                portion = refs.portions.get(log.portion_id_fk)
+                if portion and portion.gram_weight > 0:
+                    display_amount = log.amount_grams / portion.gram_weight
+                    selected_portion = _portion_snapshot(portion)
+
+            description_to_display = get_display_description(food_item, refs, user.id)
+
+        meal_key = log.meal_name or "Unspecified"
+        if meal_key not in meals:
+            meals[meal_key] = []
+        if meal_key not in meal_totals:
+            meal_totals[meal_key] = {
+                "calories": 0,
+                "protein": 0,
+                "carbs": 0,
+                "fat": 0,
+                "fiber": 0,
+            }
+
+        for nutrient in meal_totals[meal_key]:
+            meal_totals[meal_key][nutrient] += nutrition[nutrient]
+
+        meals[meal_key].append(
+            {
+                "log_id": log.id,
+                "description": description_to_display,
+                "amount": display_amount,
+                "nutrition": nutrition,
+                "portions": available_portions,
+                "selected_portion": selected_portion,
+                "total_gram_weight": log.amount_grams,
+                "owner_id": food_item.user_id
+                if hasattr(food_item, "user_id")
+                else None,
+                "food_type": food_type,
+                "food_id": food_id,
+            }
+        )
+
+    return SimpleNamespace(
+        meals=meals,
+        meal_totals=meal_totals,
+        totals=totals,
+        logged_meal_names={meal_name for meal_name, items in meals.items() if items},
+        calories_burned=sum(log.calories_burned for log in exercise_logs),
+        water_total_grams=sum(
+            log.amount_grams for log in daily_logs if log.meal_name == "Water"
+        ),
+        water_food=water_food
+        and SimpleNamespace(
+            id=water_food.id,
+            portions=[_portion_snapshot(portion) for portion in water_food.portions],
+        ),
+    )
+
+
+def get_meal_names_to_render(base_meals_to_show, view_model):
+    """Combines the user's standard meals with any meal that has logged items."""
+    return sorted(
+        set(base_meals_to_show) | view_model.logged_meal_names,
+        key=ALL_MEAL_TYPES.index,
+    )
+
+
+def get_dashboard_view_model(user, date_obj, time_range):
+    """
+    Returns the goals, day and week totals, analytics and check-in series shown
+    on `user`'s dashboard for `date_obj`. Check-ins are limited to
+    `time_range` days before the viewed date.
+    """
+    version = get_data_versions().user_version(user.id)
+    return _cached(
+        ("dashboard", user.id, date_obj, time_range, user.week_start_day, version),
+        lambda: _build_dashboard_view_model(user, date_obj, time_range),
+    )
+
+
+def _build_dashboard_view_model(user, date_obj, time_range):
+    user_goal = _get_user_goal(user)
+
+    daily_logs = DailyLog.query.filter_by(user_id=user.id, log_date=date_obj).all()
+    refs = load_item_references(daily_logs)
+    totals = calculate_nutrition_for_items(daily_logs, nutrients_map=refs.nutrients)
+
+    exercise_logs = ExerciseLog.query.filter_by(
+        user_id=user.id, log_date=date_obj
+    ).all()
+    calories_burned = sum(log.calories_burned for log in exercise_logs)
+
+    remaining = {
+        "calories": (user_goal.calories or 0) - totals["calories"] + calories_burned,
+        "protein": (user_goal.protein or 0) - totals["protein"],
+        "carbs": (user_goal.carbs or 0) - totals["carbs"],
+        "fat": (user_goal.fat or 0) - totals["fat"],
+    }
+
+    food_names = {}
+    for log in daily_logs:
+        food_item, food_type, _ = resolve_food_item(log, refs)
+        if food_item and food_type in ("usda", "my_food"):
+            food_names[log.id] = food_item.description
+
+    # Filter check-ins based on time_range; 'all_time' doesn't need a filter
+    check_ins_query = CheckIn.query.filter_by(user_id=user.id)
+    if time_range in CHECK_IN_RANGE_DAYS:
+        start_date = date_obj - timedelta(days=CHECK_IN_RANGE_DAYS[time_range])
+        check_ins_query = check_ins_query.filter(CheckIn.checkin_date >= start_date)
+    check_ins = check_ins_query.order_by(CheckIn.checkin_date.asc()).all()
+
+    # --- Weekly Goal Progress ---
+    # Calculate start and end of the week based on the viewed date
+    start_of_week = get_start_of_week(date_obj, user.week_start_day)
+    end_of_week = start_of_week + timedelta(days=6)
+
+    weekly_exercise_logs = ExerciseLog.query.filter(
+        ExerciseLog.user_id == user.id,
+        ExerciseLog.log_date >= start_of_week,
+        ExerciseLog.log_date <= end_of_week,
+    ).all()
+
+    weekly_diet_logs = DailyLog.query.filter(
+        DailyLog.user_id == user.id,
+        DailyLog.log_date >= start_of_week,
+        DailyLog.log_date <= end_of_week,
+    ).all()
+    weekly_refs = load_item_references(weekly_diet_logs)
+
+    latest_checkin = (
+        CheckIn.query.filter_by(user_id=user.id)
+        .order_by(CheckIn.checkin_date.desc())
+        .first()
+    )
+
+    # Scale DVs based on user's calorie goal
+    scaling_factor = (user_goal.calories or 2000) / 2000
+
+    return SimpleNamespace(
+        goals=_snapshot(user_goal),
+        daily_logs=[_snapshot(log) for log in daily_logs],
+        food_names=food_names,
+        totals=totals,
+        remaining=remaining,
+        calories_burned=calories_burned,
+        exercise_logs=[
+            SimpleNamespace(
+                activity=SimpleNamespace(name=log.activity.name)
+                if log.activity
+                else None,
+                manual_description=log.manual_description,
+                duration_minutes=log.duration_minutes,
+                calories_burned=log.calories_burned,
+            )
+            for log in exercise_logs
+        ],
+        chart_labels=[
+            check_in.checkin_date.strftime("%Y-%m-%d") for check_in in check_ins
+        ],
+        weight_data=[check_in.weight_kg for check_in in check_ins],
+        body_fat_data=[check_in.body_fat_percentage for check_in in check_ins],
+        waist_data=[check_in.waist_cm for check_in in check_ins],
+        start_of_week=start_of_week,
+        end_of_week=end_of_week,
+        days_elapsed_in_week=(date_obj - start_of_week).days + 1,
+        weekly_progress={
+            "calories_burned": sum(log.calories_burned for log in weekly_exercise_logs),
+            "exercises": len(weekly_exercise_logs),
+            "minutes": sum(log.duration_minutes for log in weekly_exercise_logs),
+        },
+        weekly_totals=calculate_nutrition_for_items(
+            weekly_diet_logs, nutrients_map=weekly_refs.nutrients
+        ),
+        weekly_goals={
+            "calories": (user_goal.calories or 0) * 7,
+            "protein": (user_goal.protein or 0) * 7,
+            "carbs": (user_goal.carbs or 0) * 7,
+            "fat": (user_goal.fat or 0) * 7,
+        },
+        latest_checkin=_snapshot(latest_checkin),
+        nutrient_density=calculate_nutrient_density(daily_logs),
+        meal_nutrition=get_meal_based_nutrition(daily_logs),
+        deviation_metrics=calculate_intake_vs_goal_deviation(user_goal, daily_logs),
+        scaled_daily_values={
+            key: value * scaling_factor for key, value in FDA_STANDARD_DVS.items()
+        },
+    )
@@ -37,5 +37,45 @@ CREATE TABLE food_nutrients (
     FOREIGN KEY (nutrient_id) REFERENCES nutrients (id)
 );
 
+-- This table stores the nutrition label values of each food, per 100g, resolved from food_nutrients
+-- by the importer using the fallback nutrient names in constants.LABEL_FACT_NUTRIENTS.
+CREATE TABLE food_label_facts (
+    fdc_id INTEGER PRIMARY KEY,
+    energy REAL NOT NULL DEFAULT 0,
+    fat REAL NOT NULL DEFAULT 0,
+    saturated_fat REAL NOT NULL DEFAULT 0,
+    trans_fat REAL NOT NULL DEFAULT 0,
+    cholesterol REAL NOT NULL DEFAULT 0,
+    sodium REAL NOT NULL DEFAULT 0,
+    carbs REAL NOT NULL DEFAULT 0,
+    fiber REAL NOT NULL DEFAULT 0,
+    sugars REAL NOT NULL DEFAULT 0,
+    added_sugars REAL NOT NULL DEFAULT 0,
+    protein REAL NOT NULL DEFAULT 0,
+    vitamin_d REAL NOT NULL DEFAULT 0,
+    calcium REAL NOT NULL DEFAULT 0,
+    iron REAL NOT NULL DEFAULT 0,
+    potassium REAL NOT NULL DEFAULT 0,
+    FOREIGN KEY (fdc_id) REFERENCES foods (fdc_id)
+);
+
+-- This table lists the nutrients whose values the importer left out of food_nutrients, because they
+-- were not in its --keep_nutrients allow-list. The nutrients themselves stay in the nutrients table.
+CREATE TABLE pruned_nutrients (
+    id INTEGER PRIMARY KEY
+);
+
+-- This table records the FoodData Central releases the database was imported from or updated to.
+CREATE TABLE usda_releases (
+    id INTEGER PRIMARY KEY,
+    -- The name of the release (e.g., the date of the FoodData Central download).
+    release TEXT NOT NULL,
+    -- 'import' for a full import, 'update' for an incremental update.
+    mode TEXT NOT NULL,
+    applied_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    -- JSON of the rows inserted, updated and deleted in each table.
+    changes TEXT
+);
+
 -- DO NOT CREATE A PORTIONS TABLE HERE, unified portions table is now in the user database
 -- DO NOT CREATE A CATEGORY TABLE HERE, unified category table is now in the user database
\ No newline at end of file
@@ -1,12 +1,18 @@
 import pytest
+import csv
 import os
+import random
 import sys
 import tempfile
 import shutil
+from contextlib import contextmanager
+from datetime import date
 
 # Add project root to path to allow importing 'app'
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
+from sqlalchemy import event
+
 from opennourish import create_app
 from models import db, User, UserGoal, Food
 
@@ -17,6 +23,8 @@ def app_with_db(mocker):
     Creates a new app instance for each test, configured for testing.
     Includes a safeguard to prevent running against a real database.
     """
+    label_cache_dir = tempfile.mkdtemp()
+    job_upload_dir = tempfile.mkdtemp()
     test_config = {
         "TESTING": True,
         "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
@@ -26,6 +34,8 @@ def app_with_db(mocker):
         "WTF_CSRF_ENABLED": False,  # Disable CSRF for testing forms
         "ALLOW_REGISTRATION": True,
         "SERVER_NAME": "localhost.localdomain:5000",  # Required for url_for(_external=True) in tests
+        "LABEL_CACHE_DIR": label_cache_dir,
+        "JOB_UPLOAD_DIR": job_upload_dir,
     }
 
     # --- SAFEGUARD ---
@@ -54,8 +64,10 @@ def app_with_db(mocker):
         db.session.remove()
         db.drop_all()
 
-    # Clean up the temporary instance folder
+    # Clean up the temporary instance and label cache folders
     shutil.rmtree(instance_path)
+    shutil.rmtree(label_cache_dir)
+    shutil.rmtree(job_upload_dir)
 
 
 @pytest.fixture(scope="function")
@@ -222,3 +234,176 @@ def sample_usda_food(app_with_db):
         db.session.add(food)
         db.session.commit()
         yield food
+
+
+@pytest.fixture
+def count_queries():
+    """
+    Returns a context manager that counts the SQL statements executed on all
+    engines inside its block.
+    """
+
+    @contextmanager
+    def counter():
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        engines = list(db.engines.values())
+        for engine in engines:
+            event.listen(engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            for engine in engines:
+                event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+    return counter
+
+
+def _query_plan(statement):
+    engine = db.engine
+    compiled = statement.compile(
+        dialect=engine.dialect, compile_kwargs={"render_postcompile": True}
+    )
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    params = tuple(
+        value.isoformat() if isinstance(value, date) else value for value in params
+    )
+    with engine.connect() as connection:
+        rows = connection.exec_driver_sql(
+            f"EXPLAIN QUERY PLAN {compiled}", params
+        ).fetchall()
+    return [row[-1] for row in rows]
+
+
+@pytest.fixture
+def assert_uses_indexes():
+    """
+    Returns a check that fails if SQLite would answer a statement with a full
+    table scan.
+    """
+
+    def check(name, statement):
+        plan = _query_plan(statement)
+        scans = [step for step in plan if step.startswith("SCAN ")]
+        assert not scans, f"{name} scans a table: {plan}"
+
+    return check
+
+
+# Nutrients of the small FoodData Central release the USDA import tests use
+NUTRIENT_ROWS = [
+    (1003, "Protein", "G"),
+    (1004, "Total lipid (fat)", "G"),
+    (1005, "Carbohydrate, by difference", "G"),
+    (1008, "Energy", "KCAL"),
+    (1051, "Water", "G"),
+    (1093, "Sodium, Na", "MG"),
+    (2000, "Sugars, total including NLEA", "G"),
+    (2047, "Energy (Atwater General Factors)", "KCAL"),
+]
+BRANDED_COLUMNS = 15
+
+
+def _write_csv(path, header, rows):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+def _write_usda_release(directory, food_count=300, seed=7):
+    """
+    Writes a small FoodData Central CSV release: foods of each data type,
+    some without energy, duplicate UPCs and duplicate nutrient rows.
+    """
+    rng = random.Random(seed)
+    _write_csv(
+        directory / "nutrient.csv",
+        ["id", "name", "unit_name", "nutrient_nbr", "rank"],
+        [(*row, "", "") for row in NUTRIENT_ROWS],
+    )
+    foods, branded, food_nutrients = [], [], []
+    data_types = ["branded_food", "sr_legacy_food", "survey_fndds_food"]
+    for i in range(food_count):
+        fdc_id = 100000 + i
+        data_type = data_types[i % 3]
+        foods.append(
+            (
+                fdc_id,
+                data_type,
+                f"food {i}, o'brien's (raw) mix",
+                rng.choice(["", "1", "2"]),
+                "2024-04-01",
+            )
+        )
+        if data_type == "branded_food":
+            row = [""] * BRANDED_COLUMNS
+            row[0] = fdc_id
+            row[4] = rng.choice(["", f"0001{i % 20:04d}", f"0002{i:04d}"])
+            row[5] = rng.choice(
+                ["", "sugar, salt (iodized)", 'cane "raw" sugar,\nsea salt']
+            )
+            row[14] = rng.choice(["", "2023-01-01", "2024-06-15"])
+            branded.append(row)
+        for nutrient_id, _, _ in NUTRIENT_ROWS:
+            if nutrient_id in (1008, 2047) and i % 5 == 0:
+                continue  # A fifth of the foods have no energy value
+            amount = rng.choice([0, 0.5, 12.25, 300])
+            food_nutrients.append((len(food_nutrients), fdc_id, nutrient_id, amount))
+            if rng.random() < 0.05:
+                # A later duplicate of the pair, which the first row wins over
+                food_nutrients.append(
+                    (len(food_nutrients), fdc_id, nutrient_id, amount + 1)
+                )
+    # Nutrient values of a food missing from food.csv
+    food_nutrients.append((len(food_nutrients), 999999, 1008, 50))
+    rng.shuffle(food_nutrients)
+
+    _write_csv(
+        directory / "food.csv",
+        ["fdc_id", "data_type", "description", "food_category_id", "pub_date"],
+        foods,
+    )
+    _write_csv(
+        directory / "branded_food.csv",
+        [f"column_{i}" for i in range(BRANDED_COLUMNS)],
+        branded,
+    )
+    _write_csv(
+        directory / "food_nutrient.csv",
+        ["id", "fdc_id", "nutrient_id", "amount"],
+        food_nutrients,
+    )
+    for name in ("sr_legacy_food.csv", "survey_fndds_food.csv"):
+        _write_csv(directory / name, ["fdc_id", "ndb_number"], [])
+    return food_nutrients
+
+
+def _rewrite_csv(path, keep_row):
+    """Rewrites a CSV file with the rows `keep_row` returns, or drops."""
+    with open(path, encoding="utf-8", newline="") as f:
+        header, *rows = list(csv.reader(f))
+    _write_csv(path, header, [kept for row in rows if (kept := keep_row(row))])
+
+
+@pytest.fixture
+def usda_release(tmp_path):
+    release_dir = tmp_path / "usda_data"
+    release_dir.mkdir()
+    food_nutrients = _write_usda_release(release_dir)
+    return release_dir, food_nutrients
+
+
+@pytest.fixture
+def write_usda_release():
+    """Returns the writer of a small FoodData Central CSV release."""
+    return _write_usda_release
+
+
+@pytest.fixture
+def rewrite_csv():
+    """Returns the helper that rewrites the rows of a release CSV file."""
+    return _rewrite_csv
@@ -0,0 +1,320 @@
+import io
+import json
+import zipfile
+from datetime import date, datetime
+
+from models import (
+    db,
+    CheckIn,
+    DailyLog,
+    ExerciseLog,
+    FastingSession,
+    FoodCategory,
+    MyFood,
+    MyMeal,
+    MyMealItem,
+    Recipe,
+    RecipeIngredient,
+    UnifiedPortion,
+    User,
+    UserGoal,
+)
+
+
+def _seed_account(user):
+    user.timezone = "Europe/Berlin"
+    user.meals_per_day = 3
+    category = FoodCategory(user_id=user.id, description="Archive Pantry")
+    food = MyFood(
+        user_id=user.id,
+        description="Archive Oats",
+        calories_per_100g=380,
+        food_category=category,
+    )
+    food.portions = [
+        UnifiedPortion(amount=1, measure_unit_description="cup", gram_weight=80)
+    ]
+    sauce = Recipe(user_id=user.id, name="Archive Sauce")
+    db.session.add_all([food, sauce])
+    db.session.flush()
+    bowl = Recipe(user_id=user.id, name="Archive Bowl", food_category=category)
+    bowl.ingredients = [
+        RecipeIngredient(
+            my_food_id=food.id, amount_grams=80, portion_id_fk=food.portions[0].id
+        ),
+        RecipeIngredient(recipe_id_link=sauce.id, amount_grams=20),
+        RecipeIngredient(fdc_id=1123, amount_grams=50),
+    ]
+    meal = MyMeal(user_id=user.id, name="Archive Breakfast")
+    meal.items = [MyMealItem(my_food_id=food.id, amount_grams=40)]
+    db.session.add_all([bowl, meal])
+    db.session.flush()
+    for day in range(1, 31):
+        db.session.add(
+            DailyLog(
+                user_id=user.id,
+                log_date=date(2024, 1, day),
+                meal_name="Breakfast",
+                recipe_id=bowl.id,
+                amount_grams=150,
+            )
+        )
+    db.session.add_all(
+        [
+            ExerciseLog(
+                user_id=user.id,
+                log_date=date(2024, 1, 2),
+                manual_description="Archive Run",
+                duration_minutes=30,
+                calories_burned=300,
+            ),
+            CheckIn(user_id=user.id, checkin_date=date(2024, 1, 3), weight_kg=70.5),
+            UserGoal(user_id=user.id, calories=1800),
+            FastingSession(
+                user_id=user.id,
+                start_time=datetime(2024, 1, 4, 20, 0),
+                end_time=datetime(2024, 1, 5, 12, 0),
+                planned_duration_hours=16,
+                status="completed",
+            ),
+        ]
+    )
+    db.session.commit()
+
+
+def test_account_archive_export_and_restore(auth_client):
+    with auth_client.application.app_context():
+        user = User.query.filter_by(username="testuser").first()
+        _seed_account(user)
+        other = User(username="archiveother", email="archiveother@example.com")
+        db.session.add(other)
+        db.session.flush()
+        db.session.add(MyFood(user_id=other.id, description="Not Archived"))
+        db.session.commit()
+
+    response = auth_client.get("/settings/export")
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert response.mimetype == "application/zip"
+    body = response.get_data()
+
+    with zipfile.ZipFile(io.BytesIO(body)) as archive:
+        manifest = json.loads(archive.read("manifest.json"))
+        assert manifest["format"] == "opennourish-account"
+        foods = archive.read("my_foods.jsonl").decode().splitlines()
+        assert [json.loads(line)["description"] for line in foods] == ["Archive Oats"]
+        assert len(archive.read("daily_logs.jsonl").decode().splitlines()) == 30
+
+    with auth_client.application.app_context():
+        new_user = User(username="restored", email="restored@example.com")
+        new_user.set_password("password")
+        db.session.add(new_user)
+        db.session.flush()
+        # A goal created by the onboarding is replaced by the archived one
+        db.session.add(UserGoal(user_id=new_user.id, calories=2000))
+        db.session.commit()
+        new_user_id = new_user.id
+    auth_client.get("/auth/logout")
+    auth_client.post(
+        "/auth/login", data={"username_or_email": "restored", "password": "password"}
+    )
+
+    response = auth_client.post(
+        "/settings/restore",
+        data={"file": (io.BytesIO(body), "account.zip")},
+        content_type="multipart/form-data",
+    )
+    assert response.status_code == 302
+    with auth_client.session_transaction() as sess:
+        assert sess["_flashes"] == [
+            ("success", "Your account has been restored with 44 records.")
+        ]
+
+    with auth_client.application.app_context():
+        new_user = db.session.get(User, new_user_id)
+        assert new_user.username == "restored"
+        assert new_user.timezone == "Europe/Berlin"
+        assert new_user.meals_per_day == 3
+
+        food = MyFood.query.filter_by(user_id=new_user_id).one()
+        assert food.food_category.user_id == new_user_id
+        assert food.food_category.description == "Archive Pantry"
+        assert [p.gram_weight for p in food.portions] == [80]
+        bowl = Recipe.query.filter_by(user_id=new_user_id, name="Archive Bowl").one()
+        sauce = Recipe.query.filter_by(user_id=new_user_id, name="Archive Sauce").one()
+        ingredients = {
+            (i.my_food_id, i.recipe_id_link, i.fdc_id, i.portion_id_fk)
+            for i in bowl.ingredients
+        }
+        assert ingredients == {
+            (food.id, None, None, food.portions[0].id),
+            (None, sauce.id, None, None),
+            (None, None, 1123, None),
+        }
+        meal = MyMeal.query.filter_by(user_id=new_user_id).one()
+        assert meal.items[0].my_food_id == food.id
+
+        logs = DailyLog.query.filter_by(user_id=new_user_id).all()
+        assert len(logs) == 30
+        assert {log.recipe_id for log in logs} == {bowl.id}
+        assert ExerciseLog.query.filter_by(user_id=new_user_id).one().log_date == (
+            date(2024, 1, 2)
+        )
+        assert CheckIn.query.filter_by(user_id=new_user_id).one().weight_kg == 70.5
+        assert UserGoal.query.filter_by(user_id=new_user_id).one().calories == 1800
+        fast = FastingSession.query.filter_by(user_id=new_user_id).one()
+        assert fast.start_time == datetime(2024, 1, 4, 20, 0)
+
+        # The original account is untouched
+        assert DailyLog.query.count() == 60
+        assert MyFood.query.filter_by(description="Not Archived").count() == 1
+
+
+def test_restore_requires_an_empty_account_and_a_valid_archive(auth_client):
+    response = auth_client.post(
+        "/settings/restore",
+        data={"file": (io.BytesIO(b"not a zip"), "account.zip")},
+        content_type="multipart/form-data",
+        follow_redirects=True,
+    )
+    assert b"not an OpenNourish account archive" in response.data
+
+    with auth_client.application.app_context():
+        user = User.query.filter_by(username="testuser").first()
+        db.session.add(MyFood(user_id=user.id, description="Existing Food"))
+        db.session.commit()
+    body = auth_client.get("/settings/export").get_data()
+    response = auth_client.post(
+        "/settings/restore",
+        data={"file": (io.BytesIO(body), "account.zip")},
+        content_type="multipart/form-data",
+        follow_redirects=True,
+    )
+    assert b"only be restored into an account without" in response.data
+    with auth_client.application.app_context():
+        assert MyFood.query.count() == 1
+
+
+def test_restore_maps_usda_portions_and_leaves_out_other_users_recipes(auth_client):
+    with auth_client.application.app_context():
+        user = User.query.filter_by(username="testuser").first()
+        cup = UnifiedPortion(
+            fdc_id=1123, amount=1, measure_unit_description="cup", gram_weight=120
+        )
+        slice_ = UnifiedPortion(
+            fdc_id=1123, amount=1, measure_unit_description="slice", gram_weight=30
+        )
+        other = User(username="archivechef", email="archivechef@example.com")
+        db.session.add_all([cup, slice_, other])
+        db.session.flush()
+        public_recipe = Recipe(user_id=other.id, name="Public Stew", is_public=True)
+        db.session.add(public_recipe)
+        db.session.flush()
+        for portion in (cup, slice_):
+            db.session.add(
+                DailyLog(
+                    user_id=user.id,
+                    log_date=date(2024, 2, 1),
+                    meal_name="Lunch",
+                    fdc_id=1123,
+                    portion_id_fk=portion.id,
+                    amount_grams=portion.gram_weight,
+                )
+            )
+        db.session.add(
+            DailyLog(
+                user_id=user.id,
+                log_date=date(2024, 2, 1),
+                meal_name="Dinner",
+                recipe_id=public_recipe.id,
+                amount_grams=300,
+            )
+        )
+        db.session.commit()
+
+    body = auth_client.get("/settings/export").get_data()
+    with zipfile.ZipFile(io.BytesIO(body)) as archive:
+        assert len(archive.read("usda_portions.jsonl").decode().splitlines()) == 2
+
+    with auth_client.application.app_context():
+        # A database whose USDA portions were seeded with other ids, and
+        # without the slice portion
+        DailyLog.query.delete()
+        UnifiedPortion.query.delete()
+        db.session.add(
+            UnifiedPortion(fdc_id=5555, measure_unit_description="bar", gram_weight=40)
+        )
+        db.session.flush()
+        new_cup = UnifiedPortion(
+            fdc_id=1123, amount=1, measure_unit_description="cup", gram_weight=120
+        )
+        new_user = User(username="portionuser", email="portionuser@example.com")
+        new_user.set_password("password")
+        db.session.add_all([new_cup, new_user])
+        db.session.commit()
+        new_cup_id = new_cup.id
+        new_user_id = new_user.id
+    auth_client.get("/auth/logout")
+    auth_client.post(
+        "/auth/login",
+        data={"username_or_email": "portionuser", "password": "password"},
+    )
+
+    auth_client.post(
+        "/settings/restore",
+        data={"file": (io.BytesIO(body), "account.zip")},
+        content_type="multipart/form-data",
+    )
+    with auth_client.session_transaction() as sess:
+        assert sess["_flashes"] == [
+            ("success", "Your account has been restored with 4 records."),
+            (
+                "warning",
+                "Entries that use other users' recipes or foods were left out: 1.",
+            ),
+        ]
+
+    with auth_client.application.app_context():
+        logs = DailyLog.query.filter_by(user_id=new_user_id).all()
+        assert [log.recipe_id for log in logs] == [None, None]
+        portions = {
+            db.session.get(
+                UnifiedPortion, log.portion_id_fk
+            ).measure_unit_description: log.portion_id_fk
+            for log in logs
+        }
+        assert portions["cup"] == new_cup_id
+        slice_ = db.session.get(UnifiedPortion, portions["slice"])
+        assert (slice_.fdc_id, slice_.gram_weight) == (1123, 30)
+        assert UnifiedPortion.query.filter_by(fdc_id=1123).count() == 2
+
+
+def test_archive_reads_each_batch_to_the_end_before_sending_it(
+    auth_client, monkeypatch, count_queries
+):
+    from opennourish import account_archive
+
+    monkeypatch.setattr(account_archive, "ARCHIVE_BATCH_SIZE", 7)
+    monkeypatch.setattr(account_archive, "ARCHIVE_CHUNK_SIZE", 1)
+    with auth_client.application.app_context():
+        user = User.query.filter_by(username="testuser").first()
+        _seed_account(user)
+        with count_queries() as statements:
+            body = b"".join(account_archive.iter_account_archive(user.id))
+        log_queries = [
+            statement
+            for statement in statements
+            if statement.startswith("SELECT daily_logs.id")
+        ]
+        # One query per batch of 7, each read to its end, and an empty one
+        assert len(log_queries) == 6
+
+    with zipfile.ZipFile(io.BytesIO(body)) as archive:
+        logs = [
+            json.loads(line)
+            for line in archive.read("daily_logs.jsonl").decode().splitlines()
+        ]
+    assert [log["log_date"] for log in logs] == [
+        date(2024, 1, day).isoformat() for day in range(1, 31)
+    ]
+    assert len({log["id"] for log in logs}) == 30
@@ -1,3 +1,5 @@
+import os
+
 import pytest
 from datetime import date
 from flask import url_for
@@ -14,7 +16,9 @@ from models import (
     RecipeIngredient,
     MyMealItem,
     MyMeal,
+    BackgroundJob,
 )
+from opennourish.job_runner import save_job_upload
 
 
 @pytest.fixture
@@ -293,3 +297,26 @@ def test_delete_account_fails_with_incorrect_password(app_with_db, client, user_
         assert db.session.query(User, user_a) is not None
         assert db.session.query(UserGoal).filter_by(user_id=user_a).first() is not None
         assert db.session.query(MyFood).filter_by(user_id=user_a).first() is not None
+
+
+def test_account_deletion_removes_queued_job_uploads(app_with_db, client, user_a):
+    with app_with_db.test_request_context():
+        path = save_job_upload("- description: Queued", ".yaml")
+        db.session.add(
+            BackgroundJob(
+                kind="my_foods_import",
+                user_id=user_a,
+                payload={"path": path, "json_lines": False},
+            )
+        )
+        db.session.commit()
+
+    with app_with_db.app_context():
+        login(client, "usera", "passwordA")
+        client.post(
+            url_for("settings.delete_account"),
+            data={"password": "passwordA"},
+            follow_redirects=True,
+        )
+        assert BackgroundJob.query.filter_by(user_id=user_a).count() == 0
+    assert not os.path.exists(path)
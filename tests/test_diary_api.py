@@ -1,4 +1,5 @@
-from models import db, User, UserGoal, DailyLog, MyFood
+from models import db, User, UserGoal, DailyLog, ExerciseLog, MyFood
+from opennourish.cache import LRUCache
 from datetime import date
 from flask import url_for
 
@@ -33,3 +34,78 @@ def test_get_remaining_calories(auth_client):
         assert data["goal_calories"] == 2000
         assert data["calories_consumed"] == 52
         assert data["calories_burned"] == 0
+
+
+def test_get_remaining_calories_is_conditional_and_versioned(auth_client):
+    with auth_client.application.app_context():
+        user = User.query.filter_by(username="testuser").first()
+        db.session.add(UserGoal(user_id=user.id, calories=2000))
+        food = MyFood(user_id=user.id, description="Pear", calories_per_100g=50)
+        db.session.add(food)
+        db.session.commit()
+        user_id, food_id = user.id, food.id
+
+    log_date = date(2025, 9, 1)
+    url = f"/api/get-remaining-calories/{log_date.isoformat()}"
+
+    response = auth_client.get(url)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    assert "no-cache" in response.headers["Cache-Control"]
+
+    response = auth_client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    with auth_client.application.app_context():
+        db.session.add(
+            DailyLog(
+                user_id=user_id,
+                my_food_id=food_id,
+                amount_grams=200,
+                log_date=log_date,
+                meal_name="Lunch",
+            )
+        )
+        db.session.add(
+            ExerciseLog(
+                user_id=user_id,
+                log_date=log_date,
+                manual_description="Walk",
+                duration_minutes=20,
+                calories_burned=80,
+            )
+        )
+        db.session.commit()
+
+    response = auth_client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    data = response.get_json()
+    assert data["calories_consumed"] == 100
+    assert data["calories_burned"] == 80
+    assert data["remaining_calories"] == 1980
+
+    # Editing the referenced food invalidates every cached day
+    with auth_client.application.app_context():
+        db.session.get(MyFood, food_id).calories_per_100g = 100
+        db.session.commit()
+
+    data = auth_client.get(url).get_json()
+    assert data["calories_consumed"] == 200
+
+
+def test_get_remaining_calories_invalid_date(auth_client):
+    response = auth_client.get("/api/get-remaining-calories/not-a-date")
+    assert response.status_code == 400
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert len(cache) == 2
@@ -0,0 +1,267 @@
+from datetime import date
+
+from models import (
+    db,
+    User,
+    Food,
+    MyFood,
+    MyMeal,
+    MyMealItem,
+    DailyLog,
+    Recipe,
+    UnifiedPortion,
+)
+
+
+def _seed_foods(user_id):
+    db.session.add(Food(fdc_id=60001, description="Bulk Oats"))
+    usda_portion = UnifiedPortion(fdc_id=60001, gram_weight=40.0, amount=1.0)
+    my_food = MyFood(user_id=user_id, description="Bulk Bread", calories_per_100g=250)
+    db.session.add_all([usda_portion, my_food])
+    db.session.flush()
+    bread_portion = UnifiedPortion(
+        my_food_id=my_food.id,
+        amount=1.0,
+        measure_unit_description="slice",
+        gram_weight=30.0,
+    )
+    meal = MyMeal(user_id=user_id, name="Bulk Breakfast")
+    db.session.add_all([bread_portion, meal])
+    db.session.flush()
+    db.session.add_all(
+        [
+            MyMealItem(my_meal_id=meal.id, my_food_id=my_food.id, amount_grams=60),
+            MyMealItem(my_meal_id=meal.id, fdc_id=60001, amount_grams=40),
+        ]
+    )
+    db.session.commit()
+    return usda_portion.id, my_food.id, bread_portion.id, meal.id
+
+
+def test_bulk_add_over_date_range_in_one_insert(auth_client, count_queries):
+    with auth_client.application.app_context():
+        user = User.query.filter_by(username="testuser").first()
+        usda_portion_id, my_food_id, bread_portion_id, meal_id = _seed_foods(user.id)
+        user_id = user.id
+
+    payload = {
+        "add": [
+            {
+                "food_type": "usda",
+                "food_id": 60001,
+                "portion_id": usda_portion_id,
+                "amount": 2,
+                "meal_name": "Breakfast",
+                "start": "2025-03-03",
+                "end": "2025-03-09",
+            },
+            {
+                "food_type": "my_food",
+                "food_id": my_food_id,
+                "portion_id": bread_portion_id,
+                "meal_name": "Lunch",
+                "log_date": "2025-03-04",
+            },
+            {
+                "food_type": "my_meal",
+                "food_id": meal_id,
+                "amount": 0.5,
+                "meal_name": "Dinner",
+                "start": "2025-03-03",
+                "end": "2025-03-05",
+            },
+        ]
+    }
+    with count_queries() as statements:
+        response = auth_client.post("/api/diary/bulk", json=payload)
+    assert response.status_code == 200
+    assert response.get_json() == {"added": 14, "copied": 0, "moved": 0}
+    inserts = [s for s in statements if s.startswith("INSERT INTO daily_logs")]
+    assert len(inserts) == 1
+
+    with auth_client.application.app_context():
+        logs = DailyLog.query.filter_by(user_id=user_id).all()
+        assert len(logs) == 14
+        oats = [
+            log for log in logs if log.fdc_id == 60001 and log.meal_name == "Breakfast"
+        ]
+        assert len(oats) == 7
+        assert all(log.amount_grams == 80 for log in oats)
+        bread = next(log for log in logs if log.meal_name == "Lunch")
+        assert bread.serving_type.strip() == "slice"
+        assert bread.amount_grams == 30
+        dinner = [log for log in logs if log.meal_name == "Dinner"]
+        assert sorted(log.amount_grams for log in dinner) == [20, 20, 20, 30, 30, 30]
+        assert db.session.get(MyMeal, meal_id).usage_count == 3
+
+
+def test_bulk_rejects_invalid_payload_without_writing(auth_client):
+    with auth_client.application.app_context():
+        user = User.query.filter_by(username="testuser").first()
+        usda_portion_id, my_food_id, _, _ = _seed_foods(user.id)
+        other = User(username="bulkother", email="bulkother@example.com")
+        db.session.add(other)
+        db.session.flush()
+        other_meal = MyMeal(user_id=other.id, name="Not Yours")
+        db.session.add(other_meal)
+        db.session.commit()
+        other_meal_id = other_meal.id
+
+    payload = {
+        "add": [
+            {
+                "food_type": "usda",
+                "food_id": 60001,
+                "meal_name": "Breakfast",
+                "log_date": "2025-03-03",
+            },
+            {
+                "food_type": "my_food",
+                "food_id": my_food_id,
+                "portion_id": usda_portion_id,
+                "meal_name": "Lunch",
+                "log_date": "2025-03-03",
+            },
+            {
+                "food_type": "my_meal",
+                "food_id": other_meal_id,
+                "meal_name": "Dinner",
+                "log_date": "2025-03-03",
+            },
+        ],
+        "copy": [{"start": "2025-03-01", "target_start": "2025-03-08"}],
+        "move": [{"ids": [999999], "log_date": "2025-03-03"}],
+    }
+    response = auth_client.post("/api/diary/bulk", json=payload)
+    assert response.status_code == 400
+    errors = response.get_json()["errors"]
+    assert any(e.startswith("add[1]: portion") for e in errors)
+    assert any(e.startswith("add[2]: My Meal") for e in errors)
+    assert any(e.startswith("move[0]:") for e in errors)
+    assert not any(e.startswith("add[0]") for e in errors)
+
+    with auth_client.application.app_context():
+        assert DailyLog.query.count() == 0
+
+    response = auth_client.post("/api/diary/bulk", json={"add": [{}]})
+    assert response.status_code == 400
+    response = auth_client.post("/api/diary/bulk", data="not json")
+    assert response.status_code == 400
+
+
+def test_bulk_copy_friend_days_and_move(auth_client_with_friendship):
+    client, test_user, friend_user = auth_client_with_friendship
+    with client.application.app_context():
+        food = MyFood(
+            user_id=friend_user.id, description="Friend Soup", calories_per_100g=40
+        )
+        db.session.add(food)
+        db.session.flush()
+        for day, meal in [(1, "Lunch"), (1, "Dinner"), (2, "Lunch")]:
+            db.session.add(
+                DailyLog(
+                    user_id=friend_user.id,
+                    log_date=date(2025, 4, day),
+                    meal_name=meal,
+                    my_food_id=food.id,
+                    amount_grams=200,
+                )
+            )
+        own_log = DailyLog(
+            user_id=test_user.id,
+            log_date=date(2025, 4, 1),
+            meal_name="Snack",
+            my_food_id=food.id,
+            amount_grams=50,
+        )
+        db.session.add(own_log)
+        db.session.commit()
+        own_log_id = own_log.id
+
+    payload = {
+        "copy": [
+            {
+                "friend_username": friend_user.username,
+                "start": "2025-04-01",
+                "end": "2025-04-02",
+                "meal_name": "Lunch",
+                "target_start": "2025-04-10",
+                "target_meal_name": "Breakfast",
+                "multiplier": 0.5,
+            }
+        ],
+        "move": [{"ids": [own_log_id], "log_date": "2025-04-05", "meal_name": "Lunch"}],
+    }
+    response = client.post("/api/diary/bulk", json=payload)
+    assert response.status_code == 200
+    assert response.get_json() == {"added": 0, "copied": 2, "moved": 1}
+
+    with client.application.app_context():
+        copied = (
+            DailyLog.query.filter_by(user_id=test_user.id, meal_name="Breakfast")
+            .order_by(DailyLog.log_date)
+            .all()
+        )
+        assert [log.log_date for log in copied] == [
+            date(2025, 4, 10),
+            date(2025, 4, 11),
+        ]
+        assert all(log.amount_grams == 100 for log in copied)
+        moved = db.session.get(DailyLog, own_log_id)
+        assert (moved.log_date, moved.meal_name) == (date(2025, 4, 5), "Lunch")
+
+    response = client.post(
+        "/api/diary/bulk",
+        json={
+            "copy": [
+                {
+                    "friend_username": "nobody",
+                    "start": "2025-04-01",
+                    "target_start": "2025-04-10",
+                }
+            ]
+        },
+    )
+    assert response.status_code == 400
+    assert "not friends" in response.get_json()["errors"][0]
+
+
+def test_bulk_add_rejects_other_users_private_items(auth_client):
+    with auth_client.application.app_context():
+        other = User(username="bulkprivate", email="bulkprivate@example.com")
+        db.session.add(other)
+        db.session.flush()
+        secret_food = MyFood(
+            user_id=other.id, description="Secret Snack", calories_per_100g=500
+        )
+        secret_recipe = Recipe(user_id=other.id, name="Secret Stew")
+        public_recipe = Recipe(user_id=other.id, name="Shared Stew", is_public=True)
+        db.session.add_all([secret_food, secret_recipe, public_recipe])
+        db.session.commit()
+        ids = (secret_food.id, secret_recipe.id, public_recipe.id)
+
+    def add(food_type, food_id):
+        return {
+            "food_type": food_type,
+            "food_id": food_id,
+            "amount": 100,
+            "meal_name": "Lunch",
+            "log_date": "2025-03-03",
+        }
+
+    response = auth_client.post(
+        "/api/diary/bulk",
+        json={"add": [add("my_food", ids[0]), add("recipe", ids[1])]},
+    )
+    assert response.status_code == 400
+    assert response.get_json()["errors"] == [
+        f"add[0]: my_food {ids[0]} not found.",
+        f"add[1]: recipe {ids[1]} not found.",
+    ]
+    with auth_client.application.app_context():
+        assert DailyLog.query.count() == 0
+
+    response = auth_client.post(
+        "/api/diary/bulk", json={"add": [add("recipe", ids[2])]}
+    )
+    assert response.status_code == 200
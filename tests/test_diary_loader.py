@@ -0,0 +1,151 @@
+from datetime import date
+
+from models import (
+    db,
+    User,
+    Food,
+    FoodNutrient,
+    Nutrient,
+    MyFood,
+    Recipe,
+    DailyLog,
+    MyMeal,
+    MyMealItem,
+    UnifiedPortion,
+)
+from opennourish.cache import get_data_versions
+from opennourish.loaders import load_item_references, resolve_food_item
+
+
+def _seed_day(user_id, friend_id, num_entries):
+    """Creates a USDA food, a My Food, a friend's recipe and num_entries logs."""
+    db.session.add(Nutrient(id=1008, name="Energy", unit_name="kcal"))
+    db.session.add(Food(fdc_id=50001, description="Loader Oats"))
+    db.session.add(FoodNutrient(fdc_id=50001, nutrient_id=1008, amount=380.0))
+    usda_portion = UnifiedPortion(fdc_id=50001, gram_weight=40.0, amount=1.0)
+    db.session.add(usda_portion)
+
+    my_food = MyFood(user_id=user_id, description="Loader Bread", calories_per_100g=250)
+    recipe = Recipe(user_id=friend_id, name="Friend Stew", final_weight_grams=100)
+    db.session.add_all([my_food, recipe])
+    db.session.flush()
+    db.session.add(UnifiedPortion(my_food_id=my_food.id, gram_weight=1.0))
+    db.session.add(UnifiedPortion(recipe_id=recipe.id, gram_weight=1.0))
+    db.session.flush()
+    _add_logs(user_id, usda_portion.id, my_food.id, recipe.id, num_entries)
+    return my_food.id, recipe.id
+
+
+def _add_logs(user_id, usda_portion_id, my_food_id, recipe_id, num_entries):
+    """Logs the foods of `_seed_day` in turn, num_entries times in all."""
+    for i in range(num_entries):
+        if i % 3 == 0:
+            log = DailyLog(fdc_id=50001, amount_grams=80, portion_id_fk=usda_portion_id)
+        elif i % 3 == 1:
+            log = DailyLog(my_food_id=my_food_id, amount_grams=50)
+        else:
+            log = DailyLog(recipe_id=recipe_id, amount_grams=100)
+        log.user_id = user_id
+        log.log_date = date.today()
+        log.meal_name = "Lunch"
+        db.session.add(log)
+    db.session.commit()
+
+
+def test_load_item_references_resolves_all_types(app_with_db, count_queries):
+    with app_with_db.app_context():
+        user = User(username="loader", email="loader@example.com")
+        friend = User(username="loaderfriend", email="loaderfriend@example.com")
+        db.session.add_all([user, friend])
+        db.session.commit()
+        my_food_id, recipe_id = _seed_day(user.id, friend.id, 3)
+
+        logs = DailyLog.query.filter_by(user_id=user.id).all()
+        with count_queries() as statements:
+            refs = load_item_references(logs)
+        # foods, my_foods, recipes with their ingredients, portions, owners,
+        # nutrients
+        assert len(statements) == 6
+
+        assert set(refs.foods) == {50001}
+        assert set(refs.my_foods) == {my_food_id}
+        assert set(refs.recipes) == {recipe_id}
+        assert set(refs.owners) == {user.id, friend.id}
+        assert refs.nutrients[50001][1008] == 380.0
+
+        usda_log = next(log for log in logs if log.fdc_id)
+        food_item, food_type, food_id = resolve_food_item(usda_log, refs)
+        assert food_item.description == "Loader Oats"
+        assert (food_type, food_id) == ("usda", 50001)
+        assert usda_log.portion_id_fk in refs.portions
+
+        # Portions are populated on the parents, so no lazy loads are needed
+        with count_queries() as lazy_statements:
+            assert len(refs.foods[50001].portions) == 1
+            assert len(refs.my_foods[my_food_id].portions) == 1
+            assert len(refs.recipes[recipe_id].portions) == 1
+        assert lazy_statements == []
+
+
+def _diary_query_count(client, count_queries):
+    # Start from a rebuilt view model rather than the cached one
+    get_data_versions().bump_all()
+    with count_queries() as statements:
+        response = client.get(f"/diary/{date.today().isoformat()}")
+
+    assert response.status_code == 200
+    assert b"Friend Stew (from stewcook)" in response.data
+    assert b'name="food_id"' in response.data
+    return len(statements)
+
+
+def test_diary_query_count_does_not_grow_with_entries(auth_client, count_queries):
+    with auth_client.application.app_context():
+        user = User.query.filter_by(username="testuser").first()
+        friend = User(username="stewcook", email="stewcook@example.com")
+        db.session.add(friend)
+        db.session.commit()
+        my_food_id, recipe_id = _seed_day(user.id, friend.id, 4)
+        usda_portion_id = UnifiedPortion.query.filter_by(fdc_id=50001).one().id
+
+        # Warm-up request creates the Water food and its portions
+        auth_client.get(f"/diary/{date.today().isoformat()}")
+        few = _diary_query_count(auth_client, count_queries)
+        _add_logs(user.id, usda_portion_id, my_food_id, recipe_id, 36)
+        # The commit expired the logged-in user, which the requests share
+        db.session.refresh(user)
+        many = _diary_query_count(auth_client, count_queries)
+
+    # Goal, fasting, logs, exercise and the loader's batched queries, which
+    # also load the Water food of the quick-add
+    assert many < 10
+    assert few == many
+
+
+def test_edit_meal_uses_batched_loader(auth_client, count_queries):
+    with auth_client.application.app_context():
+        user = User.query.filter_by(username="testuser").first()
+        db.session.add(Food(fdc_id=50002, description="Meal Rice"))
+        portion = UnifiedPortion(fdc_id=50002, gram_weight=150.0, amount=1.0)
+        db.session.add(portion)
+        meal = MyMeal(user_id=user.id, name="Rice Bowl")
+        db.session.add(meal)
+        db.session.flush()
+        for _ in range(10):
+            db.session.add(
+                MyMealItem(
+                    my_meal_id=meal.id,
+                    fdc_id=50002,
+                    amount_grams=300,
+                    portion_id_fk=portion.id,
+                )
+            )
+        db.session.commit()
+        meal_id = meal.id
+
+    with count_queries() as statements:
+        response = auth_client.get(f"/my_meals/edit/{meal_id}")
+
+    assert response.status_code == 200
+    assert b"Meal Rice" in response.data
+    assert len(statements) < 10
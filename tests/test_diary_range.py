@@ -0,0 +1,124 @@
+from datetime import date, timedelta
+
+from models import (
+    db,
+    User,
+    UserGoal,
+    MyFood,
+    DailyLog,
+    ExerciseLog,
+    UnifiedPortion,
+)
+
+
+def _seed_week(user_id, start):
+    bread = MyFood(user_id=user_id, description="Range Bread", calories_per_100g=250)
+    db.session.add(bread)
+    db.session.flush()
+    slice_portion = UnifiedPortion(
+        my_food_id=bread.id,
+        amount=1.0,
+        measure_unit_description="slice",
+        gram_weight=40,
+    )
+    db.session.add(slice_portion)
+    db.session.flush()
+    db.session.add(UserGoal(user_id=user_id, calories=2000))
+
+    for offset in range(3):
+        db.session.add(
+            DailyLog(
+                user_id=user_id,
+                log_date=start + timedelta(days=offset),
+                meal_name="Breakfast",
+                my_food_id=bread.id,
+                amount_grams=80,
+                portion_id_fk=slice_portion.id,
+            )
+        )
+    db.session.add(
+        DailyLog(
+            user_id=user_id,
+            log_date=start,
+            meal_name="Dinner",
+            my_food_id=bread.id,
+            amount_grams=100,
+        )
+    )
+    db.session.add(
+        ExerciseLog(
+            user_id=user_id,
+            log_date=start + timedelta(days=1),
+            manual_description="Rowing",
+            duration_minutes=30,
+            calories_burned=300,
+        )
+    )
+    # Outside of the requested range
+    db.session.add(
+        DailyLog(
+            user_id=user_id,
+            log_date=start + timedelta(days=10),
+            meal_name="Lunch",
+            my_food_id=bread.id,
+            amount_grams=100,
+        )
+    )
+    db.session.commit()
+
+
+def test_diary_range_api_groups_by_day_and_meal(auth_client):
+    start = date(2025, 3, 3)
+    with auth_client.application.app_context():
+        user = User.query.filter_by(username="testuser").first()
+        _seed_week(user.id, start)
+
+    response = auth_client.get(
+        f"/api/diary/range?start={start.isoformat()}&end={(start + timedelta(days=6)).isoformat()}"
+    )
+    assert response.status_code == 200
+    data = response.get_json()
+
+    assert data["start"] == "2025-03-03"
+    assert data["end"] == "2025-03-09"
+    assert len(data["days"]) == 7
+
+    first_day = data["days"][0]
+    assert list(first_day["meals"]) == ["Breakfast", "Dinner"]
+    breakfast_item = first_day["meals"]["Breakfast"]["items"][0]
+    assert breakfast_item["description"] == "Range Bread"
+    assert breakfast_item["amount"] == 2
+    assert breakfast_item["serving_type"] == "slice"
+    assert first_day["meals"]["Breakfast"]["totals"]["calories"] == 200
+    assert first_day["totals"]["calories"] == 450
+
+    assert data["days"][1]["calories_burned"] == 300
+    assert data["days"][1]["exercises"][0]["description"] == "Rowing"
+    assert data["days"][3]["meals"] == {}
+    assert sum(day["totals"]["calories"] for day in data["days"]) == 850
+
+
+def test_diary_range_api_rejects_invalid_ranges(auth_client):
+    response = auth_client.get("/api/diary/range?start=2025-03-09&end=2025-03-03")
+    assert response.status_code == 400
+
+    response = auth_client.get("/api/diary/range?start=2025-01-01&end=2025-03-01")
+    assert response.status_code == 400
+    assert "cannot exceed" in response.get_json()["error"]
+
+    response = auth_client.get("/api/diary/range?start=not-a-date")
+    assert response.status_code == 400
+
+
+def test_diary_range_view_renders(auth_client):
+    start = date(2025, 3, 3)
+    with auth_client.application.app_context():
+        user = User.query.filter_by(username="testuser").first()
+        _seed_week(user.id, start)
+
+    response = auth_client.get("/diary/range?end=2025-03-09")
+    assert response.status_code == 200
+    assert b"March 03, 2025" in response.data
+    assert b"Range Bread" in response.data
+    assert b"Rowing" in response.data
+    assert b"850 kcal" in response.data
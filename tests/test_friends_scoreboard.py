@@ -0,0 +1,93 @@
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import func, or_, select
+
+from models import db, User, Friendship, DailyLog, ExerciseLog
+
+TODAY = date(2025, 3, 3)
+WEEK_START = date(2025, 3, 1)
+
+# The friends page's queries, which must not scan their tables
+SCOREBOARD_QUERIES = {
+    "friendships_of_user": select(Friendship).where(
+        or_(Friendship.requester_id == 1, Friendship.receiver_id == 1)
+    ),
+    "scoreboard_diary_logs": select(DailyLog.user_id, func.count(DailyLog.id))
+    .where(DailyLog.user_id.in_([2, 3]), DailyLog.log_date.between(WEEK_START, TODAY))
+    .group_by(DailyLog.user_id),
+    "scoreboard_exercise_logs": select(ExerciseLog.user_id, func.count(ExerciseLog.id))
+    .where(
+        ExerciseLog.user_id.in_([2, 3]),
+        ExerciseLog.log_date.between(WEEK_START, TODAY),
+    )
+    .group_by(ExerciseLog.user_id),
+}
+
+
+def _add_friend(user_id, username, status="accepted"):
+    friend = User(username=username, email=f"{username}@example.com")
+    db.session.add(friend)
+    db.session.flush()
+    db.session.add(
+        Friendship(requester_id=user_id, receiver_id=friend.id, status=status)
+    )
+    return friend
+
+
+def test_scoreboard_query_count_is_constant_and_cached(auth_client, count_queries):
+    today = date.today()
+    with auth_client.application.app_context():
+        user = User.query.filter_by(username="testuser").first()
+        for i in range(8):
+            friend = _add_friend(user.id, f"scorefriend{i}")
+            for _ in range(i):
+                db.session.add(
+                    DailyLog(user_id=friend.id, log_date=today, amount_grams=10)
+                )
+            db.session.add(
+                ExerciseLog(
+                    user_id=friend.id,
+                    log_date=today,
+                    duration_minutes=10,
+                    calories_burned=50,
+                )
+            )
+        _add_friend(user.id, "pendingfriend", status="pending")
+        # Logged last week, must not be counted
+        db.session.add(
+            DailyLog(
+                user_id=user.id, log_date=today - timedelta(days=8), amount_grams=10
+            )
+        )
+        db.session.commit()
+        user_id = user.id
+
+    with count_queries() as statements:
+        response = auth_client.get("/friends/")
+    assert response.status_code == 200
+    # Loading the user, the friendships with both users, and one grouped query
+    # each for diary and exercise logs; nothing scales with the friend count.
+    assert len(statements) <= 5
+    html = response.data.decode()
+    assert "scorefriend7" in html
+    assert "pendingfriend" in html
+
+    with count_queries() as statements:
+        auth_client.get("/friends/")
+    # The scoreboard comes from the cache on the second view
+    assert not any("daily_logs" in statement for statement in statements)
+
+    with auth_client.application.app_context():
+        db.session.add(DailyLog(user_id=user_id, log_date=today, amount_grams=10))
+        db.session.commit()
+
+    with count_queries() as statements:
+        auth_client.get("/friends/")
+    assert any("daily_logs" in statement for statement in statements)
+
+
+@pytest.mark.parametrize("name", sorted(SCOREBOARD_QUERIES))
+def test_scoreboard_queries_use_indexes(app_with_db, assert_uses_indexes, name):
+    with app_with_db.app_context():
+        assert_uses_indexes(name, SCOREBOARD_QUERIES[name])
@@ -0,0 +1,196 @@
+import io
+import os
+
+import pytest
+
+from models import db, BackgroundJob, User
+from opennourish.job_runner import (
+    JOB_HANDLERS,
+    enqueue_job,
+    get_job_runner,
+    job_handler,
+    job_result,
+    save_job_upload,
+)
+
+
+@pytest.fixture
+def flaky_handler(monkeypatch):
+    """A job kind that fails until its payload's `fail_until` attempt."""
+    monkeypatch.setitem(JOB_HANDLERS, "test_flaky", None)
+    calls = []
+
+    @job_handler("test_flaky", max_attempts=3)
+    def run(job):
+        calls.append(job.payload)
+        job.progress(len(calls), 3)
+        if len(calls) < job.payload["fail_until"]:
+            raise RuntimeError(f"attempt {len(calls)} failed")
+        return job_result("main.index", [("success", "Flaky job done.")])
+
+    return calls
+
+
+@pytest.fixture
+def worker_runner(app_with_db):
+    runner = get_job_runner()
+    runner.max_workers = 1
+    yield runner
+    runner.shutdown()
+    runner.max_workers = 0
+
+
+def test_inline_job_is_retried_until_it_succeeds(app_with_db, flaky_handler):
+    with app_with_db.test_request_context():
+        job = enqueue_job("test_flaky", {"fail_until": 2})
+    assert job.status == "succeeded"
+    assert job.attempts == 2
+    assert job.error is None
+    assert job.progress_done == job.progress_total == 3
+    assert job.result["messages"] == [["success", "Flaky job done."]]
+    assert len(flaky_handler) == 2
+
+
+def test_inline_job_fails_after_max_attempts(app_with_db, flaky_handler):
+    with app_with_db.test_request_context():
+        job = enqueue_job("test_flaky", {"fail_until": 5})
+    assert job.status == "failed"
+    assert job.attempts == 3
+    assert job.error == "attempt 3 failed"
+    assert job.finished_at is not None
+
+
+def test_job_runs_on_a_worker_thread(app_with_db, flaky_handler, worker_runner):
+    with app_with_db.test_request_context():
+        job = BackgroundJob(kind="test_flaky", payload={"fail_until": 1})
+        db.session.add(job)
+        db.session.commit()
+        job_id = job.id
+    worker_runner.submit(job_id).result(timeout=10)
+
+    job = db.session.get(BackgroundJob, job_id, populate_existing=True)
+    assert job.status == "succeeded"
+    assert job.attempts == 1
+
+
+def test_start_recovers_interrupted_and_queued_jobs(
+    app_with_db, flaky_handler, worker_runner
+):
+    payload = {"fail_until": 1}
+    with app_with_db.test_request_context():
+        upload = save_job_upload("archive", ".zip")
+    jobs = [
+        # Out of attempts when the process stopped
+        BackgroundJob(
+            kind="test_flaky",
+            payload={"path": upload},
+            status="running",
+            attempts=1,
+            max_attempts=1,
+        ),
+        # Interrupted with attempts left
+        BackgroundJob(
+            kind="test_flaky",
+            payload=payload,
+            status="running",
+            attempts=1,
+            max_attempts=3,
+        ),
+        BackgroundJob(kind="test_flaky", payload=payload),
+        BackgroundJob(kind="test_flaky", payload=payload, status="succeeded"),
+    ]
+    db.session.add_all(jobs)
+    db.session.commit()
+    job_ids = [job.id for job in jobs]
+
+    worker_runner.start()
+    worker_runner.shutdown(wait=True)
+
+    statuses = [
+        db.session.get(BackgroundJob, job_id, populate_existing=True)
+        for job_id in job_ids
+    ]
+    assert [(job.status, job.attempts) for job in statuses] == [
+        ("failed", 1),
+        ("succeeded", 2),
+        ("succeeded", 1),
+        ("succeeded", 0),
+    ]
+    assert statuses[0].error == "Interrupted by a restart"
+    assert statuses[0].payload is None
+    assert not os.path.exists(upload)
+    assert len(flaky_handler) == 2
+
+
+def test_job_status_endpoints(auth_client, flaky_handler):
+    with auth_client.application.test_request_context():
+        user = User.query.filter_by(username="testuser").first()
+        failed = enqueue_job("test_flaky", {"fail_until": 5}, user_id=user.id)
+        done = enqueue_job("test_flaky", {"fail_until": 1}, user_id=user.id)
+        other = User(username="jobsother", email="jobsother@example.com")
+        db.session.add(other)
+        db.session.commit()
+        foreign = enqueue_job("test_flaky", {"fail_until": 1}, user_id=other.id)
+        failed_id, done_id, foreign_id = failed.id, done.id, foreign.id
+
+    response = auth_client.get(f"/jobs/{failed_id}/status")
+    assert response.json["status"] == "failed"
+    assert response.json["attempts"] == 3
+    assert response.json["error"] == "attempt 3 failed"
+    response = auth_client.get(f"/jobs/{failed_id}")
+    assert response.status_code == 200
+    assert b"attempt 3 failed" in response.data
+
+    # A finished job's page continues to its result, with its messages
+    response = auth_client.get(f"/jobs/{done_id}")
+    assert response.status_code == 302
+    with auth_client.session_transaction() as sess:
+        assert sess["_flashes"] == [("success", "Flaky job done.")]
+
+    assert auth_client.get(f"/jobs/{foreign_id}/status").status_code == 404
+    assert auth_client.get(f"/jobs/{foreign_id}").status_code == 404
+
+
+def test_imports_keep_uploads_out_of_the_job_table(auth_client):
+    upload_dir = auth_client.application.config["JOB_UPLOAD_DIR"]
+    yaml_text = (
+        '- description: "Upload Bar"\n'
+        "  serving: {gram_weight: 40}\n"
+        "  nutrition_facts: {calories: 200}\n"
+    )
+    auth_client.post(
+        "/my_foods/import",
+        data={"file": (io.BytesIO(yaml_text.encode()), "foods.yaml")},
+        content_type="multipart/form-data",
+    )
+    response = auth_client.post(
+        "/recipes/import",
+        data={"file": (io.BytesIO("Zutat: Möhre".encode("latin-1")), "r.yaml")},
+        content_type="multipart/form-data",
+        follow_redirects=True,
+    )
+    assert b"The file must be UTF-8 encoded text." in response.data
+
+    with auth_client.application.app_context():
+        jobs = BackgroundJob.query.order_by(BackgroundJob.id).all()
+        assert [(job.kind, job.status) for job in jobs] == [
+            ("my_foods_import", "succeeded"),
+            ("recipe_import", "succeeded"),
+        ]
+        assert [job.payload for job in jobs] == [None, None]
+    assert os.listdir(upload_dir) == []
+
+
+def test_failed_job_upload_is_removed(app_with_db, monkeypatch):
+    monkeypatch.setitem(JOB_HANDLERS, "test_upload", None)
+
+    @job_handler("test_upload")
+    def run(job):
+        raise RuntimeError("cannot read the upload")
+
+    with app_with_db.test_request_context():
+        path = save_job_upload("some text", ".txt")
+        job = enqueue_job("test_upload", {"path": path})
+    assert job.status == "failed"
+    assert job.payload is None
+    assert not os.path.exists(path)
@@ -0,0 +1,81 @@
+import os
+import subprocess
+
+from models import db, Food, FoodLabelFacts
+from opennourish.label_cache import LabelCache, label_cache_key
+
+
+def _fake_typst(calls):
+    """A subprocess.run stand-in that writes the requested output file."""
+
+    def run(command, cwd=None, **kwargs):
+        calls.append(command)
+        output_path = os.path.join(cwd, command[-1])
+        with open(output_path, "w") as f:
+            f.write(f"<svg><!-- {len(calls)} --></svg>")
+        return subprocess.CompletedProcess(command, 0, "", "")
+
+    return run
+
+
+def test_label_is_compiled_once_and_served_with_etag(auth_client, mocker):
+    calls = []
+    mocker.patch(
+        "opennourish.typst_utils.subprocess.run", side_effect=_fake_typst(calls)
+    )
+    with auth_client.application.app_context():
+        db.session.add(Food(fdc_id=90001, description="Label Cache Food"))
+        db.session.add(FoodLabelFacts(fdc_id=90001, energy=100))
+        db.session.commit()
+
+    response = auth_client.get("/generate_nutrition_label/90001")
+    assert response.status_code == 200
+    assert response.mimetype == "application/pdf"
+    etag = response.headers["ETag"]
+    assert not etag.startswith("W/")
+    assert response.headers["Cache-Control"] == "private, no-cache"
+    first_body = response.data
+    assert len(calls) == 1
+
+    # Hits are served from disk without running Typst again
+    response = auth_client.get("/generate_nutrition_label/90001")
+    assert response.data == first_body
+    assert response.headers["ETag"] == etag
+    assert len(calls) == 1
+
+    response = auth_client.get(
+        "/generate_nutrition_label/90001", headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 304
+
+    # Changing the label content compiles a new label under a new key
+    with auth_client.application.app_context():
+        db.session.get(FoodLabelFacts, 90001).energy = 120
+        db.session.commit()
+    response = auth_client.get("/generate_nutrition_label/90001")
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert len(calls) == 2
+
+
+def test_label_cache_evicts_least_recently_used(tmp_path):
+    cache = LabelCache(str(tmp_path / "labels"), max_bytes=250)
+    keys = [label_cache_key(f"label {i}", "svg") for i in range(3)]
+    cache.put(keys[0], "svg", b"x" * 100)
+    cache.put(keys[1], "svg", b"x" * 100)
+    # Make the first label the most recently used one
+    os.utime(cache._path(keys[1], "svg"), ns=(1, 1))
+    cache.open(keys[0], "svg").close()
+    cache.put(keys[2], "svg", b"x" * 100)
+
+    assert cache.open(keys[1], "svg") is None
+    for key in (keys[0], keys[2]):
+        label_file = cache.open(key, "svg")
+        assert label_file.read() == b"x" * 100
+        label_file.close()
+
+
+def test_label_cache_key_depends_on_format_and_pages():
+    assert label_cache_key("source", "svg") != label_cache_key("source", "pdf")
+    assert label_cache_key("source", "pdf") != label_cache_key("source", "pdf", 1)
+    assert label_cache_key("source", "pdf", 1) == label_cache_key("source", "pdf", 1)
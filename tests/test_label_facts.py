@@ -0,0 +1,93 @@
+import os
+import sqlite3
+
+from import_usda_data import populate_label_facts
+from models import db, Food, FoodLabelFacts, FoodNutrient, Nutrient
+from opennourish.typst_utils import _get_nutrition_label_data, get_label_facts_map
+
+SCHEMA_FILE = os.path.join(os.path.dirname(__file__), "..", "schema_usda.sql")
+
+NUTRIENTS = [
+    (1008, "Energy", "KCAL"),
+    (1062, "Energy", "kJ"),
+    (2047, "Energy (Atwater General Factors)", "KCAL"),
+    (1004, "Total lipid (fat)", "G"),
+    (1093, "Sodium, Na", "MG"),
+    (2000, "Sugars, total including NLEA", "G"),
+    (1063, "Sugars, Total", "G"),
+]
+
+
+def test_importer_precomputes_label_facts():
+    conn = sqlite3.connect(":memory:")
+    cursor = conn.cursor()
+    with open(SCHEMA_FILE) as f:
+        cursor.executescript(f.read())
+    cursor.executemany("INSERT INTO nutrients VALUES (?, ?, ?)", NUTRIENTS)
+    cursor.executemany(
+        "INSERT INTO foods (fdc_id, description) VALUES (?, ?)",
+        [(1, "Kcal Food"), (2, "Atwater Food"), (3, "Bare Food")],
+    )
+    cursor.executemany(
+        "INSERT INTO food_nutrients VALUES (?, ?, ?)",
+        [
+            (1, 1062, 1000.0),
+            (1, 1008, 239.0),
+            (1, 1004, 5.5),
+            (1, 1093, 120.0),
+            (2, 2047, 150.0),
+            (2, 2000, 9.0),
+        ],
+    )
+
+    assert populate_label_facts(cursor) == 3
+
+    cursor.execute(
+        "SELECT fdc_id, energy, fat, sodium, sugars, protein FROM food_label_facts "
+        "ORDER BY fdc_id"
+    )
+    assert cursor.fetchall() == [
+        (1, 239.0, 5.5, 120.0, 0.0, 0.0),
+        (2, 150.0, 0.0, 0.0, 9.0, 0.0),
+        (3, 0.0, 0.0, 0.0, 0.0, 0.0),
+    ]
+    conn.close()
+
+
+def test_label_data_reads_precomputed_row(app_with_db, count_queries):
+    with app_with_db.app_context():
+        db.session.add(Food(fdc_id=80001, description="Facts Food"))
+        db.session.add(FoodLabelFacts(fdc_id=80001, energy=321.0, fat=4.5, iron=1.2))
+        db.session.commit()
+
+        with count_queries() as statements:
+            food, label_fields, nutrients = _get_nutrition_label_data(80001)
+        assert not [s for s in statements if "food_nutrients" in s]
+        assert food.description == "Facts Food"
+        assert nutrients["Energy"] == 321.0
+        assert nutrients["Total lipid (fat)"] == 4.5
+        assert nutrients["Iron"] == 1.2
+        assert nutrients["Sodium"] == 0.0
+        assert set(nutrients) == set(label_fields)
+
+
+def test_label_facts_fall_back_to_nutrients(app_with_db):
+    with app_with_db.app_context():
+        db.session.add(Food(fdc_id=80002, description="Legacy Food"))
+        db.session.add_all(
+            Nutrient(id=nutrient_id, name=name, unit_name=unit)
+            for nutrient_id, name, unit in NUTRIENTS
+        )
+        db.session.add_all(
+            [
+                FoodNutrient(fdc_id=80002, nutrient_id=1062, amount=1000.0),
+                FoodNutrient(fdc_id=80002, nutrient_id=1008, amount=239.0),
+                FoodNutrient(fdc_id=80002, nutrient_id=1093, amount=75.0),
+            ]
+        )
+        db.session.commit()
+
+        facts = get_label_facts_map([80002])[80002]
+        assert facts["energy"] == 239.0
+        assert facts["sodium"] == 75.0
+        assert facts["potassium"] == 0.0
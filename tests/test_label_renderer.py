@@ -0,0 +1,74 @@
+import threading
+
+import pytest
+
+from models import db, Food
+from opennourish.label_renderer import LabelRenderer, LabelRendererBusy
+
+
+def test_concurrent_requests_for_same_label_are_coalesced():
+    renderer = LabelRenderer(max_concurrency=2, queue_timeout=5)
+    release = threading.Event()
+    calls = []
+
+    def compile_label():
+        calls.append(1)
+        release.wait(5)
+        return b"label"
+
+    results = []
+    threads = [
+        threading.Thread(
+            target=lambda: results.append(renderer.render("same", compile_label))
+        )
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == [b"label"] * 5
+    assert len(calls) == 1
+
+
+def test_full_queue_and_slow_labels_raise_busy():
+    renderer = LabelRenderer(
+        max_concurrency=1, max_queue=1, queue_timeout=0.05, retry_after=7
+    )
+    release = threading.Event()
+
+    def slow_label():
+        release.wait(5)
+        return b"slow"
+
+    # The first label occupies the only worker, the second waits in the queue
+    with pytest.raises(LabelRendererBusy):
+        renderer.render("first", slow_label)
+    with pytest.raises(LabelRendererBusy):
+        renderer.render("second", slow_label)
+
+    # A third distinct label is rejected at once
+    with pytest.raises(LabelRendererBusy) as excinfo:
+        renderer.render("third", lambda: b"never")
+    assert excinfo.value.retry_after == 7
+
+    release.set()
+    renderer.queue_timeout = 5
+    # Labels that outlived their waiters still finish
+    assert renderer.render("first", lambda: b"unused") in (b"slow", b"unused")
+    assert renderer.render("third", lambda: b"third") == b"third"
+
+
+def test_label_route_returns_503_when_busy(auth_client, mocker):
+    with auth_client.application.app_context():
+        db.session.add(Food(fdc_id=90002, description="Busy Label Food"))
+        db.session.commit()
+
+    renderer = auth_client.application.extensions["label_renderer"]
+    mocker.patch.object(renderer, "render", side_effect=LabelRendererBusy(9))
+
+    response = auth_client.get("/generate_nutrition_label/90002")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "9"
@@ -0,0 +1,105 @@
+import os
+import subprocess
+
+import pytest
+
+from models import db, FoodCategory, MyFood, Recipe, User
+
+
+@pytest.fixture
+def typst_sources(mocker):
+    """Replaces the typst binary and records the source of each compilation."""
+    sources = []
+
+    def run(command, cwd=None, **kwargs):
+        with open(os.path.join(cwd, command[-2]), encoding="utf-8") as f:
+            sources.append(f.read())
+        with open(os.path.join(cwd, command[-1]), "wb") as f:
+            f.write(b"%PDF-1.7 fake")
+        return subprocess.CompletedProcess(command, 0, "", "")
+
+    mocker.patch("opennourish.typst_utils.subprocess.run", side_effect=run)
+    return sources
+
+
+def _seed_foods(user_id, count, category_id=None):
+    foods = [
+        MyFood(
+            user_id=user_id,
+            description=f"Sheet Food {i:03d}",
+            calories_per_100g=100 + i,
+            food_category_id=category_id,
+        )
+        for i in range(count)
+    ]
+    db.session.add_all(foods)
+    db.session.commit()
+    return [food.id for food in foods]
+
+
+def test_my_food_labels_compile_once(auth_client, typst_sources):
+    with auth_client.application.app_context():
+        user = User.query.filter_by(username="testuser").first()
+        _seed_foods(user.id, 100)
+        other = User(username="sheetother", email="sheetother@example.com")
+        db.session.add(other)
+        db.session.flush()
+        db.session.add(MyFood(user_id=other.id, description="Not My Food"))
+        db.session.commit()
+
+    response = auth_client.get("/my_foods/labels")
+    assert response.status_code == 200
+    assert response.mimetype == "application/pdf"
+    assert len(typst_sources) == 1
+    source = typst_sources[0]
+    assert source.count("#pagebreak(weak: true)") == 99
+    assert "Sheet Food 000" in source and "Sheet Food 099" in source
+    assert "Not My Food" not in source
+
+
+def test_my_food_labels_for_selection_and_category(auth_client, typst_sources):
+    with auth_client.application.app_context():
+        user = User.query.filter_by(username="testuser").first()
+        category = FoodCategory(description="Snacks", user_id=user.id)
+        db.session.add(category)
+        db.session.commit()
+        category_id = category.id
+        snack_ids = _seed_foods(user.id, 3, category_id=category_id)
+        db.session.add(MyFood(user_id=user.id, description="Uncategorized Food"))
+        db.session.commit()
+
+    response = auth_client.post(
+        "/my_foods/labels", data={"food_ids": snack_ids[:2], "layout": "details"}
+    )
+    assert response.status_code == 200
+    assert "Sheet Food 000" in typst_sources[-1]
+    assert "Sheet Food 002" not in typst_sources[-1]
+    assert "== My Food:" in typst_sources[-1]
+
+    response = auth_client.get(f"/my_foods/labels?category_id={category_id}")
+    assert response.status_code == 200
+    assert "Sheet Food 002" in typst_sources[-1]
+    assert "Uncategorized Food" not in typst_sources[-1]
+
+
+def test_labels_with_empty_selection_redirect(auth_client, typst_sources):
+    response = auth_client.get("/my_foods/labels", follow_redirects=True)
+    assert b"No foods found to print labels for." in response.data
+    response = auth_client.get("/recipes/labels", follow_redirects=True)
+    assert b"No recipes found to print labels for." in response.data
+    assert typst_sources == []
+
+
+def test_recipe_labels_compile_once(auth_client, typst_sources):
+    with auth_client.application.app_context():
+        user = User.query.filter_by(username="testuser").first()
+        db.session.add_all(
+            Recipe(user_id=user.id, name=f"Sheet Recipe {i}", servings=1)
+            for i in range(5)
+        )
+        db.session.commit()
+
+    response = auth_client.get("/recipes/labels")
+    assert response.status_code == 200
+    assert len(typst_sources) == 1
+    assert all(f"Sheet Recipe {i}" in typst_sources[0] for i in range(5))
@@ -0,0 +1,118 @@
+import re
+import xml.etree.ElementTree as ET
+
+from models import db, Food, FoodLabelFacts, Recipe, UnifiedPortion, User
+from opennourish.typst_utils import (
+    _generate_typst_content,
+    _generate_typst_content_recipe,
+    _get_nutrition_label_data,
+    _recipe_nutrients_for_label,
+)
+
+NUTRIENT_PATTERN = re.compile(r'value: (-?[\d.]+), unit: "(\w+)"')
+
+
+def _typst_amounts(typst_content):
+    """Returns the calories and every nutrient amount of a Typst label source."""
+    calories = re.search(r'calories: "(-?\d+)"', typst_content).group(1)
+    amounts = [
+        f"{value}{unit}" for value, unit in NUTRIENT_PATTERN.findall(typst_content)
+    ]
+    return calories, amounts
+
+
+def _svg_text(svg):
+    return "".join(ET.fromstring(svg).itertext())
+
+
+def test_usda_preview_matches_typst_label(auth_client, mocker):
+    typst = mocker.patch("opennourish.typst_utils.subprocess.run")
+    with auth_client.application.app_context():
+        db.session.add(Food(fdc_id=90010, description="Preview Food"))
+        db.session.add(
+            FoodLabelFacts(
+                fdc_id=90010,
+                energy=239,
+                fat=5.55,
+                saturated_fat=1.2,
+                sodium=120,
+                carbs=30.4,
+                fiber=2.1,
+                added_sugars=0.5,
+                protein=8,
+                iron=1.23,
+                potassium=400,
+            )
+        )
+        db.session.add(
+            UnifiedPortion(
+                fdc_id=90010,
+                seq_num=1,
+                amount=1,
+                measure_unit_description="cup",
+                gram_weight=240,
+            )
+        )
+        db.session.commit()
+
+    response = auth_client.get("/nutrition_label_svg/90010")
+    assert response.status_code == 200
+    assert response.mimetype == "image/svg+xml"
+    typst.assert_not_called()
+    svg_text = _svg_text(response.get_data(as_text=True))
+
+    with auth_client.application.app_context():
+        food, label_fields, nutrients = _get_nutrition_label_data(90010)
+        typst_content = _generate_typst_content(food, label_fields, nutrients)
+    calories, amounts = _typst_amounts(typst_content)
+    assert calories == "574"
+    assert f"Calories{calories}" in svg_text
+    assert "Serving size1 cup (240g)" in svg_text
+    assert len(amounts) == 14
+    for amount in amounts:
+        assert amount in svg_text
+    assert "Total Fat 13.3g17%" in svg_text
+
+    etag = response.headers["ETag"]
+    response = auth_client.get(
+        "/nutrition_label_svg/90010", headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 304
+
+
+def test_recipe_preview_matches_typst_label(auth_client, mocker):
+    typst = mocker.patch("opennourish.typst_utils.subprocess.run")
+    with auth_client.application.app_context():
+        user = User.query.filter_by(username="testuser").first()
+        recipe = Recipe(
+            user_id=user.id,
+            name="Preview <Recipe>",
+            servings=4,
+            calories_per_100g=180,
+            fat_per_100g=7.25,
+            sodium_mg_per_100g=2300,
+            carbs_per_100g=22,
+            protein_per_100g=6.5,
+            calcium_mg_per_100g=130,
+        )
+        db.session.add(recipe)
+        db.session.commit()
+        recipe_id = recipe.id
+
+    response = auth_client.get(f"/recipes/{recipe_id}/nutrition-label.svg")
+    assert response.status_code == 200
+    typst.assert_not_called()
+    svg_text = _svg_text(response.get_data(as_text=True))
+
+    with auth_client.application.app_context():
+        recipe = db.session.get(Recipe, recipe_id)
+        typst_content = _generate_typst_content_recipe(
+            recipe, _recipe_nutrients_for_label(recipe), svg_only=True
+        )
+    calories, amounts = _typst_amounts(typst_content)
+    assert f"Calories{calories}" in svg_text
+    assert "4.0 servings per container" in svg_text
+    for amount in amounts:
+        assert amount in svg_text
+    assert "Sodium 2300mg100%" in svg_text
+    assert "Calcium 130mg10%" in svg_text
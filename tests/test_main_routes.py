@@ -1,5 +1,5 @@
 from flask import url_for
-from models import db, Food
+from models import db, Food, PrunedNutrient
 
 
 def test_index_redirects_authenticated(auth_client_onboarded):
@@ -53,6 +53,22 @@ def test_food_detail_success(client, sample_usda_food):
     assert sample_usda_food.description.encode() in response.data
 
 
+def test_food_detail_notes_pruned_nutrients(client, sample_usda_food):
+    """
+    Tests that the food detail page says its nutrient list is reduced when
+    the importer pruned nutrients from the USDA database.
+    """
+    url = url_for("main.food_detail", fdc_id=sample_usda_food.fdc_id)
+    assert b"reduced set of nutrients" not in client.get(url).data
+
+    db.session.add(PrunedNutrient(id=1051))
+    db.session.commit()
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert b"reduced set of nutrients" in response.data
+
+
 def test_upc_search_not_found(client):
     """
     Tests that the UPC search returns a 404 JSON response for a non-existent barcode.
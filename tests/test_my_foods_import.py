@@ -408,3 +408,90 @@ def test_import_updates_gram_weight_from_macros(auth_client):
         portion = UnifiedPortion.query.filter_by(my_food_id=food.id).first()
         assert portion is not None
         assert portion.gram_weight == calculated_weight
+
+
+def test_bulk_import_validates_first_and_inserts_in_batches(auth_client, count_queries):
+    from opennourish.my_foods import routes
+
+    food_data = [
+        {
+            "description": f"Bulk Food {i}",
+            "category": "bulk snacks" if i % 2 else "Bulk Snacks",
+            "portions": [
+                {"amount": 1, "measure_unit_description": "bar", "gram_weight": 40},
+                {"amount": 1, "measure_unit_description": "g", "gram_weight": 1},
+            ],
+            "nutrition_facts": {"calories": 200, "protein_grams": 10},
+        }
+        for i in range(2500)
+    ]
+    food_data += [
+        {"description": "Bad Sodium", "serving": {"gram_weight": 10}},
+        {
+            "description": "Bad Sodium",
+            "serving": {"gram_weight": 10},
+            "nutrition_facts": {"calories": 10, "sodium_milligrams": "lots"},
+        },
+        "not a food",
+    ]
+    progress = []
+    with auth_client.application.app_context():
+        with count_queries() as statements:
+            added, skipped = routes._import_my_foods(
+                food_data, 1, progress=lambda done, total: progress.append(done)
+            )
+        assert added == 2500
+        assert skipped == [
+            ("Bad Sodium", "Invalid data (serving/calories)"),
+            ("Bad Sodium", "Invalid data (nutrition facts)"),
+            ("Unnamed Item", "Invalid entry"),
+        ]
+        assert progress == [1000, 2000, 2500]
+        # Bulk inserts instead of a flush per food
+        assert len(statements) < 40
+
+        assert MyFood.query.count() == 2500
+        assert UnifiedPortion.query.count() == 5000
+        assert FoodCategory.query.filter_by(user_id=1).count() == 1
+        food = MyFood.query.filter_by(description="Bulk Food 7").first()
+        assert food.calories_per_100g == pytest.approx(500)
+        assert [p.gram_weight for p in food.portions] == [40, 1]
+        assert food.food_category.description == "Bulk Snacks"
+
+
+def test_import_uses_libyaml_loader_when_available():
+    import yaml
+    from opennourish.export_utils import YAML_LOADER
+
+    assert YAML_LOADER is getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+def test_import_never_puts_food_in_category_named_like_itself(auth_client):
+    """
+    A category another item of the import creates is not assigned to a food
+    whose description is the category's name.
+    """
+    from opennourish.my_foods import routes
+
+    food_data = [
+        {
+            "description": "Granola",
+            "category": "Granola",
+            "serving": {"gram_weight": 50},
+            "nutrition_facts": {"calories": 200},
+        },
+        {
+            "description": "Honey Granola",
+            "category": "granola",
+            "serving": {"gram_weight": 50},
+            "nutrition_facts": {"calories": 210},
+        },
+    ]
+    with auth_client.application.app_context():
+        added, skipped = routes._import_my_foods(food_data, 1)
+        assert (added, skipped) == (2, [])
+
+        granola = MyFood.query.filter_by(description="Granola").first()
+        assert granola.food_category_id is None
+        honey = MyFood.query.filter_by(description="Honey Granola").first()
+        assert honey.food_category.description == "granola"
@@ -0,0 +1,90 @@
+"""
+Query-plan regression tests.
+
+Each query below mirrors a hot query from the diary, dashboard, search and
+friends routes. The test fails if SQLite would answer it with a full table
+scan, which means a supporting index was dropped or the query changed shape.
+"""
+
+from datetime import date
+
+import pytest
+from sqlalchemy import or_, select
+
+from models import (
+    CheckIn,
+    DailyLog,
+    ExerciseLog,
+    FastingSession,
+    Friendship,
+    MyFood,
+    MyMeal,
+    MyMealItem,
+    Recipe,
+    RecipeIngredient,
+    UnifiedPortion,
+    UserGoal,
+)
+
+TODAY = date(2025, 3, 3)
+WEEK_START = date(2025, 3, 1)
+
+HOT_QUERIES = {
+    # Diary
+    "diary_logs_for_day": select(DailyLog).filter_by(user_id=1, log_date=TODAY),
+    "exercise_logs_for_day": select(ExerciseLog).filter_by(user_id=1, log_date=TODAY),
+    "user_goal": select(UserGoal).filter_by(user_id=1),
+    "active_fast": select(FastingSession).filter_by(user_id=1, status="active"),
+    "portions_for_my_foods": select(UnifiedPortion).where(
+        UnifiedPortion.my_food_id.in_([1, 2])
+    ),
+    "portions_for_recipes": select(UnifiedPortion).where(
+        UnifiedPortion.recipe_id.in_([1, 2])
+    ),
+    "portions_for_usda_foods": select(UnifiedPortion).where(
+        UnifiedPortion.fdc_id.in_([1, 2])
+    ),
+    "portions_for_loader": select(UnifiedPortion).where(
+        or_(
+            UnifiedPortion.fdc_id.in_([1, 2]),
+            UnifiedPortion.my_food_id.in_([1, 2]),
+            UnifiedPortion.recipe_id.in_([1, 2]),
+        )
+    ),
+    "recipe_ingredients": select(RecipeIngredient).where(
+        RecipeIngredient.recipe_id.in_([1, 2])
+    ),
+    "my_meal_items": select(MyMealItem).where(MyMealItem.my_meal_id.in_([1, 2])),
+    # Dashboard
+    "latest_check_in": select(CheckIn)
+    .filter_by(user_id=1)
+    .order_by(CheckIn.checkin_date.desc()),
+    "check_ins_since": select(CheckIn).where(
+        CheckIn.user_id == 1, CheckIn.checkin_date >= WEEK_START
+    ),
+    "diary_logs_for_range": select(DailyLog).where(
+        DailyLog.user_id == 1, DailyLog.log_date.between(WEEK_START, TODAY)
+    ),
+    "exercise_logs_for_range": select(ExerciseLog).where(
+        ExerciseLog.user_id == 1, ExerciseLog.log_date.between(WEEK_START, TODAY)
+    ),
+    # Search
+    "search_my_foods": select(MyFood).where(
+        MyFood.user_id.in_([1, 2]), MyFood.is_placeholder.is_(False)
+    ),
+    "search_recipes": select(Recipe).where(
+        or_(Recipe.user_id.in_([1, 2]), Recipe.is_public)
+    ),
+    "search_my_meals": select(MyMeal).where(MyMeal.user_id == 1),
+    # Friends
+    "pending_requests_received": select(Friendship).filter_by(
+        receiver_id=1, status="pending"
+    ),
+    "friendships_sent": select(Friendship).filter_by(requester_id=1, status="accepted"),
+}
+
+
+@pytest.mark.parametrize("name", sorted(HOT_QUERIES))
+def test_hot_queries_use_indexes(app_with_db, assert_uses_indexes, name):
+    with app_with_db.app_context():
+        assert_uses_indexes(name, HOT_QUERIES[name])
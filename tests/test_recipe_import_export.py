@@ -1,3 +1,4 @@
+import pytest
 import yaml
 from flask import url_for
 from models import db, Recipe, MyFood, RecipeIngredient, User, UnifiedPortion
@@ -379,3 +380,120 @@ recipes:
         recipe = Recipe.query.filter_by(name="Placeholder Test Recipe").first()
         assert recipe is not None
         assert len(recipe.ingredients) == 1
+
+
+def _bundle(levels, recipes_per_level):
+    """A bundle whose recipes each use a food and a recipe of the level below."""
+    foods = [
+        {
+            "description": f"Bundle Food {i}",
+            "category": "Bundle Pantry",
+            "portions": [
+                {"amount": 1, "measure_unit_description": "g", "gram_weight": 1}
+            ],
+            "nutrition_facts": {"calories": 2, "protein_grams": 0.1},
+        }
+        for i in range(recipes_per_level)
+    ]
+    recipes = []
+    # Listed top level first, so the import can't rely on the bundle order
+    for level in reversed(range(levels)):
+        for i in range(recipes_per_level):
+            ingredients = [
+                {
+                    "type": "my_food",
+                    "identifier": f"Bundle Food {i}",
+                    "amount_grams": 100,
+                    "portion": {
+                        "amount": 1,
+                        "measure_unit_description": "g",
+                        "gram_weight": 1,
+                    },
+                }
+            ]
+            if level:
+                ingredients.append(
+                    {
+                        "type": "recipe",
+                        "identifier": f"Bundle Recipe {level - 1}-{i}",
+                        "amount_grams": 100,
+                    }
+                )
+            recipes.append(
+                {
+                    "name": f"Bundle Recipe {level}-{i}",
+                    "servings": 2,
+                    "portions": [
+                        {
+                            "amount": 1,
+                            "measure_unit_description": "serving",
+                            "gram_weight": 100,
+                        }
+                    ],
+                    "ingredients": ingredients,
+                }
+            )
+    return {"dependent_my_foods": foods, "recipes": recipes}
+
+
+def test_import_large_bundle_in_bounded_statements(auth_client, count_queries):
+    with auth_client.application.app_context():
+        with count_queries() as statements:
+            response = auth_client.post(
+                url_for("recipes.import_recipes"),
+                data={"yaml_text": yaml.dump(_bundle(3, 100))},
+                follow_redirects=True,
+            )
+        assert b"Added 300 new recipes and 100 new foods." in response.data
+        assert len(statements) < 40
+
+        user = User.query.filter_by(username="testuser").first()
+        assert Recipe.query.filter_by(user_id=user.id).count() == 300
+        assert RecipeIngredient.query.count() == 500
+        # One serving portion per recipe, one portion per food, reused by
+        # the ingredients
+        assert UnifiedPortion.query.count() == 400
+        top = Recipe.query.filter_by(name="Bundle Recipe 2-7").first()
+        assert top.food_category_id is None
+        assert len(top.ingredients) == 2
+        food_ingredient = next(i for i in top.ingredients if i.my_food_id)
+        portion = db.session.get(UnifiedPortion, food_ingredient.portion_id_fk)
+        assert portion.my_food_id == food_ingredient.my_food_id
+        # 200 kcal/100g food; each level is half food, half the level below
+        base = Recipe.query.filter_by(name="Bundle Recipe 0-7").first()
+        assert base.calories_per_100g == pytest.approx(200)
+        assert top.calories_per_100g == pytest.approx(200)
+        assert top.protein_per_100g == pytest.approx(10)
+        food = MyFood.query.filter_by(description="Bundle Food 7").first()
+        assert food.food_category.description == "Bundle Pantry"
+
+
+def test_import_bundle_with_recipe_cycle(auth_client):
+    yaml_content = """
+recipes:
+  - name: "Cycle A"
+    ingredients:
+      - type: "recipe"
+        identifier: "Cycle B"
+        amount_grams: 50
+      - type: "usda"
+        identifier: 424242
+        amount_grams: 50
+  - name: "Cycle B"
+    ingredients:
+      - type: "recipe"
+        identifier: "Cycle A"
+        amount_grams: 50
+"""
+    response = auth_client.post(
+        url_for("recipes.import_recipes"),
+        data={"yaml_text": yaml_content},
+        follow_redirects=True,
+    )
+    assert b"Added 2 new recipes" in response.data
+    with auth_client.application.app_context():
+        cycle_a = Recipe.query.filter_by(name="Cycle A").first()
+        cycle_b = Recipe.query.filter_by(name="Cycle B").first()
+        assert cycle_a.ingredients[0].recipe_id_link == cycle_b.id
+        assert cycle_b.ingredients[0].recipe_id_link == cycle_a.id
+        assert cycle_a.calories_per_100g == 0
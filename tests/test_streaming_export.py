@@ -0,0 +1,277 @@
+import io
+import json
+import sqlite3
+
+import yaml
+
+from models import db, Food, MyFood, Recipe, RecipeIngredient, UnifiedPortion, User
+from opennourish import create_app
+from opennourish.export_utils import iter_in_batches
+
+
+def _seed_my_foods(count):
+    user = User.query.filter_by(username="testuser").first()
+    for i in range(count):
+        food = MyFood(
+            user_id=user.id,
+            description=f"Stream Food {i}",
+            calories_per_100g=200,
+            protein_per_100g=10,
+        )
+        food.portions = [
+            UnifiedPortion(
+                amount=1, measure_unit_description="slice", gram_weight=50, seq_num=1
+            ),
+            UnifiedPortion(
+                amount=1, measure_unit_description="g", gram_weight=1, seq_num=2
+            ),
+        ]
+        db.session.add(food)
+    db.session.commit()
+    return user
+
+
+def _delete_my_foods():
+    UnifiedPortion.query.delete()
+    MyFood.query.delete()
+    db.session.commit()
+
+
+def test_my_foods_yaml_export_streams_a_reimportable_list(auth_client, count_queries):
+    with auth_client.application.app_context():
+        _seed_my_foods(30)
+
+        with count_queries() as statements:
+            response = auth_client.get("/my_foods/export")
+            assert response.is_streamed
+            body = response.get_data(as_text=True)
+        assert response.mimetype == "application/x-yaml"
+        # Foods, their portions and categories are read in batches
+        assert len(statements) < 10
+
+    items = yaml.safe_load(body)
+    assert len(items) == 30
+    assert items[0]["description"] == "Stream Food 0"
+    assert items[0]["nutrition_facts"]["calories"] == 100
+    assert body == yaml.dump(items, default_flow_style=False, sort_keys=False, indent=2)
+
+    with auth_client.application.app_context():
+        _delete_my_foods()
+    auth_client.post(
+        "/my_foods/import",
+        data={"file": (io.BytesIO(body.encode()), "foods.yaml")},
+        content_type="multipart/form-data",
+    )
+    with auth_client.application.app_context():
+        assert MyFood.query.count() == 30
+        food = MyFood.query.filter_by(description="Stream Food 7").first()
+        assert food.calories_per_100g == 200
+        assert len(food.portions) == 2
+
+
+def test_my_foods_json_lines_export_roundtrip(auth_client):
+    with auth_client.application.app_context():
+        _seed_my_foods(3)
+
+    response = auth_client.get("/my_foods/export?format=jsonl")
+    assert response.mimetype == "application/x-ndjson"
+    assert ".jsonl" in response.headers["Content-Disposition"]
+    lines = response.get_data(as_text=True).splitlines()
+    assert [json.loads(line)["description"] for line in lines] == [
+        "Stream Food 0",
+        "Stream Food 1",
+        "Stream Food 2",
+    ]
+
+    with auth_client.application.app_context():
+        _delete_my_foods()
+    response = auth_client.post(
+        "/my_foods/import",
+        data={"file": (io.BytesIO(response.data), "foods.jsonl")},
+        content_type="multipart/form-data",
+        follow_redirects=True,
+    )
+    assert b"Successfully added 3 new foods." in response.data
+    with auth_client.application.app_context():
+        assert MyFood.query.count() == 3
+
+
+def test_empty_and_unknown_format_exports(auth_client):
+    response = auth_client.get("/my_foods/export")
+    assert yaml.safe_load(response.data) == []
+    response = auth_client.get("/recipes/export")
+    data = yaml.safe_load(response.data)
+    assert data["recipes"] == [] and data["dependent_my_foods"] == []
+
+    response = auth_client.get("/recipes/export?format=xml", follow_redirects=True)
+    assert b"Unsupported export format." in response.data
+
+
+def test_recipe_json_lines_export_roundtrip(auth_client):
+    with auth_client.application.app_context():
+        user = _seed_my_foods(1)
+        food = MyFood.query.first()
+        sauce = Recipe(user_id=user.id, name="Stream Sauce", servings=2)
+        db.session.add(sauce)
+        db.session.flush()
+        pasta = Recipe(user_id=user.id, name="Stream Pasta", servings=4)
+        pasta.ingredients = [
+            RecipeIngredient(my_food_id=food.id, amount_grams=100),
+            RecipeIngredient(recipe_id_link=sauce.id, amount_grams=50),
+        ]
+        db.session.add(pasta)
+        db.session.commit()
+
+    response = auth_client.get("/recipes/export?format=jsonl")
+    records = [
+        json.loads(line) for line in response.get_data(as_text=True).splitlines()
+    ]
+    assert records[0]["format_version"] == 1.0
+    assert [r["recipe"]["name"] for r in records if "recipe" in r] == [
+        "Stream Sauce",
+        "Stream Pasta",
+    ]
+    assert records[-1]["dependent_my_food"]["description"] == "Stream Food 0"
+
+    with auth_client.application.app_context():
+        RecipeIngredient.query.delete()
+        Recipe.query.delete()
+        _delete_my_foods()
+    response = auth_client.post(
+        "/recipes/import",
+        data={"file": (io.BytesIO(response.data), "recipes.jsonl")},
+        content_type="multipart/form-data",
+        follow_redirects=True,
+    )
+    assert b"Added 2 new recipes and 1 new foods." in response.data
+    with auth_client.application.app_context():
+        pasta = Recipe.query.filter_by(name="Stream Pasta").first()
+        assert {i.my_food_id is not None for i in pasta.ingredients} == {True, False}
+        assert any(i.recipe_id_link for i in pasta.ingredients)
+
+
+def test_recipe_export_includes_nested_recipes_in_few_queries(
+    auth_client, count_queries
+):
+    with auth_client.application.app_context():
+        user = _seed_my_foods(1)
+        food = MyFood.query.first()
+        other = User(username="exportchef", email="exportchef@example.com")
+        db.session.add(other)
+        db.session.add(Food(fdc_id=91001, description="Export Butter"))
+        db.session.flush()
+        # Another user's public recipe, nested two levels deep
+        base = Recipe(user_id=other.id, name="Shared Base", is_public=True)
+        base.ingredients = [RecipeIngredient(fdc_id=91001, amount_grams=10)]
+        db.session.add(base)
+        db.session.flush()
+        shared = Recipe(user_id=other.id, name="Shared Sauce", is_public=True)
+        shared.ingredients = [RecipeIngredient(recipe_id_link=base.id, amount_grams=5)]
+        db.session.add(shared)
+        db.session.add(Recipe(user_id=other.id, name="Unrelated Recipe"))
+        db.session.flush()
+        portion = food.portions[0]
+        for i in range(40):
+            recipe = Recipe(user_id=user.id, name=f"Export Dish {i}")
+            recipe.ingredients = [
+                RecipeIngredient(
+                    my_food_id=food.id, amount_grams=50, portion_id_fk=portion.id
+                ),
+                RecipeIngredient(recipe_id_link=shared.id, amount_grams=20),
+                RecipeIngredient(fdc_id=91001, amount_grams=5),
+            ]
+            db.session.add(recipe)
+        db.session.commit()
+
+        with count_queries() as statements:
+            body = auth_client.get("/recipes/export").get_data(as_text=True)
+        assert len(statements) < 15
+
+    data = yaml.safe_load(body)
+    names = [recipe["name"] for recipe in data["recipes"]]
+    assert names[:2] == ["Shared Base", "Shared Sauce"]
+    assert len(names) == 42
+    dish = data["recipes"][2]["ingredients"]
+    assert dish[0]["portion"]["measure_unit_description"] == "slice"
+    assert dish[1]["identifier"] == "Shared Sauce"
+    assert dish[2] == {
+        "amount_grams": 5,
+        "type": "usda",
+        "identifier": 91001,
+        "description": "Export Butter",
+    }
+    assert [food["description"] for food in data["dependent_my_foods"]] == [
+        "Stream Food 0"
+    ]
+
+
+def test_recipe_export_leaves_out_other_users_private_recipes_and_foods(
+    auth_client,
+):
+    with auth_client.application.app_context():
+        user = User.query.filter_by(username="testuser").first()
+        other = User(username="privatechef", email="privatechef@example.com")
+        db.session.add(other)
+        db.session.flush()
+        secret_food = MyFood(
+            user_id=other.id, description="Secret Spice", calories_per_100g=10
+        )
+        db.session.add(secret_food)
+        db.session.flush()
+        # Linked while it was public, since made private
+        secret = Recipe(user_id=other.id, name="Secret Sauce", is_public=False)
+        secret.ingredients = [RecipeIngredient(my_food_id=secret_food.id)]
+        db.session.add(secret)
+        db.session.flush()
+        dish = Recipe(user_id=user.id, name="My Dish")
+        dish.ingredients = [
+            RecipeIngredient(recipe_id_link=secret.id, amount_grams=20),
+            RecipeIngredient(my_food_id=secret_food.id, amount_grams=5),
+        ]
+        db.session.add(dish)
+        db.session.commit()
+
+    data = yaml.safe_load(auth_client.get("/recipes/export").get_data(as_text=True))
+    assert [recipe["name"] for recipe in data["recipes"]] == ["My Dish"]
+    assert data["dependent_my_foods"] == []
+
+
+def test_partly_read_export_does_not_block_writers(tmp_path):
+    # The in-memory test database has a single connection, so this needs
+    # a database file that a second connection can write to
+    database = tmp_path / "user_data.db"
+    app = create_app(
+        {
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{database}",
+            "SQLALCHEMY_BINDS": {"usda": "sqlite:///:memory:"},
+            "SECRET_KEY": "test_secret_key",
+            "LABEL_CACHE_DIR": str(tmp_path / "labels"),
+            "JOB_UPLOAD_DIR": str(tmp_path / "uploads"),
+        }
+    )
+    with app.app_context():
+        db.create_all()
+        user = User(username="streamer", email="streamer@example.com")
+        db.session.add(user)
+        db.session.flush()
+        db.session.add_all(
+            MyFood(user_id=user.id, description=f"Locked Food {i}") for i in range(5)
+        )
+        db.session.commit()
+
+        foods = iter_in_batches(
+            db.select(MyFood).order_by(MyFood.id), MyFood.id, batch_size=2
+        )
+        assert next(foods).description == "Locked Food 0"
+
+        writer = sqlite3.connect(database, timeout=0)
+        writer.execute("UPDATE my_foods SET upc = '123'")
+        writer.commit()
+        writer.close()
+
+        assert [food.description for food in foods] == [
+            f"Locked Food {i}" for i in range(1, 5)
+        ]
+        db.session.remove()
+        db.drop_all()
@@ -0,0 +1,154 @@
+import threading
+
+from flask import g
+from sqlalchemy import text
+
+from import_usda_data import import_usda_data
+from models import db, Food, MyMeal, MyMealItem, User
+from opennourish import create_app
+from opennourish.cache import (
+    UsdaFood,
+    UsdaFoodCache,
+    bump_usda_generation,
+    get_data_versions,
+    get_usda_food,
+    get_usda_foods,
+)
+
+
+def _seed_usda_foods(*fdc_ids):
+    for fdc_id in fdc_ids:
+        db.session.add(Food(fdc_id=fdc_id, description=f"Cached Food {fdc_id}"))
+    db.session.commit()
+
+
+def test_usda_foods_are_loaded_once(app_with_db, count_queries):
+    with app_with_db.app_context():
+        _seed_usda_foods(70001, 70002)
+
+        with count_queries() as statements:
+            foods = get_usda_foods([70001, 70002, 79999])
+        assert len(statements) == 1
+        assert set(foods) == {70001, 70002}
+        assert foods[70001] == UsdaFood(70001, "Cached Food 70001", None, None, None)
+
+        with count_queries() as statements:
+            assert get_usda_food(70002).description == "Cached Food 70002"
+            assert get_usda_foods([70001, 70002]).keys() == {70001, 70002}
+        assert statements == []
+
+        # Unknown ids are looked up again rather than cached as missing
+        with count_queries() as statements:
+            assert get_usda_food(79999) is None
+        assert len(statements) == 1
+
+
+def test_usda_food_cache_is_invalidated_by_generation(app_with_db, count_queries):
+    with app_with_db.app_context():
+        _seed_usda_foods(70003)
+        assert get_usda_food(70003).description == "Cached Food 70003"
+
+        food = db.session.get(Food, 70003)
+        food.description = "Renamed Food"
+        db.session.commit()
+        assert get_usda_food(70003).description == "Renamed Food"
+
+        Food.query.filter_by(fdc_id=70003).update({"description": "Bulk Renamed"})
+        db.session.commit()
+        assert get_usda_food(70003).description == "Bulk Renamed"
+
+        get_usda_food(70003)
+        bump_usda_generation()
+        with count_queries() as statements:
+            get_usda_food(70003)
+        assert len(statements) == 1
+
+
+def test_meal_item_food_uses_cache(app_with_db, count_queries):
+    with app_with_db.app_context():
+        _seed_usda_foods(70004)
+        user = User(username="cacheuser", email="cacheuser@example.com")
+        db.session.add(user)
+        db.session.flush()
+        meal = MyMeal(user_id=user.id, name="Cached Meal")
+        db.session.add(meal)
+        db.session.flush()
+        item = MyMealItem(my_meal_id=meal.id, fdc_id=70004, amount_grams=10)
+        db.session.add(item)
+        db.session.commit()
+
+        assert item.food.description == "Cached Food 70004"
+        with count_queries() as statements:
+            assert item.food.fdc_id == 70004
+        assert statements == []
+
+
+def test_usda_food_cache_is_bounded_and_thread_safe(app_with_db):
+    with app_with_db.app_context():
+        _seed_usda_foods(*range(71000, 71050))
+        cache = UsdaFoodCache(maxsize=20)
+        errors = []
+
+        def worker(offset):
+            with app_with_db.app_context():
+                try:
+                    for fdc_id in range(71000 + offset, 71050, 5):
+                        record = cache.get_many([fdc_id])[fdc_id]
+                        assert record.description == f"Cached Food {fdc_id}"
+                except Exception as exc:  # pragma: no cover - reported below
+                    errors.append(exc)
+                finally:
+                    db.session.remove()
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert errors == []
+        assert len(cache) == 20
+
+
+def test_swapped_usda_database_is_picked_up(tmp_path, write_usda_release, rewrite_csv):
+    release_dir = tmp_path / "usda_data"
+    release_dir.mkdir()
+    write_usda_release(release_dir, food_count=30)
+    usda_file = tmp_path / "usda_data.db"
+    import_usda_data(str(usda_file), usda_data_dir=str(release_dir))
+    app = create_app(
+        {
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
+            "SQLALCHEMY_BINDS": {"usda": f"sqlite:///{usda_file}"},
+            "SECRET_KEY": "test_secret_key",
+            "LABEL_CACHE_DIR": str(tmp_path / "label_cache"),
+        }
+    )
+    with app.app_context():
+        db.create_all(bind_key=None)
+        fdc_id = db.session.scalar(db.select(Food.fdc_id).order_by(Food.fdc_id))
+        description = get_usda_food(fdc_id).description
+        version = get_data_versions().user_version(1)
+        db.session.remove()
+        # A request still running on the old database
+        in_flight = db.engines["usda"].connect()
+        query = text(f"SELECT description FROM foods WHERE fdc_id = {fdc_id}")
+        assert in_flight.execute(query).scalar() == description
+
+        rewrite_csv(
+            release_dir / "food.csv",
+            lambda row: [row[0], row[1], f"swapped {row[2]}", *row[3:]],
+        )
+        import_usda_data(str(usda_file), usda_data_dir=str(release_dir))
+
+        with app.test_request_context():
+            app.preprocess_request()
+            assert g.usda_generation == 1
+            assert get_usda_food(fdc_id).description == f"Swapped {description}"
+        assert get_data_versions().user_version(1) != version
+        assert in_flight.execute(query).scalar() == description
+        in_flight.close()
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
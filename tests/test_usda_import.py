@@ -0,0 +1,264 @@
+import hashlib
+import json
+import logging
+import sqlite3
+
+import pytest
+
+import import_usda_data as importer
+from import_usda_data import import_usda_data, update_usda_data
+from models import db, Nutrient, PrunedNutrient
+from opennourish.utils import check_pruned_nutrients
+
+
+def table_rows(db_file, table):
+    with sqlite3.connect(db_file) as conn:
+        rows = conn.execute(f"SELECT * FROM {table} ORDER BY 1, 2").fetchall()
+    conn.close()
+    return rows
+
+
+def test_import_filters_foods_without_energy(tmp_path, usda_release):
+    release_dir, food_nutrient_rows = usda_release
+    db_file = tmp_path / "usda.db"
+    import_usda_data(str(db_file), usda_data_dir=str(release_dir))
+
+    foods = table_rows(db_file, "foods")
+    fdc_ids = {row[0] for row in foods}
+    energy_ids = {
+        fdc_id
+        for _, fdc_id, nutrient_id, amount in food_nutrient_rows
+        if nutrient_id in (1008, 2047) and amount > 0
+    }
+    assert fdc_ids == energy_ids - {999999}
+    food = next(row for row in foods if row[2] == "branded_food" and row[4])
+    assert food[1].startswith("Food ") and food[1].endswith("(Raw) Mix")
+
+    # The first value of a (food, nutrient) pair in the file wins
+    expected = {}
+    for _, fdc_id, nutrient_id, amount in food_nutrient_rows:
+        if fdc_id in energy_ids and amount > 0:
+            expected.setdefault((fdc_id, nutrient_id), float(amount))
+    food_nutrients = table_rows(db_file, "food_nutrients")
+    assert {(row[0], row[1]): row[2] for row in food_nutrients} == expected
+    assert len(food_nutrients) == len(expected)
+    assert len(table_rows(db_file, "food_label_facts")) == len(foods)
+
+
+def test_import_keeps_newest_upc_only(tmp_path, usda_release):
+    release_dir, _ = usda_release
+    db_file = tmp_path / "usda.db"
+    import_usda_data(
+        str(db_file), keep_newest_upc_only=True, usda_data_dir=str(release_dir)
+    )
+
+    upcs = [row[4] for row in table_rows(db_file, "foods") if row[4]]
+    assert upcs and len(upcs) == len(set(upcs))
+
+
+def test_bulk_load_matches_a_durable_build(tmp_path, usda_release):
+    release_dir, _ = usda_release
+    bulk_file = tmp_path / "bulk.db"
+    durable_file = tmp_path / "durable.db"
+    import_usda_data(str(bulk_file), usda_data_dir=str(release_dir))
+    import_usda_data(str(durable_file), usda_data_dir=str(release_dir), bulk_load=False)
+
+    for table in ("foods", "nutrients", "food_nutrients", "food_label_facts"):
+        assert table_rows(bulk_file, table) == table_rows(durable_file, table)
+    assert not (tmp_path / "bulk.db.build").exists()
+    with sqlite3.connect(bulk_file) as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone() == ("delete",)
+        assert conn.execute("PRAGMA integrity_check").fetchone() == ("ok",)
+        indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master")}
+        assert "idx_foods_upc" in indexes
+        # ANALYZE's statistics are part of the copy
+        assert conn.execute("SELECT COUNT(*) FROM sqlite_stat1").fetchone()[0] > 0
+    conn.close()
+
+
+def database_checksum(db_file):
+    checksum = hashlib.sha256()
+    for table in ("foods", "nutrients", "food_nutrients", "food_label_facts"):
+        for row in table_rows(db_file, table):
+            checksum.update(repr(row).encode())
+    return checksum.hexdigest()
+
+
+def test_parallel_import_matches_serial_import(tmp_path, usda_release, monkeypatch):
+    release_dir, _ = usda_release
+    # Small chunks, so each file is split many times, also inside quoted
+    # ingredients that span lines
+    monkeypatch.setattr(importer, "CSV_CHUNK_BYTES", 512)
+    chunks = importer.csv_chunks(release_dir / "branded_food.csv")
+    assert len(chunks) > 3
+
+    serial_file = tmp_path / "serial.db"
+    parallel_file = tmp_path / "parallel.db"
+    import_usda_data(str(serial_file), usda_data_dir=str(release_dir))
+    import_usda_data(str(parallel_file), usda_data_dir=str(release_dir), workers=2)
+
+    assert database_checksum(parallel_file) == database_checksum(serial_file)
+    ingredients = {row[5] for row in table_rows(parallel_file, "foods")}
+    assert 'Cane "Raw" Sugar,\nSea Salt' in ingredients
+
+
+def test_update_applies_only_the_changes_of_a_new_release(
+    tmp_path, usda_release, write_usda_release, rewrite_csv
+):
+    release_dir, _ = usda_release
+    db_file = tmp_path / "usda.db"
+    import_usda_data(str(db_file), usda_data_dir=str(release_dir), release="2024-04")
+    old_ids = [row[0] for row in table_rows(db_file, "foods")]
+    deleted_id, changed_id = old_ids[0], old_ids[1]
+
+    # The next release adds foods, drops one and changes another's values
+    new_dir = tmp_path / "usda_data_new"
+    new_dir.mkdir()
+    write_usda_release(new_dir, food_count=330)
+    rewrite_csv(new_dir / "food.csv", lambda row: row[0] != str(deleted_id) and row)
+    rewrite_csv(
+        new_dir / "food_nutrient.csv",
+        lambda row: (
+            row[:3] + [float(row[3]) * 2] if row[1] == str(changed_id) else row
+        ),
+    )
+    expected_file = tmp_path / "expected.db"
+    import_usda_data(str(expected_file), usda_data_dir=str(new_dir))
+    unchanged_id = next(
+        fdc_id
+        for fdc_id in old_ids[2:]
+        if [row for row in table_rows(db_file, "food_nutrients") if row[0] == fdc_id]
+        == [
+            row
+            for row in table_rows(expected_file, "food_nutrients")
+            if row[0] == fdc_id
+        ]
+    )
+
+    user_db = tmp_path / "user_data.db"
+    with sqlite3.connect(user_db) as conn:
+        conn.execute("CREATE TABLE daily_logs (id INTEGER PRIMARY KEY, fdc_id)")
+        conn.execute("CREATE TABLE recipe_ingredients (id INTEGER PRIMARY KEY, fdc_id)")
+        conn.executemany(
+            "INSERT INTO daily_logs (fdc_id) VALUES (?)",
+            [(deleted_id,), (changed_id,), (changed_id,), (unchanged_id,), (None,)],
+        )
+        conn.execute(
+            "INSERT INTO recipe_ingredients (fdc_id) VALUES (?)", (changed_id,)
+        )
+    conn.close()
+
+    affected = update_usda_data(
+        str(db_file),
+        usda_data_dir=str(new_dir),
+        release="2024-10",
+        user_db_file=str(user_db),
+        batch_size=7,
+    )
+
+    assert database_checksum(db_file) == database_checksum(expected_file)
+    assert affected == {
+        "daily_logs": {"deleted": [deleted_id], "changed": [changed_id]},
+        "recipe_ingredients": {"deleted": [], "changed": [changed_id]},
+    }
+    releases = table_rows(db_file, "usda_releases")
+    assert [row[1:3] for row in releases] == [
+        ("2024-04", "import"),
+        ("2024-10", "update"),
+    ]
+    changes = json.loads(releases[1][4])
+    assert changes["foods"]["inserted"] > 0
+    assert changes["foods"]["deleted"] == 1
+    assert changes["food_nutrients"]["updated"] > 0
+    assert not (tmp_path / "usda.db.release").exists()
+
+    # Updating to the same release again changes nothing
+    affected = update_usda_data(
+        str(db_file), usda_data_dir=str(new_dir), user_db_file=str(user_db)
+    )
+    assert affected == {}
+    changes = json.loads(table_rows(db_file, "usda_releases")[2][4])
+    assert all(count == 0 for table in changes.values() for count in table.values())
+
+
+def test_import_swaps_a_validated_database_into_place(
+    tmp_path, usda_release, write_usda_release, rewrite_csv
+):
+    release_dir, _ = usda_release
+    db_file = tmp_path / "usda.db"
+    import_usda_data(str(db_file), usda_data_dir=str(release_dir), release="2024-04")
+    conn = sqlite3.connect(db_file)
+    foods = conn.execute("SELECT * FROM foods ORDER BY fdc_id").fetchall()
+
+    # A release without foods fails validation and leaves the database alone
+    empty_dir = tmp_path / "empty_release"
+    empty_dir.mkdir()
+    write_usda_release(empty_dir)
+    rewrite_csv(empty_dir / "food.csv", lambda row: None)
+    with pytest.raises(SystemExit):
+        import_usda_data(str(db_file), usda_data_dir=str(empty_dir))
+    assert table_rows(db_file, "foods") == foods
+    assert importer.current_release(str(db_file)) == "2024-04"
+    assert not (tmp_path / "usda.db.new").exists()
+
+    # A connection open on the old database keeps reading it after the swap
+    new_dir = tmp_path / "new_release"
+    new_dir.mkdir()
+    write_usda_release(new_dir, food_count=30)
+    import_usda_data(str(db_file), usda_data_dir=str(new_dir), release="2024-10")
+    assert conn.execute("SELECT * FROM foods ORDER BY fdc_id").fetchall() == foods
+    conn.close()
+    assert len(table_rows(db_file, "foods")) < len(foods)
+    assert importer.current_release(str(db_file)) == "2024-10"
+
+    with pytest.raises(importer.InvalidDatabaseError, match="instead of 1"):
+        importer.validate_database(str(db_file), {"nutrients": 1})
+
+
+def test_import_keeps_only_the_allowed_nutrients(tmp_path, usda_release):
+    release_dir, _ = usda_release
+    full_file = tmp_path / "full.db"
+    pruned_file = tmp_path / "pruned.db"
+    import_usda_data(str(full_file), usda_data_dir=str(release_dir))
+    import_usda_data(
+        str(pruned_file),
+        usda_data_dir=str(release_dir),
+        keep_nutrients=importer.REFERENCED_NUTRIENTS,
+    )
+
+    # Water is the only nutrient the app doesn't read
+    with sqlite3.connect(pruned_file) as conn:
+        pruned = conn.execute("SELECT id FROM pruned_nutrients").fetchall()
+    conn.close()
+    assert pruned == [(1051,)]
+    assert table_rows(pruned_file, "food_nutrients") == [
+        row for row in table_rows(full_file, "food_nutrients") if row[1] != 1051
+    ]
+    for table in ("foods", "nutrients", "food_label_facts"):
+        assert table_rows(pruned_file, table) == table_rows(full_file, table)
+
+    # Energy is kept with any allow-list, as it decides which foods are imported
+    import_usda_data(
+        str(pruned_file), usda_data_dir=str(release_dir), keep_nutrients=[1003]
+    )
+    kept_ids = {row[1] for row in table_rows(pruned_file, "food_nutrients")}
+    assert kept_ids == {1003, 1008, 2047}
+    assert table_rows(pruned_file, "foods") == table_rows(full_file, "foods")
+
+
+def test_check_pruned_nutrients_warns_about_used_nutrients(app_with_db, caplog):
+    caplog.set_level(logging.INFO)
+    db.session.add_all(
+        [
+            Nutrient(id=1093, name="Sodium, Na", unit_name="MG"),
+            Nutrient(id=1051, name="Water", unit_name="G"),
+            PrunedNutrient(id=1093),
+            PrunedNutrient(id=1051),
+        ]
+    )
+    db.session.commit()
+
+    assert check_pruned_nutrients() == [(1093, "Sodium, Na")]
+    assert "nutrient 1093 (Sodium, Na)" in caplog.text
+    assert "Water" not in caplog.text
+    assert "no values of 2 nutrients" in caplog.text
@@ -0,0 +1,91 @@
+from datetime import date
+
+from models import db, CheckIn, DailyLog, MyFood, UserGoal
+from opennourish.view_models import get_dashboard_view_model, get_diary_view_model
+
+VIEW_DATE = date(2025, 5, 14)
+
+
+def _seed_friend_day(friend_id):
+    db.session.add(UserGoal(user_id=friend_id, calories=1800))
+    food = MyFood(user_id=friend_id, description="Shared Toast", calories_per_100g=300)
+    db.session.add(food)
+    db.session.flush()
+    db.session.add(
+        DailyLog(
+            user_id=friend_id,
+            log_date=VIEW_DATE,
+            meal_name="Breakfast",
+            my_food_id=food.id,
+            amount_grams=100,
+        )
+    )
+    db.session.add(CheckIn(user_id=friend_id, checkin_date=VIEW_DATE, weight_kg=70))
+    db.session.commit()
+    return food.id
+
+
+def _log_queries(statements):
+    return [s for s in statements if "FROM daily_logs" in s]
+
+
+def test_friend_dashboard_reuses_owner_view_model(
+    auth_client_with_friendship, count_queries
+):
+    client, _, friend_user = auth_client_with_friendship
+    with client.application.app_context():
+        _seed_friend_day(friend_user.id)
+        # The owner's own dashboard builds and caches the view-model
+        owner_view = get_dashboard_view_model(friend_user, VIEW_DATE, "3_month")
+        assert owner_view.totals["calories"] == 300
+        assert owner_view.remaining["calories"] == 1500
+        assert owner_view.weight_data == [70]
+
+    url = f"/user/{friend_user.username}/dashboard/{VIEW_DATE.isoformat()}"
+    with count_queries() as statements:
+        response = client.get(url)
+    assert response.status_code == 200
+    assert b"Shared Toast" in response.data
+    assert _log_queries(statements) == []
+
+
+def test_view_models_refresh_after_owner_writes(
+    auth_client_with_friendship, count_queries
+):
+    client, _, friend_user = auth_client_with_friendship
+    with client.application.app_context():
+        food_id = _seed_friend_day(friend_user.id)
+        first_diary = get_diary_view_model(friend_user, VIEW_DATE)
+        first_dashboard = get_dashboard_view_model(friend_user, VIEW_DATE, "all_time")
+        assert get_diary_view_model(friend_user, VIEW_DATE) is first_diary
+
+        db.session.add(
+            DailyLog(
+                user_id=friend_user.id,
+                log_date=VIEW_DATE,
+                meal_name="Lunch",
+                my_food_id=food_id,
+                amount_grams=50,
+            )
+        )
+        db.session.add(
+            CheckIn(user_id=friend_user.id, checkin_date=date(2025, 5, 1), weight_kg=71)
+        )
+        db.session.commit()
+
+        diary = get_diary_view_model(friend_user, VIEW_DATE)
+        assert diary is not first_diary
+        assert diary.totals["calories"] == 450
+        assert diary.logged_meal_names == {"Breakfast", "Lunch"}
+
+        dashboard = get_dashboard_view_model(friend_user, VIEW_DATE, "all_time")
+        assert dashboard is not first_dashboard
+        assert dashboard.weight_data == [71, 70]
+
+    with count_queries() as statements:
+        response = client.get(
+            f"/user/{friend_user.username}/diary/{VIEW_DATE.isoformat()}"
+        )
+    assert response.status_code == 200
+    assert b"Shared Toast" in response.data
+    assert _log_queries(statements) == []
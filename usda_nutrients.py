@@ -0,0 +1,47 @@
+"""
+USDA nutrient ids shared by the importer, import_usda_data.py, and the app:
+which nutrients decide that a food is imported, and which ones the app reads.
+"""
+
+from constants import CORE_NUTRIENT_IDS, LABEL_FACT_NUTRIENTS, USDA_UNIT_NAMES
+
+# Energy (KCAL) and Energy (Atwater General Factors) (KCAL); foods without a
+# positive value for either are not imported
+ENERGY_NUTRIENT_IDS = (1008, 2047)
+
+
+def label_fact_nutrient_ids(nutrients):
+    """
+    Maps each food_label_facts column to the nutrient ids to try, in order.
+    `nutrients` are (id, name, unit_name) rows. Names are tried in the order
+    of LABEL_FACT_NUTRIENTS; when a name exists with several units (e.g.
+    Energy in KCAL and kJ), the one in the label's unit is tried first.
+    """
+    ids_by_name = {}
+    for nutrient_id, name, unit_name in nutrients:
+        ids_by_name.setdefault(name, []).append((nutrient_id, unit_name))
+
+    column_ids = {}
+    for column, names, unit in LABEL_FACT_NUTRIENTS:
+        ids = []
+        for name in names:
+            candidates = sorted(
+                ids_by_name.get(name, []),
+                key=lambda c: (c[1] or "").upper() != USDA_UNIT_NAMES[unit],
+            )
+            ids.extend(nutrient_id for nutrient_id, _ in candidates)
+        column_ids[column] = ids
+    return column_ids
+
+
+def referenced_nutrient_ids(nutrients):
+    """
+    The ids of the nutrients the app reads: CORE_NUTRIENT_IDS, the energy
+    nutrients that decide which foods are imported, and every candidate of
+    the LABEL_FACT_NUTRIENTS label lines. `nutrients` are (id, name,
+    unit_name) rows.
+    """
+    ids = set(CORE_NUTRIENT_IDS.values()) | set(ENERGY_NUTRIENT_IDS)
+    for column_ids in label_fact_nutrient_ids(nutrients).values():
+        ids.update(column_ids)
+    return ids